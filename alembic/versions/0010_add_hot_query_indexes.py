@@ -0,0 +1,51 @@
+"""add composite indexes for hot query shapes
+
+Revision ID: 0010_add_hot_query_indexes
+Revises: 0009_add_player_defense_pending
+Create Date: 2026-10-17 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0010_add_hot_query_indexes"
+down_revision = "0009_add_player_defense_pending"
+branch_labels = None
+
+# (index name, table, columns) - keep in sync with __table_args__ in pq_app/model.py
+INDEXES = [
+    ("ix_tile_user_playthrough_id", "tile", ["user_id", "playthrough_id", "id"]),
+    ("ix_encounter_user_created", "encounter", ["user_id", "created_at", "id"]),
+    ("ix_encounter_tile_id", "encounter", ["tile_id"]),
+    ("ix_playthrough_user_ended_started", "playthrough", ["user_id", "ended_at", "started_at"]),
+    ("ix_action_tile_actionverb", "action", ["tile", "actionverb"]),
+    ("ix_tilemedia_type_media_default", "tilemedia", ["tile_type_id", "media_type", "is_default"]),
+    ("ix_tilemedia_tile_id", "tilemedia", ["tile_id"]),
+]
+
+
+def upgrade():
+    """Create the composite indexes, skipping any that already exist"""
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+    missing = [
+        (name, table, columns)
+        for name, table, columns in INDEXES
+        if name not in {index["name"] for index in inspector.get_indexes(table)}
+    ]
+
+    if conn.dialect.name == "postgresql":
+        # encounter/tile are large: build without blocking writes (requires autocommit)
+        with op.get_context().autocommit_block():
+            for name, table, columns in missing:
+                op.create_index(name, table, columns, postgresql_concurrently=True)
+    else:
+        for name, table, columns in missing:
+            op.create_index(name, table, columns)
+
+
+def downgrade():
+    """Drop the composite indexes"""
+    for name, table, _columns in reversed(INDEXES):
+        op.drop_index(name, table_name=table)
@@ -0,0 +1,111 @@
+"""add playerstats rollup table
+
+Revision ID: 0011_add_player_stats_rollup
+Revises: 0010_add_hot_query_indexes
+Create Date: 2026-10-17 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0011_add_player_stats_rollup"
+down_revision = "0010_add_hot_query_indexes"
+branch_labels = None
+
+COUNTERS = [
+    "total_encounters",
+    "successful_encounters",
+    "total_damage_dealt",
+    "total_damage_received",
+    "monsters_killed",
+    "tiles_explored",
+    "flee_attempts",
+    "flee_successes",
+]
+
+
+def upgrade():
+    """Create the playerstats table and backfill one row per player from history"""
+    inspector = sa.inspect(op.get_bind())
+    if "playerstats" not in inspector.get_table_names():
+        op.create_table(
+            "playerstats",
+            sa.Column(
+                "user_id",
+                sa.Integer(),
+                sa.ForeignKey("user.id", name="fk_playerstats_user", ondelete="CASCADE"),
+                primary_key=True,
+            ),
+            *[sa.Column(name, sa.Integer(), nullable=False, server_default="0") for name in COUNTERS],
+            sa.Column("updated_at", sa.DateTime(), nullable=True),
+        )
+    _backfill()
+
+
+def _backfill():
+    """
+    Insert the rollup row of every player that has none, with the same aggregates as
+    StatsService.compute_player_stats, in one INSERT ... SELECT. Increments only update
+    existing rows, so this must run before the application writes to the table.
+    """
+    user = sa.table("user", sa.column("id", sa.Integer))
+    playerstats = sa.table("playerstats", sa.column("user_id", sa.Integer), sa.column("updated_at", sa.DateTime))
+    for name in COUNTERS:
+        playerstats.append_column(sa.column(name, sa.Integer))
+    encounter = sa.table(
+        "encounter",
+        sa.column("user_id", sa.Integer),
+        sa.column("combat_action_id", sa.Integer),
+        sa.column("was_successful", sa.Boolean),
+        sa.column("damage_dealt", sa.Integer),
+        sa.column("damage_received", sa.Integer),
+        sa.column("monster_hp_before", sa.Integer),
+        sa.column("monster_hp_after", sa.Integer),
+    )
+    combataction = sa.table("combataction", sa.column("id", sa.Integer), sa.column("code", sa.String))
+    tile = sa.table("tile", sa.column("id", sa.Integer), sa.column("user_id", sa.Integer))
+
+    is_flee = combataction.c.code == "flee"
+    killed = (encounter.c.monster_hp_before > 0) & (encounter.c.monster_hp_after <= 0)
+    encounters = (
+        sa.select(
+            encounter.c.user_id,
+            sa.func.count().label("total_encounters"),
+            sa.func.sum(sa.case((encounter.c.was_successful.is_(True), 1), else_=0)).label("successful_encounters"),
+            sa.func.sum(encounter.c.damage_dealt).label("total_damage_dealt"),
+            sa.func.sum(encounter.c.damage_received).label("total_damage_received"),
+            sa.func.sum(sa.case((killed, 1), else_=0)).label("monsters_killed"),
+            sa.func.sum(sa.case((is_flee, 1), else_=0)).label("flee_attempts"),
+            sa.func.sum(sa.case((is_flee & encounter.c.was_successful.is_(True), 1), else_=0)).label(
+                "flee_successes"
+            ),
+        )
+        .select_from(encounter.outerjoin(combataction, encounter.c.combat_action_id == combataction.c.id))
+        .group_by(encounter.c.user_id)
+        .subquery()
+    )
+    tiles = (
+        sa.select(tile.c.user_id, sa.func.count().label("tiles_explored")).group_by(tile.c.user_id).subquery()
+    )
+
+    def counter(name):
+        source = tiles if name == "tiles_explored" else encounters
+        return sa.func.coalesce(source.c[name], 0)
+
+    rows = (
+        sa.select(user.c.id, *[counter(name) for name in COUNTERS], sa.func.current_timestamp())
+        .select_from(
+            user.outerjoin(encounters, encounters.c.user_id == user.c.id).outerjoin(
+                tiles, tiles.c.user_id == user.c.id
+            )
+        )
+        .where(~sa.exists().where(playerstats.c.user_id == user.c.id))
+    )
+    op.get_bind().execute(playerstats.insert().from_select(["user_id", *COUNTERS, "updated_at"], rows))
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    if "playerstats" in inspector.get_table_names():
+        op.drop_table("playerstats")
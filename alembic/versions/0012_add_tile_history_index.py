@@ -0,0 +1,33 @@
+"""add tile (user_id, created_at, id) index for keyset-paginated history
+
+Revision ID: 0012_add_tile_history_index
+Revises: 0011_add_player_stats_rollup
+Create Date: 2026-10-17 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0012_add_tile_history_index"
+down_revision = "0011_add_player_stats_rollup"
+branch_labels = None
+
+INDEX_NAME = "ix_tile_user_created"
+
+
+def upgrade():
+    """Create the tile history index unless it already exists"""
+    conn = op.get_bind()
+    if INDEX_NAME in {index["name"] for index in sa.inspect(conn).get_indexes("tile")}:
+        return
+
+    if conn.dialect.name == "postgresql":
+        with op.get_context().autocommit_block():
+            op.create_index(INDEX_NAME, "tile", ["user_id", "created_at", "id"], postgresql_concurrently=True)
+    else:
+        op.create_index(INDEX_NAME, "tile", ["user_id", "created_at", "id"])
+
+
+def downgrade():
+    op.drop_index(INDEX_NAME, table_name="tile")
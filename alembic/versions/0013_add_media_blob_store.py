@@ -0,0 +1,119 @@
+"""add content-addressed media blob store
+
+Revision ID: 0013_add_media_blob_store
+Revises: 0012_add_tile_history_index
+Create Date: 2026-10-17 00:00:00.000000
+"""
+
+import hashlib
+from datetime import datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0013_add_media_blob_store"
+down_revision = "0012_add_tile_history_index"
+branch_labels = None
+
+# table -> (content column, hash column, foreign key name)
+HASHED_COLUMNS = {
+    "tilemedia": ("content", "content_hash", "fk_tilemedia_content_hash"),
+    "tiletypeoption": ("ascii_art", "ascii_art_hash", "fk_tiletypeoption_ascii_art_hash"),
+}
+
+
+def _hash(content):
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def upgrade():
+    """Create mediablob, add hash columns and backfill them from existing art"""
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+
+    if "mediablob" not in inspector.get_table_names():
+        op.create_table(
+            "mediablob",
+            sa.Column("sha256", sa.String(64), primary_key=True),
+            sa.Column("content", sa.Text(), nullable=False),
+            sa.Column("size", sa.Integer(), nullable=False),
+            sa.Column("created_at", sa.DateTime(), nullable=True),
+        )
+
+    sqlite = conn.dialect.name == "sqlite"
+    if sqlite:
+        # The recreate below drops tiletypeoption, which tile rows reference, so foreign
+        # key enforcement (on in env.py) has to be off. The pragma is a no-op inside a
+        # transaction, hence the autocommit blocks.
+        with op.get_context().autocommit_block():
+            op.execute("PRAGMA foreign_keys=OFF")
+    try:
+        for table_name, (_, hash_column, fk_name) in HASHED_COLUMNS.items():
+            existing_columns = [col["name"] for col in inspector.get_columns(table_name)]
+            existing_fks = {fk["name"] for fk in inspector.get_foreign_keys(table_name)}
+            if hash_column in existing_columns and fk_name in existing_fks:
+                continue
+            # A failed earlier run can leave batch mode's temporary table behind
+            if sqlite and f"_alembic_tmp_{table_name}" in inspector.get_table_names():
+                op.drop_table(f"_alembic_tmp_{table_name}")
+            # SQLite cannot add constraints to existing tables: batch mode recreates the table
+            # there, and issues plain ALTER TABLE statements on other databases
+            with op.batch_alter_table(table_name) as batch_op:
+                if hash_column not in existing_columns:
+                    batch_op.add_column(sa.Column(hash_column, sa.String(64), nullable=True))
+                if fk_name not in existing_fks:
+                    batch_op.create_foreign_key(fk_name, "mediablob", [hash_column], ["sha256"])
+    finally:
+        if sqlite:
+            with op.get_context().autocommit_block():
+                op.execute("PRAGMA foreign_keys=ON")
+
+    # Backfill: one blob per distinct piece of art, then point every row at its blob
+    mediablob = sa.table(
+        "mediablob",
+        sa.column("sha256", sa.String),
+        sa.column("content", sa.Text),
+        sa.column("size", sa.Integer),
+        sa.column("created_at", sa.DateTime),
+    )
+    stored = set(conn.execute(sa.select(mediablob.c.sha256)).scalars())
+    now = datetime.now(timezone.utc)
+    for table_name, (content_column, hash_column, _) in HASHED_COLUMNS.items():
+        table = sa.table(table_name, sa.column(content_column, sa.Text), sa.column(hash_column, sa.String))
+        contents = conn.execute(
+            sa.select(table.c[content_column])
+            .where(table.c[content_column].is_not(None), table.c[hash_column].is_(None))
+            .distinct()
+        ).scalars()
+        for content in contents:
+            if not content:
+                continue
+            digest = _hash(content)
+            if digest not in stored:
+                conn.execute(
+                    mediablob.insert().values(
+                        sha256=digest, content=content, size=len(content.encode("utf-8")), created_at=now
+                    )
+                )
+                stored.add(digest)
+            conn.execute(
+                table.update().where(table.c[content_column] == content).values({hash_column: digest})
+            )
+
+
+def downgrade():
+    """Drop the hash columns and the mediablob table (art stays in the text columns)"""
+    inspector = sa.inspect(op.get_bind())
+    for table_name, (_, hash_column, fk_name) in HASHED_COLUMNS.items():
+        existing_columns = [col["name"] for col in inspector.get_columns(table_name)]
+        if hash_column not in existing_columns:
+            continue
+        existing_fks = {fk["name"] for fk in inspector.get_foreign_keys(table_name)}
+        with op.batch_alter_table(table_name) as batch_op:
+            if fk_name in existing_fks:
+                batch_op.drop_constraint(fk_name, type_="foreignkey")
+            batch_op.drop_column(hash_column)
+
+    if "mediablob" in inspector.get_table_names():
+        op.drop_table("mediablob")
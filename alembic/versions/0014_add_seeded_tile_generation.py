@@ -0,0 +1,55 @@
+"""seeded tile generation: playthrough seed/position and tile index
+
+Revision ID: 0014_add_seeded_tile_generation
+Revises: 0013_add_media_blob_store
+Create Date: 2026-10-17 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0014_add_seeded_tile_generation"
+down_revision = "0013_add_media_blob_store"
+branch_labels = None
+
+POSITION_INDEX = "ix_tile_playthrough_index"
+
+
+def upgrade():
+    """Generate tiles from a per-playthrough seed and record each tile's position"""
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+
+    # Existing playthroughs get a seed lazily, the first time a tile is revealed
+    playthrough_columns = [col["name"] for col in inspector.get_columns("playthrough")]
+    if "seed" not in playthrough_columns:
+        op.add_column("playthrough", sa.Column("seed", sa.BigInteger(), nullable=True))
+    if "tiles_revealed" not in playthrough_columns:
+        op.add_column(
+            "playthrough", sa.Column("tiles_revealed", sa.Integer(), nullable=False, server_default="0")
+        )
+
+    tile_columns = [col["name"] for col in inspector.get_columns("tile")]
+    if "tile_index" not in tile_columns:
+        op.add_column("tile", sa.Column("tile_index", sa.Integer(), nullable=True))
+    if POSITION_INDEX not in {index["name"] for index in inspector.get_indexes("tile")}:
+        op.create_index(POSITION_INDEX, "tile", ["playthrough_id", "tile_index"], unique=True)
+
+
+def downgrade():
+    """Drop seeded generation columns"""
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+
+    if POSITION_INDEX in {index["name"] for index in inspector.get_indexes("tile")}:
+        op.drop_index(POSITION_INDEX, table_name="tile")
+    tile_columns = [col["name"] for col in inspector.get_columns("tile")]
+    if "tile_index" in tile_columns:
+        op.drop_column("tile", "tile_index")
+
+    playthrough_columns = [col["name"] for col in inspector.get_columns("playthrough")]
+    if "tiles_revealed" in playthrough_columns:
+        op.drop_column("playthrough", "tiles_revealed")
+    if "seed" in playthrough_columns:
+        op.drop_column("playthrough", "seed")
@@ -0,0 +1,32 @@
+"""optimistic concurrency: version counters on user and tile
+
+Revision ID: 0015_add_optimistic_version_columns
+Revises: 0014_add_seeded_tile_generation
+Create Date: 2026-10-17 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0015_add_optimistic_version_columns"
+down_revision = "0014_add_seeded_tile_generation"
+branch_labels = None
+
+TABLES = ("user", "tile")
+
+
+def upgrade():
+    """Add version_id (existing rows start at version 1)"""
+    inspector = sa.inspect(op.get_bind())
+    for table in TABLES:
+        if "version_id" not in [col["name"] for col in inspector.get_columns(table)]:
+            op.add_column(table, sa.Column("version_id", sa.Integer(), nullable=False, server_default="1"))
+
+
+def downgrade():
+    """Drop the version counters"""
+    inspector = sa.inspect(op.get_bind())
+    for table in TABLES:
+        if "version_id" in [col["name"] for col in inspector.get_columns(table)]:
+            op.drop_column(table, "version_id")
@@ -0,0 +1,46 @@
+"""idempotency keys for action endpoints
+
+Revision ID: 0016_add_idempotency_keys
+Revises: 0015_add_optimistic_version_columns
+Create Date: 2026-10-17 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0016_add_idempotency_keys"
+down_revision = "0015_add_optimistic_version_columns"
+branch_labels = None
+
+CREATED_INDEX = "ix_idempotency_key_created"
+
+
+def upgrade():
+    """Create the idempotency_key table"""
+    inspector = sa.inspect(op.get_bind())
+    if "idempotency_key" in inspector.get_table_names():
+        return
+
+    op.create_table(
+        "idempotency_key",
+        sa.Column(
+            "user_id",
+            sa.Integer(),
+            sa.ForeignKey("user.id", name="fk_idempotency_key_user", ondelete="CASCADE"),
+            primary_key=True,
+        ),
+        sa.Column("key", sa.String(255), primary_key=True),
+        sa.Column("request_hash", sa.String(64), nullable=False),
+        sa.Column("status_code", sa.Integer(), nullable=True),
+        sa.Column("response_body", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+    )
+    op.create_index(CREATED_INDEX, "idempotency_key", ["created_at"])
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    if "idempotency_key" in inspector.get_table_names():
+        op.drop_index(CREATED_INDEX, table_name="idempotency_key")
+        op.drop_table("idempotency_key")
@@ -0,0 +1,34 @@
+"""reference data version counter
+
+Revision ID: 0017_add_reference_data_version
+Revises: 0016_add_idempotency_keys
+Create Date: 2026-10-17 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0017_add_reference_data_version"
+down_revision = "0016_add_idempotency_keys"
+branch_labels = None
+
+
+def upgrade():
+    """Create the single-row reference_data_version table"""
+    inspector = sa.inspect(op.get_bind())
+    if "reference_data_version" in inspector.get_table_names():
+        return
+
+    table = op.create_table(
+        "reference_data_version",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("version", sa.Integer(), nullable=False),
+    )
+    op.bulk_insert(table, [{"id": 1, "version": 0}])
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    if "reference_data_version" in inspector.get_table_names():
+        op.drop_table("reference_data_version")
@@ -0,0 +1,34 @@
+"""idempotency key lease: claimed_at
+
+Revision ID: 0018_add_idempotency_lease
+Revises: 0017_add_reference_data_version
+Create Date: 2026-10-17 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0018_add_idempotency_lease"
+down_revision = "0017_add_reference_data_version"
+branch_labels = None
+
+
+def upgrade():
+    """Add idempotency_key.claimed_at (existing claims date from created_at)"""
+    inspector = sa.inspect(op.get_bind())
+    if "claimed_at" in [col["name"] for col in inspector.get_columns("idempotency_key")]:
+        return
+
+    op.add_column("idempotency_key", sa.Column("claimed_at", sa.DateTime(), nullable=True))
+    op.execute("UPDATE idempotency_key SET claimed_at = created_at")
+    # Batch mode: SQLite cannot change a column's nullability in place
+    with op.batch_alter_table("idempotency_key") as batch_op:
+        batch_op.alter_column("claimed_at", existing_type=sa.DateTime(), nullable=False)
+
+
+def downgrade():
+    inspector = sa.inspect(op.get_bind())
+    if "claimed_at" in [col["name"] for col in inspector.get_columns("idempotency_key")]:
+        with op.batch_alter_table("idempotency_key") as batch_op:
+            batch_op.drop_column("claimed_at")
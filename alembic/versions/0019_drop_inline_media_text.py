@@ -0,0 +1,111 @@
+"""drop the inline art text columns now that art lives in mediablob
+
+Revision ID: 0019_drop_inline_media_text
+Revises: 0018_add_idempotency_lease
+Create Date: 2026-10-17 00:00:00.000000
+"""
+
+import hashlib
+from datetime import datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = "0019_drop_inline_media_text"
+down_revision = "0018_add_idempotency_lease"
+branch_labels = None
+
+# table -> (content column, hash column)
+INLINE_COLUMNS = {
+    "tilemedia": ("content", "content_hash"),
+    "tiletypeoption": ("ascii_art", "ascii_art_hash"),
+}
+
+MEDIABLOB = sa.table(
+    "mediablob",
+    sa.column("sha256", sa.String),
+    sa.column("content", sa.Text),
+    sa.column("size", sa.Integer),
+    sa.column("created_at", sa.DateTime),
+)
+
+
+def _hash(content):
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def _recreate_tables(columns_by_table):
+    """Run ``batch_alter_table`` per table; on SQLite with foreign keys off (tile rows reference tiletypeoption)"""
+    conn = op.get_bind()
+    sqlite = conn.dialect.name == "sqlite"
+    if sqlite:
+        with op.get_context().autocommit_block():
+            op.execute("PRAGMA foreign_keys=OFF")
+    try:
+        for table_name, alter in columns_by_table.items():
+            if sqlite and f"_alembic_tmp_{table_name}" in sa.inspect(conn).get_table_names():
+                op.drop_table(f"_alembic_tmp_{table_name}")
+            with op.batch_alter_table(table_name) as batch_op:
+                alter(batch_op)
+    finally:
+        if sqlite:
+            with op.get_context().autocommit_block():
+                op.execute("PRAGMA foreign_keys=ON")
+
+
+def upgrade():
+    """Hash any art written since 0013 without going through the ORM, then drop the text columns"""
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+
+    stored = set(conn.execute(sa.select(MEDIABLOB.c.sha256)).scalars())
+    now = datetime.now(timezone.utc)
+    to_drop = {}
+    for table_name, (content_column, hash_column) in INLINE_COLUMNS.items():
+        if content_column not in [col["name"] for col in inspector.get_columns(table_name)]:
+            continue
+        table = sa.table(table_name, sa.column(content_column, sa.Text), sa.column(hash_column, sa.String))
+        rows = conn.execute(
+            sa.select(table.c[content_column], table.c[hash_column]).where(table.c[content_column].is_not(None)).distinct()
+        )
+        for content, content_hash in rows.all():
+            digest = _hash(content) if content else None
+            if digest and digest not in stored:
+                conn.execute(
+                    MEDIABLOB.insert().values(
+                        sha256=digest, content=content, size=len(content.encode("utf-8")), created_at=now
+                    )
+                )
+                stored.add(digest)
+            if digest != content_hash:
+                conn.execute(
+                    table.update().where(table.c[content_column] == content).values({hash_column: digest})
+                )
+        to_drop[table_name] = lambda batch_op, column=content_column: batch_op.drop_column(column)
+
+    if to_drop:
+        _recreate_tables(to_drop)
+
+
+def downgrade():
+    """Restore the text columns from the blobs their rows reference"""
+    conn = op.get_bind()
+    inspector = sa.inspect(conn)
+
+    to_add = {}
+    for table_name, (content_column, _) in INLINE_COLUMNS.items():
+        if content_column in [col["name"] for col in inspector.get_columns(table_name)]:
+            continue
+        to_add[table_name] = lambda batch_op, column=content_column: batch_op.add_column(
+            sa.Column(column, sa.Text(), nullable=True)
+        )
+    if to_add:
+        _recreate_tables(to_add)
+
+    for table_name, (content_column, hash_column) in INLINE_COLUMNS.items():
+        table = sa.table(table_name, sa.column(content_column, sa.Text), sa.column(hash_column, sa.String))
+        content = (
+            sa.select(MEDIABLOB.c.content).where(MEDIABLOB.c.sha256 == table.c[hash_column]).scalar_subquery()
+        )
+        conn.execute(table.update().where(table.c[hash_column].is_not(None)).values({content_column: content}))
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Login storm benchmark: login throughput versus gameplay latency.
+
+Threads hammer POST /api/v1/auth/login while a probe thread plays tile actions
+(a fight on a monster tile) and records their latency. Three runs are compared:
+
+    idle       no logins, the probe alone (baseline latency)
+    unbounded  one hashing thread per login thread, as when hashing ran on the request
+               thread: every login hashes at once and competes with gameplay for CPU
+    bounded    PASSWORD_HASH_WORKERS / PASSWORD_HASH_QUEUE_SIZE as given; logins over
+               the bound get 429 + Retry-After and back off
+
+Each run uses its own temporary SQLite database and the configured PASSWORD_HASH_METHOD.
+
+Usage:
+    python benchmark_auth.py                                  # 16 login threads, 5 s per run
+    python benchmark_auth.py --login-threads 32 --seconds 10 --hash-workers 1 --queue-size 2
+    python benchmark_auth.py --json
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# Add the parent directory to Python path to import pq_app
+sys.path.insert(0, str(Path(__file__).parent))
+
+import config  # noqa: E402
+from flask_jwt_extended import create_access_token  # noqa: E402
+
+from pq_app import create_app  # noqa: E402
+from pq_app.model import db, User, Tile, Playthrough, TileTypeOption  # noqa: E402
+
+PASSWORD = "storm-password"
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Measure login throughput against tile-action latency")
+    parser.add_argument("--login-threads", type=int, default=16, help="concurrent clients logging in")
+    parser.add_argument("--seconds", type=float, default=5.0, help="duration of each run")
+    parser.add_argument("--hash-workers", type=int, default=1, help="PASSWORD_HASH_WORKERS for the bounded run")
+    parser.add_argument("--queue-size", type=int, default=2, help="PASSWORD_HASH_QUEUE_SIZE for the bounded run")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    return parser.parse_args(argv)
+
+
+def make_app(path, hash_workers, queue_size):
+    """Development app on a fresh SQLite file with rate limiting off and the given hashing bounds"""
+    cfg = config.DevelopmentConfig
+    cfg.SQLALCHEMY_DATABASE_URI = f"sqlite:///{path}"
+    cfg.SQLALCHEMY_ENGINE_OPTIONS = config.engine_options(cfg.SQLALCHEMY_DATABASE_URI, pool_size=64)
+    cfg.RATELIMIT_ENABLED = False
+    cfg.PASSWORD_HASH_WORKERS = hash_workers
+    cfg.PASSWORD_HASH_QUEUE_SIZE = queue_size
+    cfg.DEBUG = False
+    app = create_app("development")
+    with app.app_context():
+        storm = User(username="storm", email="storm@example.com")
+        storm.set_password(PASSWORD)
+        player = User(username="probe", email="probe@example.com")
+        player.set_password(PASSWORD)
+        player.points = 10**9
+        db.session.add_all([storm, player])
+        db.session.flush()
+        playthrough = Playthrough(user_id=player.id)
+        db.session.add(playthrough)
+        db.session.flush()
+        monster = TileTypeOption.query.filter_by(name="monster").first()
+        tile = Tile(
+            user_id=player.id,
+            type=monster.id,
+            playthrough_id=playthrough.id,
+            monster_max_hp=10**9,
+            monster_current_hp=10**9,
+        )
+        db.session.add(tile)
+        db.session.commit()
+        token = create_access_token(identity=str(player.id))
+        return app, f"/api/v1/player/{player.id}/tiles/{tile.id}/action", token
+
+
+def _storm(app, stop, counts, lock):
+    client = app.test_client()
+    while not stop.is_set():
+        status = client.post("/api/v1/auth/login", json={"username": "storm", "password": PASSWORD}).status_code
+        with lock:
+            counts[status] = counts.get(status, 0) + 1
+        if status == 429:
+            time.sleep(0.05)  # a well-behaved client backs off
+
+
+def _probe(app, path, token, stop, latencies):
+    client = app.test_client()
+    headers = {"Authorization": f"Bearer {token}"}
+    body = {"action_code": "fight", "combat_action_code": "attack_light"}
+    while not stop.is_set():
+        started = time.perf_counter()
+        response = client.post(path, json=body, headers=headers)
+        latencies.append((time.perf_counter() - started) * 1000)
+        if response.status_code != 200:
+            raise RuntimeError(f"tile action failed: {response.status_code} {response.get_data(as_text=True)}")
+        time.sleep(0.01)
+
+
+def run(name, login_threads, seconds, hash_workers, queue_size):
+    with tempfile.TemporaryDirectory() as tmp:
+        app, path, token = make_app(os.path.join(tmp, "bench.db"), hash_workers, queue_size)
+        stop = threading.Event()
+        counts, lock, latencies = {}, threading.Lock(), []
+        threads = [threading.Thread(target=_probe, args=(app, path, token, stop, latencies))]
+        threads += [threading.Thread(target=_storm, args=(app, stop, counts, lock)) for _ in range(login_threads)]
+        for thread in threads:
+            thread.start()
+        time.sleep(seconds)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+
+    latencies.sort()
+    return {
+        "run": name,
+        "login_threads": login_threads,
+        "hash_workers": hash_workers,
+        "queue_size": queue_size,
+        "logins_per_second": round(counts.get(200, 0) / seconds, 1),
+        "rejected_429": counts.get(429, 0),
+        "action_p50_ms": round(statistics.median(latencies), 1),
+        "action_p99_ms": round(latencies[int(len(latencies) * 0.99)], 1),
+        "actions": len(latencies),
+    }
+
+
+def benchmark(args):
+    return [
+        run("idle", 0, args.seconds, args.hash_workers, args.queue_size),
+        run("unbounded", args.login_threads, args.seconds, args.login_threads, 0),
+        run("bounded", args.login_threads, args.seconds, args.hash_workers, args.queue_size),
+    ]
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    summaries = benchmark(args)
+    if args.json:
+        print(json.dumps(summaries, indent=2))
+        return
+    print(f"method {config.Config.PASSWORD_HASH_METHOD}, {os.cpu_count()} CPUs, {args.seconds:g} s per run")
+    print(f"{'run':<11}{'hash pool':>10}{'logins/s':>10}{'429s':>7}{'action p50':>12}{'action p99':>12}")
+    for s in summaries:
+        pool = f"{s['hash_workers']}+{s['queue_size']}" if s["login_threads"] else "-"
+        print(
+            f"{s['run']:<11}{pool:>10}{s['logins_per_second']:>10.1f}{s['rejected_429']:>7}"
+            f"{s['action_p50_ms']:>10.1f}ms{s['action_p99_ms']:>10.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,420 @@
+#!/usr/bin/env python3
+"""
+Load test: many concurrent players on a locally started server.
+
+Starts the app under gunicorn (production config, rate limiting off) on a fresh SQLite
+file or a given database, registers synthetic players through the API and plays
+journeys through the JWT API until the time is up. Each virtual player:
+
+    logs in (POST auth/login)
+    repeats for a session of 5-15 tiles:
+        looks at the current tile (GET tiles/current)
+        on a live monster, fights with a mix of combat actions, healing when low on HP
+            (POST combat/execute) until the tile is completed
+        moves on (POST tiles/next)
+    pauses, then starts a new session with a fresh login
+
+with a random think time between requests. Players start spread over the ramp-up.
+The API has no call to start a playthrough (the web UI does that), so each player's
+first playthrough and tile are created directly in the database after registration.
+
+Thousands of players are asyncio tasks that mostly sleep; requests go out over a
+bounded set of keep-alive connections (like a reverse proxy in front of the workers).
+The report shows throughput, latency percentiles, error rate and, from the
+Server-Timing header, SQL statements and DB time per request for each endpoint.
+
+Databases: "sqlite" is a temporary SQLite file; anything else is a SQLAlchemy URL for an
+existing database, e.g. a local Postgres (postgresql+psycopg2://pyquest@localhost/pyquest).
+Synthetic players are named load<run>_<n>, so repeated runs do not collide.
+
+Usage:
+    python benchmark_load.py                                  # 500 players, 30 s, SQLite
+    python benchmark_load.py --players 2000 --seconds 60 --workers 4 --threads 8
+    python benchmark_load.py --database sqlite --database postgresql+psycopg2://pyquest@localhost/pyquest
+    python benchmark_load.py --json > baseline.json
+    python benchmark_load.py --baseline baseline.json --max-regression 20   # exit 1 on regression
+"""
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Add the parent directory to Python path to import pq_app
+ROOT = Path(__file__).parent
+sys.path.insert(0, str(ROOT))
+
+import config  # noqa: E402
+
+from pq_app import create_app  # noqa: E402
+from pq_app.model import db  # noqa: E402
+from pq_app.services.tile_service import TileService  # noqa: E402
+
+PASSWORD = "load-password"
+MAX_HP = 100
+
+# Combat action mix for a player above the heal threshold (code, weight)
+ACTION_MIX = (("attack_light", 50), ("attack_heavy", 30), ("defend", 15), ("flee", 5))
+HEAL_BELOW_PERCENT = 35
+
+_SERVER_TIMING = re.compile(r'dur=([\d.]+);desc="(\d+) queries"')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate concurrent players against a local server")
+    parser.add_argument("--players", type=int, default=500, help="concurrent virtual players")
+    parser.add_argument("--seconds", type=float, default=30.0, help="duration of the run after registration")
+    parser.add_argument("--ramp-up", type=float, default=10.0, help="seconds over which players start")
+    parser.add_argument("--think-time", type=float, default=1.0, help="mean pause between a player's requests")
+    parser.add_argument("--session-gap", type=float, default=5.0, help="longest pause between sessions")
+    parser.add_argument(
+        "--database", action="append", help='"sqlite" or a SQLAlchemy URL; repeat to compare (default: sqlite)'
+    )
+    parser.add_argument("--workers", type=int, default=min(4, os.cpu_count() or 1), help="gunicorn workers")
+    parser.add_argument("--threads", type=int, default=4, help="threads per gunicorn worker")
+    parser.add_argument("--connections", type=int, default=0, help="client connections (default workers*threads*2)")
+    parser.add_argument(
+        "--hash-method",
+        default="pbkdf2:sha256:1000",
+        help="PASSWORD_HASH_METHOD for the server; cheap by default, benchmark_auth.py covers login storms",
+    )
+    parser.add_argument("--seed", type=int, default=1, help="seed for think times and action choices")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    parser.add_argument("--baseline", help="JSON output of an earlier run to compare against")
+    parser.add_argument(
+        "--max-regression", type=float, default=20.0, help="allowed p99 latency increase over the baseline, percent"
+    )
+    return parser.parse_args(argv)
+
+
+class Client:
+    """Blocking HTTP requests on a thread pool, one keep-alive connection per thread"""
+
+    def __init__(self, port, connections):
+        self.port = port
+        self.executor = ThreadPoolExecutor(max_workers=connections, thread_name_prefix="load-client")
+        self.local = threading.local()
+        self.samples = defaultdict(list)
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+
+    async def request(self, name, method, path, body=None, token=None):
+        """
+        Send a request and record its sample under ``name``
+
+        Returns:
+            (status, decoded JSON body or None); status 0 means the connection failed
+        """
+        loop = asyncio.get_running_loop()
+        status, payload, ms, timing = await loop.run_in_executor(self.executor, self._send, method, path, body, token)
+        self.samples[name].append((ms, status, timing))
+        return status, payload
+
+    def _send(self, method, path, body, token):
+        headers = {"Content-Type": "application/json"}
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+        data = json.dumps(body) if body is not None else None
+        started = time.perf_counter()
+        for attempt in range(2):
+            connection = getattr(self.local, "connection", None)
+            if connection is None:
+                connection = self.local.connection = http.client.HTTPConnection("127.0.0.1", self.port, timeout=60)
+            try:
+                connection.request(method, path, body=data, headers=headers)
+                response = connection.getresponse()
+                raw = response.read()
+                break
+            except (http.client.HTTPException, OSError):
+                # The server closed an idle keep-alive connection: reconnect once
+                connection.close()
+                self.local.connection = None
+                if attempt:
+                    return 0, None, (time.perf_counter() - started) * 1000, None
+        ms = (time.perf_counter() - started) * 1000
+        if response.getheader("Connection", "").lower() == "close":
+            connection.close()
+            self.local.connection = None
+        match = _SERVER_TIMING.search(response.getheader("Server-Timing", ""))
+        timing = (float(match.group(1)), int(match.group(2))) if match else None
+        try:
+            payload = json.loads(raw) if raw else None
+        except ValueError:
+            payload = None
+        return response.status, payload, ms, timing
+
+
+def percentile(values, q):
+    """Nearest-rank percentile of sorted ``values``"""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, max(0, int(round(q / 100 * len(values))) - 1))]
+
+
+def summarize(name, samples, seconds):
+    latencies = sorted(ms for ms, _, _ in samples)
+    errors = sum(1 for _, status, _ in samples if not 200 <= status < 400)
+    timings = [timing for _, _, timing in samples if timing is not None]
+    statuses = defaultdict(int)
+    for _, status, _ in samples:
+        statuses[str(status)] += 1
+    return {
+        "endpoint": name,
+        "requests": len(samples),
+        "rps": round(len(samples) / seconds, 1) if seconds else 0.0,
+        "error_rate": round(errors / len(samples), 4) if samples else 0.0,
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p90_ms": round(percentile(latencies, 90), 1),
+        "p99_ms": round(percentile(latencies, 99), 1),
+        "max_ms": round(latencies[-1], 1) if latencies else 0.0,
+        "db_ms_mean": round(sum(t[0] for t in timings) / len(timings), 2) if timings else None,
+        "db_queries_mean": round(sum(t[1] for t in timings) / len(timings), 2) if timings else None,
+        "statuses": dict(statuses),
+    }
+
+
+def choose_action(rng, hp):
+    if hp * 100 < MAX_HP * HEAL_BELOW_PERCENT:
+        return "heal"
+    codes, weights = zip(*ACTION_MIX)
+    return rng.choices(codes, weights)[0]
+
+
+async def play(client, player, stop_at, rng, args):
+    """One virtual player's journeys until ``stop_at`` (event loop time)"""
+    loop = asyncio.get_running_loop()
+    base = f"/api/v1/player/{player['id']}"
+
+    async def pause(seconds):
+        # Never past the end of the run, so the measured duration is the run's
+        await asyncio.sleep(max(0.0, min(seconds, stop_at - loop.time())))
+        return loop.time() < stop_at
+
+    async def think():
+        return await pause(min(rng.expovariate(1 / args.think_time), args.think_time * 5))
+
+    while loop.time() < stop_at:
+        status, login = await client.request(
+            "POST auth/login", "POST", "/api/v1/auth/login", {"username": player["username"], "password": PASSWORD}
+        )
+        if status != 200:
+            if not await think():
+                return
+            continue
+        token, hp = login["access_token"], MAX_HP
+
+        for _ in range(rng.randint(5, 15)):
+            if not await think():
+                return
+            status, tile = await client.request("GET tiles/current", "GET", f"{base}/tiles/current", token=token)
+            if status != 200:
+                break
+            monster = tile.get("monster_status") or {}
+            while monster.get("is_alive") and hp > 0:
+                if not await think():
+                    return
+                body = {"tile_id": tile["id"], "combat_action_code": choose_action(rng, hp)}
+                status, result = await client.request(
+                    "POST combat/execute", "POST", f"{base}/combat/execute", body, token=token
+                )
+                if status != 200 or result["tile_completed"]:
+                    break
+                hp = result["player_hp"]
+            if not await think():
+                return
+            status, _ = await client.request("POST tiles/next", "POST", f"{base}/tiles/next", token=token)
+            if status != 200:
+                break
+
+        await pause(rng.uniform(0, args.session_gap))
+
+
+async def register(client, players, concurrency=16):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(player):
+        async with semaphore:
+            body = {"username": player["username"], "email": f"{player['username']}@load.test", "password": PASSWORD}
+            status, payload = await client.request("POST auth/register", "POST", "/api/v1/auth/register", body)
+            if status == 201:
+                player["id"] = payload["user"]["id"]
+
+    await asyncio.gather(*(one(player) for player in players))
+    return [player for player in players if "id" in player]
+
+
+async def run_players(client, players, args):
+    loop = asyncio.get_running_loop()
+    stop_at = loop.time() + args.seconds
+    step = args.ramp_up / len(players) if players else 0
+
+    async def start(index, player):
+        await asyncio.sleep(index * step)
+        await play(client, player, stop_at, random.Random(f"{args.seed}-{index}"), args)
+
+    await asyncio.gather(*(start(i, player) for i, player in enumerate(players)))
+
+
+def prepare_database(url):
+    """Create the schema and reference data, and return an app for seeding"""
+    cfg = config.DevelopmentConfig
+    cfg.SQLALCHEMY_DATABASE_URI = url
+    cfg.SQLALCHEMY_ENGINE_OPTIONS = config.engine_options(url)
+    cfg.DEBUG = False
+    return create_app("development")
+
+
+def start_playthroughs(app, user_ids):
+    with app.app_context():
+        service = TileService()
+        for user_id in user_ids:
+            service.start_new_playthrough(user_id)
+        db.session.commit()
+        db.session.remove()
+        db.engine.dispose()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(url, args, workdir):
+    port = free_port()
+    env = dict(
+        os.environ,
+        APP_ENV="production",
+        DATABASE_URL=url,
+        RATELIMIT_ENABLED="0",
+        RATELIMIT_STORAGE_URI="memory://",
+        PASSWORD_HASH_METHOD=args.hash_method,
+        SERVER_TIMING_ENABLED="1",
+        PROMETHEUS_MULTIPROC_DIR=os.path.join(workdir, "prometheus"),
+    )
+    command = [sys.executable, "-m", "gunicorn", "run:app", "-b", f"127.0.0.1:{port}", "-w", str(args.workers)]
+    command += ["-k", "gthread", "--threads", str(args.threads), "--log-level", "warning"]
+    log = open(os.path.join(workdir, "gunicorn.log"), "w")
+    process = subprocess.Popen(command, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            break
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            connection.request("GET", "/api/v1/health/pool")
+            if connection.getresponse().status == 200:
+                return process, port
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"server did not start, see {log.name}:\n{Path(log.name).read_text()}")
+
+
+def stop_server(process):
+    process.terminate()
+    try:
+        process.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        process.kill()
+
+
+def run(database, args):
+    with tempfile.TemporaryDirectory() as workdir:
+        url = f"sqlite:///{os.path.join(workdir, 'load.db')}" if database == "sqlite" else database
+        app = prepare_database(url)
+        process, port = start_server(url, args, workdir)
+        client = Client(port, args.connections or args.workers * args.threads * 2)
+        try:
+            prefix = f"load{int(time.time())}"
+            players = [{"username": f"{prefix}_{i}"} for i in range(args.players)]
+            started = time.perf_counter()
+            players = asyncio.run(register(client, players))
+            registration_seconds = time.perf_counter() - started
+            start_playthroughs(app, [player["id"] for player in players])
+
+            registration = client.samples.pop("POST auth/register")
+            started = time.perf_counter()
+            asyncio.run(run_players(client, players, args))
+            seconds = time.perf_counter() - started
+        finally:
+            client.close()
+            stop_server(process)
+
+    samples = dict(client.samples)
+    endpoints = [summarize("POST auth/register", registration, registration_seconds)]
+    endpoints += [summarize(name, samples[name], seconds) for name in sorted(samples)]
+    every = [sample for name in samples for sample in samples[name]]
+    return {
+        "database": database,
+        "players": len(players),
+        "seconds": round(seconds, 1),
+        "workers": args.workers,
+        "threads": args.threads,
+        "endpoints": endpoints,
+        "total": summarize("total", every, seconds),
+    }
+
+
+def regressions(results, baseline, max_regression):
+    """Endpoints whose p99 latency or error rate got worse than in ``baseline``"""
+    found = []
+    previous = {(r["database"], e["endpoint"]): e for r in baseline for e in r["endpoints"] + [r["total"]]}
+    for result in results:
+        for endpoint in result["endpoints"] + [result["total"]]:
+            before = previous.get((result["database"], endpoint["endpoint"]))
+            if before is None:
+                continue
+            label = f"{result['database']} {endpoint['endpoint']}"
+            if endpoint["p99_ms"] > before["p99_ms"] * (1 + max_regression / 100):
+                found.append(f"{label}: p99 {before['p99_ms']:.1f} -> {endpoint['p99_ms']:.1f} ms")
+            if endpoint["error_rate"] > before["error_rate"] + 0.01:
+                found.append(f"{label}: error rate {before['error_rate']:.2%} -> {endpoint['error_rate']:.2%}")
+    return found
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    results = [run(database, args) for database in args.database or ["sqlite"]]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        for result in results:
+            print(
+                f"\n{result['database']}: {result['players']} players, {result['seconds']:g} s, "
+                f"{result['workers']} workers x {result['threads']} threads"
+            )
+            print(
+                f"{'endpoint':<22}{'requests':>9}{'req/s':>8}{'errors':>8}"
+                f"{'p50':>9}{'p90':>9}{'p99':>9}{'queries':>9}"
+            )
+            for s in result["endpoints"] + [result["total"]]:
+                queries = f"{s['db_queries_mean']:.1f}" if s["db_queries_mean"] is not None else "-"
+                print(
+                    f"{s['endpoint']:<22}{s['requests']:>9}{s['rps']:>8.1f}{s['error_rate']:>8.2%}"
+                    f"{s['p50_ms']:>7.1f}ms{s['p90_ms']:>7.1f}ms{s['p99_ms']:>7.1f}ms{queries:>9}"
+                )
+
+    if args.baseline:
+        found = regressions(results, json.loads(Path(args.baseline).read_text()), args.max_regression)
+        for line in found:
+            print(f"REGRESSION {line}", file=sys.stderr)
+        if found:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Rate-limit storage benchmark: per-check overhead and cross-process accuracy.
+
+Times ``limiter.hit`` (one rate-limit check, as Flask-Limiter does per request) on the
+per-process ``memory://`` storage and on the shared ``sqlite://`` file storage. Each
+backend runs with the fixed-window and sliding-window-counter strategies. Then several
+processes, like gunicorn workers, hit one shared limit at the same time, and the run
+reports how many hits each backend let through. With memory storage every process has
+its own counter, so the limit is exceeded N times over.
+
+Usage:
+    python benchmark_rate_limit.py                        # 20k checks, 4 processes
+    python benchmark_rate_limit.py --checks 100000 --workers 8
+    python benchmark_rate_limit.py --json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add the parent directory to Python path to import pq_app
+sys.path.insert(0, str(Path(__file__).parent))
+
+from limits import parse  # noqa: E402
+from limits.storage import storage_from_string  # noqa: E402
+from limits.strategies import FixedWindowRateLimiter, SlidingWindowCounterRateLimiter  # noqa: E402
+
+import pq_app.services.rate_limit_storage  # noqa: E402,F401 (registers sqlite://)
+
+STRATEGIES = {
+    "fixed-window": FixedWindowRateLimiter,
+    "sliding-window-counter": SlidingWindowCounterRateLimiter,
+}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Measure rate-limit check overhead per storage backend")
+    parser.add_argument("--checks", type=int, default=20000, help="timed checks per backend and strategy")
+    parser.add_argument("--keys", type=int, default=1000, help="distinct clients (rate-limit keys)")
+    parser.add_argument("--workers", type=int, default=4, help="processes sharing one limit")
+    parser.add_argument("--limit", type=int, default=100, help="shared limit for the accuracy run")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    return parser.parse_args(argv)
+
+
+def time_checks(uri, strategy, checks, keys):
+    """Time single rate-limit checks; returns latency stats in microseconds"""
+    limiter = STRATEGIES[strategy](storage_from_string(uri))
+    item = parse("1000000 per minute")
+    latencies = []
+    for i in range(checks):
+        started = time.perf_counter()
+        limiter.hit(item, "bench", str(i % keys))
+        latencies.append((time.perf_counter() - started) * 1e6)
+    latencies.sort()
+    return {
+        "mean_us": round(statistics.fmean(latencies), 1),
+        "p50_us": round(latencies[len(latencies) // 2], 1),
+        "p99_us": round(latencies[int(len(latencies) * 0.99)], 1),
+    }
+
+
+def _contend(uri, strategy, limit, attempts, start, results):
+    limiter = STRATEGIES[strategy](storage_from_string(uri))
+    item = parse(f"{limit} per hour")
+    start.wait()
+    results.put(sum(limiter.hit(item, "bench", "shared-client") for _ in range(attempts)))
+
+
+def count_admitted(uri, strategy, workers, limit):
+    """Hits admitted when ``workers`` processes each try ``limit`` hits on one shared limit"""
+    start = multiprocessing.Barrier(workers)
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=_contend, args=(uri, strategy, limit, limit, start, results))
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    admitted = sum(results.get() for _ in processes)
+    for process in processes:
+        process.join()
+    return admitted
+
+
+def benchmark(args):
+    summaries = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for strategy in STRATEGIES:
+            for backend in ("memory", "sqlite"):
+                path = os.path.join(tmp, f"{strategy}.db")
+                uri = "memory://" if backend == "memory" else f"sqlite:///{path}"
+                summary = {"backend": backend, "strategy": strategy}
+                summary.update(time_checks(uri, strategy, args.checks, args.keys))
+                if backend == "sqlite":
+                    # Start the accuracy run from empty counters
+                    storage_from_string(uri).reset()
+                summary["admitted"] = count_admitted(uri, strategy, args.workers, args.limit)
+                summary["limit"] = args.limit
+                summaries.append(summary)
+    return summaries
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    summaries = benchmark(args)
+    if args.json:
+        print(json.dumps(summaries, indent=2))
+        return
+    print(f"{args.checks} checks over {args.keys} keys; {args.workers} processes sharing a limit of {args.limit}")
+    print(f"{'backend':<9}{'strategy':<24}{'mean us':>9}{'p50 us':>9}{'p99 us':>9}{'admitted':>10}")
+    for s in summaries:
+        print(
+            f"{s['backend']:<9}{s['strategy']:<24}{s['mean_us']:>9.1f}{s['p50_us']:>9.1f}{s['p99_us']:>9.1f}"
+            f"{s['admitted']:>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Multi-process SQLite write benchmark for the SQLITE_PRAGMAS tuning profile in config.py.
+
+Several processes, like gunicorn workers, hammer one database file with the write
+transaction of a combat action: read the player, update its points and HP, and append
+an encounter row. The run is repeated with the connection settings the app used before
+the tuning profile (foreign keys only: rollback journal, synchronous=FULL, the sqlite3
+driver's busy handler) and with the configured profile. For each run it reports
+committed transactions per second and how many attempts failed with "database is
+locked".
+
+Usage:
+    python benchmark_sqlite.py                           # 4 processes x 500 transactions
+    python benchmark_sqlite.py --workers 8 --transactions 1000
+    python benchmark_sqlite.py --path /data/bench.db     # benchmark a specific disk
+    python benchmark_sqlite.py --json
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add the parent directory to Python path to import pq_app
+sys.path.insert(0, str(Path(__file__).parent))
+
+from sqlalchemy import create_engine, event, text  # noqa: E402
+from sqlalchemy.exc import OperationalError  # noqa: E402
+
+from config import Config  # noqa: E402
+from pq_app.model import apply_sqlite_pragmas  # noqa: E402
+
+BASELINE = {"foreign_keys": "ON"}
+PLAYERS = 16
+
+SCHEMA = (
+    "CREATE TABLE player (id INTEGER PRIMARY KEY, points INTEGER NOT NULL, hitpoints INTEGER NOT NULL)",
+    "CREATE TABLE encounter (id INTEGER PRIMARY KEY, player_id INTEGER NOT NULL REFERENCES player (id),"
+    " damage INTEGER NOT NULL, message VARCHAR(255), created_at TIMESTAMP NOT NULL)",
+    "CREATE INDEX ix_encounter_player ON encounter (player_id)",
+)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Compare SQLite write throughput with and without the tuning profile")
+    parser.add_argument("--workers", type=int, default=4, help="concurrent writer processes")
+    parser.add_argument("--transactions", type=int, default=500, help="committed transactions per worker")
+    parser.add_argument("--path", default=None, help="database file to use (default: a temporary file)")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    return parser.parse_args(argv)
+
+
+def _engine(path, pragmas):
+    engine = create_engine(f"sqlite:///{path}")
+    event.listen(engine, "connect", lambda dbapi_connection, record: apply_sqlite_pragmas(dbapi_connection, pragmas))
+    return engine
+
+
+def _prepare(path, pragmas):
+    for suffix in ("", "-wal", "-shm", "-journal"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    engine = _engine(path, pragmas)
+    with engine.begin() as conn:
+        for statement in SCHEMA:
+            conn.execute(text(statement))
+        conn.execute(
+            text("INSERT INTO player (id, points, hitpoints) VALUES (:id, 1000000, 100)"),
+            [{"id": i} for i in range(1, PLAYERS + 1)],
+        )
+    engine.dispose()
+
+
+def _worker(path, pragmas, worker_id, transactions, start, results):
+    engine = _engine(path, pragmas)
+    locked = 0
+    start.wait()
+    began = time.perf_counter()
+    done = 0
+    while done < transactions:
+        player_id = (worker_id + done) % PLAYERS + 1
+        try:
+            with engine.begin() as conn:
+                hp = conn.execute(text("SELECT hitpoints FROM player WHERE id = :id"), {"id": player_id}).scalar_one()
+                conn.execute(
+                    text("UPDATE player SET points = points - 1, hitpoints = :hp WHERE id = :id"),
+                    {"hp": max(hp - 1, 1), "id": player_id},
+                )
+                conn.execute(
+                    text(
+                        "INSERT INTO encounter (player_id, damage, message, created_at)"
+                        " VALUES (:id, 1, 'benchmark hit', CURRENT_TIMESTAMP)"
+                    ),
+                    {"id": player_id},
+                )
+            done += 1
+        except OperationalError as exc:
+            if "locked" not in str(exc):
+                raise
+            locked += 1
+    results.put((done, locked, time.perf_counter() - began))
+    engine.dispose()
+
+
+def run_profile(name, pragmas, path, workers, transactions):
+    """Run one benchmark pass and return its summary"""
+    _prepare(path, pragmas)
+    start = multiprocessing.Barrier(workers + 1)
+    results = multiprocessing.Queue()
+    processes = [
+        multiprocessing.Process(target=_worker, args=(path, pragmas, i, transactions, start, results))
+        for i in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    start.wait()
+    began = time.perf_counter()
+    outcomes = [results.get() for _ in processes]
+    elapsed = time.perf_counter() - began
+    for process in processes:
+        process.join()
+
+    committed = sum(done for done, _, _ in outcomes)
+    return {
+        "profile": name,
+        "pragmas": {key: value for key, value in pragmas.items() if value not in (None, "")},
+        "committed": committed,
+        "locked_errors": sum(locked for _, locked, _ in outcomes),
+        "seconds": round(elapsed, 3),
+        "tx_per_second": round(committed / elapsed, 1),
+    }
+
+
+def benchmark(args):
+    pragmas = dict(Config.SQLITE_PRAGMAS, foreign_keys="ON")
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.path or os.path.join(tmp, "benchmark.db")
+        return [
+            run_profile("baseline", BASELINE, path, args.workers, args.transactions),
+            run_profile("tuned", pragmas, path, args.workers, args.transactions),
+        ]
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    summaries = benchmark(args)
+    if args.json:
+        print(json.dumps(summaries, indent=2))
+        return
+    print(f"{args.workers} writer processes x {args.transactions} transactions")
+    print(f"{'profile':<10}{'tx/s':>10}{'seconds':>10}{'locked':>8}")
+    for s in summaries:
+        print(f"{s['profile']:<10}{s['tx_per_second']:>10.1f}{s['seconds']:>10.2f}{s['locked_errors']:>8}")
+    baseline, tuned = summaries
+    print(f"speedup: {tuned['tx_per_second'] / baseline['tx_per_second']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
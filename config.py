@@ -2,6 +2,29 @@
 import os
 
 
+def engine_options(database_uri, pool_size=5, max_overflow=10, pool_timeout=30, pool_recycle=1800):
+    """
+    SQLALCHEMY_ENGINE_OPTIONS for ``database_uri``; the DB_POOL_* env vars override the defaults.
+
+    Each process (gunicorn worker) has its own pool and opens up to pool_size + max_overflow
+    connections, so keep workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) below the server's
+    max_connections. GET /api/v1/health/pool shows how a worker's pool is doing.
+    """
+    if database_uri.startswith('sqlite') and (':memory:' in database_uri or database_uri.rstrip('/') == 'sqlite:'):
+        # In-memory SQLite lives in a single shared connection (StaticPool); nothing to size
+        return {}
+    return {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', pool_size)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', max_overflow)),
+        # Whole seconds a request waits for a free connection before failing (Flask-SQLAlchemy
+        # builds the engine with engine_from_config, which truncates this to an int)
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', pool_timeout)),
+        # Reconnect before server/proxy idle timeouts silently drop the connection
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', pool_recycle)),
+        'pool_pre_ping': os.environ.get('DB_POOL_PRE_PING', '1').lower() in ('1', 'true', 'yes'),
+    }
+
+
 class Config:
     """Base configuration"""
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
@@ -19,6 +42,61 @@ class Config:
     XP_GROWTH = float(os.environ.get('XP_GROWTH', 1.5))      # per-level XP multiplier
     HP_PER_LEVEL = int(os.environ.get('HP_PER_LEVEL', 10))   # max HP gained per level
     XP_PER_MONSTER_HP = float(os.environ.get('XP_PER_MONSTER_HP', 1.0))  # XP per point of monster max HP
+    # How often (seconds) each process checks the reference_data_version row for reference-table
+    # writes made by other workers; the most a worker serves stale reference data. 0 checks on every lookup.
+    REFERENCE_DATA_CHECK_SECONDS = float(os.environ.get('REFERENCE_DATA_CHECK_SECONDS', 5))
+    # Turn cap for POST /api/v1/player/<id>/combat/auto
+    AUTO_BATTLE_MAX_TURNS = int(os.environ.get('AUTO_BATTLE_MAX_TURNS', 50))
+    # Most actions accepted by POST /api/v1/player/<id>/combat/batch
+    COMBAT_BATCH_MAX_ACTIONS = int(os.environ.get('COMBAT_BATCH_MAX_ACTIONS', 20))
+    # Write encounters in their own transaction at the end of each request instead of the
+    # action's (they then survive a rollback of the action); see services/encounter_log.py
+    ENCOUNTER_LOG_APPEND_ONLY = os.environ.get('ENCOUNTER_LOG_APPEND_ONLY', '0').lower() in ('1', 'true', 'yes')
+    # Attempts per combat action when a concurrent action on the same tile/player wins the race
+    OPTIMISTIC_RETRY_ATTEMPTS = int(os.environ.get('OPTIMISTIC_RETRY_ATTEMPTS', 5))
+    # How long responses to requests sent with an Idempotency-Key are kept for replay
+    IDEMPOTENCY_KEY_TTL_HOURS = float(os.environ.get('IDEMPOTENCY_KEY_TTL_HOURS', 24))
+    # After this long an unfinished request's claim on its Idempotency-Key lapses and a retry
+    # may run the action again (keep it above the longest request, e.g. gunicorn's worker timeout)
+    IDEMPOTENCY_LEASE_SECONDS = float(os.environ.get('IDEMPOTENCY_LEASE_SECONDS', 60))
+    # Per-request SQL statement counts (services/query_counter.py): add them to a Server-Timing
+    # response header, and log a possible N+1 when one statement repeats this many times
+    SERVER_TIMING_ENABLED = os.environ.get('SERVER_TIMING_ENABLED', '1').lower() in ('1', 'true', 'yes')
+    QUERY_REPEAT_THRESHOLD = int(os.environ.get('QUERY_REPEAT_THRESHOLD', 5))
+    # Prometheus metrics at /metrics (services/metrics.py). Under gunicorn, gunicorn.conf.py
+    # points PROMETHEUS_MULTIPROC_DIR at a shared directory so every worker is included.
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1').lower() in ('1', 'true', 'yes')
+    # Password hashing (services/password_hasher.py): werkzeug method string, plus how many
+    # hashes run at once per process and how many more may wait before logins get a 429.
+    # Changing the method re-hashes each user's password on their next login. (scrypt hashes
+    # are longer than the 150-character user.password_hash column.)
+    PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256:600000')
+    PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', 2))
+    PASSWORD_HASH_QUEUE_SIZE = int(os.environ.get('PASSWORD_HASH_QUEUE_SIZE', 8))
+    # Rate-limit counters. memory:// is per process; sqlite:///<file> (services/rate_limit_storage.py)
+    # is shared by every worker on the host and survives restarts.
+    RATELIMIT_STORAGE_URI = os.environ.get('RATELIMIT_STORAGE_URI', 'memory://')
+    # Explicit, because the limiter is a module-level singleton: without it every app created
+    # after one with RATELIMIT_ENABLED=False would stay disabled. Load tests from one
+    # address (benchmark_load.py) turn it off.
+    RATELIMIT_ENABLED = os.environ.get('RATELIMIT_ENABLED', '1').lower() in ('1', 'true', 'yes')
+    RATELIMIT_STRATEGY = os.environ.get('RATELIMIT_STRATEGY', 'sliding-window-counter')
+    # SQLite tuning profile, applied to every new connection (see model._set_sqlite_pragma).
+    # WAL lets readers run alongside the single writer, and busy_timeout (ms) makes writers
+    # from other workers wait for the lock instead of failing with "database is locked".
+    # synchronous=NORMAL only fsyncs at WAL checkpoints; that is durable against app
+    # crashes, and a power loss can at worst drop the last commits. Set a value to "" to
+    # leave that pragma at SQLite's default. Ignored for other databases.
+    SQLITE_PRAGMAS = {
+        'busy_timeout': os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000),
+        'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),
+        'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),
+        'cache_size': os.environ.get('SQLITE_CACHE_SIZE', -32000),  # negative = KiB, so 32 MB
+        'mmap_size': os.environ.get('SQLITE_MMAP_SIZE', 268435456),  # 256 MB
+        'temp_store': os.environ.get('SQLITE_TEMP_STORE', 'MEMORY'),
+    }
+    # API tile payloads reference art by hash (/api/v1/media/<hash>); set to embed it too
+    API_INLINE_MEDIA = os.environ.get('API_INLINE_MEDIA', '0').lower() in ('1', 'true', 'yes')
 
 
 class DevelopmentConfig(Config):
@@ -26,6 +104,7 @@ class DevelopmentConfig(Config):
     DEBUG = True
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
         'sqlite:///pyquest.db'
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI)
 
 
 class TestingConfig(Config):
@@ -41,6 +120,8 @@ class TestingConfig(Config):
     COUNTER_DAMAGE_MIN = 3
     COUNTER_DAMAGE_MAX = 10
     HEALING_NERF_PERCENT = 0
+    # Cheap hashes keep the suite fast
+    PASSWORD_HASH_METHOD = 'pbkdf2:sha256:1000'
 
 
 class ProductionConfig(Config):
@@ -48,6 +129,8 @@ class ProductionConfig(Config):
     DEBUG = False
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or \
         'sqlite:///pyquest.db'
+    SQLALCHEMY_ENGINE_OPTIONS = engine_options(SQLALCHEMY_DATABASE_URI, pool_size=10, max_overflow=5)
+    RATELIMIT_STORAGE_URI = os.environ.get('RATELIMIT_STORAGE_URI', 'sqlite:///ratelimits.db')
 
 
 # Configuration dictionary
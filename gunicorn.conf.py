@@ -0,0 +1,24 @@
+"""
+Gunicorn settings, read automatically by ``gunicorn run:app`` (see entrypoint.sh)
+
+Workers are separate processes, so Prometheus metrics (pq_app/services/metrics.py) are
+kept in memory-mapped files under PROMETHEUS_MULTIPROC_DIR, which ``/metrics`` adds up
+across workers. The directory is emptied when gunicorn starts, so values from a previous
+run are not added in, and a worker's live gauges are dropped when it exits.
+"""
+import os
+import shutil
+
+os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", "/tmp/pq_prometheus")
+
+
+def on_starting(server):
+    path = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
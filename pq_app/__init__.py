@@ -1,5 +1,6 @@
 from flask import Flask
 from flask_login import LoginManager
+from sqlalchemy.exc import SQLAlchemyError
 from . import model
 import os
 
@@ -32,7 +33,13 @@ def create_app(config_name=None):
     app.config['JWT_ACCESS_TOKEN_EXPIRES'] = 3600  # 1 hour
     app.config['JWT_REFRESH_TOKEN_EXPIRES'] = 2592000  # 30 days
 
-    # Initialize extensions
+    # Initialize extensions. The encounter log's teardown must be registered before the
+    # database's so that it runs after the request session has been removed.
+    from .services import encounter_log, password_hasher, pool_metrics, query_counter
+    encounter_log.init_app(app)
+    password_hasher.init_app(app)
+    query_counter.init_app(app)
+    pool_metrics.init_app(app)
     model.db.init_app(app)
     login_manager.init_app(app)
     login_manager.login_view = "main.login"
@@ -42,6 +49,12 @@ def create_app(config_name=None):
     jwt.init_app(app)
     limiter.init_app(app)
 
+    from .services import metrics
+    metrics.init_app(app)
+
+    from .services import media_store, reference_data  # noqa: F401 (media_store registers its flush hook)
+    registry = reference_data.init_app(app)
+
     # Create database tables
     # In development and testing we create tables and seed defaults automatically.
     # In production environments, prefer running Alembic migrations instead.
@@ -49,6 +62,13 @@ def create_app(config_name=None):
         if config_name in ("development", "testing"):
             model.db.create_all()
             model.init_defaults()
+        # Warm the reference-data registry. Before migrations have run the tables may not
+        # exist yet; the registry then loads lazily on first use.
+        try:
+            registry.load()
+        except SQLAlchemyError:
+            model.db.session.rollback()
+            registry.invalidate()
 
     # Register blueprints
     from .app import main_bp
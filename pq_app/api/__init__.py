@@ -9,17 +9,19 @@ from flask_jwt_extended import JWTManager
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 
+from ..services import rate_limit_storage  # noqa: F401 (registers the sqlite:// limiter storage)
+
 api_v1 = Blueprint('api_v1', __name__, url_prefix='/api/v1')
 jwt = JWTManager()
 
-# Initialize rate limiter
+# Initialize rate limiter. Storage and strategy come from RATELIMIT_STORAGE_URI and
+# RATELIMIT_STRATEGY in config.py.
 limiter = Limiter(
     key_func=get_remote_address,
     default_limits=["200 per hour", "50 per minute"],
-    storage_uri="memory://",
 )
 
 # Import routes after blueprint creation to avoid circular imports
-from . import auth, tiles, combat, player, docs, error_handlers
+from . import auth, tiles, combat, player, media, health, docs, error_handlers
 
 __all__ = ['api_v1', 'jwt', 'limiter']
@@ -5,11 +5,23 @@ Handles user registration, login, and JWT token management.
 """
 from flask import request, jsonify
 from flask_jwt_extended import create_access_token, create_refresh_token, jwt_required, get_jwt_identity
-from werkzeug.security import check_password_hash, generate_password_hash
 from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 from . import api_v1, limiter
 from .schemas import user_schema, error_schema
 from ..model import db, User
+from ..services.concurrency import ConcurrentUpdateError, run_with_retry
+from ..services.password_hasher import HashingBusyError
+
+
+def _hashing_busy():
+    """429 for when the password hashing queue is full (see services/password_hasher.py)"""
+    response = jsonify(error_schema.dump({
+        'error': 'Too Many Requests',
+        'message': 'Too many logins in progress. Please try again shortly.',
+        'status_code': 429
+    }))
+    response.headers['Retry-After'] = '1'
+    return response, 429
 
 
 @api_v1.route('/auth/register', methods=['POST'])
@@ -28,6 +40,7 @@ def register():
     Returns:
         201: User created successfully
         400: Invalid input or user already exists
+        429: Rate limited, or password hashing is saturated (see Retry-After)
     """
     data = request.get_json()
     
@@ -67,11 +80,8 @@ def register():
     
     try:
         # Create user
-        user = User(
-            username=username,
-            email=email,
-            password_hash=generate_password_hash(password)
-        )
+        user = User(username=username, email=email)
+        user.set_password(password)
         
         db.session.add(user)
         db.session.commit()
@@ -80,6 +90,8 @@ def register():
             'message': 'User created successfully',
             'user': user_schema.dump(user)
         }), 201
+    except HashingBusyError:
+        return _hashing_busy()
     except IntegrityError as e:
         db.session.rollback()
         return jsonify(error_schema.dump({
@@ -111,6 +123,7 @@ def login():
     Returns:
         200: Login successful with access and refresh tokens
         401: Invalid credentials
+        429: Rate limited, or password hashing is saturated (see Retry-After)
     """
     data = request.get_json()
     
@@ -135,13 +148,17 @@ def login():
         # Find user
         user = User.query.filter_by(username=username).first()
         
-        if not user or not check_password_hash(user.password_hash, password):
+        if not user or not user.check_password(password):
             return jsonify(error_schema.dump({
                 'error': 'Unauthorized',
                 'message': 'Invalid username or password',
                 'status_code': 401
             })), 401
         
+        # Upgrade hashes made with old PASSWORD_HASH_METHOD parameters (re-read and retried
+        # if the versioned user row changed concurrently)
+        run_with_retry(lambda: user.rehash_password_if_needed(password))
+        
         # Create tokens (identity must be string)
         access_token = create_access_token(identity=str(user.id))
         refresh_token = create_refresh_token(identity=str(user.id))
@@ -152,6 +169,14 @@ def login():
             'refresh_token': refresh_token,
             'user': user_schema.dump(user)
         }), 200
+    except HashingBusyError:
+        return _hashing_busy()
+    except ConcurrentUpdateError:
+        return jsonify(error_schema.dump({
+            'error': 'Conflict',
+            'message': 'User was updated concurrently, please retry',
+            'status_code': 409
+        })), 409
     except SQLAlchemyError as e:
         db.session.rollback()
         return jsonify(error_schema.dump({
@@ -4,21 +4,29 @@ Combat API Endpoints
 Handles combat actions and encounters.
 """
 
-from flask import request, jsonify
+from flask import current_app, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from sqlalchemy.exc import SQLAlchemyError
 from . import api_v1, limiter
-from .schemas import combat_action_schema, combat_actions_schema, encounter_schema, error_schema
-from ..model import db, User, Tile, CombatAction, Encounter
+from .idempotency import idempotent
+from .schemas import combat_action_schema, encounter_schema, error_schema, EncounterSchema
+from ..model import db, User, Tile
+from ..services.combat_engine import BATTLE_POLICIES
 from ..services.combat_service import CombatService
+from ..services.concurrency import ConcurrentUpdateError, run_with_retry
+from ..services.pagination import InvalidCursor, clamp_page_size
 from ..services.player_service import PlayerService
+from ..services.stats_service import StatsService
+from ..services.tile_service import TileService
+from ..services.reference_data import get_reference_data
 
 
 @api_v1.route("/player/<int:player_id>/tiles/<int:tile_id>/combat-actions", methods=["GET"])
+@api_v1.route("/player/<int:player_id>/tiles/current/combat-actions", defaults={"tile_id": None}, methods=["GET"])
 @jwt_required()
 def get_combat_actions(player_id, tile_id):
     """
-    Get available combat actions for a player on a specific tile
+    Get available combat actions for a player on a specific tile (or their current tile)
 
     Returns:
         200: List of available combat actions filtered by class/race
@@ -44,7 +52,12 @@ def get_combat_actions(player_id, tile_id):
             403,
         )
 
-    tile = db.session.get(Tile, tile_id)
+    if tile_id is None:
+        tile_service = TileService()
+        playthrough = tile_service.get_active_playthrough(player_id)
+        tile = tile_service.get_current_tile(player_id, playthrough) if playthrough else None
+    else:
+        tile = db.session.get(Tile, tile_id)
     if not tile:
         return jsonify(error_schema.dump({"error": "Not Found", "message": "Tile not found", "status_code": 404})), 404
 
@@ -53,13 +66,14 @@ def get_combat_actions(player_id, tile_id):
     # Accrue points lazily
     PlayerService().accrue_points(player)
 
-    actions = combat_service.get_available_actions(player)
+    tile_type = get_reference_data().tile_types_by_id.get(tile.type)
+    action_set = combat_service.get_available_action_set(player, tile_type.name if tile_type else None)
 
     return (
         jsonify({
-            "tile_id": tile_id,
+            "tile_id": tile.id,
             "tile_type": tile.type,
-            "available_actions": combat_actions_schema.dump(actions),
+            "available_actions": action_set.api_payload,
             "points_balance": player.points,
         }),
         200,
@@ -69,13 +83,14 @@ def get_combat_actions(player_id, tile_id):
 @api_v1.route("/player/<int:player_id>/combat/execute", methods=["POST"])
 @jwt_required()
 @limiter.limit("30 per minute")
+@idempotent
 def execute_combat_action_api(player_id):
     """
-    Execute a combat action
+    Execute a combat action. Send an ``Idempotency-Key`` header to make retries safe.
 
     Request Body:
         {
-            "tile_id": int,
+            "tile_id": int,             # null for the current tile (stored on this first action)
             "combat_action_code": "string"
         }
 
@@ -84,6 +99,9 @@ def execute_combat_action_api(player_id):
         400: Invalid input
         403: Player belongs to another user
         404: Player, tile, or action not found
+        409: Still conflicting with concurrent actions on the tile after retries, or a
+             request with the same Idempotency-Key is still in flight
+        422: Idempotency-Key already used for a different request
     """
     current_user_id = int(get_jwt_identity())
     player = db.session.get(User, player_id)
@@ -122,37 +140,49 @@ def execute_combat_action_api(player_id):
     tile_id = data["tile_id"]
     combat_action_code = data["combat_action_code"]
 
-    try:
-        # Get tile
-        tile = db.session.get(Tile, tile_id)
-        if not tile:
+    def act():
+        combat_service = CombatService()
+        tile = combat_service.get_tile_for_action(tile_id, player.id)
+        if not tile or tile.user_id != player.id:
             return (
                 jsonify(error_schema.dump({"error": "Not Found", "message": "Tile not found", "status_code": 404})),
                 404,
-            )
+            ), None
+        is_valid, error_msg = combat_service.validate_tile_action(tile)
+        if not is_valid:
+            return (
+                jsonify(error_schema.dump({"error": "Bad Request", "message": error_msg, "status_code": 400})),
+                400,
+            ), None
 
         # Get combat action
-        combat_action = CombatAction.query.filter_by(code=combat_action_code).first()
+        combat_action = get_reference_data().combat_actions_by_code.get(combat_action_code)
         if not combat_action:
             return (
                 jsonify(
                     error_schema.dump({"error": "Not Found", "message": "Combat action not found", "status_code": 404})
                 ),
                 404,
-            )
+            ), None
 
         # Spend a point non-blocking before combat action
         PlayerService().spend_point(player)
 
         # Execute combat action
-        combat_service = CombatService()
         result = combat_service.execute_combat_action(player=player, tile=tile, combat_action=combat_action)
 
-        # Convert CombatResult to dict
-        result_dict = result.to_dict()
-
         # Accrue points lazily after action
         PlayerService().accrue_points(player)
+        return None, result
+
+    try:
+        # Optimistic concurrency: a conflicting concurrent action re-runs this one from a fresh read
+        error, result = run_with_retry(act)
+        if error:
+            return error
+
+        # Convert CombatResult to dict
+        result_dict = result.to_dict()
 
         response_data = {
             "success": result_dict.get("success", False),
@@ -168,6 +198,8 @@ def execute_combat_action_api(player_id):
             response_data["encounter"] = encounter_schema.dump(result["encounter"])
 
         return jsonify(response_data), 200
+    except ConcurrentUpdateError:
+        return _conflict()
     except SQLAlchemyError as e:
         db.session.rollback()
         return (
@@ -180,6 +212,247 @@ def execute_combat_action_api(player_id):
         )
 
 
+@api_v1.route("/player/<int:player_id>/combat/auto", methods=["POST"])
+@jwt_required()
+@limiter.limit("10 per minute")
+@idempotent
+def auto_battle_api(player_id):
+    """
+    Fight the monster on a tile to completion in one request. Send an ``Idempotency-Key``
+    header to make retries safe.
+
+    Runs a policy turn by turn until the monster is defeated, the player dies or flees,
+    or the turn cap is hit. All encounters are written in one bulk insert and one
+    transaction, retried from scratch if a concurrent action changed the player or tile
+    first; one point is spent per turn.
+
+    Request Body:
+        {
+            "tile_id": int,             # null for the current tile
+            "policy": "heal_below",     # optional, see combat_engine.BATTLE_POLICIES
+            "threshold": 40,            # optional, HP percent for heal_below / flee_below
+            "max_turns": 50             # optional, capped by AUTO_BATTLE_MAX_TURNS
+        }
+
+    Returns:
+        200: Outcome, final HP, XP gained and the condensed turn log
+        400: Invalid input, or the tile has no live monster
+        403: Player belongs to another user
+        404: Player or tile not found
+        409: Still conflicting with concurrent actions on the tile after retries, or a
+             request with the same Idempotency-Key is still in flight
+        422: Idempotency-Key already used for a different request
+    """
+    current_user_id = int(get_jwt_identity())
+    player = db.session.get(User, player_id)
+
+    if not player:
+        return (
+            jsonify(error_schema.dump({"error": "Not Found", "message": "Player not found", "status_code": 404})),
+            404,
+        )
+
+    if player.id != current_user_id:
+        return (
+            jsonify(
+                error_schema.dump(
+                    {"error": "Forbidden", "message": "You do not have access to this player", "status_code": 403}
+                )
+            ),
+            403,
+        )
+
+    def bad_request(message):
+        return jsonify(error_schema.dump({"error": "Bad Request", "message": message, "status_code": 400})), 400
+
+    data = request.get_json(silent=True) or {}
+    if "tile_id" not in data:
+        return bad_request("tile_id is required")
+    policy = data.get("policy", "heal_below")
+    if policy not in BATTLE_POLICIES:
+        return bad_request(f"policy must be one of: {', '.join(BATTLE_POLICIES)}")
+    turn_cap = int(current_app.config.get("AUTO_BATTLE_MAX_TURNS", 50))
+    try:
+        threshold = int(data.get("threshold", 40))
+        max_turns = int(data.get("max_turns", turn_cap))
+    except (TypeError, ValueError):
+        return bad_request("threshold and max_turns must be integers")
+    if not 0 <= threshold <= 100 or max_turns < 1:
+        return bad_request("threshold must be 0-100 and max_turns at least 1")
+
+    combat_service = CombatService()
+
+    def fight():
+        tile, error = _load_monster_tile(combat_service, player, data["tile_id"])
+        if error:
+            return error, None
+        result = combat_service.auto_battle(
+            player, tile, policy=policy, threshold=threshold, max_turns=min(max_turns, turn_cap)
+        )
+        player_service = PlayerService()
+        player_service.spend_point(player, len(result.turns))
+        player_service.accrue_points(player)
+        return None, result
+
+    try:
+        error, result = run_with_retry(fight)
+        if error:
+            return error
+
+        response_data = result.to_dict()
+        response_data["points_balance"] = player.points
+        return jsonify(response_data), 200
+    except ConcurrentUpdateError:
+        return _conflict()
+    except SQLAlchemyError:
+        db.session.rollback()
+        return (
+            jsonify(
+                error_schema.dump(
+                    {"error": "Database Error", "message": "Failed to resolve battle", "status_code": 500}
+                )
+            ),
+            500,
+        )
+
+
+@api_v1.route("/player/<int:player_id>/combat/batch", methods=["POST"])
+@jwt_required()
+@limiter.limit("30 per minute")
+@idempotent
+def execute_combat_batch_api(player_id):
+    """
+    Execute a queued sequence of combat actions in one request. Send an
+    ``Idempotency-Key`` header to make retries safe.
+
+    The actions run in order in one transaction and stop early once the monster
+    is defeated, the player flees or the player dies. All encounters are written in one
+    bulk insert and one transaction; one point is spent per action taken.
+
+    Request Body:
+        {
+            "tile_id": int,             # null for the current tile
+            "combat_action_codes": ["defend", "attack_heavy", "heal"]   # capped by COMBAT_BATCH_MAX_ACTIONS
+        }
+
+    Returns:
+        200: Outcome, final HP, and one result per action taken (``log``)
+        400: Invalid input, an action not available to the player, or no live monster on the tile
+        403: Player belongs to another user
+        404: Player or tile not found
+        409: Still conflicting with concurrent actions on the tile after retries, or a
+             request with the same Idempotency-Key is still in flight
+        422: Idempotency-Key already used for a different request
+    """
+    current_user_id = int(get_jwt_identity())
+    player = db.session.get(User, player_id)
+
+    if not player:
+        return (
+            jsonify(error_schema.dump({"error": "Not Found", "message": "Player not found", "status_code": 404})),
+            404,
+        )
+
+    if player.id != current_user_id:
+        return (
+            jsonify(
+                error_schema.dump(
+                    {"error": "Forbidden", "message": "You do not have access to this player", "status_code": 403}
+                )
+            ),
+            403,
+        )
+
+    def bad_request(message):
+        return jsonify(error_schema.dump({"error": "Bad Request", "message": message, "status_code": 400})), 400
+
+    data = request.get_json(silent=True) or {}
+    codes = data.get("combat_action_codes")
+    if "tile_id" not in data or not isinstance(codes, list) or not codes or not all(isinstance(c, str) for c in codes):
+        return bad_request("tile_id and a non-empty combat_action_codes list are required")
+    max_actions = int(current_app.config.get("COMBAT_BATCH_MAX_ACTIONS", 20))
+    if len(codes) > max_actions:
+        return bad_request(f"At most {max_actions} actions per batch")
+
+    combat_service = CombatService()
+    available = {action.code: action for action in combat_service.get_available_action_set(player, "monster").actions}
+    unknown = sorted({code for code in codes if code not in available})
+    if unknown:
+        return bad_request(f"Combat actions not available: {', '.join(unknown)}")
+
+    def fight():
+        tile, error = _load_monster_tile(combat_service, player, data["tile_id"])
+        if error:
+            return error, None
+        result = combat_service.execute_combat_sequence(player, tile, [available[code] for code in codes])
+        player_service = PlayerService()
+        player_service.spend_point(player, len(result.turns))
+        player_service.accrue_points(player)
+        return None, result
+
+    try:
+        error, result = run_with_retry(fight)
+        if error:
+            return error
+
+        response_data = result.to_dict()
+        response_data["requested"] = len(codes)
+        response_data["points_balance"] = player.points
+        return jsonify(response_data), 200
+    except ConcurrentUpdateError:
+        return _conflict()
+    except SQLAlchemyError:
+        db.session.rollback()
+        return (
+            jsonify(
+                error_schema.dump(
+                    {"error": "Database Error", "message": "Failed to execute combat actions", "status_code": 500}
+                )
+            ),
+            500,
+        )
+
+
+def _conflict():
+    """409 response for an action that kept conflicting with concurrent actions"""
+    return (
+        jsonify(
+            error_schema.dump(
+                {"error": "Conflict", "message": "Tile was updated concurrently, please retry", "status_code": 409}
+            )
+        ),
+        409,
+    )
+
+
+def _load_monster_tile(combat_service, player, tile_id):
+    """
+    Load a player's tile for a multi-turn fight
+
+    Returns:
+        (tile, None), or (None, error response) if the tile is missing, belongs to
+        someone else, is not revealed or already actioned, has no live monster, or the
+        player has fallen
+    """
+    tile = combat_service.get_tile_for_action(tile_id, player.id)
+    if not tile or tile.user_id != player.id:
+        return None, (
+            jsonify(error_schema.dump({"error": "Not Found", "message": "Tile not found", "status_code": 404})),
+            404,
+        )
+    is_valid, error_msg = combat_service.validate_tile_action(tile)
+    tile_type = get_reference_data().tile_types_by_id.get(tile.type)
+    if not is_valid:
+        message = error_msg
+    elif not tile_type or tile_type.name != "monster" or tile.monster_current_hp == 0:
+        message = "Tile has no monster to fight"
+    elif not player.is_alive:
+        message = "Player has fallen"
+    else:
+        return tile, None
+    return None, (jsonify(error_schema.dump({"error": "Bad Request", "message": message, "status_code": 400})), 400)
+
+
 @api_v1.route("/player/<int:player_id>/encounters", methods=["GET"])
 @jwt_required()
 def get_player_encounters(player_id):
@@ -187,11 +460,12 @@ def get_player_encounters(player_id):
     Get encounter history for a player
 
     Query Parameters:
-        limit: Maximum number of encounters to return (default: 50)
-        offset: Number of encounters to skip (default: 0)
+        limit: Maximum number of encounters to return (default: 50, max: 200)
+        cursor: ``next_cursor`` from the previous page (omit for the newest page)
 
     Returns:
-        200: List of encounters
+        200: Page of encounters, newest first, with ``next_cursor``/``has_more``
+        400: Invalid cursor
         403: Player belongs to another user
         404: Player not found
     """
@@ -214,28 +488,31 @@ def get_player_encounters(player_id):
             403,
         )
 
-    # Get pagination parameters
-    limit = request.args.get("limit", 50, type=int)
-    offset = request.args.get("offset", 0, type=int)
-
-    # Get encounters
-    encounters = (
-        Encounter.query.filter_by(user_id=player_id)
-        .order_by(Encounter.created_at.desc())
-        .limit(limit)
-        .offset(offset)
-        .all()
-    )
-
-    total_count = Encounter.query.filter_by(user_id=player_id).count()
+    # Keyset pagination on (created_at, id): deep pages cost the same as the first
+    limit = clamp_page_size(request.args.get("limit", type=int))
+    cursor = request.args.get("cursor")
 
-    from .schemas import EncounterSchema
+    stats_service = StatsService()
+    try:
+        page = stats_service.get_encounter_history(player_id, cursor=cursor, limit=limit)
+    except InvalidCursor:
+        return (
+            jsonify(error_schema.dump({"error": "Bad Request", "message": "Invalid cursor", "status_code": 400})),
+            400,
+        )
 
-    encounters_schema = EncounterSchema(many=True)
+    # The total comes from the statistics rollup (one row), not a count over history
+    total = stats_service.get_player_stats(player_id).total_encounters
 
     return (
         jsonify(
-            {"encounters": encounters_schema.dump(encounters), "total": total_count, "limit": limit, "offset": offset}
+            {
+                "encounters": EncounterSchema(many=True).dump(page.items),
+                "next_cursor": page.next_cursor,
+                "has_more": page.has_more,
+                "total": total,
+                "limit": limit,
+            }
         ),
         200,
     )
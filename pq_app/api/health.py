@@ -0,0 +1,37 @@
+"""
+Health API Endpoints
+
+Operational data for sizing deployments. Every gunicorn worker has its own connection
+pool, so a response describes the worker that served it (see ``pid``).
+"""
+
+from flask import jsonify
+from . import api_v1, limiter
+from ..services import pool_metrics
+from ..services.password_hasher import get_password_hasher
+
+
+@api_v1.route("/health/pool", methods=["GET"])
+@limiter.exempt
+def get_pool_status():
+    """
+    Get the serving worker's database connection pool status
+
+    Returns:
+        200: Pool size and overflow limits, connections checked out / idle / in overflow,
+             and checkout count, timeouts and wait times since the worker started
+    """
+    return jsonify(pool_metrics.snapshot()), 200
+
+
+@api_v1.route("/health/password-hashing", methods=["GET"])
+@limiter.exempt
+def get_password_hashing_status():
+    """
+    Get the serving worker's password hashing pool status
+
+    Returns:
+        200: Hash method, pool and queue size, hashes/verifications done, logins rejected
+             because the queue was full, rehashes, hashes in flight and hash latency
+    """
+    return jsonify(get_password_hasher().snapshot()), 200
@@ -0,0 +1,91 @@
+"""
+Idempotency-Key support for action endpoints
+
+Decorate a JWT-protected view with ``@idempotent`` (below ``@jwt_required()``) to let
+clients retry it safely: a request repeated with the same ``Idempotency-Key`` header gets
+the first response replayed (with ``Idempotent-Replayed: true``) instead of acting again.
+See services/idempotency.py for the storage and expiry rules.
+"""
+from datetime import datetime, timedelta, timezone
+from functools import wraps
+
+from flask import current_app, jsonify, make_response, request
+from flask_jwt_extended import get_jwt_identity
+
+from .schemas import error_schema
+from ..model import db
+from ..services import metrics
+from ..services.concurrency import hold_commit
+from ..services.idempotency import (
+    CLAIMED,
+    IN_PROGRESS,
+    MAX_KEY_LENGTH,
+    MISMATCH,
+    IdempotencyService,
+    request_fingerprint,
+)
+
+HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+
+# Transient outcomes are not stored: a retry should get a fresh attempt
+_TRANSIENT_STATUSES = (409, 429)
+
+
+def _error(status_code, error, message):
+    return jsonify(error_schema.dump({"error": error, "message": message, "status_code": status_code})), status_code
+
+
+def idempotent(view):
+    """Replay the stored response for a repeated Idempotency-Key instead of re-running ``view``"""
+
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(HEADER)
+        if key is None:
+            return view(*args, **kwargs)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return _error(400, "Bad Request", f"{HEADER} must be 1-{MAX_KEY_LENGTH} characters")
+
+        user_id = int(get_jwt_identity())
+        ttl = timedelta(hours=current_app.config.get("IDEMPOTENCY_KEY_TTL_HOURS", 24))
+        lease = timedelta(seconds=current_app.config.get("IDEMPOTENCY_LEASE_SECONDS", 60))
+        service = IdempotencyService(ttl=ttl, lease=lease)
+        fingerprint = request_fingerprint(request.method, request.path, request.get_data(cache=True))
+
+        claimed_at = datetime.now(timezone.utc)
+        outcome, stored = service.claim(user_id, key, fingerprint, now=claimed_at)
+        db.session.commit()
+        if outcome == MISMATCH:
+            return _error(422, "Unprocessable Entity", f"{HEADER} was already used for a different request")
+        if outcome == IN_PROGRESS:
+            return _error(409, "Conflict", f"A request with this {HEADER} is still being processed")
+        metrics.record_cache_lookup("idempotency", hit=outcome != CLAIMED)
+        if outcome != CLAIMED:
+            response = current_app.response_class(
+                stored.response_body, status=stored.status_code, mimetype="application/json"
+            )
+            response.headers[REPLAYED_HEADER] = "true"
+            return response
+
+        try:
+            # The view's run_with_retry only flushes the action, so its response is stored
+            # in the same transaction: a crash leaves either both or neither
+            with hold_commit():
+                response = make_response(view(*args, **kwargs))
+            if response.status_code >= 500 or response.status_code in _TRANSIENT_STATUSES:
+                db.session.rollback()
+                service.release(user_id, key, claimed_at)
+            elif not service.complete(user_id, key, claimed_at, response.status_code, response.get_data(as_text=True)):
+                # Our lease lapsed and a retry took the key over: it applies the action instead
+                db.session.rollback()
+                return _error(409, "Conflict", f"A request with this {HEADER} is still being processed")
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            service.release(user_id, key, claimed_at)
+            db.session.commit()
+            raise
+        return response
+
+    return wrapper
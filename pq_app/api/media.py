@@ -0,0 +1,85 @@
+"""
+Media API Endpoints
+
+Serves ASCII art from the content-addressed media store. A blob's URL is derived from
+its content hash, so responses never change and are cached by clients indefinitely;
+tile payloads reference art by hash instead of embedding it.
+"""
+
+from flask import current_app, jsonify, make_response, request, url_for
+from . import api_v1
+from .schemas import error_schema
+from ..services import metrics
+from ..services.media_store import get_blob
+
+# One year, the conventional maximum for immutable assets
+MEDIA_MAX_AGE = 31536000
+
+
+@api_v1.route("/media/<string:content_hash>", methods=["GET"])
+def get_media(content_hash):
+    """
+    Get a piece of media by its content hash
+
+    Returns:
+        200: The media content (text/plain), cacheable forever
+        304: Client already has this content (If-None-Match)
+        404: No media with this hash
+    """
+    blob = get_blob(content_hash)
+    if blob is None:
+        return jsonify(error_schema.dump({"error": "Not Found", "message": "Media not found", "status_code": 404})), 404
+
+    response = make_response(blob.content)
+    response.mimetype = "text/plain"
+    response.set_etag(blob.sha256)
+    response.cache_control.public = True
+    response.cache_control.max_age = MEDIA_MAX_AGE
+    response.cache_control.immutable = True
+    response = response.make_conditional(request)
+    # A 304 means the client's cached copy was used
+    metrics.record_cache_lookup("media", hit=response.status_code == 304)
+    return response
+
+
+def inline_media_requested() -> bool:
+    """
+    Whether tile payloads should embed art content as well as its hash
+
+    ``?inline_media=1`` / ``?inline_media=0`` override the ``API_INLINE_MEDIA`` setting
+    for clients that cannot fetch media separately.
+    """
+    value = request.args.get("inline_media")
+    if value is None:
+        return bool(current_app.config.get("API_INLINE_MEDIA", False))
+    return value.lower() in ("1", "true", "yes")
+
+
+def tile_media_fields(tile_type, display_art) -> dict:
+    """
+    Media fields of a tile payload
+
+    Args:
+        tile_type: The tile's type (TileTypeOption or TileTypeRef), or None
+        display_art: The tile's resolved DisplayArtRef
+
+    Returns:
+        Dictionary with ``tile_type_obj``, ``ascii_art``, ``ascii_art_hash`` and ``ascii_art_url``
+    """
+    inline = inline_media_requested()
+    content_hash = display_art.content_hash
+    fields = {
+        "tile_type_obj": None,
+        "ascii_art": display_art.content if inline else None,
+        "ascii_art_hash": content_hash,
+        "ascii_art_url": url_for("api_v1.get_media", content_hash=content_hash) if content_hash else None,
+    }
+    if tile_type is not None:
+        fields["tile_type_obj"] = {
+            "id": tile_type.id,
+            "name": tile_type.name,
+            "ascii_art_hash": tile_type.ascii_art_hash,
+        }
+        if inline:
+            fields["tile_type_obj"]["ascii_art"] = tile_type.ascii_art
+    return fields
@@ -9,19 +9,27 @@ from flask import request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from sqlalchemy.exc import SQLAlchemyError
 from . import api_v1
-from .schemas import error_schema
-from ..model import db, User, Encounter
+from .media import tile_media_fields
+from .schemas import error_schema, tile_schema, EncounterSchema
+from ..model import db, User
+from ..services.concurrency import ConcurrentUpdateError, run_with_retry
+from ..services.game_state_service import GameStateService
 from ..services.player_service import PlayerService
+from ..services.reference_data import DisplayArtRef, get_reference_data
+from ..services.stats_service import StatsService
 
 
 def _format_user_as_character(user):
     """Helper to format User as character data"""
+    reference = get_reference_data()
+    player_class = reference.player_classes_by_id.get(user.playerclass)
+    player_race = reference.player_races_by_id.get(user.playerrace)
     return {
         "id": user.id,
         "user_id": user.id,
         "char_name": user.username,
-        "char_class": user.player_class_rel.name if user.player_class_rel else None,
-        "char_race": user.player_race_rel.name if user.player_race_rel else None,
+        "char_class": player_class.name if player_class else None,
+        "char_race": player_race.name if player_race else None,
         "hit_points": user.hitpoints,
         "max_hit_points": user.max_hp,
         "level": user.level,
@@ -49,7 +57,6 @@ def get_characters():
 
     return jsonify({"characters": [_format_user_as_character(user)]}), 200
 
-    return jsonify({"characters": [_format_user_as_character(user)]}), 200
 
 @api_v1.route("/player/characters", methods=["POST"])
 @jwt_required()
@@ -150,19 +157,34 @@ def update_character(character_id):
 
     data = request.get_json()
 
-    try:
+    def update():
         # Update allowed fields
         if "hit_points" in data:
             character.hitpoints = min(data["hit_points"], character.max_hp)
         if "experience" in data:
             character.exp_points = max(0, data["experience"])
 
-        db.session.commit()
+    try:
+        # The player row is versioned: a concurrent write re-runs the update from a fresh read
+        run_with_retry(update)
 
         return (
             jsonify({"message": "Character updated successfully", "character": _format_user_as_character(character)}),
             200,
         )
+    except ConcurrentUpdateError:
+        return (
+            jsonify(
+                error_schema.dump(
+                    {
+                        "error": "Conflict",
+                        "message": "Character was updated concurrently, please retry",
+                        "status_code": 409,
+                    }
+                )
+            ),
+            409,
+        )
     except SQLAlchemyError as e:
         db.session.rollback()
         return (
@@ -205,19 +227,13 @@ def get_character_stats(character_id):
             403,
         )
 
-    # Get encounter statistics
     # Accrue points lazily on stats request
     PlayerService().accrue_points(character)
-    encounters = Encounter.query.filter_by(user_id=character_id).order_by(Encounter.created_at.desc()).all()
-    total_encounters = len(encounters)
-    successful_encounters = sum(1 for e in encounters if e.was_successful)
-    total_damage_dealt = sum(e.damage_dealt or 0 for e in encounters)
-    total_damage_received = sum(e.damage_received or 0 for e in encounters)
 
-    # Include recent encounters and points in response
-    recent = encounters[:10]
-    from .schemas import EncounterSchema
-    recent_encounters = EncounterSchema(many=True).dump(recent)
+    # Totals come from the statistics rollup; only the 10 most recent encounters are loaded
+    stats_service = StatsService()
+    statistics = stats_service.get_character_stats(character_id)
+    recent_encounters = EncounterSchema(many=True).dump(stats_service.get_recent_encounters(character_id, limit=10))
 
     character_payload = _format_user_as_character(character)
     character_payload["points"] = character.points
@@ -226,20 +242,88 @@ def get_character_stats(character_id):
         jsonify(
             {
                 "character": character_payload,
-                "statistics": {
-                    "total_encounters": total_encounters,
-                    "successful_encounters": successful_encounters,
-                    "success_rate": (
-                        round(successful_encounters / total_encounters * 100, 2) if total_encounters > 0 else 0
-                    ),
-                    "total_damage_dealt": total_damage_dealt,
-                    "total_damage_received": total_damage_received,
-                    "average_damage_dealt": (
-                        round(total_damage_dealt / total_encounters, 2) if total_encounters > 0 else 0
-                    ),
-                },
+                "statistics": statistics,
                 "recent_encounters": recent_encounters,
             }
         ),
         200,
     )
+
+
+def _format_tile_state(state):
+    """Helper to format the current tile of a GameState (same shape as tiles/current)"""
+    tile = state.tile
+    result = tile_schema.dump(tile)
+    result["action_taken"] = bool(tile.action_taken)
+    result.update(tile_media_fields(state.tile_type, DisplayArtRef(state.ascii_art, state.ascii_art_hash)))
+    result["available_actions"] = [{"id": a.id, "code": a.code, "name": a.name} for a in state.allowed_actions]
+    result["combat_actions"] = list(state.combat_actions.api_payload) if state.combat_actions else []
+    result["monster_status"] = None
+    if tile.monster_current_hp is not None:
+        result["monster_status"] = {
+            "current_hp": tile.monster_current_hp,
+            "max_hp": tile.monster_max_hp,
+            "hp_percent": tile.monster_hp_percent * 100,
+            "is_alive": tile.is_monster_alive,
+        }
+    return result
+
+
+@api_v1.route("/player/<int:player_id>/state", methods=["GET"])
+@jwt_required()
+def get_game_state(player_id):
+    """
+    Get everything needed to render the current screen in one call: the character,
+    active playthrough, current tile (with monster status, allowed actions, combat
+    actions and ASCII art) and points balance.
+
+    Returns:
+        200: Game state (``playthrough``/``tile`` are null when there is none)
+        403: Player belongs to another user
+        404: Player not found
+    """
+    current_user_id = int(get_jwt_identity())
+    state = GameStateService().load(player_id)
+
+    if not state:
+        return (
+            jsonify(error_schema.dump({"error": "Not Found", "message": "Player not found", "status_code": 404})),
+            404,
+        )
+
+    if state.player.id != current_user_id:
+        return (
+            jsonify(
+                error_schema.dump(
+                    {"error": "Forbidden", "message": "You do not have access to this player", "status_code": 403}
+                )
+            ),
+            403,
+        )
+
+    # Accrue points lazily
+    player = state.player
+    PlayerService().accrue_points(player)
+
+    character_payload = _format_user_as_character(player)
+    character_payload["points"] = player.points
+    playthrough = state.playthrough
+
+    return (
+        jsonify(
+            {
+                "player": character_payload,
+                "playthrough": (
+                    {
+                        "id": playthrough.id,
+                        "started_at": playthrough.started_at.isoformat() if playthrough.started_at else None,
+                    }
+                    if playthrough
+                    else None
+                ),
+                "tile": _format_tile_state(state) if state.tile else None,
+                "points_balance": player.points,
+            }
+        ),
+        200,
+    )
@@ -73,6 +73,7 @@ class TileSchema(Schema):
     id = fields.Int()
     content = fields.Str()
     playthrough_id = fields.Int()
+    tile_index = fields.Int()
     tile_type_obj = fields.Nested(TileTypeOptionSchema, dump_only=True)
     available_actions = fields.List(fields.Nested(ActionOptionSchema), dump_only=True)
     ascii_art = fields.Str(dump_only=True)
@@ -8,8 +8,13 @@ from flask import request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from sqlalchemy.exc import SQLAlchemyError
 from . import api_v1
+from .idempotency import idempotent
+from .media import tile_media_fields
 from .schemas import tile_schema, tiles_schema, action_result_schema, error_schema
 from ..model import db, User, Tile, Playthrough
+from ..services.combat_service import CombatService
+from ..services.concurrency import ConcurrentUpdateError, run_with_retry
+from ..services.reference_data import get_reference_data
 from ..services.tile_service import TileService
 from ..services.media_service import MediaService
 from ..services.player_service import PlayerService
@@ -56,9 +61,9 @@ def get_current_tile(player_id):
             404,
         )
 
-    # Get current tile
+    # Get current tile (generated from the seed, with a null id, until it is first actioned)
     tile_service = TileService()
-    current_tile = tile_service.get_latest_tile(player_id, playthrough.id)
+    current_tile = tile_service.get_current_tile(player_id, playthrough)
 
     if not current_tile:
         return (
@@ -66,23 +71,18 @@ def get_current_tile(player_id):
             404,
         )
 
-    tile_data = tile_service.get_tile_data(current_tile.id)
+    tile_data = tile_service.describe_tile(current_tile)
 
-    # Get ASCII art
+    # Get display art (payloads carry its media-store hash)
     media_service = MediaService()
-    ascii_art = media_service.get_tile_display_media(current_tile.id)
+    display_art = media_service.get_tile_display_ref(current_tile.id, current_tile.type)
 
     # Accrue points lazily
     PlayerService().accrue_points(player)
 
     result = tile_schema.dump(tile_data.tile)
-    result["tile_type_obj"] = {
-        "id": tile_data.tile_type_obj.id,
-        "name": tile_data.tile_type_obj.name,
-        "ascii_art": tile_data.tile_type_obj.ascii_art,
-    }
+    result.update(tile_media_fields(tile_data.tile_type_obj, display_art))
     result["available_actions"] = [{"id": a.id, "code": a.code, "name": a.name} for a in tile_data.allowed_actions]
-    result["ascii_art"] = ascii_art
     result["points_balance"] = player.points
     
     # Add monster status if applicable
@@ -134,21 +134,16 @@ def get_tile(player_id, tile_id):
     if not tile_data:
         return jsonify(error_schema.dump({"error": "Not Found", "message": "Tile not found", "status_code": 404})), 404
 
-    # Get ASCII art
+    # Get display art (payloads carry its media-store hash)
     media_service = MediaService()
-    ascii_art = media_service.get_tile_display_media(tile_id)
+    display_art = media_service.get_tile_display_ref(tile_id, tile_data.tile.type)
 
     # Accrue points lazily
     PlayerService().accrue_points(player)
 
     result = tile_schema.dump(tile_data.tile)
-    result["tile_type_obj"] = {
-        "id": tile_data.tile_type_obj.id,
-        "name": tile_data.tile_type_obj.name,
-        "ascii_art": tile_data.tile_type_obj.ascii_art,
-    }
+    result.update(tile_media_fields(tile_data.tile_type_obj, display_art))
     result["available_actions"] = [{"id": a.id, "code": a.code, "name": a.name} for a in tile_data.allowed_actions]
-    result["ascii_art"] = ascii_art
     result["points_balance"] = player.points
     
     # Add monster status if applicable
@@ -165,10 +160,14 @@ def get_tile(player_id, tile_id):
 
 
 @api_v1.route("/player/<int:player_id>/tiles/<int:tile_id>/action", methods=["POST"])
+@api_v1.route("/player/<int:player_id>/tiles/current/action", defaults={"tile_id": None}, methods=["POST"])
 @jwt_required()
+@idempotent
 def execute_tile_action(player_id, tile_id):
     """
-    Execute an action on a tile
+    Execute an action on a tile, or on the current tile via ``tiles/current/action`` (which
+    stores a tile that was only generated so far). Send an ``Idempotency-Key`` header to
+    make retries safe.
 
     Request Body:
         {
@@ -178,9 +177,12 @@ def execute_tile_action(player_id, tile_id):
 
     Returns:
         200: Action result with updated player state
-        400: Invalid action
+        400: Invalid action, or the tile was already actioned
         403: Player belongs to another user
         404: Player or tile not found
+        409: Still conflicting with concurrent actions on the tile after retries, or a
+             request with the same Idempotency-Key is still in flight
+        422: Idempotency-Key already used for a different request
     """
     current_user_id = int(get_jwt_identity())
     player = db.session.get(User, player_id)
@@ -201,7 +203,7 @@ def execute_tile_action(player_id, tile_id):
             403,
         )
 
-    data = request.get_json()
+    data = request.get_json(silent=True)
     if not data or "action_code" not in data:
         return (
             jsonify(
@@ -210,60 +212,86 @@ def execute_tile_action(player_id, tile_id):
             400,
         )
 
-    action_code = data["action_code"]
     combat_action_code = data.get("combat_action_code")
-
-    # Get tile service
-    tile_service = TileService()
-    tile_data = tile_service.get_tile_data(tile_id)
-
-    if not tile_data:
-        return jsonify(error_schema.dump({"error": "Not Found", "message": "Tile not found", "status_code": 404})), 404
-
-    # Execute action using combat service
-    from ..services.combat_service import CombatService
-
     combat_service = CombatService()
+    action_option = combat_service.get_action_by_value(data["action_code"])
+    if not action_option:
+        return (
+            jsonify(error_schema.dump({"error": "Bad Request", "message": "Unknown action_code", "status_code": 400})),
+            400,
+        )
 
-    # Spend a point non-blocking before action
-    PlayerService().spend_point(player)
+    def act():
+        tile = combat_service.get_tile_for_action(tile_id, player.id)
+        if not tile or tile.user_id != player.id:
+            return (
+                jsonify(error_schema.dump({"error": "Not Found", "message": "Tile not found", "status_code": 404})),
+                404,
+            ), None, None
+        is_valid, error_msg = combat_service.validate_tile_action(tile)
+        if not is_valid:
+            return (
+                jsonify(error_schema.dump({"error": "Bad Request", "message": error_msg, "status_code": 400})),
+                400,
+            ), None, None
+
+        # Spend a point non-blocking before action
+        player_service = PlayerService()
+        player_service.spend_point(player)
+
+        tile_type = get_reference_data().tile_types_by_id.get(tile.type)
+        result = combat_service.execute_action(
+            player=player,
+            tile=tile,
+            action_name=action_option.name,
+            tile_type_name=tile_type.name if tile_type else None,
+            combat_action_code=combat_action_code,
+        )
+        action_history_id = combat_service.get_or_create_action_record(
+            tile_id=tile.id, action_name=action_option.name, action_option=action_option
+        )
+        if result.tile_completed:
+            combat_service.complete_tile_action(tile=tile, player=player, action_history_id=action_history_id)
 
-    result = combat_service.execute_action(
-        player_char=player, tile=tile_data.tile, action_code=action_code, combat_action_code=combat_action_code
-    )
+        # Accrue points lazily after action (if hour elapsed)
+        player_service.accrue_points(player)
+        return None, tile, result
 
-    # Prepare response
-    # Accrue points lazily after action (if hour elapsed)
-    PlayerService().accrue_points(player)
+    try:
+        error, tile, result = run_with_retry(act)
+    except ConcurrentUpdateError:
+        return (
+            jsonify(
+                error_schema.dump(
+                    {"error": "Conflict", "message": "Tile was updated concurrently, please retry", "status_code": 409}
+                )
+            ),
+            409,
+        )
+    if error:
+        return error
 
     response_data = {
-        "success": result.get("success", False),
-        "message": result.get("message", ""),
-        "player_hp": player.hit_points,
+        "success": result.success,
+        "message": result.message,
+        "player_hp": player.hitpoints,
         "points_balance": player.points,
-        "gold_change": result.get("gold_change", 0),
-        "experience_change": result.get("experience_change", 0),
+        "player_hp_change": result.player_hp_change,
         "next_tile_id": None,
     }
 
-    # Add encounter if present
-    if "encounter" in result and result["encounter"]:
-        from .schemas import encounter_schema
-
-        response_data["encounter"] = encounter_schema.dump(result["encounter"])
-    
     # Add updated monster status if tile is a monster encounter
-    tile = db.session.get(Tile, tile_id)
-    if tile and tile.monster_current_hp is not None:
+    response_data["tile_id"] = tile.id
+    if tile.monster_current_hp is not None:
         response_data["monster_status"] = {
             "current_hp": tile.monster_current_hp,
             "max_hp": tile.monster_max_hp,
             "hp_percent": tile.monster_hp_percent * 100,
             "is_alive": tile.is_monster_alive,
         }
-    
+
     # Add tile_completed flag
-    response_data["tile_completed"] = result.get("tile_completed", False)
+    response_data["tile_completed"] = result.tile_completed
 
     return jsonify(response_data), 200
 
@@ -309,34 +337,45 @@ def advance_to_next_tile(player_id):
             404,
         )
 
-    try:
-        # Create new tile using tile service
-        tile_service = TileService()
-        new_tile = tile_service.generate_next_tile(playthrough.id)
+    tile_service = TileService()
+
+    def advance():
+        # Reveal the next tile of the playthrough's seeded sequence (not stored until actioned)
+        new_tile = tile_service.next_tile(player_id, playthrough.id)
+        # Accrue points lazily
+        PlayerService().accrue_points(player)
+        return new_tile
 
-        db.session.commit()
+    try:
+        # The player row is versioned: a concurrent write re-runs this from a fresh read
+        new_tile = run_with_retry(advance)
 
         # Get tile data for display
-        tile_data = tile_service.get_tile_data(new_tile.id)
+        tile_data = tile_service.describe_tile(new_tile)
 
-        # Get ASCII art
+        # Get display art (payloads carry its media-store hash)
         media_service = MediaService()
-        ascii_art = media_service.get_tile_display_media(new_tile.id)
-
-        # Accrue points lazily
-        PlayerService().accrue_points(player)
+        display_art = media_service.get_tile_display_ref(new_tile.id, new_tile.type)
 
         result = tile_schema.dump(tile_data.tile)
-        result["tile_type_obj"] = {
-            "id": tile_data.tile_type_obj.id,
-            "name": tile_data.tile_type_obj.name,
-            "ascii_art": tile_data.tile_type_obj.ascii_art,
-        }
+        result.update(tile_media_fields(tile_data.tile_type_obj, display_art))
         result["available_actions"] = [{"id": a.id, "code": a.code, "name": a.name} for a in tile_data.allowed_actions]
-        result["ascii_art"] = ascii_art
         result["points_balance"] = player.points
 
         return jsonify(result), 200
+    except ConcurrentUpdateError:
+        return (
+            jsonify(
+                error_schema.dump(
+                    {
+                        "error": "Conflict",
+                        "message": "Player was updated concurrently, please retry",
+                        "status_code": 409,
+                    }
+                )
+            ),
+            409,
+        )
     except SQLAlchemyError as e:
         db.session.rollback()
         return (
@@ -1,4 +1,3 @@
-import random
 from typing import cast
 from flask import Blueprint, request, render_template, redirect, url_for, flash, abort, jsonify
 from flask_login import (
@@ -7,10 +6,13 @@ from flask_login import (
     login_required,
     current_user,
 )
-from werkzeug.security import generate_password_hash, check_password_hash
 from . import model, gameforms
-from .services import CombatService, TileService, MediaService
+from .services import CombatService, TileService, MediaService, StatsService
+from .services.concurrency import ConcurrentUpdateError, run_with_retry
+from .services.pagination import InvalidCursor
+from .services.password_hasher import HashingBusyError
 from .services.player_service import PlayerService
+from .services.reference_data import get_reference_data
 
 # Create Blueprint
 main_bp = Blueprint("main", __name__)
@@ -25,9 +27,13 @@ def register():
         if existing:
             flash("Username already taken. Please choose another.")
             return render_template("register.html", form=form)
-        # form.password.data is typed as Optional[str]; cast to str for the password-hash helper
-        hashed_password = generate_password_hash(cast(str, form.password.data), method="pbkdf2:sha256")
-        new_user = model.User(username=form.username.data, password_hash=hashed_password)
+        new_user = model.User(username=form.username.data)
+        try:
+            # form.password.data is typed as Optional[str]; cast to str for the password-hash helper
+            new_user.set_password(cast(str, form.password.data))
+        except HashingBusyError:
+            flash("The server is busy. Please try again in a moment.")
+            return render_template("register.html", form=form), 429
         model.db.session.add(new_user)
         model.db.session.commit()
         flash("Registration successful! Please log in.")
@@ -42,11 +48,21 @@ def login():
         if form.validate_on_submit():
             user = model.User.query.filter_by(username=form.username.data).first()
             # form.password.data can be Optional[str]; cast to str for the checker
-            if user and check_password_hash(user.password_hash, cast(str, form.password.data)):
-                login_user(user, remember=form.remember.data)
-                return redirect(url_for("main.greet_user"))
-            else:
-                flash("Login unsuccessful. Please check your username and password.")
+            password = cast(str, form.password.data)
+            try:
+                if user and user.check_password(password):
+                    # Upgrade hashes made with old PASSWORD_HASH_METHOD parameters (re-read and
+                    # retried if the versioned user row changed concurrently)
+                    run_with_retry(lambda: user.rehash_password_if_needed(password))
+                    login_user(user, remember=form.remember.data)
+                    return redirect(url_for("main.greet_user"))
+                else:
+                    flash("Login unsuccessful. Please check your username and password.")
+            except HashingBusyError:
+                flash("The server is busy. Please try again in a moment.")
+                return render_template("login.html", form=form), 429
+            except ConcurrentUpdateError:
+                abort(409, description="Your account changed while you logged in, please try again")
         # Always render the login page after POST (whether validation passed or not)
         return render_template("login.html", form=form)
     # For GET and other methods, render the login template
@@ -72,7 +88,7 @@ def greet_user():
         if active_play:
             return redirect(url_for("main.get_tile", player_id=current_user.id))
         # If no active playthrough, present dashboard allowing user to start a new journey
-        user_tiles_exist = model.Tile.query.filter_by(user_id=current_user.id).first() is not None
+        user_tiles_exist = model.Playthrough.query.filter_by(user_id=current_user.id).first() is not None
         start_form = gameforms.RestartForm()
         return render_template(
             "dashboard.html", player_char=current_user, has_tiles=user_tiles_exist, start_form=start_form
@@ -98,35 +114,27 @@ def setup_char(player_id):
         return redirect(url_for("main.game_over", player_id=player_id))
     user_profile_id = user_profile.id
     form = gameforms.CharacterForm(obj=user_profile)
-    form.charclass.choices = [
-        (PlayerClass.id, PlayerClass.name) for PlayerClass in model.PlayerClass.query.order_by("name")
-    ]
-    form.charrace.choices = [(PlayerRace.id, PlayerRace.name) for PlayerRace in model.PlayerRace.query.order_by("name")]
-    tile_type_list = [
-        {"name": tile_type.name, "id": tile_type.id} for tile_type in model.TileTypeOption.query.order_by("name")
-    ]
-    tile_type = random.choice(tile_type_list)
+    reference = get_reference_data()
+    form.charclass.choices = [(player_class.id, player_class.name) for player_class in reference.player_classes]
+    form.charrace.choices = [(player_race.id, player_race.name) for player_race in reference.player_races]
     # Validate the submission (this also enforces CSRF) before mutating the profile.
     if form.validate_on_submit():
-        user_profile.playerclass = form.charclass.data
-        user_profile.playerrace = form.charrace.data
-        # if no tile exists for this user, create a tile
-        if not model.Tile.query.filter_by(user_id=user_profile_id).first():
-            # create a new playthrough for this user and the initial tile.
-            # Route through TileService so monster HP is initialized consistently.
-            new_play = model.Playthrough(user_id=user_profile_id)
-            model.db.session.add(new_play)
-            model.db.session.flush()
-
-            current_tile = TileService().create_tile(
-                user_id=user_profile_id,
-                playthrough_id=new_play.id,
-                tile_type_id=tile_type["id"],
-            )
-            model.db.session.add(current_tile)
-        user_profile.hitpoints = 100
-        model.db.session.add(user_profile)
-        model.db.session.commit()
+
+        def set_up():
+            user_profile.playerclass = form.charclass.data
+            user_profile.playerrace = form.charrace.data
+            # if this user has not started a journey yet, start one
+            if not model.Playthrough.query.filter_by(user_id=user_profile_id).first():
+                # create a new seeded playthrough for this user and reveal its first tile
+                # (generated from the seed; stored once the player acts on it).
+                TileService().start_new_playthrough(user_profile_id)
+            user_profile.hitpoints = 100
+            model.db.session.add(user_profile)
+
+        try:
+            run_with_retry(set_up)
+        except ConcurrentUpdateError:
+            abort(409, description="Your character changed while you set it up, please try again")
         return redirect(url_for("main.char_start", id=user_profile_id))
     # GET, or POST with validation/CSRF errors: render the setup form (with any errors).
     return render_template("charsetup.html", player_char=user_profile, form=form)
@@ -150,6 +158,11 @@ def char_start(id):
     return render_template("charStart.html", charMessage=char_message, player_char_id=user_profile.id)
 
 
+def _tile_address(tile) -> str:
+    """How tile routes address a tile: its id, or "current" while it is not stored yet"""
+    return str(tile.id) if tile.id is not None else "current"
+
+
 # route for the current tile, using a short url like /play that can be
 # easily accessed by a user that is logged in
 @main_bp.route("/player/<int:player_id>/play", methods=["GET"])
@@ -178,21 +191,21 @@ def get_tile(player_id):
         flash("No active journey found. Please start a new journey.")
         return redirect(url_for("main.greet_user"))
 
-    # Get the most recent tile from the active playthrough
-    tile_details = tile_service.get_latest_tile(player_id, active_playthrough.id)
+    # Get the current tile of the active playthrough
+    tile_details = tile_service.get_current_tile(player_id, active_playthrough)
     if not tile_details:
         flash("No tile found for this player; please set up your character or generate a tile.")
         return redirect(url_for("main.setup_char", player_id=player_id))
 
     # Get tile data including type and allowed actions
-    tile_data = tile_service.get_tile_data(tile_details.id)
+    tile_data = tile_service.describe_tile(tile_details)
 
     # Get media for the tile
-    ascii_art = media_service.get_tile_display_media(tile_details.id)
+    ascii_art = media_service.get_tile_display_media(tile_details.id, tile_details.type)
 
     # Prepare form
     form = gameforms.TileForm(obj=tile_details)
-    form.tileid.data = str(tile_details.id)
+    form.tileid.data = _tile_address(tile_details)
     form.type.data = tile_data.tile_type_name
     form.content.data = tile_details.content
 
@@ -265,32 +278,37 @@ def generate_tile(player_id):
     points_before = user_profile.points or 0
     if points_before <= 0:
         flash("You're out of points. Proceeding is allowed; you'll accrue +5/hour.")
-    player_service.accrue_points(user_profile)
 
-    # Get last tile record for the user
-    tile_record = tile_service.get_latest_tile(player_id)
+    def advance():
+        player_service.accrue_points(user_profile)
 
-    # If no tile record exists, redirect to the tile page which will handle prompting setup
-    if not tile_record:
-        return redirect(url_for("main.get_tile", player_id=player_id))
+        # Get the current tile of the active playthrough
+        playthrough = tile_service.get_active_playthrough(player_id)
+        tile_record = tile_service.get_current_tile(player_id, playthrough) if playthrough else None
 
-    # If the tile has not been actioned redirect to that tile page
-    if not tile_record.action_taken:
-        return redirect(url_for("main.get_tile", player_id=player_id))
+        # If no tile exists, or the tile has not been actioned, stay on the tile page
+        # (which also handles prompting setup)
+        if not tile_record or not tile_record.action_taken:
+            return None
 
-    # At this point the previous tile was actioned; generate a fresh tile for the player.
-    # Route through TileService so monster HP/content are initialized consistently and the
-    # playthrough is preserved from the previous tile.
-    current_tile = tile_service.create_tile(player_id, tile_record.playthrough_id)
-    model.db.session.add(current_tile)
-    model.db.session.commit()
+        # At this point the previous tile was actioned; reveal the next tile of the same
+        # playthrough's seeded sequence.
+        return tile_service.next_tile(player_id, playthrough.id)
+
+    # The player row is versioned: a concurrent write re-runs this from a fresh read
+    try:
+        current_tile = run_with_retry(advance)
+    except ConcurrentUpdateError:
+        abort(409, description="Your game changed while you moved on, please try again")
+    if current_tile is None:
+        return redirect(url_for("main.get_tile", player_id=player_id))
 
-    # Get tile data for the newly-created tile
-    tile_data = tile_service.get_tile_data(current_tile.id)
+    # Get tile data for the newly revealed tile
+    tile_data = tile_service.describe_tile(current_tile)
 
     # Prepare the form
     tile_details = gameforms.TileForm(obj=current_tile)
-    tile_details.tileid.data = str(current_tile.id)
+    tile_details.tileid.data = _tile_address(current_tile)
     tile_details.type.data = tile_data.tile_type_name
     tile_details.content.data = current_tile.content
     tile_details.action.choices = [(action.code or str(action.id), action.name) for action in tile_data.allowed_actions]
@@ -328,16 +346,19 @@ def start_journey(player_id):
 
     # Create a new playthrough and initial tile for this player. TileService handles tile
     # content and monster-HP initialization consistently.
-    new_play, current_tile = TileService().start_new_playthrough(player_id)
-    model.db.session.commit()
+    try:
+        run_with_retry(lambda: TileService().start_new_playthrough(player_id))
+    except ConcurrentUpdateError:
+        abort(409, description="Your game changed while you started a journey, please try again")
 
     return redirect(url_for("main.get_tile", player_id=player_id))
 
 
 @main_bp.route("/player/<int:playerid>/game/tile/<int:tile_id>/action", methods=["POST"])
+@main_bp.route("/player/<int:playerid>/game/tile/current/action", defaults={"tile_id": None}, methods=["POST"])
 @login_required
 def execute_tile_action(playerid, tile_id):
-    """Execute an action on a tile using CombatService"""
+    """Execute an action on a tile (the player's current tile for .../tile/current) using CombatService"""
     # Authorization check
     if current_user.id != playerid:
         abort(403)
@@ -363,34 +384,23 @@ def execute_tile_action(playerid, tile_id):
     action_option = combat_service.get_action_by_value(action_post_value)
     action_name = action_option.name if action_option else "unknown"
 
-    # Use a transactional nested block and acquire a row-level lock on the tile to prevent races
-    with model.db.session.begin_nested():
-        tile_record = combat_service.get_tile_with_lock(tile_id)
+    def act():
+        """Apply the action in one transaction; returns (error message, player, tile, combat result)"""
+        # The current tile is stored on its first action
+        tile_record = combat_service.get_tile_for_action(tile_id, playerid)
 
         # Validate tile
         is_valid, error_msg = combat_service.validate_tile_action(tile_record)
         if not is_valid:
-            if error_msg == "Tile already actioned":
-                # Redirect to get_tile to show the tile in readonly mode
-                if is_ajax:
-                    return jsonify(redirect=url_for("main.get_tile", player_id=playerid)), 200
-                return redirect(url_for("main.get_tile", player_id=playerid))
-            else:
-                # Tile not found or other error
-                if is_ajax:
-                    return jsonify(error=error_msg), 400
-                abort(400, description=error_msg)
+            return error_msg, None, None, None
 
         # Get player
         player_record = model.db.session.get(model.User, playerid)
         if not player_record:
-            if is_ajax:
-                return jsonify(error="Player not found"), 400
-            abort(400, description="Player not found")
+            return "Player not found", None, None, None
 
         # Get tile type
-        # Get tile type
-        tile_type = model.db.session.get(model.TileTypeOption, tile_record.type)
+        tile_type = get_reference_data().tile_types_by_id.get(tile_record.type)
         tile_type_name = tile_type.name if tile_type else None
 
         # Check for combat_action_code parameter (for enhanced combat)
@@ -415,7 +425,7 @@ def execute_tile_action(playerid, tile_id):
 
         # Get or create action record for history tracking
         action_history_id = combat_service.get_or_create_action_record(
-            tile_id=tile_id, action_name=action_name, action_option=action_option
+            tile_id=tile_record.id, action_name=action_name, action_option=action_option
         )
 
         # Complete the tile action only if tile_completed is True (monster defeated or non-combat action)
@@ -423,8 +433,27 @@ def execute_tile_action(playerid, tile_id):
             combat_service.complete_tile_action(
                 tile=tile_record, player=player_record, action_history_id=action_history_id
             )
+        return None, player_record, tile_record, combat_result
 
-    # Transaction committed here
+    # Tile and player are versioned: if a concurrent action on the same tile or player
+    # commits first, this one is re-run from a fresh read instead of overwriting it
+    try:
+        error_msg, player_record, tile_details, combat_result = run_with_retry(act)
+    except ConcurrentUpdateError:
+        if is_ajax:
+            return jsonify(error="The tile changed while you acted, please try again"), 409
+        abort(409, description="The tile changed while you acted, please try again")
+
+    if error_msg == "Tile already actioned":
+        # Redirect to get_tile to show the tile in readonly mode
+        if is_ajax:
+            return jsonify(redirect=url_for("main.get_tile", player_id=playerid)), 200
+        return redirect(url_for("main.get_tile", player_id=playerid))
+    elif error_msg:
+        # Tile or player not found, or other error
+        if is_ajax:
+            return jsonify(error=error_msg), 400
+        abort(400, description=error_msg)
 
     # Check if player is still alive after action
     if not combat_result.player_alive:
@@ -440,10 +469,9 @@ def execute_tile_action(playerid, tile_id):
         return redirect(url_for("main.greet_user"))
 
     # Render tile view - readonly if tile is completed, otherwise allow continued combat
-    tile_details = model.db.session.get(model.Tile, tile_id)
     form = gameforms.TileForm(obj=tile_details)
     form.tileid.data = str(tile_details.id)
-    tile_type_obj = model.db.session.get(model.TileTypeOption, tile_details.type)
+    tile_type_obj = get_reference_data().tile_types_by_id.get(tile_details.type)
     form.type.data = tile_type_obj.name if tile_type_obj else None
     form.action.choices = [
         (opt.code or str(opt.id), opt.name)
@@ -454,7 +482,7 @@ def execute_tile_action(playerid, tile_id):
 
     # Get media for the tile
     media_service = MediaService()
-    ascii_art = media_service.get_tile_display_media(tile_id)
+    ascii_art = media_service.get_tile_display_media(tile_details.id, tile_details.type)
 
     # Determine if tile is readonly - completed OR monster is alive (allow continued combat)
     is_readonly = tile_details.action_taken or combat_result.tile_completed
@@ -497,10 +525,11 @@ def execute_tile_action(playerid, tile_id):
 
 
 @main_bp.route("/player/<int:player_id>/game/tile/<int:tile_id>/combat-actions", methods=["GET"])
+@main_bp.route("/player/<int:player_id>/game/tile/current/combat-actions", defaults={"tile_id": None}, methods=["GET"])
 @login_required
 def get_combat_actions(player_id, tile_id):
     """
-    Get available combat actions for a player on a specific tile.
+    Get available combat actions for a player on a specific tile (or their current tile).
     Returns JSON list of available CombatActions filtered by class/race.
     """
     # Verify player
@@ -511,39 +540,25 @@ def get_combat_actions(player_id, tile_id):
         abort(404, description="Player not found")
 
     # Verify tile
-    tile = model.db.session.get(model.Tile, tile_id)
+    if tile_id is None:
+        tile_service = TileService()
+        playthrough = tile_service.get_active_playthrough(player_id)
+        tile = tile_service.get_current_tile(player_id, playthrough) if playthrough else None
+    else:
+        tile = model.db.session.get(model.Tile, tile_id)
     if not tile:
         if request.headers.get("X-Requested-With") == "XMLHttpRequest":
             return jsonify(error="Tile not found"), 404
         abort(404, description="Tile not found")
 
     # Get tile type
-    tile_type = model.db.session.get(model.TileTypeOption, tile.type)
+    tile_type = get_reference_data().tile_types_by_id.get(tile.type)
     tile_type_name = tile_type.name if tile_type else None
 
-    # Get available actions
-    combat_service = CombatService()
-    actions = combat_service.get_available_actions(player, tile_type_name)
-
-    # Format for JSON response
-    actions_data = [
-        {
-            "id": action.id,
-            "code": action.code,
-            "name": action.name,
-            "description": action.description,
-            "damage_min": action.damage_min,
-            "damage_max": action.damage_max,
-            "heal_amount": action.heal_amount,
-            "defense_boost": action.defense_boost,
-            "success_rate": action.success_rate,
-            "requires_class": action.required_class.name if action.required_class else None,
-            "requires_race": action.required_race.name if action.required_race else None,
-        }
-        for action in actions
-    ]
+    # Get available actions (precomputed and pre-serialized per class/race/tile type)
+    action_set = CombatService().get_available_action_set(player, tile_type_name)
 
-    return jsonify(tile_id=tile_id, tile_type=tile_type_name, available_actions=actions_data)
+    return jsonify(tile_id=tile.id, tile_type=tile_type_name, available_actions=action_set.payload)
 
 
 @main_bp.route("/player/<int:player_id>/profile", methods=["GET"])
@@ -557,7 +572,8 @@ def get_user_profile(player_id):
         return redirect(url_for("main.greet_user"))
     # Accrue points lazily on profile view
     PlayerService().accrue_points(user_profile)
-    return render_template("profile.html", player_char=user_profile)
+    stats = StatsService().get_player_stats(player_id)
+    return render_template("profile.html", player_char=user_profile, stats=stats)
 
 
 # get history
@@ -569,16 +585,22 @@ def get_history(player_id):
         abort(403)
     # get current logged in user profile
     user_profile = model.db.session.get(model.User, player_id)
-    tile_history = model.Tile.query.filter_by(user_id=player_id).all()
-    # Preload encounters for each tile
-    tile_encounters = {t.id: t.encounters for t in tile_history}
+    # One keyset page of tiles (newest first); encounters are eager-loaded per page
+    try:
+        page = TileService().get_tile_history(player_id, cursor=request.args.get("cursor"))
+    except InvalidCursor:
+        abort(400)
+    # Positions passed without acting are rebuilt from the seed: no row, no encounters
+    tile_encounters = {t.id: t.encounters for t in page.items if t.id is not None}
     # Check if there's an active playthrough for button logic
     active_playthrough = model.Playthrough.query.filter_by(user_id=player_id, ended_at=None).first()
     return render_template(
         "gameHistory.html",
         player_char=user_profile,
-        history=tile_history,
+        history=page.items,
+        tile_types=get_reference_data().tile_types_by_id,
         tile_encounters=tile_encounters,
+        next_cursor=page.next_cursor,
         active_playthrough=active_playthrough,
     )
 
@@ -596,17 +618,18 @@ def game_over(player_id):
         abort(404)
 
     # Get player class and race names
+    reference = get_reference_data()
     player_class_name = None
     player_race_name = None
     if user_profile.playerclass:
-        player_class = model.db.session.get(model.PlayerClass, user_profile.playerclass)
+        player_class = reference.player_classes_by_id.get(user_profile.playerclass)
         player_class_name = player_class.name if player_class else "Unknown"
     if user_profile.playerrace:
-        player_race = model.db.session.get(model.PlayerRace, user_profile.playerrace)
+        player_race = reference.player_races_by_id.get(user_profile.playerrace)
         player_race_name = player_race.name if player_race else "Unknown"
 
-    # Count tiles explored
-    tiles_explored = model.Tile.query.filter_by(user_id=player_id).count()
+    # Tiles explored come from the statistics rollup (one row, no count over history)
+    tiles_explored = StatsService().get_player_stats(player_id).tiles_explored
     # Provide a RestartForm so template can render a POST form with CSRF token
     restart_form = gameforms.RestartForm()
 
@@ -632,21 +655,32 @@ def restart_game(player_id):
     if not user_profile:
         abort(404)
 
-    # Reset player stats
-    user_profile.hitpoints = user_profile.max_hp
-    user_profile.exp_points = 0
-    user_profile.level = 1
-    user_profile.playerclass = None
-    user_profile.playerrace = None
+    def reset():
+        # Reset player stats
+        user_profile.hitpoints = user_profile.max_hp
+        user_profile.exp_points = 0
+        user_profile.level = 1
+        user_profile.playerclass = None
+        user_profile.playerrace = None
 
-    # Delete all old tiles using ORM deletes so cascades and relationships are honored
-    with model.db.session.begin_nested():
+        # Delete all old tiles using ORM deletes so cascades and relationships are honored,
+        # then their playthroughs, whose positions would otherwise still count as explored
         tiles = model.Tile.query.filter_by(user_id=player_id).all()
         for t in tiles:
             model.db.session.delete(t)
+        model.db.session.flush()
+        for playthrough in model.Playthrough.query.filter_by(user_id=player_id).all():
+            model.db.session.delete(playthrough)
         model.db.session.add(user_profile)
+        model.db.session.flush()
+        # The new game starts from what is left of the player's history
+        StatsService().rebuild_player_stats(player_id)
 
-    # transaction committed by context manager
+    # Player and tiles are versioned: a concurrent write re-runs the reset from a fresh read
+    try:
+        run_with_retry(reset)
+    except ConcurrentUpdateError:
+        abort(409, description="Your game changed while it was reset, please try again")
 
     flash("Your adventure begins anew!")
     return redirect(url_for("main.setup_char", player_id=player_id))
@@ -685,7 +719,7 @@ def upload_media():
         return redirect(request.referrer or url_for("main.greet_user"))
 
     # Verify tile type exists
-    tile_type = model.db.session.get(model.TileTypeOption, tile_type_id)
+    tile_type = get_reference_data().tile_types_by_id.get(tile_type_id)
     if not tile_type:
         if request.headers.get("X-Requested-With") == "XMLHttpRequest":
             return jsonify(error="Tile type not found"), 404
@@ -719,7 +753,7 @@ def list_media(tile_type_name):
     """
     List all media for a specific tile type.
     """
-    tile_type = model.TileTypeOption.query.filter_by(name=tile_type_name).first()
+    tile_type = get_reference_data().tile_types_by_name.get(tile_type_name)
     if not tile_type:
         if request.headers.get("X-Requested-With") == "XMLHttpRequest":
             return jsonify(error="Tile type not found"), 404
@@ -1,28 +1,100 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime, timezone
+import secrets
+from flask import current_app, has_app_context
 from sqlalchemy import event
 from sqlalchemy.engine import Engine
+from sqlalchemy.orm import object_session
+import hashlib
+import re
 import sqlite3
 
 db = SQLAlchemy()
 
+_PRAGMA_NAME = re.compile(r"^[a-z_]+$")
+_PRAGMA_VALUE = re.compile(r"^(-?\d+|[A-Za-z]+)$")
 
-# Ensure SQLite enforces foreign key constraints when used as the runtime database.
+
+def apply_sqlite_pragmas(dbapi_connection, pragmas):
+    """
+    Run ``PRAGMA name=value`` for each item of ``pragmas`` on a sqlite3 connection.
+
+    Items whose value is None or "" are skipped. Names and values are interpolated into
+    the statement, so they must be plain identifiers or integers.
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in pragmas.items():
+            if value is None or value == "":
+                continue
+            if not _PRAGMA_NAME.match(name) or not _PRAGMA_VALUE.match(str(value)):
+                raise ValueError(f"Invalid SQLite pragma {name}={value!r}")
+            cursor.execute(f"PRAGMA {name}={value}")
+            # journal_mode answers with the resulting mode; drain it so the statement completes
+            cursor.fetchall()
+    finally:
+        cursor.close()
+
+
+# Ensure SQLite enforces foreign key constraints when used as the runtime database, and
+# apply the app's SQLITE_PRAGMAS tuning profile (WAL, busy timeout, ...; see config.py).
+# Connections opened outside an app context (e.g. by Alembic) only get foreign keys.
 @event.listens_for(Engine, "connect")
 def _set_sqlite_pragma(dbapi_connection, connection_record):
     # Only apply for sqlite connections
     if isinstance(dbapi_connection, sqlite3.Connection):
-        cursor = dbapi_connection.cursor()
-        cursor.execute("PRAGMA foreign_keys=ON")
-        cursor.close()
+        pragmas = dict(current_app.config.get("SQLITE_PRAGMAS") or {}) if has_app_context() else {}
+        pragmas["foreign_keys"] = "ON"
+        apply_sqlite_pragmas(dbapi_connection, pragmas)
 
 
 # Provide a concrete Model reference to satisfy static analyzers
 Model = db.Model
 
 
+class BlobText:
+    """
+    Text kept in the MediaBlob store and referenced by a row's hash column
+
+    Reading returns the referenced blob's content (the blob relationship is eager-loaded
+    with the row). Assigning text points the hash column at the text's blob; the blob
+    itself is written by ``services.media_store`` when the row is flushed.
+    """
+
+    def __init__(self, hash_attr: str, blob_attr: str):
+        self.hash_attr = hash_attr
+        self.blob_attr = blob_attr
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        digest = getattr(obj, self.hash_attr)
+        if digest is None:
+            return None
+        text = self.assigned(obj)
+        if text is not None:
+            return text
+        blob = getattr(obj, self.blob_attr)
+        if blob is None or blob.sha256 != digest:
+            # The hash column was changed directly since the relationship was loaded
+            blob = (object_session(obj) or db.session).get(MediaBlob, digest)
+        return blob.content if blob is not None else None
+
+    def __set__(self, obj, value):
+        digest = MediaBlob.key_for(value) if value else None
+        obj.__dict__.setdefault("_blob_text", {})[self.name] = (digest, value)
+        setattr(obj, self.hash_attr, digest)
+
+    def assigned(self, obj):
+        """The text assigned to ``obj``, if it is what the hash column still references"""
+        digest, text = obj.__dict__.get("_blob_text", {}).get(self.name, (None, None))
+        return text if digest is not None and digest == getattr(obj, self.hash_attr) else None
+
+
 class User(Model, UserMixin):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(150), unique=True, nullable=False)
@@ -41,6 +113,10 @@ class User(Model, UserMixin):
     points = db.Column(db.Integer, default=0)
     last_points_accrual_at = db.Column(db.DateTime, nullable=True)
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+    # Optimistic concurrency: every ORM UPDATE checks and bumps this (see services/concurrency.py)
+    version_id = db.Column(db.Integer, nullable=False)
+
+    __mapper_args__ = {"version_id_col": version_id}
 
     # Relationships
     tiles = db.relationship("Tile", backref="user", lazy=True)
@@ -64,14 +140,32 @@ class User(Model, UserMixin):
         self.playerclass = playerclass
         self.playerrace = playerrace
 
+    # Hashing runs on the app's bounded hashing pool and raises HashingBusyError when it is
+    # saturated (see services/password_hasher.py)
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        from .services.password_hasher import get_password_hasher
+
+        self.password_hash = get_password_hasher().hash(password)
 
     def check_password(self, password):
+        from .services.password_hasher import get_password_hasher
+
         # If there is no stored password hash, return False instead of passing None
-        if not self.password_hash:
+        return get_password_hasher().verify(self.password_hash, password)
+
+    def rehash_password_if_needed(self, password):
+        """
+        After a successful check_password, re-hash with the current PASSWORD_HASH_METHOD if
+        the stored hash used other parameters. Returns True if the hash changed (caller commits).
+        """
+        from .services.password_hasher import get_password_hasher
+
+        hasher = get_password_hasher()
+        if not hasher.needs_rehash(self.password_hash):
             return False
-        return check_password_hash(self.password_hash, password)
+        self.password_hash = hasher.hash(password)
+        hasher.record_rehash()
+        return True
 
     @property
     def is_alive(self):
@@ -88,6 +182,14 @@ class User(Model, UserMixin):
 
 
 class Tile(Model):
+    __table_args__ = (
+        # get_latest_tile: WHERE user_id = ? AND playthrough_id = ? ORDER BY id DESC
+        db.Index("ix_tile_user_playthrough_id", "user_id", "playthrough_id", "id"),
+        # tile history: WHERE user_id = ? ORDER BY created_at DESC, id DESC (keyset pages)
+        db.Index("ix_tile_user_created", "user_id", "created_at", "id"),
+        # one row per generated position; also guards against revealing a position twice
+        db.Index("ix_tile_playthrough_index", "playthrough_id", "tile_index", unique=True),
+    )
     id = db.Column(db.Integer, primary_key=True)
     action_taken = db.Column(db.Boolean, default=False)
     type = db.Column(db.Integer, db.ForeignKey("tiletypeoption.id"), nullable=False)
@@ -102,6 +204,12 @@ class Tile(Model):
     monster_current_hp = db.Column(db.Integer, nullable=True)  # Monster's current HP (null for non-monster tiles)
     # Transient defense queued by a Defend action, consumed by the next counter-attack
     player_defense_pending = db.Column(db.Integer, nullable=True)
+    # Position in the playthrough's seeded tile sequence (null for tiles created directly)
+    tile_index = db.Column(db.Integer, nullable=True)
+    # Optimistic concurrency: every ORM UPDATE checks and bumps this (see services/concurrency.py)
+    version_id = db.Column(db.Integer, nullable=False)
+
+    __mapper_args__ = {"version_id_col": version_id}
 
     # Relationships - specify foreign_keys to resolve ambiguity
     tile_type = db.relationship("TileTypeOption", foreign_keys=[type], backref="tiles")
@@ -119,6 +227,7 @@ class Tile(Model):
         monster_max_hp=None,
         monster_current_hp=None,
         player_defense_pending=None,
+        tile_index=None,
     ):
         self.user_id = user_id
         self.type = type
@@ -129,6 +238,7 @@ class Tile(Model):
         self.monster_max_hp = monster_max_hp
         self.monster_current_hp = monster_current_hp
         self.player_defense_pending = player_defense_pending
+        self.tile_index = tile_index
 
     @property
     def is_monster_alive(self) -> bool:
@@ -144,6 +254,7 @@ class Tile(Model):
 
 
 class Action(Model):
+    __table_args__ = (db.Index("ix_action_tile_actionverb", "tile", "actionverb"),)
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
     tile = db.Column(db.Integer, db.ForeignKey("tile.id", use_alter=True, ondelete="CASCADE"))
@@ -168,7 +279,10 @@ class TileTypeOption(Model):
     __tablename__ = "tiletypeoption"
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
-    ascii_art = db.Column(db.Text, nullable=True)
+    # Legacy per-type art, stored once in MediaBlob (see services.media_store)
+    ascii_art_hash = db.Column(db.String(64), db.ForeignKey("mediablob.sha256"), nullable=True)
+    ascii_art_blob = db.relationship("MediaBlob", foreign_keys=[ascii_art_hash], lazy="joined")
+    ascii_art = BlobText("ascii_art_hash", "ascii_art_blob")
 
     def __init__(self, name=None, ascii_art=None):
         self.name = name
@@ -196,18 +310,33 @@ class PlayerRace(Model):
         return f"<PlayerRace {self.name}>"
 
 
+def new_playthrough_seed():
+    """A fresh playthrough seed (fits a signed 64-bit column)"""
+    return secrets.randbits(62)
+
+
 class Playthrough(Model):
     __tablename__ = "playthrough"
+    __table_args__ = (
+        # active playthrough: WHERE user_id = ? AND ended_at IS NULL ORDER BY started_at DESC
+        db.Index("ix_playthrough_user_ended_started", "user_id", "ended_at", "started_at"),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
     started_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     ended_at = db.Column(db.DateTime, nullable=True)
+    # Tiles are generated deterministically from (seed, tile index); see TileService.generate_tile
+    seed = db.Column(db.BigInteger, nullable=True, default=new_playthrough_seed)
+    tiles_revealed = db.Column(db.Integer, nullable=False, default=0, server_default="0")
 
     # relationship back to user and tiles
     user = db.relationship("User", backref="playthroughs")
 
-    def __init__(self, user_id=None):
+    def __init__(self, user_id=None, seed=None):
         self.user_id = user_id
+        if seed is not None:
+            self.seed = seed
+        self.tiles_revealed = 0
 
 
 class CombatAction(Model):
@@ -267,6 +396,12 @@ class Encounter(Model):
     """
 
     __tablename__ = "encounter"
+    __table_args__ = (
+        # encounter history / stats: WHERE user_id = ? ORDER BY created_at DESC, id DESC
+        db.Index("ix_encounter_user_created", "user_id", "created_at", "id"),
+        # tile.encounters relationship loads
+        db.Index("ix_encounter_tile_id", "tile_id"),
+    )
     id = db.Column(db.Integer, primary_key=True)
     tile_id = db.Column(db.Integer, db.ForeignKey("tile.id", ondelete="CASCADE"), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
@@ -313,6 +448,112 @@ class Encounter(Model):
         self.result_message = result_message
 
 
+class PlayerStats(Model):
+    """
+    Per-player statistics rollup.
+    Maintained incrementally in the same transaction that records each Encounter (and
+    reveals each tile), so statistics are a single-row read regardless of history length. The row
+    is created with the User (and backfilled by migration 0011 for earlier players).
+    Rebuild from history with ``python rebuild_player_stats.py``.
+    """
+
+    __tablename__ = "playerstats"
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id", ondelete="CASCADE"), primary_key=True)
+    total_encounters = db.Column(db.Integer, nullable=False, default=0)
+    successful_encounters = db.Column(db.Integer, nullable=False, default=0)
+    total_damage_dealt = db.Column(db.Integer, nullable=False, default=0)
+    total_damage_received = db.Column(db.Integer, nullable=False, default=0)
+    monsters_killed = db.Column(db.Integer, nullable=False, default=0)
+    tiles_explored = db.Column(db.Integer, nullable=False, default=0)
+    flee_attempts = db.Column(db.Integer, nullable=False, default=0)
+    flee_successes = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+    # Counter columns, in the order used by increments and rebuilds
+    COUNTERS = (
+        "total_encounters",
+        "successful_encounters",
+        "total_damage_dealt",
+        "total_damage_received",
+        "monsters_killed",
+        "tiles_explored",
+        "flee_attempts",
+        "flee_successes",
+    )
+
+    def __init__(self, user_id=None, **counters):
+        self.user_id = user_id
+        for name in self.COUNTERS:
+            setattr(self, name, counters.get(name, 0))
+
+
+@event.listens_for(User, "after_insert")
+def _create_player_stats(mapper, connection, target):
+    """Every new player starts with a zeroed rollup row, which StatsService only increments"""
+    connection.execute(
+        PlayerStats.__table__.insert().values(user_id=target.id, updated_at=datetime.now(timezone.utc))
+    )
+
+
+class MediaBlob(Model):
+    """
+    Content-addressed media store: one immutable row per distinct piece of content,
+    keyed by its sha256. TileMedia and TileTypeOption reference blobs by hash, so
+    identical art is stored once and served from a cacheable URL.
+    """
+
+    __tablename__ = "mediablob"
+    sha256 = db.Column(db.String(64), primary_key=True)
+    content = db.Column(db.Text, nullable=False)
+    size = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+    def __init__(self, sha256=None, content=None):
+        self.sha256 = sha256
+        self.content = content
+        self.size = len(content.encode("utf-8")) if content is not None else 0
+
+    @staticmethod
+    def key_for(content: str) -> str:
+        """Return the store key (hex sha256 of the UTF-8 text) for a piece of content"""
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+class IdempotencyKey(Model):
+    """
+    Responses to API requests sent with an ``Idempotency-Key`` header, replayed when the
+    client retries the same request. A row without ``status_code`` is a request still in
+    flight; its claim can be taken over once ``claimed_at`` is IDEMPOTENCY_LEASE_SECONDS
+    old. Rows expire after IDEMPOTENCY_KEY_TTL_HOURS (see services/idempotency.py).
+    """
+
+    __tablename__ = "idempotency_key"
+    __table_args__ = (
+        # expiry sweeps: WHERE created_at < ?
+        db.Index("ix_idempotency_key_created", "created_at"),
+    )
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id", ondelete="CASCADE"), primary_key=True)
+    key = db.Column(db.String(255), primary_key=True)
+    request_hash = db.Column(db.String(64), nullable=False)  # sha256 of method, path and body
+    status_code = db.Column(db.Integer, nullable=True)
+    response_body = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+    # Start of the current in-flight claim (the lease); also identifies the claim holder
+    claimed_at = db.Column(db.DateTime, nullable=False, default=lambda: datetime.now(timezone.utc))
+
+
+class ReferenceDataVersion(Model):
+    """
+    Single-row counter bumped in the same transaction as every ORM write to a reference
+    table. Each process's reference-data registry polls it to notice writes made by other
+    workers (see services/reference_data.py).
+    """
+
+    __tablename__ = "reference_data_version"
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
 class TileMedia(Model):
     """
     Media assets (images, ASCII art) associated with tiles or tile types.
@@ -320,11 +561,17 @@ class TileMedia(Model):
     """
 
     __tablename__ = "tilemedia"
+    __table_args__ = (
+        # default media lookup: WHERE tile_type_id = ? AND media_type = ? AND is_default
+        db.Index("ix_tilemedia_type_media_default", "tile_type_id", "media_type", "is_default"),
+        # tile-specific override lookup
+        db.Index("ix_tilemedia_tile_id", "tile_id"),
+    )
     id = db.Column(db.Integer, primary_key=True)
     tile_type_id = db.Column(db.Integer, db.ForeignKey("tiletypeoption.id"), nullable=True)
     tile_id = db.Column(db.Integer, db.ForeignKey("tile.id", ondelete="CASCADE"), nullable=True)
     media_type = db.Column(db.String(50), nullable=False)  # 'ascii_art', 'image', 'animation'
-    content = db.Column(db.Text, nullable=True)  # ASCII art content or file path for images
+    content_hash = db.Column(db.String(64), db.ForeignKey("mediablob.sha256"), nullable=True)  # MediaBlob key
     url = db.Column(db.String(500), nullable=True)  # External URL or local file path
     is_default = db.Column(db.Boolean, default=False)  # Is this the default media for the type?
     display_order = db.Column(db.Integer, default=0)  # Order for multiple media items
@@ -333,6 +580,9 @@ class TileMedia(Model):
     # Relationships
     tile_type = db.relationship("TileTypeOption", backref="media")
     tile = db.relationship("Tile", backref="media")
+    content_blob = db.relationship("MediaBlob", foreign_keys=[content_hash], lazy="joined")
+    # ASCII art content or file path for images, stored once in MediaBlob
+    content = BlobText("content_hash", "content_blob")
 
     def __init__(
         self,
@@ -355,6 +605,10 @@ class TileMedia(Model):
 
 def init_defaults():
     """pre-populate action options and combat actions tables"""
+    if db.session.get(ReferenceDataVersion, 1) is None:
+        db.session.add(ReferenceDataVersion(id=1, version=0))
+        db.session.commit()
+
     if ActionOption.query.first() is None:
         action_options = [
             {"name": "rest", "code": "rest"},
@@ -2,7 +2,9 @@ import random
 
 
 class NPCMonster:
-    def __init__(self):
+    def __init__(self, rng=None):
+        # Source of randomness for the monster's type; a seeded random.Random makes it reproducible
+        self.rng = rng or random
         self.name = self.choose_type()
         self.race = "none"
         self.strength = 1
@@ -47,4 +49,4 @@ class NPCMonster:
 
         animal_ascii["Dragon"] = "dragon"
 
-        return random.choice(list(animal_ascii.values()))
+        return self.rng.choice(list(animal_ascii.values()))
@@ -8,5 +8,7 @@ by both web routes and API endpoints.
 from .combat_service import CombatService
 from .tile_service import TileService
 from .media_service import MediaService
+from .stats_service import StatsService
+from .game_state_service import GameStateService
 
-__all__ = ['CombatService', 'TileService', 'MediaService']
+__all__ = ['CombatService', 'TileService', 'MediaService', 'StatsService', 'GameStateService']
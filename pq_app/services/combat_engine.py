@@ -0,0 +1,516 @@
+"""
+Combat Engine - Pure combat resolution
+
+Resolves combat actions, flee attempts and XP awards without Flask, the database or
+the ORM. Inputs are plain ``__slots__`` state structs (PlayerState, TileState), a frozen
+CombatConfig snapshot of the difficulty knobs and an injectable RNG (anything with
+``randint``; the ``random`` module by default). Inputs are never modified: every change
+is returned as a list of effects alongside the result.
+
+Effects carry their own ``apply(player, tile)``, written against the attribute names
+shared by the state structs and the ORM models, so the same list can be replayed onto
+copies (simulation, replay) or onto ``User``/``Tile`` rows (CombatService).
+"""
+
+import random
+from dataclasses import dataclass, fields
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+
+from .reference_data import CombatActionRef
+
+
+@dataclass(frozen=True)
+class CombatConfig:
+    """Snapshot of the config.py knobs the combat rules read"""
+    difficulty_multiplier: float = 1.0
+    monster_hp_min: int = 60
+    monster_hp_max: int = 120
+    counter_attack_chance: int = 70
+    counter_damage_min: int = 5
+    counter_damage_max: int = 15
+    healing_nerf_percent: int = 20
+    xp_base: int = 100
+    xp_growth: float = 1.5
+    hp_per_level: int = 10
+    xp_per_monster_hp: float = 1.0
+    # User.hitpoints / User.max_hp column defaults
+    player_hp: int = 100
+
+    @classmethod
+    def from_config(cls, cfg: Mapping[str, Any]) -> "CombatConfig":
+        """Build from a Flask config (or any mapping of upper-case config keys)"""
+        values = {}
+        for f in fields(cls):
+            key = f.name.upper()
+            if key in cfg:
+                values[f.name] = type(f.default)(cfg[key])
+        return cls(**values)
+
+    def xp_to_next(self, level: int) -> int:
+        """XP required to advance from the given level to the next one"""
+        return int(self.xp_base * (self.xp_growth ** max(0, level - 1)))
+
+
+class PlayerState:
+    """The combat-relevant columns of a User"""
+
+    __slots__ = ("hitpoints", "max_hp", "level", "exp_points")
+
+    def __init__(self, hitpoints: int, max_hp: int, level: int = 1, exp_points: int = 0):
+        self.hitpoints = hitpoints
+        self.max_hp = max_hp
+        self.level = level
+        self.exp_points = exp_points
+
+    @classmethod
+    def of(cls, user) -> "PlayerState":
+        """Copy from a User (or another PlayerState)"""
+        return cls(user.hitpoints, user.max_hp, user.level or 1, user.exp_points or 0)
+
+    def __eq__(self, other):
+        return isinstance(other, PlayerState) and all(getattr(self, s) == getattr(other, s) for s in self.__slots__)
+
+    def __repr__(self):
+        return f"PlayerState({', '.join(f'{s}={getattr(self, s)!r}' for s in self.__slots__)})"
+
+
+class TileState:
+    """The combat-relevant columns of a Tile"""
+
+    __slots__ = ("monster_current_hp", "monster_max_hp", "player_defense_pending")
+
+    def __init__(
+        self,
+        monster_current_hp: Optional[int] = None,
+        monster_max_hp: Optional[int] = None,
+        player_defense_pending: Optional[int] = None,
+    ):
+        self.monster_current_hp = monster_current_hp
+        self.monster_max_hp = monster_max_hp
+        self.player_defense_pending = player_defense_pending
+
+    @classmethod
+    def of(cls, tile) -> "TileState":
+        """Copy from a Tile (or another TileState)"""
+        return cls(tile.monster_current_hp, tile.monster_max_hp, tile.player_defense_pending)
+
+    def __eq__(self, other):
+        return isinstance(other, TileState) and all(getattr(self, s) == getattr(other, s) for s in self.__slots__)
+
+    def __repr__(self):
+        return f"TileState({', '.join(f'{s}={getattr(self, s)!r}' for s in self.__slots__)})"
+
+
+# Effects. Each one applies to a PlayerState/User and a TileState/Tile alike.
+
+
+@dataclass(frozen=True)
+class MonsterSpawned:
+    """A monster tile without persistent HP got its HP rolled"""
+    hp: int
+
+    def apply(self, player, tile) -> None:
+        tile.monster_max_hp = self.hp
+        tile.monster_current_hp = self.hp
+
+
+@dataclass(frozen=True)
+class MonsterDamaged:
+    """The monster took ``amount`` damage and has ``remaining`` HP left"""
+    amount: int
+    remaining: int
+
+    def apply(self, player, tile) -> None:
+        tile.monster_current_hp = self.remaining
+
+
+@dataclass(frozen=True)
+class PlayerDamaged:
+    amount: int
+
+    def apply(self, player, tile) -> None:
+        player.hitpoints = max(0, player.hitpoints - self.amount)
+
+
+@dataclass(frozen=True)
+class PlayerHealed:
+    amount: int
+
+    def apply(self, player, tile) -> None:
+        player.hitpoints = min(player.max_hp, player.hitpoints + self.amount)
+
+
+@dataclass(frozen=True)
+class DefenseChanged:
+    """Pending defense against the next hit (None = none)"""
+    defense: Optional[int]
+
+    def apply(self, player, tile) -> None:
+        tile.player_defense_pending = self.defense
+
+
+@dataclass(frozen=True)
+class ExperienceGained:
+    amount: int
+
+    def apply(self, player, tile) -> None:
+        player.exp_points = (player.exp_points or 0) + self.amount
+
+
+@dataclass(frozen=True)
+class LeveledUp:
+    """One level gained: its XP cost is spent and max HP grows"""
+    xp_cost: int
+    max_hp_gained: int
+
+    def apply(self, player, tile) -> None:
+        player.exp_points -= self.xp_cost
+        player.level += 1
+        player.max_hp += self.max_hp_gained
+
+
+class Resolution:
+    """Outcome of one resolved action: what happened, the effects, and the resulting states"""
+
+    __slots__ = (
+        "action",
+        "success",
+        "message",
+        "damage_dealt",
+        "damage_received",
+        "hp_change",
+        "monster_defeated",
+        "fled",
+        "xp",
+        "player_hp_before",
+        "monster_hp_before",
+        "effects",
+        "player",
+        "tile",
+    )
+
+    def __init__(self, player: PlayerState, tile: TileState, action: Optional[CombatActionRef] = None):
+        self.action = action
+        self.success = False
+        self.message = ""
+        self.damage_dealt = 0
+        self.damage_received = 0
+        self.hp_change = 0
+        self.monster_defeated = False
+        self.fled = False
+        self.xp: Optional[Dict[str, Any]] = None
+        self.player_hp_before = player.hitpoints
+        self.monster_hp_before = tile.monster_current_hp
+        self.effects: List[Any] = []
+        self.player = player
+        self.tile = tile
+
+    def emit(self, effect) -> None:
+        """Record an effect and apply it to this resolution's working states"""
+        self.effects.append(effect)
+        effect.apply(self.player, self.tile)
+
+    @property
+    def player_hp_after(self) -> int:
+        return self.player.hitpoints
+
+    @property
+    def monster_hp_after(self) -> Optional[int]:
+        return self.tile.monster_current_hp
+
+    @property
+    def player_alive(self) -> bool:
+        return self.player.hitpoints > 0
+
+    @property
+    def tile_completed(self) -> bool:
+        """The encounter is over: the monster is defeated or the player fled"""
+        return self.monster_defeated or self.fled
+
+
+def award_xp(player: PlayerState, amount: int, config: CombatConfig) -> Resolution:
+    """
+    Award XP, applying any resulting level-ups
+
+    exp_points tracks progress toward the next level (it resets on each level up).
+    Each level grants ``hp_per_level`` max HP and heals the player by that amount.
+
+    Returns:
+        Resolution whose ``xp`` is the award summary (see PlayerService.award_xp)
+    """
+    resolution = Resolution(PlayerState.of(player), TileState())
+    _award_xp(resolution, amount, config)
+    return resolution
+
+
+def _award_xp(resolution: Resolution, amount: int, config: CombatConfig) -> None:
+    player = resolution.player
+    amount = max(0, int(amount))
+    resolution.emit(ExperienceGained(amount))
+    levels_gained = 0
+    hp_gained = 0
+    # Loop so a single large award can grant multiple levels.
+    while player.exp_points >= config.xp_to_next(player.level):
+        resolution.emit(LeveledUp(config.xp_to_next(player.level), config.hp_per_level))
+        hp_gained += config.hp_per_level
+        levels_gained += 1
+
+    if hp_gained:
+        resolution.emit(PlayerHealed(hp_gained))
+
+    resolution.xp = {
+        "xp_awarded": amount,
+        "leveled_up": levels_gained > 0,
+        "levels_gained": levels_gained,
+        "new_level": player.level,
+        "hp_gained": hp_gained,
+        "xp_to_next": config.xp_to_next(player.level),
+    }
+
+
+def resolve_combat_action(
+    player: PlayerState,
+    tile: TileState,
+    action: CombatActionRef,
+    config: CombatConfig,
+    rng=random,
+) -> Resolution:
+    """
+    Resolve a CombatAction against a monster tile
+
+    - Roll success based on success_rate (a failed action does nothing)
+    - Deal damage (random between min/max); a surviving monster may counter-attack,
+      reduced by any pending defense
+    - Apply healing (reduced by the healing nerf) and queue defense
+    - Award XP when the monster is defeated
+
+    Args:
+        player: The player's state (not modified)
+        tile: The tile's state (not modified)
+        action: CombatAction to resolve
+        config: Difficulty knobs
+        rng: Source of randomness
+
+    Returns:
+        Resolution
+    """
+    # Flee is resolved separately: success ends the encounter, failure gives the monster
+    # a free counter-attack.
+    if action.code == "flee":
+        return resolve_flee(player, tile, action, config, rng)
+
+    resolution = Resolution(PlayerState.of(player), TileState.of(tile), action)
+    player, tile = resolution.player, resolution.tile
+
+    # Defensive: a monster tile must always carry persistent HP so damage sticks and the
+    # monster can actually be defeated. If it is missing (legacy/edge-case tiles),
+    # initialize it from the configured range before resolving the action.
+    if tile.monster_current_hp is None:
+        resolution.emit(MonsterSpawned(rng.randint(config.monster_hp_min, config.monster_hp_max)))
+    resolution.monster_hp_before = tile.monster_current_hp
+
+    roll = rng.randint(1, 100)
+    resolution.success = roll <= action.success_rate
+    if not resolution.success:
+        resolution.message = f"{action.name} failed! (Rolled {roll}, needed {action.success_rate} or less)"
+        return resolution
+
+    parts = []
+
+    if action.damage_max > 0:
+        damage = rng.randint(action.damage_min, action.damage_max)
+        resolution.damage_dealt = damage
+        parts.append(f"dealt {damage} damage")
+        resolution.emit(MonsterDamaged(damage, max(0, tile.monster_current_hp - damage)))
+
+        if tile.monster_current_hp <= 0:
+            resolution.monster_defeated = True
+            parts.append("Monster defeated!")
+        else:
+            parts.append(f"Monster HP: {tile.monster_current_hp}/{tile.monster_max_hp}")
+
+        # Monster counter-attack (only if monster is alive)
+        if tile.monster_current_hp > 0 and rng.randint(1, 100) <= config.counter_attack_chance:
+            received = rng.randint(config.counter_damage_min, config.counter_damage_max)
+            # Consume any pending defense from a previous Defend action.
+            defense = tile.player_defense_pending or 0
+            if defense:
+                blocked = min(received, defense)
+                received -= blocked
+                resolution.emit(DefenseChanged(None))
+                if blocked:
+                    parts.append(f"blocked {blocked} with defense")
+            if received > 0:
+                resolution.emit(PlayerDamaged(received))
+                resolution.damage_received = received
+                resolution.hp_change -= received
+                parts.append(f"received {received} damage")
+
+    if action.heal_amount > 0:
+        healed = min(action.heal_amount, player.max_hp - player.hitpoints)
+        heal_applied = max(0, int(healed * (100 - config.healing_nerf_percent) / 100))
+        resolution.emit(PlayerHealed(heal_applied))
+        resolution.hp_change += heal_applied
+        parts.append(f"healed {heal_applied} HP")
+
+    # Queue defense to reduce the next incoming counter-attack.
+    if action.defense_boost > 0:
+        resolution.emit(DefenseChanged((tile.player_defense_pending or 0) + action.defense_boost))
+        parts.append(f"gained +{action.defense_boost} defense (reduces next hit)")
+
+    if resolution.monster_defeated:
+        _award_xp(resolution, int((tile.monster_max_hp or 0) * config.xp_per_monster_hp), config)
+        parts.append(f"+{resolution.xp['xp_awarded']} XP")
+        if resolution.xp["leveled_up"]:
+            parts.append(f"Leveled up to {resolution.xp['new_level']} (+{resolution.xp['hp_gained']} max HP)")
+
+    resolution.message = f"{action.name}: " + ", ".join(parts) + "!"
+    return resolution
+
+
+def resolve_flee(
+    player: PlayerState, tile: TileState, action: CombatActionRef, config: CombatConfig, rng=random
+) -> Resolution:
+    """
+    Resolve a flee attempt. On success the player escapes and the encounter ends
+    (no reward). On failure the monster lands a free counter-attack (reduced by any
+    pending defense) and the encounter continues.
+    """
+    resolution = Resolution(PlayerState.of(player), TileState.of(tile), action)
+    roll = rng.randint(1, 100)
+    resolution.success = resolution.fled = roll <= (action.success_rate or 0)
+
+    if resolution.success:
+        resolution.message = "You successfully fled from the encounter!"
+        return resolution
+
+    received = rng.randint(config.counter_damage_min, config.counter_damage_max)
+    # Consume any pending defense.
+    defense = resolution.tile.player_defense_pending or 0
+    if defense:
+        received = max(0, received - defense)
+        resolution.emit(DefenseChanged(None))
+    resolution.emit(PlayerDamaged(received))
+    resolution.damage_received = received
+    resolution.hp_change = -received
+    resolution.message = f"You failed to flee! The monster hits you for {received} damage."
+    return resolution
+
+
+# Auto-battle policies (the scalar counterparts of combat_simulator.POLICIES)
+BATTLE_POLICIES = ("light", "heavy", "strongest", "heal_below", "flee_below")
+
+
+def strongest_attack(actions: Sequence[CombatActionRef]) -> Optional[CombatActionRef]:
+    """The attack with the highest expected damage per turn, or None"""
+    attacks = [a for a in actions if a.damage_max > 0 and a.code != "flee"]
+    return max(attacks, key=lambda a: a.success_rate * (a.damage_min + a.damage_max), default=None)
+
+
+def best_heal(actions: Sequence[CombatActionRef]) -> Optional[CombatActionRef]:
+    """The heal with the highest expected healing per turn, or None"""
+    heals = [a for a in actions if a.heal_amount > 0 and a.success_rate > 0]
+    return max(heals, key=lambda a: a.success_rate * a.heal_amount, default=None)
+
+
+def choose_action(
+    policy: str, actions: Sequence[CombatActionRef], player: PlayerState, threshold: int = 40
+) -> Optional[CombatActionRef]:
+    """
+    Pick the next action for an auto-battle policy
+
+    - light / heavy: always that attack (the strongest attack if unavailable)
+    - strongest: the attack with the highest expected damage
+    - heal_below / flee_below: the strongest attack, but heal / flee while HP is
+      under ``threshold`` percent of max HP
+
+    Returns:
+        The chosen action, or None if there is nothing to attack with
+
+    Raises:
+        ValueError: Unknown policy
+    """
+    if policy not in BATTLE_POLICIES:
+        raise ValueError(f"Unknown policy: {policy}")
+    attack = strongest_attack(actions)
+    by_code = {a.code: a for a in actions}
+    if policy in ("light", "heavy"):
+        return by_code.get(f"attack_{policy}", attack)
+    if policy != "strongest" and player.hitpoints * 100 < player.max_hp * threshold:
+        fallback = best_heal(actions) if policy == "heal_below" else by_code.get("flee")
+        return fallback or attack
+    return attack
+
+
+def resolve_battle(
+    player: PlayerState,
+    tile: TileState,
+    actions: Sequence[CombatActionRef],
+    policy: str,
+    config: CombatConfig,
+    rng=random,
+    threshold: int = 40,
+    max_turns: int = 50,
+) -> List[Resolution]:
+    """
+    Resolve a fight turn by turn with a policy until the monster is defeated, the player
+    dies or flees, or ``max_turns`` is reached
+
+    Args:
+        player: The player's state (not modified)
+        tile: The monster tile's state (not modified)
+        actions: Combat actions available to the player
+        policy: One of BATTLE_POLICIES
+        config: Difficulty knobs
+        rng: Source of randomness
+        threshold: HP percent for heal_below / flee_below
+        max_turns: Turn cap
+
+    Returns:
+        One Resolution per turn, in order; each starts from the previous one's states
+
+    Raises:
+        ValueError: Unknown policy
+    """
+    turns = []
+    for _ in range(max_turns):
+        action = choose_action(policy, actions, player, threshold)
+        if action is None:
+            break
+        resolution = resolve_combat_action(player, tile, action, config, rng)
+        turns.append(resolution)
+        player, tile = resolution.player, resolution.tile
+        if resolution.tile_completed or not resolution.player_alive:
+            break
+    return turns
+
+
+def resolve_sequence(
+    player: PlayerState,
+    tile: TileState,
+    actions: Sequence[CombatActionRef],
+    config: CombatConfig,
+    rng=random,
+) -> List[Resolution]:
+    """
+    Resolve a queued sequence of actions in order, stopping early once the monster is
+    defeated, the player flees or the player dies
+
+    Args:
+        player: The player's state (not modified)
+        tile: The monster tile's state (not modified)
+        actions: Combat actions to take, in order
+        config: Difficulty knobs
+        rng: Source of randomness
+
+    Returns:
+        One Resolution per action taken (a prefix of ``actions``), in order
+    """
+    turns = []
+    for action in actions:
+        resolution = resolve_combat_action(player, tile, action, config, rng)
+        turns.append(resolution)
+        player, tile = resolution.player, resolution.tile
+        if resolution.tile_completed or not resolution.player_alive:
+            break
+    return turns
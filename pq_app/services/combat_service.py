@@ -6,16 +6,32 @@ for both web UI and future API endpoints.
 """
 
 import random
-from typing import Optional, Dict, Any, Tuple, List
+from typing import Optional, Dict, Any, Tuple, List, Sequence
 from datetime import datetime, timezone
 from flask import flash
-from sqlalchemy import select, or_
+from sqlalchemy import select
 
 from .. import model
-from .player_service import PlayerService
+from . import combat_engine, metrics
+from .combat_engine import CombatConfig, PlayerState, Resolution, TileState
+from .encounter_log import get_encounter_log
+from .stats_service import StatsService
+from .tile_service import TileService
+from .reference_data import get_reference_data, ActionOptionRef, CombatActionRef, CombatActionSet
 from flask import current_app
 
 
+def combat_config() -> CombatConfig:
+    """Snapshot the combat knobs of the current app's config"""
+    return CombatConfig.from_config(current_app.config if current_app else {})
+
+
+def _killed_player(encounter) -> bool:
+    """Whether an encounter (record or resolution) took the player from alive to 0 HP"""
+    before, after = encounter.player_hp_before, encounter.player_hp_after
+    return before is not None and after is not None and before > 0 >= after
+
+
 class CombatResult:
     """Represents the result of a combat action"""
 
@@ -50,6 +66,46 @@ class CombatResult:
         }
 
 
+class AutoBattleResult:
+    """Represents the result of several combat turns resolved in one request (auto battle or batch)"""
+
+    def __init__(self, outcome: str, turns: List[Resolution], player: model.User, tile: model.Tile):
+        self.outcome = outcome
+        self.turns = turns
+        self.player = player
+        self.tile = tile
+
+    @property
+    def tile_completed(self) -> bool:
+        return self.outcome in ("won", "fled")
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert to dictionary for JSON responses, with a condensed per-turn log"""
+        xp_gained = sum(t.xp["xp_awarded"] for t in self.turns if t.xp)
+        return {
+            "outcome": self.outcome,
+            "turns": len(self.turns),
+            "player_hp": self.player.hitpoints,
+            "player_alive": self.player.is_alive,
+            "monster_hp": self.tile.monster_current_hp,
+            "tile_completed": self.tile_completed,
+            "xp_gained": xp_gained,
+            "level": self.player.level,
+            "log": [
+                {
+                    "action": t.action.code,
+                    "success": t.success,
+                    "damage_dealt": t.damage_dealt,
+                    "damage_received": t.damage_received,
+                    "player_hp": t.player_hp_after,
+                    "monster_hp": t.monster_hp_after,
+                    "message": t.message,
+                }
+                for t in self.turns
+            ],
+        }
+
+
 class CombatService:
     """Service for handling combat and tile action logic"""
 
@@ -57,7 +113,7 @@ class CombatService:
         """Initialize combat service with optional db session"""
         self.db = db_session or model.db.session
 
-    def get_action_by_value(self, action_value: str) -> Optional[model.ActionOption]:
+    def get_action_by_value(self, action_value: str) -> Optional[ActionOptionRef]:
         """
         Resolve ActionOption by code, id, or name
 
@@ -65,32 +121,47 @@ class CombatService:
             action_value: The action value from form/API (code, id, or name)
 
         Returns:
-            ActionOption instance or None if not found
+            ActionOption reference or None if not found
         """
+        reference = get_reference_data()
+
         # Try lookup by code first
-        action_option = model.ActionOption.query.filter_by(code=action_value).one_or_none()
+        action_option = reference.action_options_by_code.get(action_value)
 
         # Fallback to numeric id
         if not action_option and action_value and action_value.isdigit():
-            action_option = self.db.get(model.ActionOption, int(action_value))
+            action_option = reference.action_options_by_id.get(int(action_value))
 
         # Last resort: lookup by name
         if not action_option:
-            action_option = model.ActionOption.query.filter_by(name=action_value).one_or_none()
+            action_option = reference.action_options_by_name.get(action_value)
 
         return action_option
 
-    def get_tile_with_lock(self, tile_id: int) -> Optional[model.Tile]:
+    def get_tile_for_action(self, tile_id: Optional[int], user_id: Optional[int] = None) -> Optional[model.Tile]:
         """
-        Get tile with row-level lock for transaction safety
+        Load a tile fresh from the database for an action
+
+        No row lock is taken: Tile is versioned (``version_id_col``), so a concurrent
+        update makes this transaction's flush fail with StaleDataError, and callers run
+        the action through concurrency.run_with_retry.
 
         Args:
-            tile_id: ID of the tile
+            tile_id: ID of the tile, or None for the player's current tile. A current
+                tile that is only generated from the seed is stored first, since the
+                action writes to it.
+            user_id: The player's user ID (required when ``tile_id`` is None)
 
         Returns:
             Tile instance or None
         """
-        stmt = select(model.Tile).where(model.Tile.id == tile_id).with_for_update()
+        if tile_id is None:
+            tile_service = TileService(self.db)
+            playthrough = tile_service.get_active_playthrough(user_id) if user_id is not None else None
+            tile = tile_service.get_current_tile(user_id, playthrough) if playthrough else None
+            return tile_service.store_tile(tile) if tile is not None else None
+
+        stmt = select(model.Tile).where(model.Tile.id == tile_id).execution_options(populate_existing=True)
         return self.db.execute(stmt).scalar_one_or_none()
 
     def validate_tile_action(self, tile: model.Tile) -> Tuple[bool, Optional[str]]:
@@ -113,7 +184,7 @@ class CombatService:
 
     def get_available_actions(
         self, player: model.User, tile_type_name: Optional[str] = None, include_basic: bool = True
-    ) -> List[model.CombatAction]:
+    ) -> List[CombatActionRef]:
         """
         Get combat actions available to player based on class, race, and context.
 
@@ -128,36 +199,21 @@ class CombatService:
             include_basic: Include actions with no class/race requirements
 
         Returns:
-            List of CombatAction records sorted by name
+            List of CombatAction references sorted by name
         """
-        query = model.CombatAction.query
-
-        # Filter by class: include if no requirement OR matches player's class
-        class_filter = or_(
-            model.CombatAction.requires_class.is_(None), model.CombatAction.requires_class == player.playerclass
-        )
-
-        # Filter by race: include if no requirement OR matches player's race
-        race_filter = or_(
-            model.CombatAction.requires_race.is_(None), model.CombatAction.requires_race == player.playerrace
-        )
+        return list(self.get_available_action_set(player, tile_type_name).actions)
 
-        query = query.filter(class_filter, race_filter)
-
-        # Context-based filtering
-        if tile_type_name == "monster":
-            # On monster tiles, show attack and defense actions
-            # Exclude pure healing actions that don't make sense in combat
-            pass  # All actions are valid in combat for now
-        elif tile_type_name and tile_type_name != "monster":
-            # On non-monster tiles, maybe only show flee, heal, inspect-like actions
-            # For now, allow all actions
-            pass
+    def get_available_action_set(self, player: model.User, tile_type_name: Optional[str] = None) -> CombatActionSet:
+        """
+        Get the precomputed, pre-serialized set of combat actions for a player.
 
-        return query.order_by(model.CombatAction.name).all()
+        The (class, race, tile context) matrix is built together with the reference-data
+        snapshot, so this is a dict lookup; it is rebuilt whenever CombatAction rows change.
+        """
+        return get_reference_data().combat_actions_for(player.playerclass, player.playerrace, tile_type_name)
 
     def execute_combat_action(
-        self, player: model.User, tile: model.Tile, combat_action: model.CombatAction, monster_hp: int = None
+        self, player: model.User, tile: model.Tile, combat_action: CombatActionRef, monster_hp: int = None
     ) -> CombatResult:
         """
         Execute a CombatAction with full mechanics:
@@ -167,6 +223,9 @@ class CombatService:
         - Update persistent monster HP on tile
         - Track encounter in Encounter table
 
+        The rules live in combat_engine; this applies the resolved effects to the
+        player and tile, flashes the message and records the encounter.
+
         Args:
             player: User/player instance
             tile: Tile instance
@@ -176,194 +235,212 @@ class CombatService:
         Returns:
             CombatResult with action outcome
         """
-        # Flee is resolved separately: success ends the encounter, failure gives the monster
-        # a free counter-attack.
-        if combat_action.code == "flee":
-            return self._execute_flee(player, tile, combat_action)
-
-        # Defensive: a monster tile must always carry persistent HP so damage sticks and the
-        # monster can actually be defeated. If it is missing (legacy/edge-case tiles),
-        # initialize it from the configured range before resolving the action.
-        if tile.monster_current_hp is None:
-            cfg = current_app.config if current_app else {}
-            hp_min = int(cfg.get("MONSTER_HP_MIN", 60))
-            hp_max = int(cfg.get("MONSTER_HP_MAX", 120))
-            init_hp = random.randint(hp_min, hp_max)
-            tile.monster_max_hp = init_hp
-            tile.monster_current_hp = init_hp
-
-        # Use tile's persistent monster HP if available, otherwise default
-        if monster_hp is None:
-            monster_hp = tile.monster_current_hp if tile.monster_current_hp is not None else 50
-
-        # Store player HP before action
-        hp_before = player.hitpoints
-
-        # Roll for success
-        roll = random.randint(1, 100)
-        success = roll <= combat_action.success_rate
-
-        damage_dealt = 0
-        damage_received = 0
-        hp_change = 0
-        message = ""
-        monster_defeated = False
-
-        if not success:
-            # Action failed
-            message = f"{combat_action.name} failed! (Rolled {roll}, needed {combat_action.success_rate} or less)"
-            flash(message)
-        else:
-            # Action succeeded
-            parts = []
-
-            # Calculate damage dealt (if attack action)
-            if combat_action.damage_max > 0:
-                damage_dealt = random.randint(combat_action.damage_min, combat_action.damage_max)
-                parts.append(f"dealt {damage_dealt} damage")
-
-                # Update monster HP on tile
-                new_monster_hp = max(0, monster_hp - damage_dealt)
-                if tile.monster_current_hp is not None:
-                    tile.monster_current_hp = new_monster_hp
-
-                    # Check if monster is defeated
-                    if new_monster_hp <= 0:
-                        monster_defeated = True
-                        parts.append("Monster defeated!")
-                    else:
-                        parts.append(f"Monster HP: {new_monster_hp}/{tile.monster_max_hp}")
-
-                # Monster counter-attack (only if monster is alive)
-                cfg = current_app.config if current_app else {}
-                chance = int(cfg.get("COUNTER_ATTACK_CHANCE", 70))
-                dmg_min = int(cfg.get("COUNTER_DAMAGE_MIN", 5))
-                dmg_max = int(cfg.get("COUNTER_DAMAGE_MAX", 15))
-                if new_monster_hp > 0 and random.randint(1, 100) <= chance:
-                    damage_received = random.randint(dmg_min, dmg_max)
-                    # Consume any pending defense from a previous Defend action.
-                    defense = tile.player_defense_pending or 0
-                    if defense:
-                        blocked = min(damage_received, defense)
-                        damage_received -= blocked
-                        tile.player_defense_pending = None
-                        if blocked:
-                            parts.append(f"blocked {blocked} with defense")
-                    if damage_received > 0:
-                        player.take_damage(damage_received)
-                        hp_change -= damage_received
-                        parts.append(f"received {damage_received} damage")
-
-            # Apply healing
-            if combat_action.heal_amount > 0:
-                healed = min(combat_action.heal_amount, player.max_hp - player.hitpoints)
-                nerf = int(cfg.get("HEALING_NERF_PERCENT", 20))
-                heal_applied = max(0, int(healed * (100 - nerf) / 100))
-                player.heal(heal_applied)
-                hp_change += heal_applied
-                parts.append(f"healed {heal_applied} HP")
-
-            # Queue defense to reduce the next incoming counter-attack.
-            if combat_action.defense_boost > 0:
-                tile.player_defense_pending = (tile.player_defense_pending or 0) + combat_action.defense_boost
-                parts.append(f"gained +{combat_action.defense_boost} defense (reduces next hit)")
-
-            # Award XP (and apply level-ups) when the monster is defeated.
-            if monster_defeated:
-                xp = int((tile.monster_max_hp or 0) * float(cfg.get("XP_PER_MONSTER_HP", 1.0)))
-                xp_result = PlayerService(self.db).award_xp(player, xp)
-                parts.append(f"+{xp_result['xp_awarded']} XP")
-                if xp_result["leveled_up"]:
-                    parts.append(
-                        f"Leveled up to {xp_result['new_level']} (+{xp_result['hp_gained']} max HP)"
-                    )
-
-            message = f"{combat_action.name}: " + ", ".join(parts) + "!"
-            flash(message)
-
-        # Calculate final monster HP after action
-        final_monster_hp = (
-            tile.monster_current_hp if tile.monster_current_hp is not None else max(0, monster_hp - damage_dealt)
+        tile_state = TileState.of(tile)
+        if monster_hp is not None:
+            tile_state.monster_current_hp = monster_hp
+        resolution = combat_engine.resolve_combat_action(
+            PlayerState.of(player), tile_state, combat_action, combat_config(), rng=random
         )
+        return self.apply_resolution(player, tile, combat_action, resolution)
+
+    def apply_resolution(
+        self, player: model.User, tile: model.Tile, combat_action: CombatActionRef, resolution: Resolution
+    ) -> CombatResult:
+        """
+        Apply a resolved combat action to the player and tile and record its encounter
+
+        Args:
+            player: User/player instance the action was resolved for
+            tile: Tile instance the action was resolved for
+            combat_action: The resolved CombatAction
+            resolution: Result of combat_engine.resolve_combat_action
+
+        Returns:
+            CombatResult with action outcome
+        """
+        for effect in resolution.effects:
+            effect.apply(player, tile)
+        flash(resolution.message)
+        self._count_combat_action(combat_action, resolution)
 
-        # Create Encounter record
-        encounter = model.Encounter(
+        self._record_encounter(
             tile_id=tile.id,
             user_id=player.id,
             combat_action_id=combat_action.id,
-            player_hp_before=hp_before,
+            player_hp_before=resolution.player_hp_before,
             player_hp_after=player.hitpoints,
-            monster_hp_before=monster_hp,
-            monster_hp_after=final_monster_hp,
-            damage_dealt=damage_dealt,
-            damage_received=damage_received,
-            was_successful=success,
-            result_message=message,
+            monster_hp_before=resolution.monster_hp_before,
+            monster_hp_after=resolution.monster_hp_after,
+            damage_dealt=resolution.damage_dealt,
+            damage_received=resolution.damage_received,
+            was_successful=resolution.success,
+            result_message=resolution.message,
+            monster_killed=resolution.monster_defeated,
+            flee_attempt=combat_action.code == "flee",
         )
-        self.db.add(encounter)
 
         return CombatResult(
-            success=success,
-            message=message,
-            player_hp_change=hp_change,
+            success=resolution.success,
+            message=resolution.message,
+            player_hp_change=resolution.hp_change,
             player_alive=player.is_alive,
-            tile_completed=monster_defeated,  # Only complete tile when monster is defeated
+            # Only complete the tile when the monster is defeated or the player escapes
+            tile_completed=resolution.tile_completed,
         )
 
-    def _execute_flee(
-        self, player: model.User, tile: model.Tile, combat_action: model.CombatAction
-    ) -> CombatResult:
-        """
-        Resolve a flee attempt. On success the player escapes and the encounter ends
-        (no reward). On failure the monster lands a free counter-attack (reduced by any
-        pending defense) and the encounter continues.
+    def auto_battle(
+        self,
+        player: model.User,
+        tile: model.Tile,
+        policy: str = "heal_below",
+        threshold: int = 40,
+        max_turns: int = 50,
+    ) -> AutoBattleResult:
         """
-        hp_before = player.hitpoints
-        roll = random.randint(1, 100)
-        success = roll <= (combat_action.success_rate or 0)
-        damage_received = 0
+        Fight a monster tile to completion with a policy, in one transaction
 
-        if success:
-            message = "You successfully fled from the encounter!"
-        else:
-            cfg = current_app.config if current_app else {}
-            dmg_min = int(cfg.get("COUNTER_DAMAGE_MIN", 5))
-            dmg_max = int(cfg.get("COUNTER_DAMAGE_MAX", 15))
-            damage_received = random.randint(dmg_min, dmg_max)
-            # Consume any pending defense.
-            defense = tile.player_defense_pending or 0
-            if defense:
-                damage_received = max(0, damage_received - defense)
-                tile.player_defense_pending = None
-            player.take_damage(damage_received)
-            message = f"You failed to flee! The monster hits you for {damage_received} damage."
-        flash(message)
+        Turns are resolved by combat_engine.resolve_battle until the monster is defeated,
+        the player dies or flees, or ``max_turns`` is reached. The effects are applied to
+        the player and tile, and every turn's Encounter is written with a single bulk
+        INSERT and one statistics rollup update.
 
-        encounter = model.Encounter(
-            tile_id=tile.id,
-            user_id=player.id,
-            combat_action_id=combat_action.id,
-            player_hp_before=hp_before,
-            player_hp_after=player.hitpoints,
-            monster_hp_before=tile.monster_current_hp,
-            monster_hp_after=tile.monster_current_hp,
-            damage_dealt=0,
-            damage_received=damage_received,
-            was_successful=success,
-            result_message=message,
+        Args:
+            player: User/player instance
+            tile: Monster tile instance
+            policy: One of combat_engine.BATTLE_POLICIES
+            threshold: HP percent for heal_below / flee_below
+            max_turns: Turn cap
+
+        Returns:
+            AutoBattleResult with the outcome and every turn's resolution
+
+        Raises:
+            ValueError: Unknown policy
+        """
+        actions = self.get_available_action_set(player, "monster").actions
+        turns = combat_engine.resolve_battle(
+            PlayerState.of(player),
+            TileState.of(tile),
+            actions,
+            policy,
+            combat_config(),
+            rng=random,
+            threshold=threshold,
+            max_turns=max_turns,
         )
-        self.db.add(encounter)
 
-        return CombatResult(
-            success=success,
-            message=message,
-            player_hp_change=-damage_received,
-            player_alive=player.is_alive,
-            tile_completed=success,  # Fleeing successfully ends (clears) the tile
+        return self._apply_turns(player, tile, turns, unfinished="turn_limit")
+
+    def execute_combat_sequence(
+        self, player: model.User, tile: model.Tile, combat_actions: Sequence[CombatActionRef]
+    ) -> AutoBattleResult:
+        """
+        Execute a queued sequence of combat actions on a monster tile in one go
+
+        Actions are resolved in order by combat_engine.resolve_sequence, stopping early
+        once the monster is defeated, the player flees or the player dies. Persistence
+        matches auto_battle: one bulk Encounter INSERT and one statistics rollup update.
+        The caller should load the tile with get_tile_for_action and commit through
+        concurrency.run_with_retry.
+
+        Args:
+            player: User/player instance
+            tile: Monster tile instance
+            combat_actions: Combat actions to take, in order
+
+        Returns:
+            AutoBattleResult with the outcome ("in_progress" if the fight goes on) and
+            the resolution of every action actually taken
+        """
+        turns = combat_engine.resolve_sequence(
+            PlayerState.of(player), TileState.of(tile), combat_actions, combat_config(), rng=random
         )
+        return self._apply_turns(player, tile, turns, unfinished="in_progress")
+
+    def _apply_turns(
+        self, player: model.User, tile: model.Tile, turns: List[Resolution], unfinished: str
+    ) -> AutoBattleResult:
+        """
+        Apply resolved turns to the player and tile and write their encounters in bulk
+
+        Args:
+            player: User/player instance
+            tile: Monster tile instance
+            turns: Resolutions in order, each starting from the previous one's states
+            unfinished: Outcome to report if the fight is still going
+
+        Returns:
+            AutoBattleResult
+        """
+        log = get_encounter_log(self.db)
+        records = []
+        for turn in turns:
+            for effect in turn.effects:
+                effect.apply(player, tile)
+            self._count_combat_action(turn.action, turn)
+            records.append(
+                log.append(
+                    tile_id=tile.id,
+                    user_id=player.id,
+                    combat_action_id=turn.action.id,
+                    player_hp_before=turn.player_hp_before,
+                    player_hp_after=turn.player_hp_after,
+                    monster_hp_before=turn.monster_hp_before,
+                    monster_hp_after=turn.monster_hp_after,
+                    damage_dealt=turn.damage_dealt,
+                    damage_received=turn.damage_received,
+                    was_successful=turn.success,
+                    result_message=turn.message,
+                )
+            )
+        if records:
+            flees = [t for t in turns if t.action.code == "flee"]
+            StatsService(self.db).record_encounters(
+                player.id,
+                records,
+                monsters_killed=sum(1 for t in turns if t.monster_defeated),
+                flee_attempts=len(flees),
+                flee_successes=sum(1 for t in flees if t.fled),
+            )
+            metrics.record(self.db, metrics.MONSTER_KILLS, sum(1 for t in turns if t.monster_defeated))
+            metrics.record(self.db, metrics.PLAYER_DEATHS, sum(1 for t in turns if _killed_player(t)))
+
+        last = turns[-1] if turns else None
+        if last is not None and last.monster_defeated:
+            outcome = "won"
+        elif last is not None and last.fled:
+            outcome = "fled"
+        elif not player.is_alive:
+            outcome = "died"
+        else:
+            outcome = unfinished
+        return AutoBattleResult(outcome, turns, player, tile)
+
+    def _record_encounter(self, monster_killed: bool = False, flee_attempt: bool = False, **values) -> None:
+        """
+        Buffer an encounter in the encounter log and fold it into the player's statistics rollup.
+
+        Both writes belong to this service's session, so they commit (or roll back)
+        together with the rest of the action; the log writes every buffered encounter
+        with one bulk INSERT when the session flushes or commits.
+
+        Args:
+            monster_killed: Whether this encounter defeated the monster
+            flee_attempt: Whether this encounter was a flee attempt
+            **values: EncounterRecord fields
+        """
+        record = get_encounter_log(self.db).append(**values)
+        StatsService(self.db).record_encounter(record, monster_killed=monster_killed, flee_attempt=flee_attempt)
+        metrics.record(self.db, metrics.MONSTER_KILLS, 1 if monster_killed else 0)
+        metrics.record(self.db, metrics.PLAYER_DEATHS, 1 if _killed_player(record) else 0)
+
+    def _count_combat_action(self, combat_action: CombatActionRef, resolution: Resolution) -> None:
+        """Count an executed combat action in the metrics once the action commits"""
+        result = "success" if resolution.success else "failure"
+        metrics.record(self.db, metrics.COMBAT_ACTIONS, code=combat_action.code, result=result)
 
     def get_or_create_action_record(
-        self, tile_id: int, action_name: str, action_option: Optional[model.ActionOption]
+        self, tile_id: int, action_name: str, action_option: Optional[ActionOptionRef]
     ) -> int:
         """
         Get existing action record or create new one
@@ -371,7 +448,7 @@ class CombatService:
         Args:
             tile_id: ID of the tile
             action_name: Name of the action
-            action_option: ActionOption instance
+            action_option: ActionOption reference
 
         Returns:
             Action record ID
@@ -422,7 +499,7 @@ class CombatService:
 
         # Check if this is a CombatAction code
         if combat_action_code:
-            combat_action = model.CombatAction.query.filter_by(code=combat_action_code).first()
+            combat_action = get_reference_data().combat_actions_by_code.get(combat_action_code)
             if combat_action:
                 return self.execute_combat_action(player, tile, combat_action)
 
@@ -437,7 +514,7 @@ class CombatService:
             return self._execute_quit(player, tile)
         else:
             # Try to match as CombatAction by name
-            combat_action = model.CombatAction.query.filter_by(name=action_name).first()
+            combat_action = get_reference_data().combat_actions_by_name.get(action_name)
             if combat_action:
                 return self.execute_combat_action(player, tile, combat_action)
 
@@ -454,7 +531,7 @@ class CombatService:
             message = f"Resting near a monster is dangerous! You lost {damage} HP."
             flash(message)
 
-            encounter = model.Encounter(
+            self._record_encounter(
                 tile_id=tile.id,
                 user_id=player.id,
                 combat_action_id=None,
@@ -467,7 +544,6 @@ class CombatService:
                 was_successful=True,
                 result_message=message,
             )
-            self.db.add(encounter)
             # Resting does not defeat the monster: a live monster keeps the tile active so
             # it cannot be bypassed without actually fighting (or fleeing).
             return CombatResult(
@@ -484,7 +560,7 @@ class CombatService:
             message = f"You rest and recover {heal_amount} HP."
             flash(message)
 
-            encounter = model.Encounter(
+            self._record_encounter(
                 tile_id=tile.id,
                 user_id=player.id,
                 combat_action_id=None,
@@ -497,7 +573,6 @@ class CombatService:
                 was_successful=True,
                 result_message=message,
             )
-            self.db.add(encounter)
             return CombatResult(
                 success=True, message=message, player_hp_change=heal_amount, player_alive=True, tile_completed=True
             )
@@ -509,7 +584,7 @@ class CombatService:
         message = f"You fought bravely and took {damage} damage!"
         flash(message)
 
-        encounter = model.Encounter(
+        self._record_encounter(
             tile_id=tile.id,
             user_id=player.id,
             combat_action_id=None,
@@ -522,7 +597,6 @@ class CombatService:
             was_successful=True,
             result_message=message,
         )
-        self.db.add(encounter)
         return CombatResult(
             success=True, message=message, player_hp_change=-damage, player_alive=player.is_alive, tile_completed=True
         )
@@ -533,7 +607,7 @@ class CombatService:
             message = "You carefully observe the creature, learning its patterns."
             flash(message)
 
-            encounter = model.Encounter(
+            self._record_encounter(
                 tile_id=tile.id,
                 user_id=player.id,
                 combat_action_id=None,
@@ -546,7 +620,6 @@ class CombatService:
                 was_successful=True,
                 result_message=message,
             )
-            self.db.add(encounter)
             # Inspecting a live monster gathers info but does not end the encounter, so the
             # tile cannot be cleared by simply observing the monster.
             return CombatResult(
@@ -566,7 +639,7 @@ class CombatService:
                 message = f"You found a magical healing artifact! Restored {healed} HP to full health!"
                 flash(message)
 
-                encounter = model.Encounter(
+                self._record_encounter(
                     tile_id=tile.id,
                     user_id=player.id,
                     combat_action_id=None,
@@ -579,7 +652,6 @@ class CombatService:
                     was_successful=True,
                     result_message=message,
                 )
-                self.db.add(encounter)
                 return CombatResult(
                     success=True, message=message, player_hp_change=healed, player_alive=True, tile_completed=True
                 )
@@ -587,7 +659,7 @@ class CombatService:
                 message = "You inspect the area and find hints of treasure nearby."
                 flash(message)
 
-                encounter = model.Encounter(
+                self._record_encounter(
                     tile_id=tile.id,
                     user_id=player.id,
                     combat_action_id=None,
@@ -600,7 +672,6 @@ class CombatService:
                     was_successful=True,
                     result_message=message,
                 )
-                self.db.add(encounter)
                 return CombatResult(
                     success=True, message=message, player_hp_change=0, player_alive=True, tile_completed=True
                 )
@@ -608,7 +679,7 @@ class CombatService:
             message = "You take a moment to examine your surroundings carefully."
             flash(message)
 
-            encounter = model.Encounter(
+            self._record_encounter(
                 tile_id=tile.id,
                 user_id=player.id,
                 combat_action_id=None,
@@ -621,7 +692,6 @@ class CombatService:
                 was_successful=True,
                 result_message=message,
             )
-            self.db.add(encounter)
             return CombatResult(
                 success=True, message=message, player_hp_change=0, player_alive=True, tile_completed=True
             )
@@ -632,7 +702,7 @@ class CombatService:
         flash(message)
 
         # Mark the playthrough as ended. This runs inside the caller's transaction, so we do
-        # NOT roll back here (that would discard the caller's other writes / the tile lock);
+        # NOT roll back here (that would discard the caller's other writes);
         # let any failure propagate to the route, which owns the transaction boundary.
         if tile and tile.playthrough_id:
             pt = self.db.get(model.Playthrough, tile.playthrough_id)
@@ -0,0 +1,387 @@
+"""
+Combat Simulator - Vectorized Monte Carlo balancing of the difficulty knobs
+
+Runs many independent players ("lanes") side by side as NumPy arrays. Every lane fights
+a sequence of monsters under the same rules as combat_engine (resolve_combat_action,
+resolve_flee and award_xp), so millions of fights take seconds and the difficulty / XP
+settings in config.py can be tuned offline instead of in production.
+
+Each turn draws, for every lane, the values the scalar engine would draw in the same
+order: action roll, damage, counter-attack roll and counter damage (a flee uses the roll
+and the counter damage). Lanes that do not need a value simply ignore it, and lanes
+whose fight is over are masked out. With ``record=True`` the draws are kept so any lane
+can be replayed through the scalar service, which is how parity is tested.
+
+Requires numpy.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .combat_engine import CombatConfig
+from .reference_data import CombatActionRef, ReferenceSnapshot
+
+# Fight outcome codes (0 = the lane did not fight, it was already dead)
+NOT_FOUGHT, WON, DIED, FLED, TIMED_OUT = range(5)
+OUTCOME_NAMES = {WON: "won", DIED: "died", FLED: "fled", TIMED_OUT: "timed_out"}
+
+
+class ActionTable:
+    """A set of combat actions as parallel arrays, indexed by position"""
+
+    def __init__(self, actions: Sequence[CombatActionRef]):
+        self.actions = tuple(actions)
+        if not self.actions:
+            raise ValueError("At least one combat action is required")
+        self.damage_min = np.array([a.damage_min or 0 for a in self.actions], dtype=np.int64)
+        self.damage_max = np.array([a.damage_max or 0 for a in self.actions], dtype=np.int64)
+        self.heal_amount = np.array([a.heal_amount or 0 for a in self.actions], dtype=np.int64)
+        self.defense_boost = np.array([a.defense_boost or 0 for a in self.actions], dtype=np.int64)
+        self.success_rate = np.array([a.success_rate or 0 for a in self.actions], dtype=np.int64)
+        self.is_flee = np.array([a.code == "flee" for a in self.actions])
+
+    def index(self, code: str) -> Optional[int]:
+        """Position of the action with this code, or None"""
+        for i, action in enumerate(self.actions):
+            if action.code == code:
+                return i
+        return None
+
+    def strongest_attack(self) -> int:
+        """Position of the attack with the highest expected damage per turn"""
+        expected = np.where(
+            (self.damage_max > 0) & ~self.is_flee, self.success_rate * (self.damage_min + self.damage_max), -1
+        )
+        return int(np.argmax(expected))
+
+    def best_heal(self) -> Optional[int]:
+        """Position of the heal with the highest expected healing per turn, or None"""
+        expected = self.success_rate * self.heal_amount
+        return int(np.argmax(expected)) if expected.max() > 0 else None
+
+
+class LaneState:
+    """Player and monster state of a set of lanes, one array per attribute"""
+
+    __slots__ = ("hp", "max_hp", "level", "exp", "xp_earned", "monster_hp", "monster_max_hp", "defense")
+
+    def __init__(self, lanes: int, config: CombatConfig):
+        self.hp = np.full(lanes, config.player_hp, dtype=np.int64)
+        self.max_hp = np.full(lanes, config.player_hp, dtype=np.int64)
+        self.level = np.ones(lanes, dtype=np.int64)
+        self.exp = np.zeros(lanes, dtype=np.int64)
+        self.xp_earned = np.zeros(lanes, dtype=np.int64)
+        self.monster_hp = np.zeros(lanes, dtype=np.int64)
+        self.monster_max_hp = np.zeros(lanes, dtype=np.int64)
+        # Tile.player_defense_pending (0 = none)
+        self.defense = np.zeros(lanes, dtype=np.int64)
+
+    def take(self, index) -> "LaneState":
+        """Copy of the selected lanes (an index array or boolean mask)"""
+        part = LaneState.__new__(LaneState)
+        for name in self.__slots__:
+            setattr(part, name, getattr(self, name)[index])
+        return part
+
+    def put(self, index, part: "LaneState") -> None:
+        """Write a part taken with ``take`` back to the selected lanes"""
+        for name in self.__slots__:
+            getattr(self, name)[index] = getattr(part, name)
+
+
+# A policy picks an action (a position in the ActionTable) for every lane
+Policy = Callable[[ActionTable, LaneState, Mapping[str, Any]], np.ndarray]
+
+
+def _always(code: str) -> Policy:
+    def policy(table, state, params):
+        index = table.index(code)
+        return np.full(state.hp.shape, table.strongest_attack() if index is None else index)
+
+    return policy
+
+
+def _strongest(table, state, params):
+    return np.full(state.hp.shape, table.strongest_attack())
+
+
+def _below_threshold(state, params) -> np.ndarray:
+    threshold = int(params.get("threshold", 40))
+    return state.hp * 100 < state.max_hp * threshold
+
+
+def _heal_below(table, state, params):
+    """Strongest attack; the best heal while HP is under ``threshold`` percent"""
+    heal = table.best_heal()
+    attack = table.strongest_attack()
+    if heal is None:
+        return np.full(state.hp.shape, attack)
+    return np.where(_below_threshold(state, params), heal, attack)
+
+
+def _flee_below(table, state, params):
+    """Strongest attack; flee while HP is under ``threshold`` percent"""
+    flee = table.index("flee")
+    attack = table.strongest_attack()
+    if flee is None:
+        return np.full(state.hp.shape, attack)
+    return np.where(_below_threshold(state, params), flee, attack)
+
+
+POLICIES: Dict[str, Policy] = {
+    "light": _always("attack_light"),
+    "heavy": _always("attack_heavy"),
+    "strongest": _strongest,
+    "heal_below": _heal_below,
+    "flee_below": _flee_below,
+}
+
+
+@dataclass(frozen=True)
+class TurnDraws:
+    """Random values drawn for one turn of the lanes still fighting (kept with ``record=True``)"""
+    lanes: np.ndarray
+    action: np.ndarray
+    roll: np.ndarray
+    damage: np.ndarray
+    counter_roll: np.ndarray
+    counter_damage: np.ndarray
+
+    def position(self, lane: int) -> int:
+        """Position of a lane in this turn's arrays"""
+        return int(np.searchsorted(self.lanes, lane))
+
+    def script(self, lane: int, table: ActionTable) -> List[int]:
+        """The values the scalar engine draws for this lane's turn, in call order"""
+        i = self.position(lane)
+        if table.is_flee[self.action[i]]:
+            return [int(self.roll[i]), int(self.counter_damage[i])]
+        return [int(v[i]) for v in (self.roll, self.damage, self.counter_roll, self.counter_damage)]
+
+
+@dataclass
+class SimulationResult:
+    """Per-fight outcomes of a simulation run; arrays are shaped (fights, lanes)"""
+    policy: str
+    table: ActionTable
+    outcomes: np.ndarray
+    turns: np.ndarray
+    level: np.ndarray
+    xp_earned: np.ndarray
+    state: LaneState
+    # (monster max HP per lane, draws per turn) per fight, with record=True
+    trace: Optional[List[Tuple[np.ndarray, List[TurnDraws]]]] = None
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Balance metrics of the run
+
+        Rates are per fight started. turns_to_kill covers won fights; xp_curve has the
+        survival rate, mean level and mean total XP of the starting lanes after each fight.
+        """
+        fights, lanes = self.outcomes.shape
+        started = int(np.count_nonzero(self.outcomes))
+        won_turns = self.turns[self.outcomes == WON]
+        summary = {
+            "policy": self.policy,
+            "lanes": lanes,
+            "fights": started,
+        }
+        for code, name in OUTCOME_NAMES.items():
+            summary[f"{name}_rate"] = float(np.count_nonzero(self.outcomes == code) / started) if started else 0.0
+        summary["turns_to_kill"] = {
+            "mean": float(won_turns.mean()) if won_turns.size else None,
+            "p50": float(np.percentile(won_turns, 50)) if won_turns.size else None,
+            "p90": float(np.percentile(won_turns, 90)) if won_turns.size else None,
+        }
+        summary["xp_curve"] = [
+            {
+                "fight": i + 1,
+                "alive": float(np.count_nonzero(np.isin(self.outcomes[i], (WON, FLED, TIMED_OUT))) / lanes),
+                "mean_level": float(self.level[i].mean()),
+                "mean_xp": float(self.xp_earned[i].mean()),
+            }
+            for i in range(fights)
+        ]
+        return summary
+
+
+def _award_xp(state: LaneState, earned: np.ndarray, amount: np.ndarray, config: CombatConfig) -> None:
+    """Vectorized combat_engine.award_xp for the lanes in ``earned``"""
+    amount = np.maximum(0, amount)
+    state.exp = np.where(earned, state.exp + amount, state.exp)
+    state.xp_earned = np.where(earned, state.xp_earned + amount, state.xp_earned)
+    hp_gained = np.zeros_like(state.hp)
+    # One pass per level gained by any lane, like the scalar while loop
+    while True:
+        top = int(state.level.max())
+        needed = np.array([config.xp_to_next(level) for level in range(top + 1)], dtype=np.int64)[state.level]
+        leveling = earned & (state.exp >= needed)
+        if not leveling.any():
+            break
+        state.exp = np.where(leveling, state.exp - needed, state.exp)
+        state.level = state.level + leveling
+        state.max_hp = state.max_hp + leveling * config.hp_per_level
+        hp_gained = hp_gained + leveling * config.hp_per_level
+    state.hp = np.minimum(state.max_hp, state.hp + hp_gained)
+
+
+def simulate(
+    actions: Sequence[CombatActionRef],
+    policy: Union[str, Policy] = "strongest",
+    lanes: int = 10000,
+    fights: int = 1,
+    config: Optional[CombatConfig] = None,
+    max_turns: int = 100,
+    policy_params: Optional[Mapping[str, Any]] = None,
+    seed: Optional[int] = None,
+    record: bool = False,
+) -> SimulationResult:
+    """
+    Simulate ``lanes`` players each fighting up to ``fights`` monsters in a row
+
+    HP, level and XP carry over between fights; a lane that dies stops fighting.
+
+    Args:
+        actions: Combat actions available to the simulated class/race
+        policy: Name in POLICIES or a policy callable
+        lanes: Number of independent players
+        fights: Monsters each player faces in sequence
+        config: Difficulty knobs (CombatConfig defaults if not provided)
+        max_turns: Turn cap per fight (reaching it counts as timed out)
+        policy_params: Extra policy settings (``threshold`` for heal_below / flee_below)
+        seed: Seed for numpy's generator
+        record: Keep every turn's draws in ``result.trace``
+
+    Returns:
+        SimulationResult
+
+    Raises:
+        KeyError: Unknown policy name
+    """
+    config = config or CombatConfig()
+    policy_name = policy if isinstance(policy, str) else getattr(policy, "__name__", "custom")
+    choose = POLICIES[policy] if isinstance(policy, str) else policy
+    params = dict(policy_params or {})
+    table = ActionTable(actions)
+    rng = np.random.default_rng(seed)
+    state = LaneState(lanes, config)
+
+    outcomes = np.zeros((fights, lanes), dtype=np.int8)
+    turns = np.zeros((fights, lanes), dtype=np.int32)
+    levels = np.zeros((fights, lanes), dtype=np.int64)
+    xp_earned = np.zeros((fights, lanes), dtype=np.int64)
+    trace = [] if record else None
+
+    for fight in range(fights):
+        # Monster HP as rolled by TileService.roll_tile
+        base_hp = rng.integers(config.monster_hp_min, config.monster_hp_max + 1, lanes)
+        state.monster_max_hp = (base_hp * float(config.difficulty_multiplier)).astype(np.int64)
+        state.monster_hp = state.monster_max_hp.copy()
+        state.defense[:] = 0
+        fight_draws = []
+        if record:
+            trace.append((state.monster_max_hp.copy(), fight_draws))
+
+        # Work on the lanes still fighting only; finished lanes are written back as they end
+        index = np.flatnonzero(state.hp > 0)
+        s = state.take(index)
+        for _ in range(max_turns):
+            if not index.size:
+                break
+            n = index.size
+            choice = np.asarray(choose(table, s, params), dtype=np.int64)
+            draws = TurnDraws(
+                lanes=index,
+                action=choice,
+                roll=rng.integers(1, 101, n),
+                damage=rng.integers(table.damage_min[choice], table.damage_max[choice] + 1),
+                counter_roll=rng.integers(1, 101, n),
+                counter_damage=rng.integers(config.counter_damage_min, config.counter_damage_max + 1, n),
+            )
+            if record:
+                fight_draws.append(draws)
+            turns[fight, index] += 1
+
+            success = draws.roll <= table.success_rate[choice]
+            is_flee = table.is_flee[choice]
+
+            # resolve_flee: success ends the fight, failure is a free counter-attack
+            fled = success & is_flee
+            caught = is_flee & ~success
+            hit = np.maximum(0, draws.counter_damage - s.defense)
+            s.hp = np.where(caught, np.maximum(0, s.hp - hit), s.hp)
+            s.defense = np.where(caught, 0, s.defense)
+
+            # resolve_combat_action: a failed action does nothing at all
+            acted = success & ~is_flee
+            attacking = acted & (table.damage_max[choice] > 0)
+            s.monster_hp = np.where(attacking, np.maximum(0, s.monster_hp - draws.damage), s.monster_hp)
+            killed = attacking & (s.monster_hp <= 0)
+            countered = attacking & ~killed & (draws.counter_roll <= config.counter_attack_chance)
+            s.hp = np.where(countered, np.maximum(0, s.hp - hit), s.hp)
+            s.defense = np.where(countered, 0, s.defense)
+
+            heal_amount = table.heal_amount[choice]
+            healed = np.minimum(heal_amount, s.max_hp - s.hp)
+            applied = np.maximum(0, healed * (100 - config.healing_nerf_percent) // 100)
+            s.hp = np.where(acted & (heal_amount > 0), np.minimum(s.max_hp, s.hp + applied), s.hp)
+
+            boost = table.defense_boost[choice]
+            s.defense = np.where(acted & (boost > 0), s.defense + boost, s.defense)
+
+            if killed.any():
+                xp = (s.monster_max_hp * float(config.xp_per_monster_hp)).astype(np.int64)
+                _award_xp(s, killed, xp, config)
+
+            died = s.hp <= 0
+            done = killed | fled | died
+            if done.any():
+                finished = index[done]
+                outcomes[fight, finished] = np.where(killed, WON, np.where(fled, FLED, DIED))[done]
+                state.put(finished, s.take(done))
+                index = index[~done]
+                s = s.take(~done)
+
+        outcomes[fight, index] = TIMED_OUT
+        state.put(index, s)
+        levels[fight] = state.level
+        xp_earned[fight] = state.xp_earned
+
+    return SimulationResult(
+        policy=policy_name,
+        table=table,
+        outcomes=outcomes,
+        turns=turns,
+        level=levels,
+        xp_earned=xp_earned,
+        state=state,
+        trace=trace,
+    )
+
+
+def simulate_matrix(
+    reference: ReferenceSnapshot, policies: Sequence[str] = tuple(POLICIES), **kwargs
+) -> List[Dict[str, Any]]:
+    """
+    Simulate every (class, race, policy) combination in the reference data
+
+    Args:
+        reference: Reference-data snapshot (combat actions, classes, races)
+        policies: Policy names to run
+        **kwargs: Passed to simulate()
+
+    Returns:
+        One summary dict per combination, with ``class`` and ``race`` names added
+    """
+    summaries = []
+    for player_class in reference.player_classes:
+        for player_race in reference.player_races:
+            actions = reference.combat_actions_for(player_class.id, player_race.id, "monster").actions
+            for policy in policies:
+                summary = simulate(actions, policy, **kwargs).summary()
+                summary.update({"class": player_class.name, "race": player_race.name})
+                summaries.append(summary)
+    return summaries
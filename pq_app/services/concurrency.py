@@ -0,0 +1,113 @@
+"""
+Optimistic concurrency for player and tile writes
+
+``User`` and ``Tile`` carry a ``version_id`` column configured as SQLAlchemy's
+``version_id_col``: every ORM UPDATE of those rows is qualified with the version that was
+read and bumps it. A write based on a stale read matches no row, and the flush raises
+``StaleDataError`` instead of silently overwriting the concurrent update. This replaces
+``SELECT ... FOR UPDATE``, which SQLite ignores and which makes Postgres writers on a hot
+tile queue behind each other's row lock for a whole request.
+
+``run_with_retry`` runs a unit of work and commits it. On a conflict it rolls back and
+re-runs the work from a fresh read, up to ``OPTIMISTIC_RETRY_ATTEMPTS`` times. Encounters
+the failed attempt buffered are dropped with it, including in the encounter log's
+append-only mode, which otherwise writes its records whatever the transaction's outcome.
+
+Inside ``hold_commit`` the work is flushed instead of committed: conflicts still surface
+at the flush, and the caller commits the transaction together with writes of its own
+(the Idempotency-Key decorator stores the response in the action's transaction this way).
+"""
+
+import random
+import time
+from contextlib import contextmanager
+from typing import Callable, TypeVar
+
+from flask import current_app, has_app_context, has_request_context, session as flask_session
+from sqlalchemy.orm.exc import StaleDataError
+
+from .. import model
+from .encounter_log import get_encounter_log
+
+T = TypeVar("T")
+
+_FLASHES_KEY = "_flashes"
+_HOLD_COMMIT_KEY = "hold_commit"
+
+
+class ConcurrentUpdateError(Exception):
+    """Raised when a unit of work still conflicts with concurrent writers after every retry"""
+
+
+def run_with_retry(work: Callable[[], T], db_session=None, attempts: int = None) -> T:
+    """
+    Run ``work`` and commit it, retrying from scratch on optimistic-concurrency conflicts
+
+    ``work`` must (re)load the rows it changes and must not commit; it is re-run after a
+    rollback, which expires every loaded object. Messages flashed and encounters logged by
+    a failed attempt are dropped, so only those of the attempt that committed remain.
+    Inside ``hold_commit`` the successful attempt is flushed, and the caller commits it.
+
+    Args:
+        work: Callable doing the reads and writes of one transaction
+        db_session: Optional session (defaults to the Flask-SQLAlchemy session)
+        attempts: Maximum number of attempts (defaults to OPTIMISTIC_RETRY_ATTEMPTS)
+
+    Returns:
+        Whatever ``work`` returned on the attempt that committed
+
+    Raises:
+        ConcurrentUpdateError: Every attempt conflicted
+    """
+    session = db_session or model.db.session
+    if attempts is None:
+        attempts = current_app.config.get("OPTIMISTIC_RETRY_ATTEMPTS", 5) if has_app_context() else 5
+    flashes = list(flask_session.get(_FLASHES_KEY, ())) if has_request_context() else None
+    encounter_log = get_encounter_log(session)
+
+    for attempt in range(1, attempts + 1):
+        buffered = len(encounter_log)
+        try:
+            result = work()
+            if session.info.get(_HOLD_COMMIT_KEY):
+                session.flush()
+            else:
+                session.commit()
+            return result
+        except StaleDataError:
+            session.rollback()
+            # The session's log is cleared by the rollback; an append-only one would
+            # still write this attempt's encounters when the app context ends
+            encounter_log.discard(keep=buffered)
+            if flashes is not None:
+                _restore_flashes(flashes)
+            if attempt == attempts:
+                break
+            # Jittered backoff so the losers of a race do not collide again in lockstep
+            time.sleep(random.uniform(0, 0.005 * attempt))
+
+    raise ConcurrentUpdateError(f"Concurrent update conflict persisted after {attempts} attempts")
+
+
+@contextmanager
+def hold_commit(db_session=None):
+    """
+    Make ``run_with_retry`` flush rather than commit while the block runs; the caller
+    then commits (or rolls back) the transaction itself
+
+    Args:
+        db_session: Optional session (defaults to the Flask-SQLAlchemy session)
+    """
+    session = db_session or model.db.session
+    session.info[_HOLD_COMMIT_KEY] = True
+    try:
+        yield session
+    finally:
+        session.info.pop(_HOLD_COMMIT_KEY, None)
+
+
+def _restore_flashes(flashes) -> None:
+    if flashes:
+        flask_session[_FLASHES_KEY] = list(flashes)
+    else:
+        flask_session.pop(_FLASHES_KEY, None)
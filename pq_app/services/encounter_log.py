@@ -0,0 +1,186 @@
+"""
+Encounter log writer
+
+Encounter is the busiest table: every combat, rest and inspect action adds a row. Instead
+of building an ``Encounter`` ORM object per action (identity-map bookkeeping plus one
+INSERT each), write paths append a plain ``EncounterRecord`` tuple to the session's
+``EncounterLog``. Buffered records are written with a single Core executemany INSERT on
+the session's connection when the session flushes or commits (or queries Encounter), so
+they land in the same transaction as the action that produced them, and are dropped if
+it rolls back.
+
+With ``ENCOUNTER_LOG_APPEND_ONLY`` enabled the log bypasses the ORM session entirely:
+records are buffered per application context and written in their own short transaction
+when the context ends. Encounters then form an append-only audit trail: they are kept
+even if the action's transaction later rolls back, and they are not visible to queries
+inside the request that produced them. The exception is an attempt that
+``concurrency.run_with_retry`` rolls back on a conflict and re-runs: its records are
+dropped, so a retried action is logged once.
+"""
+
+from collections import namedtuple
+from datetime import datetime, timezone
+from typing import List
+
+from flask import current_app, g, has_app_context
+from sqlalchemy import event, insert
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.util import find_tables
+
+from .. import model
+
+EncounterRecord = namedtuple(
+    "EncounterRecord",
+    (
+        "tile_id",
+        "user_id",
+        "combat_action_id",
+        "player_hp_before",
+        "player_hp_after",
+        "monster_hp_before",
+        "monster_hp_after",
+        "damage_dealt",
+        "damage_received",
+        "was_successful",
+        "result_message",
+        "created_at",
+    ),
+    defaults=(None, None, None, 0, 0, True, None, None),
+)
+
+_SESSION_KEY = "encounter_log"
+
+
+class EncounterLog:
+    """Buffer of encounter records waiting for one bulk INSERT"""
+
+    def __init__(self, append_only: bool = False):
+        self.append_only = append_only
+        self.pending: List[EncounterRecord] = []
+
+    def __len__(self) -> int:
+        return len(self.pending)
+
+    def append(self, **values) -> EncounterRecord:
+        """
+        Buffer one encounter
+
+        Args:
+            **values: EncounterRecord fields; ``created_at`` defaults to now, so the
+                timestamp reflects the action rather than the write
+
+        Returns:
+            The buffered EncounterRecord
+        """
+        values.setdefault("created_at", datetime.now(timezone.utc))
+        record = EncounterRecord(**values)
+        self.pending.append(record)
+        return record
+
+    def flush(self, connection) -> int:
+        """
+        Write the buffered records with one executemany INSERT and clear the buffer
+
+        Args:
+            connection: Connection to write on (the session's, or a dedicated one in
+                append-only mode)
+
+        Returns:
+            Number of records written
+        """
+        records, self.pending = self.pending, []
+        if records:
+            connection.execute(insert(model.Encounter.__table__), [record._asdict() for record in records])
+        return len(records)
+
+    def discard(self, keep: int = 0) -> None:
+        """
+        Drop buffered records without writing them
+
+        Args:
+            keep: Number of leading (older) records to keep; all are dropped by default
+        """
+        del self.pending[keep:]
+
+
+def get_encounter_log(db_session=None) -> EncounterLog:
+    """
+    Return the encounter log to write to
+
+    Args:
+        db_session: Session whose transaction the records belong to (defaults to the
+            Flask-SQLAlchemy session); ignored in append-only mode
+
+    Returns:
+        The session's EncounterLog, or the application context's in append-only mode
+    """
+    if has_app_context() and current_app.config.get("ENCOUNTER_LOG_APPEND_ONLY"):
+        if _SESSION_KEY not in g:
+            setattr(g, _SESSION_KEY, EncounterLog(append_only=True))
+        return g.get(_SESSION_KEY)
+
+    session = db_session or model.db.session
+    log = session.info.get(_SESSION_KEY)
+    if log is None:
+        log = session.info[_SESSION_KEY] = EncounterLog()
+    return log
+
+
+def flush_append_only_log() -> int:
+    """
+    Write the application context's append-only records in their own transaction
+
+    Returns:
+        Number of records written
+    """
+    log = g.pop(_SESSION_KEY, None)
+    if not log:
+        return 0
+    with model.db.engine.begin() as connection:
+        return log.flush(connection)
+
+
+def init_app(app) -> None:
+    """
+    Flush append-only records when each application context ends
+
+    Call before ``db.init_app``: teardown callbacks run in reverse registration order, so
+    the write then happens after the request's session has been closed and released
+    its connection.
+    """
+
+    @app.teardown_appcontext
+    def _flush_encounter_log(exc):
+        try:
+            flush_append_only_log()
+        except SQLAlchemyError:
+            app.logger.exception("Failed to write append-only encounter log")
+
+
+@event.listens_for(Session, "before_flush")
+@event.listens_for(Session, "before_commit")
+def _write_encounter_log(session, *args):
+    """Write buffered records ahead of the flush/commit, in the session's transaction"""
+    log = session.info.get(_SESSION_KEY)
+    if log:
+        log.flush(session.connection())
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _write_encounter_log_before_reads(orm_execute_state):
+    """Queries over Encounter see the encounters buffered earlier in the transaction"""
+    session = orm_execute_state.session
+    if (
+        session.info.get(_SESSION_KEY)
+        and orm_execute_state.is_select
+        and model.Encounter.__table__ in find_tables(orm_execute_state.statement, include_aliases=True)
+    ):
+        _write_encounter_log(session)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_encounter_log(session):
+    log = session.info.get(_SESSION_KEY)
+    if log:
+        log.discard()
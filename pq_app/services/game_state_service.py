@@ -0,0 +1,148 @@
+"""
+GameStateService - Everything a client needs to render the current screen
+
+Loads the player, the active playthrough, the current tile and the tile's media override
+in a single SELECT (the playthrough, tile and override are joined on correlated scalar
+subqueries over the hot-query indexes). A current tile the player has not acted on yet
+has no row and is regenerated from the playthrough's seed. Class/race names, allowed
+actions, combat actions and the type-level display art come from the in-process
+reference-data registry, so building the state issues no further queries.
+"""
+
+from typing import List, Optional
+
+from sqlalchemy import or_, select
+from sqlalchemy.orm import aliased
+
+from .. import model
+from .reference_data import (
+    get_reference_data,
+    ActionOptionRef,
+    CombatActionSet,
+    DisplayArtRef,
+    NO_DISPLAY_ART,
+    TileTypeRef,
+)
+from .tile_service import TileService
+
+
+class GameState:
+    """Data class representing one player's current game state"""
+
+    def __init__(
+        self,
+        player: model.User,
+        playthrough: Optional[model.Playthrough],
+        tile: Optional[model.Tile],
+        tile_type: Optional[TileTypeRef],
+        ascii_art: Optional[str],
+        ascii_art_hash: Optional[str],
+        combat_actions: Optional[CombatActionSet],
+        allowed_actions: List[ActionOptionRef],
+    ):
+        self.player = player
+        self.playthrough = playthrough
+        self.tile = tile
+        self.tile_type = tile_type
+        self.ascii_art = ascii_art
+        self.ascii_art_hash = ascii_art_hash
+        self.combat_actions = combat_actions
+        self.allowed_actions = allowed_actions
+
+
+class GameStateService:
+    """Service for loading a player's complete game state"""
+
+    def __init__(self, db_session=None):
+        """Initialize GameStateService with optional database session"""
+        self.db = db_session or model.db.session
+
+    def load(self, user_id: int) -> Optional[GameState]:
+        """
+        Load a player's game state in one round-trip
+
+        Args:
+            user_id: The player's user ID
+
+        Returns:
+            GameState, or None if the player does not exist
+        """
+        User, Playthrough, Tile, TileMedia, MediaBlob = (
+            model.User, model.Playthrough, model.Tile, model.TileMedia, model.MediaBlob
+        )
+
+        # Active playthrough (same rule as TileService.get_active_playthrough)
+        pt = aliased(Playthrough)
+        active_playthrough_id = (
+            select(pt.id)
+            .where(pt.user_id == User.id, pt.ended_at.is_(None))
+            .order_by(pt.started_at.desc(), pt.id.desc())
+            .limit(1)
+            .correlate(User)
+            .scalar_subquery()
+        )
+
+        # Stored tile at that playthrough's current position (or its latest tile, before it
+        # reveals seeded tiles), as TileService.get_current_tile
+        latest = aliased(Tile)
+        latest_tile_id = (
+            select(latest.id)
+            .where(latest.user_id == User.id, latest.playthrough_id == Playthrough.id)
+            .where(or_(Playthrough.tiles_revealed == 0, latest.tile_index == Playthrough.tiles_revealed - 1))
+            .order_by(latest.id.desc())
+            .limit(1)
+            .correlate(User, Playthrough)
+            .scalar_subquery()
+        )
+
+        # Tile-specific media override (first by id, as MediaService.resolve_display_refs);
+        # the type-level fallback chain comes from the reference-data registry
+        tile_media = aliased(TileMedia)
+        tile_media_id = (
+            select(tile_media.id)
+            .where(tile_media.tile_id == Tile.id)
+            .order_by(tile_media.id)
+            .limit(1)
+            .correlate(Tile)
+            .scalar_subquery()
+        )
+
+        stmt = (
+            select(User, Playthrough, Tile, MediaBlob.content, TileMedia.content_hash)
+            .select_from(User)
+            .outerjoin(Playthrough, Playthrough.id == active_playthrough_id)
+            .outerjoin(Tile, Tile.id == latest_tile_id)
+            .outerjoin(TileMedia, TileMedia.id == tile_media_id)
+            .outerjoin(MediaBlob, MediaBlob.sha256 == TileMedia.content_hash)
+            .where(User.id == user_id)
+        )
+        row = self.db.execute(stmt).first()
+        if row is None:
+            return None
+        player, playthrough, tile, override_content, override_hash = row
+        if tile is None and playthrough is not None and playthrough.tiles_revealed:
+            # Not acted on yet, so not stored: rebuild it from the seed
+            tile = TileService(self.db).regenerate_tile(player.id, playthrough, playthrough.tiles_revealed - 1)
+
+        reference = get_reference_data()
+        tile_type = reference.tile_types_by_id.get(tile.type) if tile else None
+        if override_content:
+            display_art = DisplayArtRef(override_content, override_hash)
+        else:
+            display_art = reference.tile_type_display_art.get(tile.type, NO_DISPLAY_ART) if tile else NO_DISPLAY_ART
+        combat_actions = (
+            reference.combat_actions_for(player.playerclass, player.playerrace, tile_type.name if tile_type else None)
+            if tile
+            else None
+        )
+
+        return GameState(
+            player=player,
+            playthrough=playthrough,
+            tile=tile,
+            tile_type=tile_type,
+            ascii_art=display_art.content,
+            ascii_art_hash=display_art.content_hash,
+            combat_actions=combat_actions,
+            allowed_actions=TileService(self.db).get_allowed_actions(tile_type.name) if tile_type else [],
+        )
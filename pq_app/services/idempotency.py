@@ -0,0 +1,165 @@
+"""
+Idempotency keys for action endpoints
+
+Clients on flaky networks retry POSTs whose response they never saw. When a request
+carries an ``Idempotency-Key`` header, the key is first *claimed*: an
+``idempotency_key`` row is inserted with ``INSERT ... ON CONFLICT DO NOTHING`` and
+committed, so exactly one of several concurrent retries wins the claim. The winner runs
+the action and stores its response on the row, in the action's own transaction (the
+``idempotent`` decorator holds ``run_with_retry``'s commit until the response is
+stored). Later retries with the same key get that response replayed without re-running
+the action, or a conflict while it is still in flight.
+
+An in-flight claim is a lease that starts at ``claimed_at``. If the worker dies before
+the action commits, the claim stays in flight. A retry more than
+``IDEMPOTENCY_LEASE_SECONDS`` later takes it over and runs the action itself. Storing a
+response (or releasing the claim) only succeeds for the request that still holds the
+lease, so a request that outlived its lease is rolled back rather than applied twice.
+
+A key is scoped to one player and bound to the request it first arrived with (a hash
+of method, path and body); reusing it for a different request is rejected. Rows expire
+after ``IDEMPOTENCY_KEY_TTL_HOURS``. Expired rows are deleted when the same player
+claims a new key, or in bulk with ``purge_expired``.
+"""
+
+import hashlib
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from .. import model
+
+# Outcomes of IdempotencyService.claim
+CLAIMED = "claimed"  # new key: run the request, then complete() or release()
+REPLAY = "replay"  # completed earlier: return the stored response
+IN_PROGRESS = "in_progress"  # another request with this key has not finished yet
+MISMATCH = "mismatch"  # the key was used for a different request
+
+MAX_KEY_LENGTH = 255
+
+
+def request_fingerprint(method: str, path: str, body: bytes) -> str:
+    """Hash identifying a request, so a key cannot be replayed for a different one"""
+    digest = hashlib.sha256()
+    for part in (method.upper().encode("utf-8"), path.encode("utf-8"), body or b""):
+        digest.update(part)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class IdempotencyService:
+    """Claims idempotency keys and stores/replays their responses"""
+
+    def __init__(
+        self, db_session=None, ttl: timedelta = timedelta(hours=24), lease: timedelta = timedelta(seconds=60)
+    ):
+        self.db = db_session or model.db.session
+        self.ttl = ttl
+        self.lease = lease
+
+    def claim(
+        self, user_id: int, key: str, request_hash: str, now: Optional[datetime] = None
+    ) -> Tuple[str, Optional[model.IdempotencyKey]]:
+        """
+        Claim a key for a request, or take over an in-flight claim whose lease has lapsed.
+        Runs in the caller's transaction; the caller commits before running the request so
+        concurrent retries see the claim.
+
+        Args:
+            user_id: The player's user ID
+            key: The client's Idempotency-Key
+            request_hash: request_fingerprint of the request
+            now: Claim time; pass the same value to complete() / release()
+
+        Returns:
+            (outcome, row): CLAIMED with None, or REPLAY / IN_PROGRESS / MISMATCH with
+            the existing row
+        """
+        table = model.IdempotencyKey.__table__
+        now = now or datetime.now(timezone.utc)
+        self.purge_expired(user_id, now=now)
+
+        values = {"user_id": user_id, "key": key, "request_hash": request_hash, "created_at": now, "claimed_at": now}
+        dialect = self.db.get_bind().dialect.name
+        if dialect in ("sqlite", "postgresql"):
+            upsert = sqlite_insert if dialect == "sqlite" else postgresql_insert
+            stmt = upsert(table).values(**values).on_conflict_do_nothing(index_elements=[table.c.user_id, table.c.key])
+            if self.db.execute(stmt).rowcount == 1:
+                return CLAIMED, None
+        elif self._get(user_id, key) is None:
+            self.db.execute(insert(table).values(**values))
+            return CLAIMED, None
+
+        existing = self._get(user_id, key)
+        if existing is None:
+            # Expired and purged by a concurrent request between our insert and read
+            return IN_PROGRESS, None
+        if existing.request_hash != request_hash:
+            return MISMATCH, existing
+        if existing.status_code is not None:
+            return REPLAY, existing
+
+        # In flight: take the claim over if its holder's lease has lapsed (one statement,
+        # so only one of several concurrent retries wins it)
+        take_over = (
+            update(table)
+            .where(
+                table.c.user_id == user_id,
+                table.c.key == key,
+                table.c.status_code.is_(None),
+                table.c.claimed_at < now - self.lease,
+            )
+            .values(claimed_at=now)
+        )
+        if self.db.execute(take_over).rowcount == 1:
+            return CLAIMED, None
+        return IN_PROGRESS, existing
+
+    def complete(self, user_id: int, key: str, claimed_at: datetime, status_code: int, response_body: str) -> bool:
+        """
+        Store the response of a claimed key (caller commits)
+
+        Args:
+            claimed_at: The ``now`` the key was claimed with
+
+        Returns:
+            False if the claim was taken over after its lease lapsed (nothing is stored,
+            and the caller should roll the request back)
+        """
+        table = model.IdempotencyKey.__table__
+        result = self.db.execute(
+            update(table)
+            .where(table.c.user_id == user_id, table.c.key == key, table.c.claimed_at == claimed_at)
+            .values(status_code=status_code, response_body=response_body)
+        )
+        return result.rowcount == 1
+
+    def release(self, user_id: int, key: str, claimed_at: datetime) -> None:
+        """Drop a claim whose request failed, so the client can retry it (caller commits)"""
+        table = model.IdempotencyKey.__table__
+        self.db.execute(
+            delete(table).where(table.c.user_id == user_id, table.c.key == key, table.c.claimed_at == claimed_at)
+        )
+
+    def purge_expired(self, user_id: Optional[int] = None, now: Optional[datetime] = None) -> int:
+        """
+        Delete expired keys (one player's, or everyone's). Caller commits.
+
+        Returns:
+            Number of rows deleted
+        """
+        table = model.IdempotencyKey.__table__
+        cutoff = (now or datetime.now(timezone.utc)) - self.ttl
+        stmt = delete(table).where(table.c.created_at < cutoff)
+        if user_id is not None:
+            stmt = stmt.where(table.c.user_id == user_id)
+        return self.db.execute(stmt).rowcount
+
+    def _get(self, user_id: int, key: str) -> Optional[model.IdempotencyKey]:
+        stmt = select(model.IdempotencyKey).where(
+            model.IdempotencyKey.user_id == user_id, model.IdempotencyKey.key == key
+        )
+        return self.db.execute(stmt.execution_options(populate_existing=True)).scalar_one_or_none()
@@ -4,9 +4,11 @@ MediaService - Business logic for media management
 Handles ASCII art, images, and other media assets associated with tiles.
 """
 from pathlib import Path
-from typing import Optional, List
+from typing import Optional, List, Dict, Iterable, Tuple, Union
 from dataclasses import dataclass
+from sqlalchemy import select
 from .. import model
+from .reference_data import DisplayArtRef, NO_DISPLAY_ART, get_reference_data, invalidate_reference_data
 
 
 @dataclass
@@ -151,6 +153,9 @@ class MediaService:
         
         model.db.session.add(media)
         model.db.session.commit()
+        # Drop the cached per-type display chain now rather than relying on the
+        # session hook alone (which only sees ORM writes)
+        invalidate_reference_data()
         
         return media
     
@@ -171,6 +176,7 @@ class MediaService:
             tile_type.ascii_art = ascii_art
             model.db.session.add(tile_type)
             model.db.session.commit()
+            invalidate_reference_data()
             return True
         return False
     
@@ -258,6 +264,7 @@ class MediaService:
         if media:
             model.db.session.delete(media)
             model.db.session.commit()
+            invalidate_reference_data()
             return True
         return False
     
@@ -292,38 +299,108 @@ class MediaService:
         media.is_default = True
         model.db.session.add(media)
         model.db.session.commit()
+        invalidate_reference_data()
         
         return True
     
-    def get_tile_display_media(self, tile_id: int) -> Optional[str]:
+    def get_tile_display_media(self, tile_id: Optional[int], tile_type_id: Optional[int] = None) -> Optional[str]:
         """
         Get the media to display for a tile.
         Priority: tile-specific media > tile type default media > TileTypeOption.ascii_art
-        
+
+        The type-level part of the chain is cached per tile type in the reference-data
+        registry, so this is a single query for the tile-specific override (which also
+        reads the tile's type when ``tile_type_id`` is not given).
+
         Args:
-            tile_id: ID of the tile
-            
+            tile_id: ID of the tile (None for a tile not stored yet, with ``tile_type_id``)
+            tile_type_id: The tile's type, if the caller already has the tile loaded
+
         Returns:
             ASCII art content or None
         """
-        # First check for tile-specific media
-        tile_media = self.get_media_for_tile(tile_id)
-        if tile_media and tile_media.content:
-            return tile_media.content
-        
-        # Get the tile to find its type
-        tile = model.db.session.get(model.Tile, tile_id)
-        if not tile:
-            return None
-        
-        # Check for default media for the tile type
-        default_media = self.get_default_media(tile.type, "ascii_art")
-        if default_media and default_media.content:
-            return default_media.content
-        
-        # Fall back to TileTypeOption.ascii_art (legacy)
-        tile_type = model.db.session.get(model.TileTypeOption, tile.type)
-        if tile_type and tile_type.ascii_art:
-            return tile_type.ascii_art
-        
-        return None
+        return self.get_tile_display_ref(tile_id, tile_type_id).content
+
+    def get_tile_display_ref(self, tile_id: Optional[int], tile_type_id: Optional[int] = None) -> DisplayArtRef:
+        """
+        Like ``get_tile_display_media``, but also returns the art's media-store hash
+
+        Args:
+            tile_id: ID of the tile (None for a tile not stored yet, with ``tile_type_id``)
+            tile_type_id: The tile's type, if the caller already has the tile loaded
+
+        Returns:
+            DisplayArtRef (with ``None`` content and hash when the tile has no art)
+        """
+        if tile_type_id is not None:
+            return self.resolve_display_refs([(tile_id, tile_type_id)])[tile_id]
+
+        override = (
+            select(model.TileMedia.id)
+            .where(model.TileMedia.tile_id == model.Tile.id)
+            .order_by(model.TileMedia.id)
+            .limit(1)
+            .correlate(model.Tile)
+            .scalar_subquery()
+        )
+        stmt = (
+            select(model.Tile.type, model.MediaBlob.content, model.TileMedia.content_hash)
+            .outerjoin(model.TileMedia, model.TileMedia.id == override)
+            .outerjoin(model.MediaBlob, model.MediaBlob.sha256 == model.TileMedia.content_hash)
+            .where(model.Tile.id == tile_id)
+        )
+        row = model.db.session.execute(stmt).first()
+        if row is None:
+            return NO_DISPLAY_ART
+        tile_type_id, content, content_hash = row
+        if content:
+            return DisplayArtRef(content, content_hash)
+        return get_reference_data().tile_type_display_art.get(tile_type_id, NO_DISPLAY_ART)
+
+    def resolve_display_media(self, tiles: Iterable[Union[model.Tile, Tuple[int, int]]]) -> Dict[int, Optional[str]]:
+        """
+        Resolve display media for many tiles at once: one batched query for tile-specific
+        overrides, with the type-level fallback served from the reference-data registry.
+
+        Args:
+            tiles: Tile objects or (tile_id, tile_type_id) pairs
+
+        Returns:
+            Dictionary mapping tile ID to ASCII art content (or None)
+        """
+        return {tile_id: ref.content for tile_id, ref in self.resolve_display_refs(tiles).items()}
+
+    def resolve_display_refs(self, tiles: Iterable[Union[model.Tile, Tuple[int, int]]]) -> Dict[int, DisplayArtRef]:
+        """
+        Like ``resolve_display_media``, but also returns each art's media-store hash
+
+        Args:
+            tiles: Tile objects or (tile_id, tile_type_id) pairs
+
+        Returns:
+            Dictionary mapping tile ID to DisplayArtRef
+        """
+        pairs = [(t.id, t.type) if isinstance(t, model.Tile) else tuple(t) for t in tiles]
+        if not pairs:
+            return {}
+
+        # First TileMedia row per tile wins, as in get_media_for_tile. Tiles not stored yet
+        # (id None) cannot have overrides.
+        overrides: Dict[int, DisplayArtRef] = {}
+        stored_ids = {tile_id for tile_id, _ in pairs if tile_id is not None}
+        if stored_ids:
+            stmt = (
+                select(model.TileMedia.tile_id, model.MediaBlob.content, model.TileMedia.content_hash)
+                .outerjoin(model.MediaBlob, model.MediaBlob.sha256 == model.TileMedia.content_hash)
+                .where(model.TileMedia.tile_id.in_(stored_ids))
+                .order_by(model.TileMedia.id)
+            )
+            for tile_id, content, content_hash in model.db.session.execute(stmt):
+                overrides.setdefault(tile_id, DisplayArtRef(content, content_hash))
+
+        type_art = get_reference_data().tile_type_display_art
+        resolved = {}
+        for tile_id, tile_type_id in pairs:
+            art = overrides.get(tile_id)
+            resolved[tile_id] = art if art and art.content else type_art.get(tile_type_id, NO_DISPLAY_ART)
+        return resolved
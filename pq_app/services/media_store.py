@@ -0,0 +1,111 @@
+"""
+Content-addressed media store
+
+ASCII art is stored once per distinct content in ``MediaBlob``, keyed by its sha256.
+``TileMedia`` and ``TileTypeOption`` keep only the hash (``content_hash`` /
+``ascii_art_hash``): their ``content`` / ``ascii_art`` attributes read the referenced
+blob, and assigning them points the hash at the new text. A ``before_flush`` hook stores
+the blob of every assigned text, so every write path (services, admin routes, seed
+scripts) deduplicates art without calling into this module. Blobs are immutable and
+never rewritten, which is what lets ``/api/v1/media/<hash>`` be cached indefinitely by
+clients.
+"""
+
+import re
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import event, insert, inspect, select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from .. import model
+
+_HASH_PATTERN = re.compile(r"[0-9a-f]{64}")
+
+# model -> its BlobText attributes
+_BLOB_TEXT = {
+    model.TileMedia: (model.TileMedia.content,),
+    model.TileTypeOption: (model.TileTypeOption.ascii_art,),
+}
+
+
+def hash_content(content: str) -> str:
+    """Return the store key (hex sha256 of the UTF-8 text) for a piece of content"""
+    return model.MediaBlob.key_for(content)
+
+
+def is_content_hash(value: str) -> bool:
+    """Whether ``value`` is syntactically a store key"""
+    return bool(_HASH_PATTERN.fullmatch(value or ""))
+
+
+def get_blob(content_hash: str, db_session=None) -> Optional[model.MediaBlob]:
+    """
+    Look up a blob by hash
+
+    Args:
+        content_hash: Hex sha256 of the content
+        db_session: Optional session (defaults to the Flask-SQLAlchemy session)
+
+    Returns:
+        MediaBlob or None if no such content is stored
+    """
+    if not is_content_hash(content_hash):
+        return None
+    return (db_session or model.db.session).get(model.MediaBlob, content_hash)
+
+
+def store_blobs(session, contents: Iterable[str]) -> Dict[str, str]:
+    """
+    Ensure a blob exists for each piece of content
+
+    Uses ``INSERT ... ON CONFLICT DO NOTHING`` where the dialect supports it, so
+    concurrent writers storing the same art never collide; other dialects insert only
+    the hashes not already present.
+
+    Args:
+        session: Session whose transaction the blobs are written in
+        contents: Content strings (duplicates are stored once)
+
+    Returns:
+        Dictionary mapping hash to content for everything passed in
+    """
+    blobs = {hash_content(content): content for content in contents if content}
+    if not blobs:
+        return blobs
+
+    table = model.MediaBlob.__table__
+    now = datetime.now(timezone.utc)
+    values = [
+        {"sha256": digest, "content": content, "size": len(content.encode("utf-8")), "created_at": now}
+        for digest, content in blobs.items()
+    ]
+
+    connection = session.connection()
+    dialect = connection.dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        upsert = sqlite_insert if dialect == "sqlite" else postgresql_insert
+        connection.execute(upsert(table).on_conflict_do_nothing(index_elements=[table.c.sha256]), values)
+        return blobs
+
+    existing = set(connection.scalars(select(table.c.sha256).where(table.c.sha256.in_(blobs))))
+    missing = [row for row in values if row["sha256"] not in existing]
+    if missing:
+        connection.execute(insert(table), missing)
+    return blobs
+
+
+@event.listens_for(Session, "before_flush")
+def _store_assigned_media(session, flush_context, instances):
+    """Store the blob of every piece of art assigned since the row was loaded"""
+    contents = []
+    for obj in (*session.new, *session.dirty):
+        for blob_text in _BLOB_TEXT.get(type(obj), ()):
+            if obj not in session.new and not inspect(obj).attrs[blob_text.hash_attr].history.has_changes():
+                continue
+            text = blob_text.assigned(obj)
+            if text:
+                contents.append(text)
+    store_blobs(session, contents)
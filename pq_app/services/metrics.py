@@ -0,0 +1,153 @@
+"""
+Prometheus metrics
+
+``GET /metrics`` serves, in the Prometheus text format:
+
+* ``pq_http_request_duration_seconds`` and ``pq_http_request_db_queries`` histograms per
+  blueprint, endpoint, method and status;
+* gameplay counters: combat actions by code and result, tiles generated by type, monster
+  kills, player deaths, and points accrued and spent;
+* connection pool gauges (connections open, checked out and in overflow), checkout wait
+  times and checkout timeouts (see pool_metrics.py);
+* cache lookups by cache and result, for the hit rate of the reference-data registry,
+  idempotent replays and conditional media requests.
+
+Gameplay counters describe committed state. Services add increments to their session
+with ``record``; they are applied when the session commits and dropped when it rolls
+back, so an action retried by ``run_with_retry`` is counted once.
+
+Under gunicorn every worker has its own counters. With ``PROMETHEUS_MULTIPROC_DIR`` set
+(gunicorn.conf.py sets it up) prometheus_client keeps the values in memory-mapped files
+in that directory, and ``/metrics`` aggregates the files of all workers, whichever
+worker serves the scrape. Counters and histograms are summed; pool gauges are summed
+over live workers, so ``pq_db_pool_checked_out`` is the deployment's total against the
+database's connection limit.
+"""
+
+import os
+import time
+
+from flask import Response, g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+REQUEST_DURATION = Histogram(
+    "pq_http_request_duration_seconds",
+    "HTTP request latency",
+    ["blueprint", "endpoint", "method", "status"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+REQUEST_DB_QUERIES = Histogram(
+    "pq_http_request_db_queries",
+    "SQL statements executed per HTTP request",
+    ["blueprint", "endpoint"],
+    buckets=(0, 1, 2, 4, 8, 16, 32, 64),
+)
+
+COMBAT_ACTIONS = Counter("pq_combat_actions", "Combat actions executed", ["code", "result"])
+TILES_GENERATED = Counter("pq_tiles_generated", "Tiles generated", ["type"])
+MONSTER_KILLS = Counter("pq_monster_kills", "Monsters defeated")
+PLAYER_DEATHS = Counter("pq_player_deaths", "Players whose HP dropped to zero")
+POINTS_ACCRUED = Counter("pq_points_accrued", "Action points accrued by players")
+POINTS_SPENT = Counter("pq_points_spent", "Action points spent on tile actions")
+
+POOL_SIZE = Gauge("pq_db_pool_size", "Connections kept open by the pools", multiprocess_mode="livesum")
+POOL_CHECKED_OUT = Gauge(
+    "pq_db_pool_checked_out", "Connections currently checked out of the pools", multiprocess_mode="livesum"
+)
+POOL_OVERFLOW = Gauge("pq_db_pool_overflow", "Connections open beyond the pool size", multiprocess_mode="livesum")
+POOL_CHECKOUT_WAIT = Histogram(
+    "pq_db_pool_checkout_wait_seconds",
+    "Time spent waiting for a pooled connection",
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30),
+)
+POOL_TIMEOUTS = Counter("pq_db_pool_timeouts", "Connection checkouts that timed out")
+
+CACHE_LOOKUPS = Counter("pq_cache_lookups", "Cache lookups", ["cache", "result"])
+
+_PENDING_KEY = "pending_metrics"
+
+
+def record(session, metric, amount=1, **labels) -> None:
+    """
+    Add to a counter once ``session`` commits
+
+    Args:
+        session: The session whose transaction the counted event belongs to
+        metric: The Counter to increment
+        amount: Increment (nothing is recorded for zero)
+        **labels: Label values of the counter
+    """
+    if amount:
+        session.info.setdefault(_PENDING_KEY, []).append((metric, labels, amount))
+
+
+def record_cache_lookup(cache: str, hit: bool) -> None:
+    CACHE_LOOKUPS.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_pending(session):
+    for metric, labels, amount in session.info.pop(_PENDING_KEY, ()):
+        (metric.labels(**labels) if labels else metric).inc(amount)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+def registry():
+    """The registry to expose: all workers' values in multiprocess mode, else this process's"""
+    if not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        return REGISTRY
+    collected = CollectorRegistry()
+    multiprocess.MultiProcessCollector(collected)
+    return collected
+
+
+def init_app(app) -> None:
+    """
+    Time every request and serve ``/metrics`` (unless ``METRICS_ENABLED`` is off)
+
+    Call after the rate limiter's ``init_app``: scrapes are exempt from rate limits.
+    """
+    if not app.config.get("METRICS_ENABLED", True):
+        return
+
+    @app.before_request
+    def _start_timer():
+        g.metrics_started = time.perf_counter()
+
+    @app.after_request
+    def _observe_request(response):
+        started = g.pop("metrics_started", None)
+        if started is None:
+            return response
+        # Label by route, not by URL, to keep the number of series bounded
+        blueprint = request.blueprint or "none"
+        endpoint = request.endpoint or "none"
+        REQUEST_DURATION.labels(blueprint, endpoint, request.method, str(response.status_code)).observe(
+            time.perf_counter() - started
+        )
+        stats = g.get("query_stats")
+        if stats is not None:
+            REQUEST_DB_QUERIES.labels(blueprint, endpoint).observe(stats.count)
+        return response
+
+    def metrics():
+        return Response(generate_latest(registry()), mimetype=CONTENT_TYPE_LATEST)
+
+    for limiter in app.extensions.get("limiter", ()):
+        limiter.exempt(metrics)
+    app.add_url_rule("/metrics", "metrics", metrics, methods=["GET"])
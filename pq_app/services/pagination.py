@@ -0,0 +1,150 @@
+"""
+Keyset (cursor) pagination on (created_at, id)
+
+History tables are read newest-first. Instead of LIMIT/OFFSET (which re-reads every
+skipped row) each page continues strictly after the last row of the previous page, so
+deep pages cost the same as the first one. The position is handed to clients as an
+opaque, URL-safe cursor token. ``created_at`` is always populated by the model defaults,
+so (created_at, id) is a total order.
+"""
+
+import base64
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+from sqlalchemy import and_, or_
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class InvalidCursor(ValueError):
+    """Raised when a cursor token cannot be decoded"""
+
+
+@dataclass(frozen=True)
+class KeysetPage:
+    """One page of rows plus the cursor for the next (older) page"""
+
+    items: List[Any]
+    next_cursor: Optional[str]
+    has_more: bool
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """
+    Encode a (created_at, id) position as an opaque cursor token
+
+    Args:
+        created_at: Timestamp of the last row on the page
+        row_id: ID of the last row on the page
+
+    Returns:
+        URL-safe cursor string
+    """
+    payload = json.dumps([created_at.isoformat(), row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> Tuple[datetime, int]:
+    """
+    Decode a cursor token produced by ``encode_cursor``
+
+    Args:
+        token: Cursor string from a previous response
+
+    Returns:
+        Tuple of (created_at, id)
+
+    Raises:
+        InvalidCursor: If the token is malformed
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError) as exc:
+        raise InvalidCursor("Invalid cursor") from exc
+
+
+def encode_position(*key: int) -> str:
+    """
+    Encode a position that is not a (created_at, id) pair, such as a tile's place in its
+    playthrough, as an opaque cursor token
+
+    Args:
+        key: Integer sort key of the last item on the page
+
+    Returns:
+        URL-safe cursor string
+    """
+    payload = json.dumps(list(key), separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_position(token: str, size: int) -> Tuple[int, ...]:
+    """
+    Decode a cursor token produced by ``encode_position``
+
+    Args:
+        token: Cursor string from a previous response
+        size: Number of integers in the key
+
+    Returns:
+        The sort key
+
+    Raises:
+        InvalidCursor: If the token is malformed
+    """
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(key, list) or len(key) != size:
+            raise ValueError(token)
+        return tuple(int(value) for value in key)
+    except (ValueError, TypeError) as exc:
+        raise InvalidCursor("Invalid cursor") from exc
+
+
+def clamp_page_size(limit: Optional[int], default: int = DEFAULT_PAGE_SIZE) -> int:
+    """Bound a client-supplied page size to 1..MAX_PAGE_SIZE"""
+    if limit is None:
+        return default
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def paginate_keyset(session, stmt, created_col, id_col, cursor: Optional[str], limit: int) -> KeysetPage:
+    """
+    Run ``stmt`` as one newest-first keyset page
+
+    Args:
+        session: Session used to execute the query
+        stmt: ``select()`` of an ORM entity, already filtered (e.g. by user)
+        created_col: The entity's created_at column
+        id_col: The entity's primary key column
+        cursor: Cursor token from the previous page, or None for the first page
+        limit: Page size
+
+    Returns:
+        KeysetPage; ``has_more`` comes from fetching one extra row, not from a count
+
+    Raises:
+        InvalidCursor: If ``cursor`` is malformed
+    """
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        stmt = stmt.where(or_(created_col < created_at, and_(created_col == created_at, id_col < row_id)))
+
+    # Matches the (user_id, created_at, id) indexes, so a page is an index range scan
+    stmt = stmt.order_by(created_col.desc(), id_col.desc()).limit(limit + 1)
+    rows = list(session.execute(stmt).scalars())
+
+    has_more = len(rows) > limit
+    items = rows[:limit]
+    next_cursor = None
+    if has_more:
+        last = items[-1]
+        next_cursor = encode_cursor(getattr(last, created_col.key), getattr(last, id_col.key))
+    return KeysetPage(items=items, next_cursor=next_cursor, has_more=has_more)
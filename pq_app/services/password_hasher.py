@@ -0,0 +1,152 @@
+"""
+Bounded password hashing
+
+Password hashing is deliberately slow (scrypt/PBKDF2 take ~0.1-0.3 s of CPU). After an
+outage every client logs in again at once. With hashing on the request thread, every
+worker thread then spends its CPU on hashes and gameplay requests starve behind them.
+
+``PasswordHasher`` runs hashes on a small dedicated thread pool (hashlib releases the
+GIL, so the request thread just waits) behind a bounded queue. At most
+``PASSWORD_HASH_WORKERS`` hashes run at once per process, and at most
+``PASSWORD_HASH_QUEUE_SIZE`` more wait. Beyond that, ``HashingBusyError`` is raised at
+once, and the login/register routes answer 429 with ``Retry-After``. That sheds the
+load instead of queuing it behind gameplay.
+
+Hash parameters come from ``PASSWORD_HASH_METHOD`` (a werkzeug method string, by default
+``pbkdf2:sha256:600000``; scrypt hashes do not fit ``User.password_hash``). Stored hashes
+made with other parameters are detected by ``needs_rehash`` and replaced on the user's
+next successful login.
+"""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Optional
+
+from flask import current_app, has_app_context
+from werkzeug.security import check_password_hash, generate_password_hash
+
+_EXTENSION_KEY = "password_hasher"
+
+DEFAULT_METHOD = "pbkdf2:sha256:600000"
+
+
+class HashingBusyError(Exception):
+    """Raised when the hashing queue is full; the caller should answer 429"""
+
+
+class PasswordHasher:
+    """Hashes and verifies passwords on a bounded thread pool"""
+
+    def __init__(self, method: str = DEFAULT_METHOD, workers: int = 2, queue_size: int = 8):
+        self.method = method
+        self.workers = workers
+        self.queue_size = queue_size
+        self._slots = threading.BoundedSemaphore(workers + queue_size)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pid = None
+        self._lock = threading.Lock()
+        # werkzeug expands defaults ("pbkdf2" -> "pbkdf2:sha256:<iterations>"): hash once, at
+        # startup rather than on a request thread, to learn the prefix stored hashes carry
+        self._method_prefix = generate_password_hash("", method).split("$", 1)[0]
+        self._stats = {"hashes": 0, "verifications": 0, "rejected": 0, "rehashes": 0, "in_flight": 0}
+        self._seconds_total = 0.0
+        self._seconds_max = 0.0
+
+    def hash(self, password: str) -> str:
+        """
+        Hash a password with the configured method
+
+        Raises:
+            HashingBusyError: The hashing queue is full
+        """
+        return self._run("hashes", generate_password_hash, password, self.method)
+
+    def verify(self, password_hash: Optional[str], password: str) -> bool:
+        """
+        Check a password against a stored hash (False if there is no hash)
+
+        Raises:
+            HashingBusyError: The hashing queue is full
+        """
+        if not password_hash:
+            return False
+        return self._run("verifications", check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash: Optional[str]) -> bool:
+        """Whether a stored hash was made with parameters other than the configured ones"""
+        if not password_hash:
+            return False
+        return password_hash.split("$", 1)[0] != self._method_prefix
+
+    def record_rehash(self) -> None:
+        with self._lock:
+            self._stats["rehashes"] += 1
+
+    def snapshot(self) -> Dict[str, object]:
+        """Counters since the process started, for the health endpoint"""
+        with self._lock:
+            done = self._stats["hashes"] + self._stats["verifications"]
+            return dict(
+                self._stats,
+                pid=os.getpid(),
+                method=self.method,
+                workers=self.workers,
+                queue_size=self.queue_size,
+                seconds_mean=round(self._seconds_total / done, 6) if done else 0.0,
+                seconds_max=round(self._seconds_max, 6),
+            )
+
+    def _run(self, counter, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self._stats["rejected"] += 1
+            raise HashingBusyError("Too many password hashes in progress")
+        with self._lock:
+            self._stats["in_flight"] += 1
+        started = time.perf_counter()
+        try:
+            return self._get_executor().submit(fn, *args).result()
+        finally:
+            elapsed = time.perf_counter() - started
+            self._slots.release()
+            with self._lock:
+                self._stats["in_flight"] -= 1
+                self._stats[counter] += 1
+                self._seconds_total += elapsed
+                self._seconds_max = max(self._seconds_max, elapsed)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # Threads do not survive a fork (gunicorn --preload): start the pool in each worker
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._pid != os.getpid():
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+                    self._pid = os.getpid()
+        return self._executor
+
+
+def init_app(app) -> PasswordHasher:
+    """Create the app's PasswordHasher from PASSWORD_HASH_* config"""
+    hasher = PasswordHasher(
+        method=app.config.get("PASSWORD_HASH_METHOD", DEFAULT_METHOD),
+        workers=app.config.get("PASSWORD_HASH_WORKERS", 2),
+        queue_size=app.config.get("PASSWORD_HASH_QUEUE_SIZE", 8),
+    )
+    app.extensions[_EXTENSION_KEY] = hasher
+    return hasher
+
+
+_fallback: Optional[PasswordHasher] = None
+
+
+def get_password_hasher() -> PasswordHasher:
+    """The current app's PasswordHasher (a default one outside an app context, e.g. scripts)"""
+    global _fallback
+    if has_app_context() and _EXTENSION_KEY in current_app.extensions:
+        return current_app.extensions[_EXTENSION_KEY]
+    # Created on first use, so importing this module does not pay for a hash
+    if _fallback is None:
+        _fallback = PasswordHasher()
+    return _fallback
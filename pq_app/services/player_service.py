@@ -4,9 +4,10 @@ Player Service - Points accrual and spending logic
 from datetime import datetime, timezone, timedelta
 from typing import Tuple, Dict, Any
 
-from flask import current_app
-
 from .. import model
+from . import combat_engine, metrics
+from .combat_engine import PlayerState
+from .combat_service import combat_config
 
 
 class PlayerService:
@@ -15,10 +16,7 @@ class PlayerService:
 
     def xp_to_next(self, level: int) -> int:
         """XP required to advance from the given level to the next one."""
-        cfg = current_app.config if current_app else {}
-        base = int(cfg.get("XP_BASE", 100))
-        growth = float(cfg.get("XP_GROWTH", 1.5))
-        return int(base * (growth ** max(0, level - 1)))
+        return combat_config().xp_to_next(level)
 
     def award_xp(self, user: model.User, amount: int) -> Dict[str, Any]:
         """
@@ -29,33 +27,11 @@ class PlayerService:
 
         Returns a summary dict describing what happened.
         """
-        amount = max(0, int(amount))
-        cfg = current_app.config if current_app else {}
-        hp_per_level = int(cfg.get("HP_PER_LEVEL", 10))
-
-        user.exp_points = (user.exp_points or 0) + amount
-        levels_gained = 0
-        hp_gained = 0
-        # Loop so a single large award can grant multiple levels.
-        while user.exp_points >= self.xp_to_next(user.level):
-            user.exp_points -= self.xp_to_next(user.level)
-            user.level += 1
-            user.max_hp += hp_per_level
-            hp_gained += hp_per_level
-            levels_gained += 1
-
-        if hp_gained:
-            user.heal(hp_gained)
+        resolution = combat_engine.award_xp(PlayerState.of(user), amount, combat_config())
+        for effect in resolution.effects:
+            effect.apply(user, None)
         self.db.add(user)
-
-        return {
-            "xp_awarded": amount,
-            "leveled_up": levels_gained > 0,
-            "levels_gained": levels_gained,
-            "new_level": user.level,
-            "hp_gained": hp_gained,
-            "xp_to_next": self.xp_to_next(user.level),
-        }
+        return resolution.xp
 
     def accrue_points(self, user: model.User) -> int:
         """
@@ -82,17 +58,19 @@ class PlayerService:
         # Advance accrual timestamp by whole hours to preserve remainder
         user.last_points_accrual_at = (last + timedelta(hours=hours)).astimezone(timezone.utc)
         self.db.add(user)
+        metrics.record(self.db, metrics.POINTS_ACCRUED, added)
         return added
 
-    def spend_point(self, user: model.User) -> Tuple[bool, int]:
+    def spend_point(self, user: model.User, count: int = 1) -> Tuple[bool, int]:
         """
-        Spend 1 point for a tile action. Returns (ok, remaining_points).
+        Spend 1 point per tile action (``count`` actions). Returns (ok, remaining_points).
         Policy: do not block actions when at 0; clamp at 0.
         """
         balance = user.points or 0
         if balance <= 0:
             # Allow action, keep balance at 0
             return True, 0
-        user.points = balance - 1
+        user.points = max(0, balance - count)
         self.db.add(user)
+        metrics.record(self.db, metrics.POINTS_SPENT, balance - user.points)
         return True, user.points
@@ -0,0 +1,134 @@
+"""
+Connection pool instrumentation
+
+Sizing gunicorn workers against Postgres ``max_connections`` needs to know how each
+worker's pool behaves under load: how many connections are checked out, how far it goes
+into overflow, how long requests wait for a connection and how often they give up.
+SQLAlchemy's pool events fire only once a connection has been handed out, so the wait
+cannot be measured from outside. ``InstrumentedQueuePool`` is a ``QueuePool`` that
+times each checkout itself and counts checkout timeouts.
+
+``init_app`` installs it as the engine's pool class whenever the engine options
+configure a sized pool (see ``engine_options`` in config.py). Pools are per process, so
+each gunicorn worker reports its own numbers; ``snapshot`` includes the pid. The same
+numbers go to the Prometheus metrics (metrics.py), which add up all workers.
+"""
+
+import os
+import threading
+import time
+from typing import Dict
+
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool
+
+from .. import model
+from . import metrics
+
+
+class PoolStats:
+    """Counters for one pool (thread safe)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record(self, waited: float, timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds_total += waited
+            self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+    def as_dict(self) -> Dict[str, float]:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_seconds_total": round(self.wait_seconds_total, 6),
+                "wait_seconds_max": round(self.wait_seconds_max, 6),
+            }
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records checkout wait time and checkout timeouts in ``self.stats``"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+
+    def _do_get(self):
+        # Includes opening a new connection when the pool has room for one, which is part
+        # of what a request waits for
+        started = time.perf_counter()
+        try:
+            entry = super()._do_get()
+        except exc.TimeoutError:
+            waited = time.perf_counter() - started
+            self.stats.record(waited, timed_out=True)
+            metrics.POOL_TIMEOUTS.inc()
+            metrics.POOL_CHECKOUT_WAIT.observe(waited)
+            raise
+        waited = time.perf_counter() - started
+        self.stats.record(waited)
+        metrics.POOL_CHECKOUT_WAIT.observe(waited)
+        self._update_gauges()
+        return entry
+
+    def _do_return_conn(self, record):
+        super()._do_return_conn(record)
+        self._update_gauges()
+
+    def _update_gauges(self):
+        metrics.POOL_SIZE.set(self.size())
+        metrics.POOL_CHECKED_OUT.set(self.checkedout())
+        metrics.POOL_OVERFLOW.set(max(self.overflow(), 0))
+
+
+def init_app(app) -> None:
+    """
+    Use InstrumentedQueuePool for the app's engine
+
+    Call before ``db.init_app``, which creates the engine from SQLALCHEMY_ENGINE_OPTIONS.
+    Options without ``pool_size`` (in-memory SQLite, which needs a single shared
+    connection) or with an explicit ``poolclass`` are left alone.
+    """
+    options = app.config.get("SQLALCHEMY_ENGINE_OPTIONS") or {}
+    if "pool_size" in options and "poolclass" not in options:
+        # Copy: the options dict is shared with the config class
+        app.config["SQLALCHEMY_ENGINE_OPTIONS"] = dict(options, poolclass=InstrumentedQueuePool)
+
+
+def snapshot(engine=None) -> Dict[str, object]:
+    """
+    Current state of this process's connection pool
+
+    Args:
+        engine: Engine to inspect (defaults to the Flask-SQLAlchemy engine)
+
+    Returns:
+        Dict with the pid and pool class, and for queue pools the configured size and
+        max overflow, connections checked out / idle / in overflow, and (when
+        instrumented) checkout counts, timeouts and wait times
+    """
+    pool = (engine or model.db.engine).pool
+    data: Dict[str, object] = {"pid": os.getpid(), "pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        data.update(
+            size=pool.size(),
+            max_overflow=pool._max_overflow,
+            timeout=pool.timeout(),
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            # QueuePool counts overflow from -size (no connections open yet)
+            overflow=max(pool.overflow(), 0),
+        )
+    stats = getattr(pool, "stats", None)
+    if stats is not None:
+        data.update(stats.as_dict())
+    return data
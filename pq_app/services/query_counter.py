@@ -0,0 +1,136 @@
+"""
+Per-request SQL statement counting and N+1 detection
+
+Engine-level ``before/after_cursor_execute`` listeners time every statement and add it
+to the collectors active in the current context. ``init_app`` opens a collector for each
+request. After the request it:
+
+* adds a ``Server-Timing: db;dur=<ms>;desc="<n> queries"`` header (``SERVER_TIMING_ENABLED``),
+  so browser dev tools and load-test tools show DB time per response;
+* logs one ``pq_app.queries`` record with ``db_queries``, ``db_time_ms`` and
+  ``db_repeated`` fields (as ``extra`` attributes for structured log formatters);
+* logs a warning when one statement ran ``QUERY_REPEAT_THRESHOLD`` times or more.
+  That is the signature of an N+1 loop such as lazy-loading ``tile.encounters`` for
+  every tile of a page.
+
+``count_queries()`` opens a collector around any block; the ``query_budget`` test
+fixture (tests/conftest.py) uses it to hold endpoints to a statement budget. Collectors
+nest: a request made inside a ``count_queries()`` block counts toward both.
+"""
+
+import logging
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Tuple
+
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger("pq_app.queries")
+
+_active: ContextVar[Tuple["QueryStats", ...]] = ContextVar("query_stats", default=())
+
+_START_KEY = "query_counter_start"
+
+
+class QueryStats:
+    """Statements executed while a collector was active"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.statements: Counter = Counter()
+
+    def record(self, statement: str, seconds: float) -> None:
+        self.count += 1
+        self.seconds += seconds
+        self.statements[" ".join(statement.split())] += 1
+
+    @property
+    def milliseconds(self) -> float:
+        return self.seconds * 1000
+
+    def repeated(self, threshold: int) -> Dict[str, int]:
+        """Statements (with their counts) executed at least ``threshold`` times"""
+        return {statement: n for statement, n in self.statements.most_common() if n >= threshold}
+
+
+@contextmanager
+def count_queries() -> Iterator[QueryStats]:
+    """Collect the statements executed inside the block"""
+    stats = QueryStats()
+    token = _active.set(_active.get() + (stats,))
+    try:
+        yield stats
+    finally:
+        _active.reset(token)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault(_START_KEY, []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info[_START_KEY].pop()
+    for stats in _active.get():
+        stats.record(statement, elapsed)
+
+
+@event.listens_for(Engine, "handle_error")
+def _discard_failed_start(exception_context):
+    # A failed statement never reaches after_cursor_execute
+    connection = exception_context.connection
+    if connection is not None and connection.info.get(_START_KEY):
+        connection.info[_START_KEY].pop()
+
+
+def init_app(app) -> None:
+    """Count each request's statements and report them in a header and the log"""
+
+    @app.before_request
+    def _start_query_count():
+        stats = QueryStats()
+        g.query_stats = stats
+        g.query_stats_token = _active.set(_active.get() + (stats,))
+
+    @app.after_request
+    def _report_query_count(response):
+        stats = g.get("query_stats")
+        if stats is None:
+            return response
+        if app.config.get("SERVER_TIMING_ENABLED", True):
+            response.headers.add("Server-Timing", f'db;dur={stats.milliseconds:.1f};desc="{stats.count} queries"')
+
+        threshold = app.config.get("QUERY_REPEAT_THRESHOLD", 5)
+        repeated = stats.repeated(threshold)
+        fields = {
+            "endpoint": request.endpoint,
+            "method": request.method,
+            "status": response.status_code,
+            "db_queries": stats.count,
+            "db_time_ms": round(stats.milliseconds, 2),
+            "db_repeated": len(repeated),
+        }
+        logger.info(
+            "%s %s: %d queries in %.1f ms", request.method, request.path, stats.count, stats.milliseconds, extra=fields
+        )
+        for statement, n in repeated.items():
+            logger.warning(
+                "Possible N+1 in %s: statement ran %d times: %s",
+                request.endpoint,
+                n,
+                statement,
+                extra=dict(fields, db_statement=statement, db_statement_count=n),
+            )
+        return response
+
+    @app.teardown_request
+    def _stop_query_count(exc):
+        token = g.pop("query_stats_token", None)
+        if token is not None:
+            _active.reset(token)
@@ -0,0 +1,171 @@
+"""
+SQLite storage backend for Flask-Limiter
+
+``memory://`` keeps rate-limit counters inside each process, so with N gunicorn workers
+a client gets N times the configured limit, and every restart resets the counters.
+``SQLiteStorage`` keeps them in a local SQLite file that all workers on the host share,
+so it needs no outside service. Importing this module registers the backend with the
+``limits`` library under the ``sqlite`` scheme. Use the SQLAlchemy URL form::
+
+    RATELIMIT_STORAGE_URI = "sqlite:///ratelimits.db"          # relative to the cwd
+    RATELIMIT_STORAGE_URI = "sqlite:////var/lib/pyquest/rl.db"  # absolute
+
+Counters live in one ``WITHOUT ROWID`` table in WAL mode with mmap I/O. A fixed-window
+hit is a single ``INSERT ... ON CONFLICT DO UPDATE ... RETURNING`` statement. A
+sliding-window-counter hit reads and bumps its two windows inside one
+``BEGIN IMMEDIATE`` transaction. Both are atomic across processes: unlike the memory
+backend, the sliding window never admits a hit and then reverts it. Expired rows are
+swept every ``SWEEP_EVERY`` writes. Each thread of each process opens its own connection.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from math import floor
+
+from limits.storage import SlidingWindowCounterSupport, Storage
+from limits.storage.base import TimestampedSlidingWindow
+
+from ..model import apply_sqlite_pragmas
+
+SWEEP_EVERY = 1000
+
+_PRAGMAS = {
+    "busy_timeout": 5000,
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "mmap_size": 16777216,
+}
+
+_SCHEMA = (
+    "CREATE TABLE IF NOT EXISTS rate_limit_counter ("
+    " key TEXT PRIMARY KEY, count INTEGER NOT NULL, expires_at REAL NOT NULL"
+    ") WITHOUT ROWID"
+)
+
+_INCR = (
+    "INSERT INTO rate_limit_counter (key, count, expires_at) VALUES (:key, :amount, :now + :expiry)"
+    " ON CONFLICT (key) DO UPDATE SET"
+    " count = CASE WHEN expires_at <= :now THEN excluded.count ELSE count + excluded.count END,"
+    " expires_at = CASE WHEN expires_at <= :now THEN excluded.expires_at ELSE expires_at END"
+    " RETURNING count"
+)
+
+
+class SQLiteStorage(Storage, SlidingWindowCounterSupport, TimestampedSlidingWindow):
+    """Rate-limit counters in a SQLite file shared by every worker process on the host"""
+
+    STORAGE_SCHEME = ["sqlite"]
+
+    def __init__(self, uri: str, wrap_exceptions: bool = False, **options):
+        super().__init__(uri, wrap_exceptions=wrap_exceptions, **options)
+        # sqlite:///relative/path or sqlite:////absolute/path, as in SQLAlchemy URLs
+        self.path = uri.split("://", 1)[1][1:] or ":memory:"
+        self._local = threading.local()
+        self._writes = 0
+        self._get_connection()
+
+    @property
+    def base_exceptions(self):
+        return sqlite3.Error
+
+    def _get_connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        # A connection must not cross a fork (gunicorn preloads the app before forking)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            apply_sqlite_pragmas(connection, _PRAGMAS)
+            connection.execute(_SCHEMA)
+            self._local.connection, self._local.pid = connection, os.getpid()
+        return connection
+
+    def _incr(self, connection, key, expiry, amount, now) -> int:
+        row = connection.execute(_INCR, {"key": key, "amount": amount, "now": now, "expiry": expiry}).fetchone()
+        self._writes += 1
+        if self._writes % SWEEP_EVERY == 0:
+            connection.execute("DELETE FROM rate_limit_counter WHERE expires_at <= ?", (now,))
+        return row[0]
+
+    def _get(self, connection, key, now) -> int:
+        row = connection.execute(
+            "SELECT count FROM rate_limit_counter WHERE key = ? AND expires_at > ?", (key, now)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def incr(self, key: str, expiry: float, amount: int = 1) -> int:
+        return self._incr(self._get_connection(), key, expiry, amount, time.time())
+
+    def decr(self, key: str, amount: int = 1) -> int:
+        connection = self._get_connection()
+        connection.execute(
+            "UPDATE rate_limit_counter SET count = max(count - ?, 0) WHERE key = ? AND expires_at > ?",
+            (amount, key, time.time()),
+        )
+        return self._get(connection, key, time.time())
+
+    def get(self, key: str) -> int:
+        return self._get(self._get_connection(), key, time.time())
+
+    def get_expiry(self, key: str) -> float:
+        now = time.time()
+        row = (
+            self._get_connection()
+            .execute("SELECT expires_at FROM rate_limit_counter WHERE key = ? AND expires_at > ?", (key, now))
+            .fetchone()
+        )
+        return row[0] if row else now
+
+    def check(self) -> bool:
+        try:
+            self._get_connection().execute("SELECT 1").fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reset(self) -> int:
+        return self._get_connection().execute("DELETE FROM rate_limit_counter").rowcount
+
+    def clear(self, key: str) -> None:
+        self._get_connection().execute("DELETE FROM rate_limit_counter WHERE key = ?", (key,))
+
+    def acquire_sliding_window_entry(self, key: str, limit: int, expiry: int, amount: int = 1) -> bool:
+        if amount > limit:
+            return False
+        connection = self._get_connection()
+        now = time.time()
+        previous_key, current_key = self.sliding_window_keys(key, expiry, now)
+        # IMMEDIATE takes the write lock up front, so no other process can hit between our
+        # read of the window and our increment
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            previous_count, previous_ttl, current_count, _ = self._sliding_window(
+                connection, previous_key, current_key, expiry, now
+            )
+            weighted_count = previous_count * previous_ttl / expiry + current_count
+            acquired = floor(weighted_count) + amount <= limit
+            if acquired:
+                # As in the memory backend, a window's counter lives for two window lengths
+                self._incr(connection, current_key, 2 * expiry, amount, now)
+            connection.execute("COMMIT")
+        except BaseException:
+            connection.execute("ROLLBACK")
+            raise
+        return acquired
+
+    def get_sliding_window(self, key: str, expiry: int):
+        now = time.time()
+        previous_key, current_key = self.sliding_window_keys(key, expiry, now)
+        return self._sliding_window(self._get_connection(), previous_key, current_key, expiry, now)
+
+    def clear_sliding_window(self, key: str, expiry: int) -> None:
+        previous_key, current_key = self.sliding_window_keys(key, expiry, time.time())
+        self.clear(previous_key)
+        self.clear(current_key)
+
+    def _sliding_window(self, connection, previous_key, current_key, expiry, now):
+        previous_count = self._get(connection, previous_key, now)
+        current_count = self._get(connection, current_key, now)
+        previous_ttl = 0.0 if previous_count == 0 else (1 - (((now - expiry) / expiry) % 1)) * expiry
+        current_ttl = (1 - ((now / expiry) % 1)) * expiry + expiry
+        return previous_count, previous_ttl, current_count, current_ttl
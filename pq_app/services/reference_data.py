@@ -0,0 +1,422 @@
+"""
+Reference Data - Process-local registry for static lookup tables
+
+ActionOption, TileTypeOption, CombatAction, PlayerClass and PlayerRace are seeded
+once (init_defaults / migrations) and change roughly once per deploy, yet every tile
+view and action used to re-query them. The registry loads them once into immutable
+snapshots and serves lookups from dicts keyed by id, code and name. Each snapshot also
+carries the resolved type-level display art per tile type (see MediaService), so only
+tile-specific media overrides still need a query.
+
+Each application gets its own registry (``app.extensions["reference_data"]``). Any
+ORM write to a reference table (init_defaults, the admin media endpoints, ...) marks
+the session, and the registry is invalidated when that session commits or rolls back.
+The next lookup reloads a fresh snapshot with a bumped version number.
+
+That invalidation only reaches the process that made the write. The same flush also
+bumps the ``reference_data_version`` row, and every registry compares it with the
+version its snapshot was loaded at, at most once per REFERENCE_DATA_CHECK_SECONDS.
+Another worker's write is therefore picked up within that many seconds of its commit
+(the type-level display art cached for MediaService included). Writes that bypass the
+ORM (raw SQL, migrations) do not bump the row and are only seen after a restart.
+"""
+
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Optional, Tuple, Dict
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, insert, inspect, select, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from .. import model
+from . import metrics
+
+
+@dataclass(frozen=True)
+class ActionOptionRef:
+    """Immutable copy of an ActionOption row"""
+    id: int
+    name: str
+    code: Optional[str]
+
+
+@dataclass(frozen=True)
+class TileTypeRef:
+    """Immutable copy of a TileTypeOption row"""
+    id: int
+    name: str
+    ascii_art: Optional[str]
+    ascii_art_hash: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class DisplayArtRef:
+    """Resolved display art: the content and its key in the media store"""
+    content: Optional[str]
+    content_hash: Optional[str]
+
+
+NO_DISPLAY_ART = DisplayArtRef(content=None, content_hash=None)
+
+
+@dataclass(frozen=True)
+class PlayerClassRef:
+    """Immutable copy of a PlayerClass row"""
+    id: int
+    name: str
+
+
+@dataclass(frozen=True)
+class PlayerRaceRef:
+    """Immutable copy of a PlayerRace row"""
+    id: int
+    name: str
+
+
+@dataclass(frozen=True)
+class CombatActionRef:
+    """Immutable copy of a CombatAction row (with its class/race requirement resolved)"""
+    id: int
+    name: str
+    code: str
+    description: Optional[str]
+    damage_min: int
+    damage_max: int
+    heal_amount: int
+    defense_boost: int
+    success_rate: int
+    requires_class: Optional[int]
+    requires_race: Optional[int]
+    required_class: Optional[PlayerClassRef] = None
+    required_race: Optional[PlayerRaceRef] = None
+
+
+@dataclass(frozen=True)
+class CombatActionSet:
+    """Combat actions available to one (class, race, tile context) combination, pre-serialized"""
+    actions: Tuple[CombatActionRef, ...]
+    payload: Tuple[dict, ...]
+    api_payload: Tuple[dict, ...]
+
+    @classmethod
+    def build(cls, actions) -> "CombatActionSet":
+        actions = tuple(actions)
+        return cls(
+            actions=actions,
+            payload=tuple(_combat_action_payload(a) for a in actions),
+            api_payload=tuple(_combat_action_api_payload(a) for a in actions),
+        )
+
+
+def _combat_action_payload(action: CombatActionRef) -> dict:
+    """Web route format: class/race requirements as names"""
+    return {
+        "id": action.id,
+        "code": action.code,
+        "name": action.name,
+        "description": action.description,
+        "damage_min": action.damage_min,
+        "damage_max": action.damage_max,
+        "heal_amount": action.heal_amount,
+        "defense_boost": action.defense_boost,
+        "success_rate": action.success_rate,
+        "requires_class": action.required_class.name if action.required_class else None,
+        "requires_race": action.required_race.name if action.required_race else None,
+    }
+
+
+def _combat_action_api_payload(action: CombatActionRef) -> dict:
+    """API format, identical to ``CombatActionSchema`` output: requirements as id strings"""
+    payload = _combat_action_payload(action)
+    payload["requires_class"] = str(action.requires_class) if action.requires_class is not None else None
+    payload["requires_race"] = str(action.requires_race) if action.requires_race is not None else None
+    return payload
+
+
+def combat_action_applies(action: CombatActionRef, class_id, race_id, tile_type_name: Optional[str]) -> bool:
+    """
+    Whether a combat action is available for a class/race on a given tile type.
+
+    Actions with no class/race requirement are available to everyone; otherwise the
+    player's class/race must match. All actions are currently valid in every tile
+    context (monster tiles and others alike).
+    """
+    return action.requires_class in (None, class_id) and action.requires_race in (None, race_id)
+
+
+@dataclass(frozen=True)
+class ReferenceSnapshot:
+    """A consistent, versioned view of all reference tables"""
+    version: int
+    # reference_data_version.version when the snapshot was read (``None``: no row yet)
+    source_version: Optional[int] = None
+    action_options: Tuple[ActionOptionRef, ...] = ()
+    tile_types: Tuple[TileTypeRef, ...] = ()
+    player_classes: Tuple[PlayerClassRef, ...] = ()
+    player_races: Tuple[PlayerRaceRef, ...] = ()
+    combat_actions: Tuple[CombatActionRef, ...] = ()
+    action_options_by_id: Dict[int, ActionOptionRef] = field(default_factory=dict)
+    action_options_by_code: Dict[str, ActionOptionRef] = field(default_factory=dict)
+    action_options_by_name: Dict[str, ActionOptionRef] = field(default_factory=dict)
+    tile_types_by_id: Dict[int, TileTypeRef] = field(default_factory=dict)
+    tile_types_by_name: Dict[str, TileTypeRef] = field(default_factory=dict)
+    player_classes_by_id: Dict[int, PlayerClassRef] = field(default_factory=dict)
+    player_races_by_id: Dict[int, PlayerRaceRef] = field(default_factory=dict)
+    combat_actions_by_id: Dict[int, CombatActionRef] = field(default_factory=dict)
+    combat_actions_by_code: Dict[str, CombatActionRef] = field(default_factory=dict)
+    combat_actions_by_name: Dict[str, CombatActionRef] = field(default_factory=dict)
+    # (class_id, race_id, tile_type_name) -> CombatActionSet, ``None`` meaning "not set"
+    combat_action_matrix: Dict[Tuple, CombatActionSet] = field(default_factory=dict)
+    # tile_type_id -> resolved type-level display art (default TileMedia, else legacy ascii_art)
+    tile_type_display_art: Dict[int, DisplayArtRef] = field(default_factory=dict)
+
+    def combat_actions_for(self, class_id, race_id, tile_type_name: Optional[str] = None) -> CombatActionSet:
+        """Actions available to a class/race in a tile context (a dict lookup for known keys)"""
+        action_set = self.combat_action_matrix.get((class_id, race_id, tile_type_name))
+        if action_set is None:
+            action_set = CombatActionSet.build(
+                a for a in self.combat_actions if combat_action_applies(a, class_id, race_id, tile_type_name)
+            )
+        return action_set
+
+    @classmethod
+    def load(cls, session, version: int) -> "ReferenceSnapshot":
+        """Read every reference table once and index the rows"""
+        # Read before the tables, so a write committed in between only causes one extra reload
+        source_version = _read_source_version(session)
+        action_options = tuple(
+            ActionOptionRef(id=a.id, name=a.name, code=a.code)
+            for a in session.query(model.ActionOption).order_by(model.ActionOption.name, model.ActionOption.id)
+        )
+        tile_types = tuple(
+            TileTypeRef(id=t.id, name=t.name, ascii_art=t.ascii_art, ascii_art_hash=t.ascii_art_hash)
+            for t in session.query(model.TileTypeOption).order_by(model.TileTypeOption.name, model.TileTypeOption.id)
+        )
+        player_classes = tuple(
+            PlayerClassRef(id=c.id, name=c.name)
+            for c in session.query(model.PlayerClass).order_by(model.PlayerClass.name, model.PlayerClass.id)
+        )
+        player_races = tuple(
+            PlayerRaceRef(id=r.id, name=r.name)
+            for r in session.query(model.PlayerRace).order_by(model.PlayerRace.name, model.PlayerRace.id)
+        )
+        classes_by_id = {c.id: c for c in player_classes}
+        races_by_id = {r.id: r for r in player_races}
+        combat_actions = tuple(
+            CombatActionRef(
+                id=a.id,
+                name=a.name,
+                code=a.code,
+                description=a.description,
+                damage_min=a.damage_min or 0,
+                damage_max=a.damage_max or 0,
+                heal_amount=a.heal_amount or 0,
+                defense_boost=a.defense_boost or 0,
+                success_rate=a.success_rate if a.success_rate is not None else 100,
+                requires_class=a.requires_class,
+                requires_race=a.requires_race,
+                required_class=classes_by_id.get(a.requires_class),
+                required_race=races_by_id.get(a.requires_race),
+            )
+            for a in session.query(model.CombatAction).order_by(model.CombatAction.name, model.CombatAction.id)
+        )
+
+        # Type-level display fallback chain: the default ascii_art TileMedia (first by id,
+        # as ``MediaService.get_default_media``), else TileTypeOption.ascii_art
+        default_media_art = {}
+        for tile_type_id, content, content_hash in session.execute(
+            select(model.TileMedia.tile_type_id, model.MediaBlob.content, model.TileMedia.content_hash)
+            .outerjoin(model.MediaBlob, model.MediaBlob.sha256 == model.TileMedia.content_hash)
+            .where(
+                model.TileMedia.tile_type_id.is_not(None),
+                model.TileMedia.media_type == "ascii_art",
+                model.TileMedia.is_default.is_(True),
+            )
+            .order_by(model.TileMedia.id)
+        ):
+            default_media_art.setdefault(tile_type_id, DisplayArtRef(content, content_hash))
+        tile_type_display_art = {}
+        for t in tile_types:
+            art = default_media_art.get(t.id)
+            if not (art and art.content):
+                art = DisplayArtRef(t.ascii_art, t.ascii_art_hash) if t.ascii_art else NO_DISPLAY_ART
+            tile_type_display_art[t.id] = art
+
+        return cls(
+            version=version,
+            source_version=source_version,
+            action_options=action_options,
+            tile_types=tile_types,
+            player_classes=player_classes,
+            player_races=player_races,
+            combat_actions=combat_actions,
+            action_options_by_id={a.id: a for a in action_options},
+            # Keep the first row per key, matching the old ``.first()`` lookups
+            action_options_by_code=_index_first(action_options, "code"),
+            action_options_by_name=_index_first(action_options, "name"),
+            tile_types_by_id={t.id: t for t in tile_types},
+            tile_types_by_name=_index_first(tile_types, "name"),
+            player_classes_by_id=classes_by_id,
+            player_races_by_id=races_by_id,
+            combat_actions_by_id={a.id: a for a in combat_actions},
+            combat_actions_by_code=_index_first(combat_actions, "code"),
+            combat_actions_by_name=_index_first(combat_actions, "name"),
+            combat_action_matrix=_build_combat_action_matrix(combat_actions, player_classes, player_races, tile_types),
+            tile_type_display_art=tile_type_display_art,
+        )
+
+
+def _build_combat_action_matrix(combat_actions, player_classes, player_races, tile_types) -> Dict:
+    """Precompute the available-action set for every (class, race, tile context) combination"""
+    matrix = {}
+    for class_id in (None, *(c.id for c in player_classes)):
+        for race_id in (None, *(r.id for r in player_races)):
+            for tile_type_name in (None, *(t.name for t in tile_types)):
+                matrix[(class_id, race_id, tile_type_name)] = CombatActionSet.build(
+                    a for a in combat_actions if combat_action_applies(a, class_id, race_id, tile_type_name)
+                )
+    return matrix
+
+
+def _index_first(rows, attr: str) -> Dict:
+    """Index rows by ``attr`` (lowest id wins on duplicates, skipping empty keys)"""
+    index = {}
+    for row in sorted(rows, key=lambda r: r.id):
+        key = getattr(row, attr)
+        if key is not None and key not in index:
+            index[key] = row
+    return index
+
+
+def _read_source_version(session) -> Optional[int]:
+    """Current value of the cross-process reference_data_version counter"""
+    return session.execute(
+        select(model.ReferenceDataVersion.version).where(model.ReferenceDataVersion.id == 1)
+    ).scalar()
+
+
+class ReferenceData:
+    """Versioned, lazily reloaded registry of reference data for one application"""
+
+    def __init__(self, check_seconds: float = 5):
+        self.version = 0
+        self.check_seconds = check_seconds
+        self._snapshot: Optional[ReferenceSnapshot] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def load(self, session=None) -> ReferenceSnapshot:
+        """(Re)load the snapshot from the database"""
+        session = session or model.db.session
+        with self._lock:
+            snapshot = ReferenceSnapshot.load(session, self.version)
+            self._snapshot = snapshot
+            self._checked_at = time.monotonic()
+            return snapshot
+
+    def snapshot(self) -> ReferenceSnapshot:
+        """
+        Return the current snapshot, loading it if it was invalidated.
+
+        Once ``check_seconds`` have passed since the last check, one query compares the
+        snapshot with reference_data_version and reloads it if another process wrote.
+        """
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._checked_at >= self.check_seconds:
+            self._checked_at = time.monotonic()
+            if _read_source_version(model.db.session) != snapshot.source_version:
+                self.invalidate()
+                snapshot = None
+        if snapshot is None or snapshot.version != self.version:
+            metrics.record_cache_lookup("reference_data", hit=False)
+            return self.load()
+        metrics.record_cache_lookup("reference_data", hit=True)
+        return snapshot
+
+    def invalidate(self) -> None:
+        """Drop the current snapshot; the next lookup reloads it"""
+        with self._lock:
+            self.version += 1
+            self._snapshot = None
+
+
+def init_app(app) -> ReferenceData:
+    """Attach an (empty) registry to the app"""
+    registry = ReferenceData(check_seconds=app.config.get("REFERENCE_DATA_CHECK_SECONDS", 5))
+    app.extensions["reference_data"] = registry
+    return registry
+
+
+def get_reference_data() -> ReferenceSnapshot:
+    """Return the reference snapshot for the current application"""
+    return current_app.extensions["reference_data"].snapshot()
+
+
+def invalidate_reference_data() -> None:
+    """Invalidate the current application's registry (no-op outside an app)"""
+    if has_app_context():
+        registry = current_app.extensions.get("reference_data")
+        if registry is not None:
+            registry.invalidate()
+
+
+# Models whose writes invalidate the registry. Type-level TileMedia rows count too (see
+# _is_reference_write) because the snapshot caches each tile type's default display art.
+_REFERENCE_MODELS = (
+    model.ActionOption,
+    model.TileTypeOption,
+    model.CombatAction,
+    model.PlayerClass,
+    model.PlayerRace,
+)
+_DIRTY_FLAG = "reference_data_dirty"
+
+
+def _is_reference_write(obj) -> bool:
+    """Whether a flushed object is (or was) part of the registry's snapshot"""
+    if isinstance(obj, model.TileMedia):
+        # Per-tile overrides are queried on every view, not cached: only type-level rows
+        # (tile_id NULL before or after this flush) change the snapshot
+        return obj.tile_id is None or None in inspect(obj).attrs.tile_id.history.deleted
+    return isinstance(obj, _REFERENCE_MODELS)
+
+
+@event.listens_for(Session, "after_flush")
+def _track_reference_writes(session, flush_context):
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if _is_reference_write(obj):
+            if not session.info.get(_DIRTY_FLAG):
+                _bump_source_version(session)
+            session.info[_DIRTY_FLAG] = True
+            return
+
+
+def _bump_source_version(session) -> None:
+    """
+    Bump reference_data_version in the writing transaction, for the other processes' registries.
+
+    The row is upserted where the dialect supports it, so two workers creating it at
+    once (``create_all`` deployments have no migration to seed it) cannot collide.
+    """
+    table = model.ReferenceDataVersion.__table__
+    dialect = session.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        upsert = sqlite_insert if dialect == "sqlite" else postgresql_insert
+        stmt = upsert(table).values(id=1, version=1)
+        session.execute(stmt.on_conflict_do_update(index_elements=[table.c.id], set_={"version": table.c.version + 1}))
+        return
+
+    result = session.execute(update(table).where(table.c.id == 1).values(version=table.c.version + 1))
+    if result.rowcount == 0:
+        session.execute(insert(table).values(id=1, version=1))
+
+
+@event.listens_for(Session, "after_commit")
+@event.listens_for(Session, "after_rollback")
+def _invalidate_after_transaction(session):
+    if session.info.pop(_DIRTY_FLAG, False):
+        invalidate_reference_data()
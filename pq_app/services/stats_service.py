@@ -0,0 +1,333 @@
+"""
+Stats Service - Player statistics
+
+Encounter history grows without bound, so statistics are served from the PlayerStats
+rollup: one row per player, incremented in the same transaction that records each
+Encounter or reveals each tile. The rollup can be rebuilt from history with SQL aggregates
+(``rebuild_player_stats``), and the recent-encounters list is a separate, bounded query.
+
+Every player gets a zeroed row when the User is inserted, and migration ``0011``
+backfills players that existed before the rollup. Increments only ever update that row.
+A player without one is read from history until it is rebuilt, instead of getting a row
+that holds only the increments recorded since.
+"""
+
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Iterable, Optional
+
+from sqlalchemy import select, func, case, insert, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from .. import model
+from .pagination import KeysetPage, paginate_keyset
+
+
+class StatsService:
+    """Service for computing player statistics"""
+
+    def __init__(self, db_session=None):
+        self.db = db_session or model.db.session
+
+    def get_encounter_totals(self, user_id: int) -> Dict[str, int]:
+        """
+        Aggregate a player's encounter history in a single query
+
+        Args:
+            user_id: The player's user ID
+
+        Returns:
+            Dictionary with total/successful encounter counts and damage totals
+        """
+        encounter = model.Encounter
+        stmt = select(
+            func.count(encounter.id),
+            func.coalesce(func.sum(case((encounter.was_successful.is_(True), 1), else_=0)), 0),
+            func.coalesce(func.sum(encounter.damage_dealt), 0),
+            func.coalesce(func.sum(encounter.damage_received), 0),
+        ).where(encounter.user_id == user_id)
+        total, successful, dealt, received = self.db.execute(stmt).one()
+
+        return {
+            "total_encounters": int(total),
+            "successful_encounters": int(successful),
+            "total_damage_dealt": int(dealt),
+            "total_damage_received": int(received),
+        }
+
+    def record_encounter(self, encounter, monster_killed: bool = False, flee_attempt: bool = False) -> None:
+        """
+        Fold a new encounter into its player's rollup row
+
+        Args:
+            encounter: The Encounter (or EncounterRecord) being recorded
+            monster_killed: Whether this encounter defeated the monster
+            flee_attempt: Whether this encounter was a flee attempt
+        """
+        self._increment(
+            encounter.user_id,
+            total_encounters=1,
+            successful_encounters=1 if encounter.was_successful else 0,
+            total_damage_dealt=encounter.damage_dealt or 0,
+            total_damage_received=encounter.damage_received or 0,
+            monsters_killed=1 if monster_killed else 0,
+            flee_attempts=1 if flee_attempt else 0,
+            flee_successes=1 if flee_attempt and encounter.was_successful else 0,
+        )
+
+    def record_encounters(
+        self,
+        user_id: int,
+        records: Iterable[Any],
+        monsters_killed: int = 0,
+        flee_attempts: int = 0,
+        flee_successes: int = 0,
+    ) -> None:
+        """
+        Fold a batch of encounters, written in bulk, into one player's rollup row
+
+        Args:
+            user_id: The player's user ID
+            records: EncounterRecords of the batch
+            monsters_killed: How many of them defeated a monster
+            flee_attempts: How many of them were flee attempts
+            flee_successes: How many flee attempts succeeded
+        """
+        records = list(records)
+        self._increment(
+            user_id,
+            total_encounters=len(records),
+            successful_encounters=sum(1 for record in records if record.was_successful),
+            total_damage_dealt=sum(record.damage_dealt or 0 for record in records),
+            total_damage_received=sum(record.damage_received or 0 for record in records),
+            monsters_killed=monsters_killed,
+            flee_attempts=flee_attempts,
+            flee_successes=flee_successes,
+        )
+
+    def record_tile_explored(self, user_id: int, count: int = 1) -> None:
+        """
+        Count newly revealed tiles towards a player's rollup row
+
+        Args:
+            user_id: The player's user ID
+            count: Number of tiles revealed
+        """
+        self._increment(user_id, tiles_explored=count)
+
+    def _increment(self, user_id: int, **deltas: int) -> None:
+        """
+        Atomically add ``deltas`` to a player's rollup row with a single UPDATE, so
+        concurrent writers never lose increments.
+
+        A player without a row is skipped: a row created here would hold only these
+        deltas and hide the player's earlier history. ``get_player_stats`` computes such
+        players from history until ``rebuild_player_stats`` writes their row.
+        """
+        deltas = {name: value for name, value in deltas.items() if value}
+        if user_id is None or not deltas:
+            return
+
+        table = model.PlayerStats.__table__
+        increments = {name: table.c[name] + value for name, value in deltas.items()}
+        self.db.execute(
+            update(table).where(table.c.user_id == user_id).values(**increments, updated_at=datetime.now(timezone.utc))
+        )
+
+    def compute_player_stats(self, user_ids: Optional[Iterable[int]] = None) -> Dict[int, Dict[str, int]]:
+        """
+        Compute rollup counters from history with grouped SQL aggregates
+
+        Args:
+            user_ids: Players to compute (all players with history if omitted)
+
+        Returns:
+            Dictionary mapping user ID to a dictionary of PlayerStats counters
+        """
+        encounter = model.Encounter
+        is_flee = model.CombatAction.code == "flee"
+        encounter_stmt = (
+            select(
+                encounter.user_id,
+                func.count(encounter.id),
+                func.sum(case((encounter.was_successful.is_(True), 1), else_=0)),
+                func.coalesce(func.sum(encounter.damage_dealt), 0),
+                func.coalesce(func.sum(encounter.damage_received), 0),
+                func.sum(case(((encounter.monster_hp_before > 0) & (encounter.monster_hp_after <= 0), 1), else_=0)),
+                func.sum(case((is_flee, 1), else_=0)),
+                func.sum(case((is_flee & encounter.was_successful.is_(True), 1), else_=0)),
+            )
+            .outerjoin(model.CombatAction, encounter.combat_action_id == model.CombatAction.id)
+            .group_by(encounter.user_id)
+        )
+        # Tiles explored: every revealed position of a seeded playthrough (stored or not),
+        # plus stored tiles from before seeding, which have no position
+        revealed_stmt = select(
+            model.Playthrough.user_id, func.coalesce(func.sum(model.Playthrough.tiles_revealed), 0)
+        ).group_by(model.Playthrough.user_id)
+        tile_stmt = (
+            select(model.Tile.user_id, func.count(model.Tile.id))
+            .where(model.Tile.tile_index.is_(None))
+            .group_by(model.Tile.user_id)
+        )
+        if user_ids is not None:
+            user_ids = list(user_ids)
+            encounter_stmt = encounter_stmt.where(encounter.user_id.in_(user_ids))
+            revealed_stmt = revealed_stmt.where(model.Playthrough.user_id.in_(user_ids))
+            tile_stmt = tile_stmt.where(model.Tile.user_id.in_(user_ids))
+
+        stats: Dict[int, Dict[str, int]] = {}
+
+        def _row(user_id):
+            return stats.setdefault(user_id, {name: 0 for name in model.PlayerStats.COUNTERS})
+
+        for user_id, total, successful, dealt, received, killed, flees, fled in self.db.execute(encounter_stmt):
+            if user_id is None:
+                continue
+            _row(user_id).update(
+                total_encounters=int(total),
+                successful_encounters=int(successful or 0),
+                total_damage_dealt=int(dealt),
+                total_damage_received=int(received),
+                monsters_killed=int(killed or 0),
+                flee_attempts=int(flees or 0),
+                flee_successes=int(fled or 0),
+            )
+        for stmt in (revealed_stmt, tile_stmt):
+            for user_id, tiles in self.db.execute(stmt):
+                if user_id is not None and tiles:
+                    _row(user_id)["tiles_explored"] += int(tiles)
+
+        return stats
+
+    def rebuild_player_stats(self, user_id: Optional[int] = None) -> int:
+        """
+        Rebuild the rollup from existing encounters and tiles (one player, or everyone).
+        Runs in the caller's transaction; the caller commits.
+
+        Rows are upserted with the computed values (``INSERT ... ON CONFLICT DO UPDATE``
+        where the dialect supports it) rather than deleted and re-inserted, so a
+        concurrent increment never finds the row missing. Players without history get a
+        zeroed row.
+
+        Args:
+            user_id: Player to rebuild (all players if omitted)
+
+        Returns:
+            Number of rollup rows written
+        """
+        user_ids = list(self.db.scalars(select(model.User.id))) if user_id is None else [user_id]
+        stats = self.compute_player_stats(None if user_id is None else user_ids)
+        if not user_ids:
+            return 0
+
+        table = model.PlayerStats.__table__
+        now = datetime.now(timezone.utc)
+        zero = {name: 0 for name in model.PlayerStats.COUNTERS}
+        rows = [{"user_id": uid, "updated_at": now, **stats.get(uid, zero)} for uid in user_ids]
+
+        dialect = self.db.get_bind().dialect.name
+        if dialect in ("sqlite", "postgresql"):
+            upsert = sqlite_insert if dialect == "sqlite" else postgresql_insert
+            stmt = upsert(table)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.user_id],
+                set_={name: stmt.excluded[name] for name in (*model.PlayerStats.COUNTERS, "updated_at")},
+            )
+            self.db.execute(stmt, rows)
+            return len(rows)
+
+        existing = set(self.db.scalars(select(table.c.user_id).where(table.c.user_id.in_(user_ids))))
+        for row in rows:
+            if row["user_id"] in existing:
+                values = {name: value for name, value in row.items() if name != "user_id"}
+                self.db.execute(update(table).where(table.c.user_id == row["user_id"]).values(**values))
+        missing = [row for row in rows if row["user_id"] not in existing]
+        if missing:
+            self.db.execute(insert(table), missing)
+        return len(rows)
+
+    def get_player_stats(self, user_id: int) -> model.PlayerStats:
+        """
+        Get a player's rollup row.
+
+        Players whose row has not been backfilled yet get a transient (unsaved) row
+        computed from history, so reads stay correct before the backfill runs.
+
+        Args:
+            user_id: The player's user ID
+
+        Returns:
+            PlayerStats instance
+        """
+        # Increments are executed immediately, so a read never needs to flush pending
+        # ORM changes (which belong to the caller's request, not to the rollup).
+        with self.db.no_autoflush:
+            stats = self.db.get(model.PlayerStats, user_id, populate_existing=True)
+            if stats is None:
+                counters = self.compute_player_stats([user_id]).get(user_id, {})
+                stats = model.PlayerStats(user_id=user_id, **counters)
+        return stats
+
+    def get_recent_encounters(self, user_id: int, limit: int = 10) -> List[model.Encounter]:
+        """
+        Get a player's most recent encounters (bounded by ``limit``)
+
+        Args:
+            user_id: The player's user ID
+            limit: Maximum number of encounters to return
+
+        Returns:
+            List of Encounter records, newest first
+        """
+        stmt = (
+            select(model.Encounter)
+            .where(model.Encounter.user_id == user_id)
+            .order_by(model.Encounter.created_at.desc(), model.Encounter.id.desc())
+            .limit(limit)
+        )
+        return list(self.db.execute(stmt).scalars())
+
+    def get_encounter_history(self, user_id: int, cursor: Optional[str] = None, limit: int = 50) -> KeysetPage:
+        """
+        Get one keyset page of a player's encounters, newest first
+
+        Args:
+            user_id: The player's user ID
+            cursor: Cursor token from the previous page, or None for the first page
+            limit: Page size
+
+        Returns:
+            KeysetPage of Encounter records
+
+        Raises:
+            InvalidCursor: If ``cursor`` is malformed
+        """
+        stmt = select(model.Encounter).where(model.Encounter.user_id == user_id)
+        return paginate_keyset(self.db, stmt, model.Encounter.created_at, model.Encounter.id, cursor, limit)
+
+    def get_character_stats(self, user_id: int) -> Dict[str, Any]:
+        """
+        Build the statistics block for the character stats endpoint
+
+        Args:
+            user_id: The player's user ID
+
+        Returns:
+            Dictionary of totals plus success rate and average damage dealt
+        """
+        stats = self.get_player_stats(user_id)
+        total = stats.total_encounters
+
+        return {
+            "total_encounters": total,
+            "successful_encounters": stats.successful_encounters,
+            "success_rate": round(stats.successful_encounters / total * 100, 2) if total > 0 else 0,
+            "total_damage_dealt": stats.total_damage_dealt,
+            "total_damage_received": stats.total_damage_received,
+            "average_damage_dealt": round(stats.total_damage_dealt / total, 2) if total > 0 else 0,
+            "monsters_killed": stats.monsters_killed,
+            "tiles_explored": stats.tiles_explored,
+            "flee_attempts": stats.flee_attempts,
+            "flee_successes": stats.flee_successes,
+        }
@@ -4,15 +4,35 @@ TileService - Business logic for tile management and generation
 This service handles:
 - Tile generation with random types
 - Content generation based on tile type
+- Deterministic, seeded tile sequences per playthrough
 - Tile retrieval and validation
 - Action filtering by tile type
+
+Each playthrough has a seed, and the tile at position ``i`` is a pure function of
+(seed, i): its type, monster and HP are rolled from a ``random.Random`` seeded with both.
+Upcoming tiles are therefore never pre-rolled or stored. Revealing claims the next
+position with an atomic increment of ``playthrough.tiles_revealed`` and writes nothing
+else: the current tile is regenerated from the seed until the player first acts on it,
+and only then is its ``Tile`` row stored (``store_tile``). Positions the player moved past
+without acting are never stored; history rebuilds them from the seed.
 """
 
 import random
-from typing import Optional, List, Tuple, Dict
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Optional, List, Tuple, Dict
 from flask import flash
+from sqlalchemy import case, func, insert, select, tuple_, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 from .. import model, gameTile, pqMonsters
 from flask import current_app
+from .reference_data import get_reference_data, ActionOptionRef, TileTypeRef
+from . import metrics
+from .stats_service import StatsService
+from .pagination import KeysetPage, decode_position, encode_position
 
 
 class TileData:
@@ -21,8 +41,8 @@ class TileData:
     def __init__(
         self,
         tile: model.Tile,
-        tile_type_obj: model.TileTypeOption,
-        allowed_actions: List[model.ActionOption],
+        tile_type_obj: TileTypeRef,
+        allowed_actions: List[ActionOptionRef],
         content: str = None,
     ):
         self.tile = tile
@@ -32,6 +52,27 @@ class TileData:
         self.content = content or tile.content
 
 
+@dataclass(frozen=True)
+class GeneratedTile:
+    """A tile computed from (playthrough seed, tile index), not necessarily stored"""
+    tile_index: int
+    type: int
+    content: str
+    monster_max_hp: Optional[int] = None
+
+    def to_tile(self, user_id: int, playthrough_id: int) -> model.Tile:
+        """Materialize as a new (unsaved) Tile row"""
+        return model.Tile(
+            user_id=user_id,
+            playthrough_id=playthrough_id,
+            type=self.type,
+            content=self.content,
+            monster_max_hp=self.monster_max_hp,
+            monster_current_hp=self.monster_max_hp,
+            tile_index=self.tile_index,
+        )
+
+
 class TileService:
     """Service for managing tiles in the game"""
 
@@ -40,11 +81,8 @@ class TileService:
         self.db = db_session or model.db.session
 
     def get_tile_types(self) -> List[Dict[str, any]]:
-        """Get all available tile types"""
-        return [
-            {"name": tile_type.name, "id": tile_type.id}
-            for tile_type in model.TileTypeOption.query.order_by(model.TileTypeOption.name)
-        ]
+        """Get all available tile types (served from the reference-data registry)"""
+        return [{"name": tile_type.name, "id": tile_type.id} for tile_type in get_reference_data().tile_types]
 
     def generate_tile_content(self, tile_type_name: str) -> str:
         """Generate content for a tile based on its type"""
@@ -62,51 +100,312 @@ class TileService:
         else:
             return "Unknown tile type"
 
-    def create_tile(self, user_id: int, playthrough_id: int, tile_type_id: int = None) -> model.Tile:
+    def roll_tile(self, tile_type_id: int = None, rng=None) -> Dict[str, Any]:
         """
-        Create a new tile for the player
+        Roll a tile's type, content and monster HP without touching the database
 
         Args:
-            user_id: The player's user ID
-            playthrough_id: The active playthrough ID
             tile_type_id: Optional specific tile type ID (random if not provided)
+            rng: Source of randomness (the ``random`` module if not provided); pass a
+                seeded ``random.Random`` for a reproducible roll
 
         Returns:
-            The newly created Tile object (not yet committed)
+            Dictionary of Tile column values (type, content, monster_max_hp, monster_current_hp)
         """
+        rng = rng or random
+
         # Select random tile type if not specified
         if tile_type_id is None:
             tile_types = self.get_tile_types()
-            tile_type_id = random.choice(tile_types)["id"]
-
-        # Create the tile
-        new_tile = model.Tile()
-        new_tile.type = tile_type_id
-        new_tile.user_id = user_id
-        new_tile.playthrough_id = playthrough_id
+            tile_type_id = rng.choice(tile_types)["id"]
 
-        tile_type_obj = self.db.get(model.TileTypeOption, tile_type_id)
+        tile_type_obj = get_reference_data().tile_types_by_id.get(tile_type_id)
         tile_type_name = tile_type_obj.name if tile_type_obj else None
+        rolled = {"type": tile_type_id, "content": None, "monster_max_hp": None, "monster_current_hp": None}
 
         # Initialize monster HP for monster tiles and derive the display content from the
         # same HP value so what the player sees matches what combat uses (single source).
         if tile_type_name == "monster":
             # Tougher monsters: configurable HP range
-            monster_name = pqMonsters.NPCMonster().name
+            monster_name = pqMonsters.NPCMonster(rng=rng).name
             cfg = current_app.config if current_app else {}
             hp_min = cfg.get("MONSTER_HP_MIN", 60)
             hp_max = cfg.get("MONSTER_HP_MAX", 120)
             multiplier = cfg.get("DIFFICULTY_MULTIPLIER", 1.0)
-            base_hp = random.randint(hp_min, hp_max)
+            base_hp = rng.randint(hp_min, hp_max)
             monster_hp = int(base_hp * float(multiplier))
-            new_tile.monster_max_hp = monster_hp
-            new_tile.monster_current_hp = monster_hp
-            new_tile.content = f"{monster_name} ({monster_hp} HP)"
+            rolled["monster_max_hp"] = monster_hp
+            rolled["monster_current_hp"] = monster_hp
+            rolled["content"] = f"{monster_name} ({monster_hp} HP)"
         else:
-            new_tile.content = self.generate_tile_content(tile_type_name)
+            rolled["content"] = self.generate_tile_content(tile_type_name)
+
+        return rolled
+
+    def generate_tile(self, seed: int, tile_index: int) -> "GeneratedTile":
+        """
+        Deterministically generate the tile at a position of a seeded sequence
+
+        The same (seed, index) always yields the same tile for a given set of tile types
+        and monster HP settings, so tiles need not be stored to be reproduced.
+
+        Args:
+            seed: The playthrough's seed
+            tile_index: Zero-based position in the playthrough
+
+        Returns:
+            GeneratedTile
+        """
+        rolled = self.roll_tile(rng=random.Random(f"{seed}:{tile_index}"))
+        return GeneratedTile(
+            tile_index=tile_index,
+            type=rolled["type"],
+            content=rolled["content"],
+            monster_max_hp=rolled["monster_max_hp"],
+        )
+
+    def create_tile(self, user_id: int, playthrough_id: int, tile_type_id: int = None) -> model.Tile:
+        """
+        Create a new tile for the player
+
+        Args:
+            user_id: The player's user ID
+            playthrough_id: The active playthrough ID
+            tile_type_id: Optional specific tile type ID (random if not provided)
+
+        Returns:
+            The newly created Tile object (not yet committed)
+        """
+        new_tile = model.Tile(user_id=user_id, playthrough_id=playthrough_id, **self.roll_tile(tile_type_id))
+
+        # Count the tile towards the player's rollup in the caller's transaction
+        StatsService(self.db).record_tile_explored(user_id)
+        self._count_generated(new_tile.type)
 
         return new_tile
 
+    def next_tile(self, user_id: int, playthrough_id: Optional[int]) -> model.Tile:
+        """
+        Reveal the next tile of a playthrough's seeded sequence
+
+        The position is claimed with an atomic ``tiles_revealed + 1`` (so two concurrent
+        reveals get consecutive positions), and that position's tile is generated but not
+        stored: its row is written by ``store_tile`` when the player first acts on it.
+
+        Args:
+            user_id: The player's user ID
+            playthrough_id: The active playthrough ID (legacy tiles without one are
+                generated unseeded and stored)
+
+        Returns:
+            The revealed Tile (unsaved for a playthrough; added to the session otherwise)
+        """
+        playthrough = self.db.get(model.Playthrough, playthrough_id) if playthrough_id is not None else None
+        if playthrough is None:
+            tile = self.create_tile(user_id, playthrough_id)
+            self.db.add(tile)
+            return tile
+
+        tile = self.regenerate_tile(user_id, playthrough, self._claim_position(playthrough))
+        StatsService(self.db).record_tile_explored(user_id)
+        self._count_generated(tile.type)
+        return tile
+
+    def regenerate_tile(self, user_id: int, playthrough: model.Playthrough, tile_index: int) -> model.Tile:
+        """
+        Rebuild a revealed position's tile from the playthrough's seed
+
+        Args:
+            user_id: The player's user ID
+            playthrough: The tile's playthrough
+            tile_index: The position
+
+        Returns:
+            An unsaved Tile (``id`` is None; not added to the session)
+        """
+        return self.generate_tile(playthrough.seed, tile_index).to_tile(user_id, playthrough.id)
+
+    def get_current_tile(self, user_id: int, playthrough: model.Playthrough) -> Optional[model.Tile]:
+        """
+        Get the tile at a playthrough's current position
+
+        Args:
+            user_id: The player's user ID
+            playthrough: The playthrough
+
+        Returns:
+            The stored Tile once the player has acted on it, else the tile regenerated
+            from the seed (unsaved). Playthroughs that have not revealed a seeded tile
+            fall back to their latest stored tile, or None.
+        """
+        if not playthrough.tiles_revealed:
+            return self.get_latest_tile(user_id, playthrough.id)
+        tile_index = playthrough.tiles_revealed - 1
+        stored = self._get_stored_tile(playthrough.id, tile_index)
+        return stored or self.regenerate_tile(user_id, playthrough, tile_index)
+
+    def store_tile(self, tile: model.Tile) -> model.Tile:
+        """
+        Store a generated tile, the first time the player acts on it
+
+        Runs in the caller's transaction. The row is inserted with ``INSERT ... ON
+        CONFLICT DO NOTHING`` on the (playthrough_id, tile_index) index where the dialect
+        supports it, so concurrent first actions on the same position store it once and
+        then both continue on the stored (versioned) row.
+
+        Args:
+            tile: A tile from ``get_current_tile`` (returned unchanged if already stored)
+
+        Returns:
+            The stored Tile, loaded fresh from the database
+        """
+        if tile.id is not None:
+            return tile
+
+        table = model.Tile.__table__
+        values = {
+            "user_id": tile.user_id,
+            "playthrough_id": tile.playthrough_id,
+            "tile_index": tile.tile_index,
+            "type": tile.type,
+            "content": tile.content,
+            "monster_max_hp": tile.monster_max_hp,
+            "monster_current_hp": tile.monster_current_hp,
+            "action_taken": False,
+            "created_at": datetime.now(timezone.utc),
+            "version_id": 1,
+        }
+        dialect = self.db.get_bind().dialect.name
+        if dialect in ("sqlite", "postgresql"):
+            upsert = sqlite_insert if dialect == "sqlite" else postgresql_insert
+            self.db.execute(
+                upsert(table)
+                .values(**values)
+                .on_conflict_do_nothing(index_elements=[table.c.playthrough_id, table.c.tile_index])
+            )
+        elif self._get_stored_tile(tile.playthrough_id, tile.tile_index) is None:
+            self.db.execute(insert(table).values(**values))
+        return self._get_stored_tile(tile.playthrough_id, tile.tile_index)
+
+    def _get_stored_tile(self, playthrough_id: int, tile_index: int) -> Optional[model.Tile]:
+        """The stored row of a position, refreshed from the database, or None"""
+        stmt = (
+            select(model.Tile)
+            .where(model.Tile.playthrough_id == playthrough_id, model.Tile.tile_index == tile_index)
+            .execution_options(populate_existing=True)
+        )
+        return self.db.execute(stmt).scalar_one_or_none()
+
+    def _claim_position(self, playthrough: model.Playthrough) -> int:
+        """
+        Atomically take the playthrough's next position
+
+        Playthroughs created before seeding existed get a seed in the same statement.
+
+        Returns:
+            The claimed (zero-based) tile index
+        """
+        table = model.Playthrough.__table__
+        stmt = (
+            update(table)
+            .where(table.c.id == playthrough.id)
+            .values(
+                tiles_revealed=table.c.tiles_revealed + 1,
+                seed=func.coalesce(table.c.seed, model.new_playthrough_seed()),
+            )
+        )
+        if self.db.get_bind().dialect.update_returning:
+            revealed, seed = self.db.execute(stmt.returning(table.c.tiles_revealed, table.c.seed)).one()
+        else:
+            # The UPDATE holds the row lock until commit, so this read sees our own increment
+            self.db.execute(stmt)
+            revealed, seed = self.db.execute(
+                select(table.c.tiles_revealed, table.c.seed).where(table.c.id == playthrough.id)
+            ).one()
+        set_committed_value(playthrough, "tiles_revealed", revealed)
+        set_committed_value(playthrough, "seed", seed)
+        return revealed - 1
+
+    def _count_generated(self, tile_type_id: Optional[int]) -> None:
+        """Count a generated tile in the metrics once it commits"""
+        tile_type = get_reference_data().tile_types_by_id.get(tile_type_id)
+        metrics.record(self.db, metrics.TILES_GENERATED, type=tile_type.name if tile_type else "unknown")
+
+    def get_tile_history(self, user_id: int, cursor: Optional[str] = None, limit: int = 25) -> KeysetPage:
+        """
+        Get one page of a player's tiles: newest playthrough first and, within it, latest
+        position first (stored tiles without a position follow, newest first)
+
+        Positions the player moved past without acting have no row and are rebuilt from
+        the playthrough's seed. Stored tiles come with their encounters and action record
+        loaded in one extra query apiece (no N+1).
+
+        Args:
+            user_id: The player's user ID
+            cursor: Cursor token from the previous page, or None for the first page
+            limit: Page size
+
+        Returns:
+            KeysetPage of Tile records (unsaved for rebuilt positions)
+
+        Raises:
+            InvalidCursor: If ``cursor`` is malformed
+        """
+        # Every entry sorts on (playthrough id or 0, 1 if positioned else 0, position or id)
+        after = decode_position(cursor, 3) if cursor else None
+
+        # Revealed positions after the cursor: only the first limit + 1 can be on this page
+        playthrough_stmt = (
+            select(model.Playthrough)
+            .where(model.Playthrough.user_id == user_id, model.Playthrough.tiles_revealed > 0)
+            .order_by(model.Playthrough.id.desc())
+        )
+        if after:
+            playthrough_stmt = playthrough_stmt.where(model.Playthrough.id <= after[0])
+        positions: Dict[Tuple[int, int, int], model.Playthrough] = {}
+        for playthrough in self.db.execute(playthrough_stmt).scalars():
+            top = playthrough.tiles_revealed
+            if after and playthrough.id == after[0]:
+                top = min(top, after[2]) if after[1] else 0
+            for tile_index in range(top - 1, -1, -1):
+                if len(positions) > limit:
+                    break
+                positions[(playthrough.id, 1, tile_index)] = playthrough
+            if len(positions) > limit:
+                break
+
+        # Stored tiles in the same order, cut off where the positions above run out
+        tile = model.Tile
+        sort_key = (
+            func.coalesce(tile.playthrough_id, 0),
+            case((tile.tile_index.is_(None), 0), else_=1),
+            func.coalesce(tile.tile_index, tile.id),
+        )
+        stmt = (
+            select(tile)
+            .where(tile.user_id == user_id)
+            .options(selectinload(tile.encounters), selectinload(tile.tile_action))
+        )
+        if after:
+            stmt = stmt.where(tuple_(*sort_key) < tuple_(*after))
+        if len(positions) > limit:
+            stmt = stmt.where(sort_key[0] >= min(positions)[0])
+        stmt = stmt.order_by(*(column.desc() for column in sort_key)).limit(limit + 1)
+        stored = {
+            (t.playthrough_id or 0, 0 if t.tile_index is None else 1, t.id if t.tile_index is None else t.tile_index): t
+            for t in self.db.execute(stmt).scalars()
+        }
+
+        keys = sorted(positions.keys() | stored.keys(), reverse=True)
+        items = [
+            stored[key] if key in stored else self.regenerate_tile(user_id, positions[key], key[2])
+            for key in keys[:limit]
+        ]
+        has_more = len(keys) > limit
+        return KeysetPage(
+            items=items, next_cursor=encode_position(*keys[limit - 1]) if has_more else None, has_more=has_more
+        )
+
     def get_latest_tile(self, user_id: int, playthrough_id: int = None) -> Optional[model.Tile]:
         """
         Get the most recent tile for a user
@@ -141,7 +440,7 @@ class TileService:
             .first()
         )
 
-    def get_allowed_actions(self, tile_type_name: str) -> List[model.ActionOption]:
+    def get_allowed_actions(self, tile_type_name: str) -> List[ActionOptionRef]:
         """
         Get allowed actions for a specific tile type
 
@@ -149,9 +448,9 @@ class TileService:
             tile_type_name: Name of the tile type (sign, monster, treasure, scene)
 
         Returns:
-            List of allowed ActionOption objects
+            List of allowed ActionOption references, sorted by name
         """
-        all_actions = model.ActionOption.query.order_by(model.ActionOption.name).all()
+        all_actions = list(get_reference_data().action_options)
 
         if tile_type_name == "sign":
             # Sign tiles only allow rest, inspect, and quit
@@ -176,8 +475,19 @@ class TileService:
         tile = self.db.get(model.Tile, tile_id)
         if not tile:
             return None
+        return self.describe_tile(tile)
 
-        tile_type_obj = self.db.get(model.TileTypeOption, tile.type)
+    def describe_tile(self, tile: model.Tile) -> TileData:
+        """
+        Get tile data (type and allowed actions) for a tile already loaded or generated
+
+        Args:
+            tile: The Tile, stored or not
+
+        Returns:
+            TileData object
+        """
+        tile_type_obj = get_reference_data().tile_types_by_id.get(tile.type)
         tile_type_name = tile_type_obj.name if tile_type_obj else None
         allowed_actions = self.get_allowed_actions(tile_type_name)
 
@@ -213,10 +523,11 @@ class TileService:
         Returns:
             True if a new tile should be generated
         """
-        latest_tile = self.get_latest_tile(user_id, playthrough_id)
+        playthrough = self.db.get(model.Playthrough, playthrough_id)
+        current_tile = self.get_current_tile(user_id, playthrough) if playthrough else None
 
-        # Need new tile if no tiles exist or last tile was actioned
-        return latest_tile is None or latest_tile.action_taken
+        # Need new tile if no tiles exist or the current tile was actioned
+        return current_tile is None or bool(current_tile.action_taken)
 
     def start_new_playthrough(self, user_id: int) -> Tuple[model.Playthrough, model.Tile]:
         """
@@ -226,15 +537,15 @@ class TileService:
             user_id: The player's user ID
 
         Returns:
-            Tuple of (new_playthrough, first_tile)
+            Tuple of (new_playthrough, first_tile); the first tile is not stored until
+            the player acts on it
         """
         # Create new playthrough
         new_playthrough = model.Playthrough(user_id=user_id)
         self.db.add(new_playthrough)
         self.db.flush()  # Get the playthrough ID
 
-        # Create first tile
-        first_tile = self.create_tile(user_id, new_playthrough.id)
-        self.db.add(first_tile)
+        # Reveal the first tile of the playthrough's seeded sequence
+        first_tile = self.next_tile(user_id, new_playthrough.id)
 
         return new_playthrough, first_tile
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Rebuild the PlayerStats rollup from existing encounters and tiles.
+Migration 0011 backfills the rollup; run this any time it is suspected to be stale.
+
+Usage:
+    python rebuild_player_stats.py             # every player
+    python rebuild_player_stats.py <user_id>   # a single player
+"""
+import sys
+from pathlib import Path
+
+# Add the parent directory to Python path to import pq_app
+sys.path.insert(0, str(Path(__file__).parent))
+
+from pq_app import create_app  # noqa: E402
+from pq_app.model import db  # noqa: E402
+from pq_app.services.stats_service import StatsService  # noqa: E402
+
+
+def rebuild_player_stats(user_id=None):
+    """Recompute rollup rows and commit them"""
+    app = create_app()
+
+    with app.app_context():
+        written = StatsService().rebuild_player_stats(user_id)
+        db.session.commit()
+        print(f"✓ Rebuilt statistics for {written} player(s)")
+
+
+if __name__ == '__main__':
+    user_id = int(sys.argv[1]) if len(sys.argv) > 1 else None
+    print("Rebuilding player statistics...\n")
+    rebuild_player_stats(user_id)
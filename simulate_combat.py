@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Monte Carlo combat simulation for tuning the difficulty and XP knobs in config.py.
+Simulates every class/race combination with each policy and prints win rate,
+death rate, turns-to-kill and the XP curve. Requires numpy.
+
+Usage:
+    python simulate_combat.py                                  # 100k players, 1 fight each
+    python simulate_combat.py --lanes 1000000 --fights 10
+    python simulate_combat.py --policy heal_below --threshold 50
+    python simulate_combat.py --set DIFFICULTY_MULTIPLIER=1.5 --set COUNTER_ATTACK_CHANCE=60
+    python simulate_combat.py --json > results.json
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+# Add the parent directory to Python path to import pq_app
+sys.path.insert(0, str(Path(__file__).parent))
+
+from pq_app import create_app  # noqa: E402
+from pq_app.services.combat_engine import CombatConfig  # noqa: E402
+from pq_app.services.combat_simulator import POLICIES, simulate_matrix  # noqa: E402
+from pq_app.services.reference_data import get_reference_data  # noqa: E402
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate combat to balance the difficulty knobs")
+    parser.add_argument("--lanes", type=int, default=100000, help="players simulated per class/race/policy")
+    parser.add_argument("--fights", type=int, default=1, help="monsters each player fights in a row")
+    parser.add_argument("--max-turns", type=int, default=100, help="turn cap per fight")
+    parser.add_argument("--policy", action="append", choices=sorted(POLICIES), help="policy to run (repeatable)")
+    parser.add_argument("--threshold", type=int, default=40, help="HP percent for heal_below / flee_below")
+    parser.add_argument("--set", action="append", default=[], metavar="KEY=VALUE", help="override a config knob")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    return parser.parse_args(argv)
+
+
+def print_table(summaries):
+    print(f"{'class':<10}{'race':<12}{'policy':<12}{'win':>8}{'died':>8}{'fled':>8}{'turns':>8}{'p90':>6}{'level':>8}")
+    for s in summaries:
+        turns = s["turns_to_kill"]
+        print(
+            f"{s['class']:<10}{s['race']:<12}{s['policy']:<12}"
+            f"{s['won_rate']:>8.1%}{s['died_rate']:>8.1%}{s['fled_rate']:>8.1%}"
+            f"{turns['mean'] or 0:>8.1f}{turns['p90'] or 0:>6.0f}{s['xp_curve'][-1]['mean_level']:>8.2f}"
+        )
+
+
+def simulate_combat(args):
+    """Run the simulation against the configured database's combat actions"""
+    app = create_app()
+
+    with app.app_context():
+        cfg = dict(app.config)
+        for override in args.set:
+            key, _, value = override.partition("=")
+            cfg[key.strip().upper()] = value.strip()
+        config = CombatConfig.from_config(cfg)
+
+        started = time.perf_counter()
+        summaries = simulate_matrix(
+            get_reference_data(),
+            policies=args.policy or sorted(POLICIES),
+            lanes=args.lanes,
+            fights=args.fights,
+            config=config,
+            max_turns=args.max_turns,
+            policy_params={"threshold": args.threshold},
+            seed=args.seed,
+        )
+        elapsed = time.perf_counter() - started
+
+    if args.json:
+        print(json.dumps({"config": config.__dict__, "results": summaries}, indent=2))
+    else:
+        print_table(summaries)
+        total = sum(s["fights"] for s in summaries)
+        print(f"\n✓ Simulated {total:,} fights in {elapsed:.1f}s")
+
+
+if __name__ == '__main__':
+    simulate_combat(parse_args())
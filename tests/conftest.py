@@ -1,6 +1,9 @@
+from contextlib import contextmanager
+
 import pytest
 from pq_app import create_app
 from pq_app.model import db
+from pq_app.services.query_counter import count_queries
 
 
 @pytest.fixture
@@ -41,3 +44,31 @@ def authenticated_client(client, app):
 
     client.post("/login", data={"username": "testuser", "password": "testpass"})
     return client
+
+
+@pytest.fixture
+def query_budget():
+    """
+    Hold a block (typically one request) to a SQL statement budget::
+
+        with query_budget(6):
+            client.get("/api/v1/player/1/state", headers=headers)
+
+    Fails if the block runs more than ``max_queries`` statements, or one identical
+    statement more than ``max_repeats`` times (an N+1 loop).
+    """
+
+    @contextmanager
+    def budget(max_queries, max_repeats=2):
+        with count_queries() as stats:
+            yield stats
+        problems = []
+        if stats.count > max_queries:
+            problems.append(f"{stats.count} statements, budget is {max_queries}")
+        for statement, n in stats.repeated(max_repeats + 1).items():
+            problems.append(f"N+1: ran {n} times (max {max_repeats}): {statement}")
+        if problems:
+            statements = "\n".join(f"  {n}x {statement}" for statement, n in stats.statements.most_common())
+            pytest.fail("\n".join(problems) + "\nstatements:\n" + statements, pytrace=False)
+
+    return budget
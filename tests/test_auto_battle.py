@@ -0,0 +1,161 @@
+"""
+Tests for resolve-to-completion auto battles.
+"""
+import pytest
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+
+from pq_app import create_app
+from pq_app.model import db, User, Tile, Playthrough, TileTypeOption, Encounter, init_defaults
+from pq_app.services.combat_engine import PlayerState, choose_action
+from pq_app.services.reference_data import get_reference_data
+from pq_app.services.stats_service import StatsService
+
+
+@pytest.fixture
+def app():
+    app = create_app("testing")
+    with app.app_context():
+        db.create_all()
+        init_defaults()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def _player_with_tile(monster_hp=60, tile_type="monster", username="auto_player"):
+    player = User(username=username)
+    player.set_password("pw")
+    player.points = 100
+    db.session.add(player)
+    db.session.flush()
+    playthrough = Playthrough(user_id=player.id)
+    db.session.add(playthrough)
+    db.session.flush()
+    tile_type_id = TileTypeOption.query.filter_by(name=tile_type).first().id
+    tile = Tile(
+        user_id=player.id,
+        type=tile_type_id,
+        playthrough_id=playthrough.id,
+        monster_max_hp=monster_hp if tile_type == "monster" else None,
+        monster_current_hp=monster_hp if tile_type == "monster" else None,
+    )
+    db.session.add(tile)
+    db.session.commit()
+    return player, tile
+
+
+def _auto(app, player, **body):
+    headers = {"Authorization": f"Bearer {create_access_token(identity=str(player.id))}"}
+    return app.test_client().post(f"/api/v1/player/{player.id}/combat/auto", json=body, headers=headers)
+
+
+def test_fight_resolves_in_one_request_and_one_encounter_insert(app):
+    player, tile = _player_with_tile(monster_hp=60)
+    app.config.update(COUNTER_ATTACK_CHANCE=0)
+    player_id, tile_id = player.id, tile.id
+
+    inserts = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("INSERT INTO ENCOUNTER"):
+            inserts.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", _record)
+    try:
+        response = _auto(app, player, tile_id=tile_id, policy="heavy")
+    finally:
+        event.remove(db.engine, "before_cursor_execute", _record)
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert data["outcome"] == "won" and data["tile_completed"]
+    assert data["monster_hp"] == 0
+    assert data["xp_gained"] == 60
+    assert len(data["log"]) == data["turns"] > 1
+    assert {entry["action"] for entry in data["log"]} == {"attack_heavy"}
+    assert data["points_balance"] == 100 - data["turns"]
+    assert len(inserts) == 1
+
+    # Everything was committed
+    db.session.expire_all()
+    assert db.session.get(Tile, tile_id).monster_current_hp == 0
+    assert Encounter.query.filter_by(tile_id=tile_id).count() == data["turns"]
+    stats = StatsService().get_player_stats(player_id)
+    assert (stats.total_encounters, stats.monsters_killed) == (data["turns"], 1)
+
+
+def test_fight_ends_on_death_or_turn_cap(app):
+    app.config.update(COUNTER_ATTACK_CHANCE=100, COUNTER_DAMAGE_MIN=40, COUNTER_DAMAGE_MAX=40)
+    player, tile = _player_with_tile(monster_hp=10000)
+    data = _auto(app, player, tile_id=tile.id, policy="heavy").get_json()
+    assert data["outcome"] == "died"
+    assert data["player_hp"] == 0 and not data["player_alive"]
+    assert data["turns"] == len(data["log"])
+
+    app.config.update(COUNTER_ATTACK_CHANCE=0)
+    other, other_tile = _player_with_tile(monster_hp=10000, username="capped_player")
+    data = _auto(app, other, tile_id=other_tile.id, policy="strongest", max_turns=2).get_json()
+    assert (data["outcome"], data["turns"], data["player_alive"]) == ("turn_limit", 2, True)
+
+
+def test_policy_choice(app):
+    actions = get_reference_data().combat_actions_for(None, None, "monster").actions
+    healthy, hurt = PlayerState(90, 100), PlayerState(30, 100)
+    assert choose_action("heal_below", actions, healthy).code == "attack_heavy"
+    assert choose_action("heal_below", actions, hurt).code == "heal"
+    assert choose_action("flee_below", actions, hurt).code == "flee"
+    assert choose_action("light", actions, hurt).code == "attack_light"
+    with pytest.raises(ValueError):
+        choose_action("berserk", actions, healthy)
+
+
+def test_invalid_requests(app):
+    player, tile = _player_with_tile()
+    assert _auto(app, player, tile_id=tile.id, policy="berserk").status_code == 400
+    assert _auto(app, player, tile_id=tile.id, threshold=150).status_code == 400
+    assert _auto(app, player).status_code == 400
+
+    _, treasure = _player_with_tile(tile_type="treasure", username="treasure_player")
+    assert _auto(app, player, tile_id=treasure.id).status_code == 404
+
+    own_treasure = Tile(user_id=player.id, type=treasure.type, playthrough_id=tile.playthrough_id)
+    db.session.add(own_treasure)
+    db.session.commit()
+    assert _auto(app, player, tile_id=own_treasure.id).status_code == 400
+
+    # Already-actioned tiles are rejected by CombatService.validate_tile_action
+    tile.action_taken = True
+    db.session.commit()
+    assert _auto(app, player, tile_id=tile.id).status_code == 400
+    assert Encounter.query.count() == 0
+
+
+def test_single_combat_action_is_committed(app):
+    player, tile = _player_with_tile(monster_hp=500)
+    tile_id = tile.id
+    headers = {"Authorization": f"Bearer {create_access_token(identity=str(player.id))}"}
+    response = app.test_client().post(
+        f"/api/v1/player/{player.id}/combat/execute",
+        json={"tile_id": tile_id, "combat_action_code": "attack_light"},
+        headers=headers,
+    )
+    assert response.status_code == 200
+    db.session.remove()
+    assert Encounter.query.filter_by(tile_id=tile_id).count() == 1
+
+
+def test_single_combat_action_rejects_foreign_and_actioned_tiles(app):
+    player, tile = _player_with_tile(monster_hp=500)
+    _, foreign = _player_with_tile(username="other_player")
+    tile.action_taken = True
+    db.session.commit()
+    headers = {"Authorization": f"Bearer {create_access_token(identity=str(player.id))}"}
+
+    def act(tile_id):
+        body = {"tile_id": tile_id, "combat_action_code": "attack_light"}
+        return app.test_client().post(f"/api/v1/player/{player.id}/combat/execute", json=body, headers=headers)
+
+    assert act(tile.id).status_code == 400
+    assert act(foreign.id).status_code == 404
+    assert Encounter.query.count() == 0
@@ -0,0 +1,39 @@
+"""
+Smoke test for the load-test harness (benchmark_load.py).
+"""
+import config
+
+import benchmark_load
+
+
+def test_players_complete_journeys(monkeypatch):
+    # The harness points the development config at its own database; restore it afterwards
+    for name in ("SQLALCHEMY_DATABASE_URI", "SQLALCHEMY_ENGINE_OPTIONS", "DEBUG"):
+        monkeypatch.setattr(config.DevelopmentConfig, name, getattr(config.DevelopmentConfig, name))
+    args = benchmark_load.parse_args(
+        ["--players", "4", "--seconds", "3", "--ramp-up", "0.5", "--think-time", "0.05", "--session-gap", "0.1"]
+        + ["--workers", "1", "--threads", "2"]
+    )
+
+    result = benchmark_load.run("sqlite", args)
+
+    endpoints = {e["endpoint"]: e for e in result["endpoints"]}
+    assert result["players"] == 4
+    assert endpoints["POST auth/register"]["requests"] == 4
+    for name in ("POST auth/login", "GET tiles/current", "POST tiles/next"):
+        assert endpoints[name]["requests"] > 0
+        assert endpoints[name]["error_rate"] == 0
+        assert endpoints[name]["db_queries_mean"] > 0
+    assert result["total"]["p99_ms"] >= result["total"]["p50_ms"] > 0
+
+
+def test_regressions_flag_slower_p99_and_more_errors():
+    def result(p99, error_rate):
+        endpoint = {"endpoint": "POST tiles/next", "p99_ms": p99, "error_rate": error_rate}
+        return [{"database": "sqlite", "endpoints": [endpoint], "total": dict(endpoint, endpoint="total")}]
+
+    baseline = result(100.0, 0.0)
+    assert benchmark_load.regressions(result(115.0, 0.005), baseline, max_regression=20) == []
+    found = benchmark_load.regressions(result(130.0, 0.05), baseline, max_regression=20)
+    assert "sqlite POST tiles/next: p99 100.0 -> 130.0 ms" in found
+    assert "sqlite total: error rate 0.00% -> 5.00%" in found
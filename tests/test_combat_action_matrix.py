@@ -0,0 +1,73 @@
+"""
+Tests for the precomputed (class, race, tile context) combat-action matrix.
+"""
+import pytest
+
+from pq_app import create_app
+from pq_app.api.schemas import combat_actions_schema
+from pq_app.model import db, User, CombatAction, PlayerClass, PlayerRace, init_defaults
+from pq_app.services.combat_service import CombatService
+from pq_app.services.reference_data import get_reference_data
+
+
+@pytest.fixture
+def app():
+    app = create_app("testing")
+    with app.app_context():
+        db.create_all()
+        init_defaults()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def _player(class_name=None, race_name=None):
+    player = User(username="matrix_player")
+    if class_name:
+        player.playerclass = PlayerClass.query.filter_by(name=class_name).first().id
+    if race_name:
+        player.playerrace = PlayerRace.query.filter_by(name=race_name).first().id
+    return player
+
+
+def test_matrix_covers_every_combination(app):
+    with app.app_context():
+        reference = get_reference_data()
+        # (3 classes + unset) x (3 races + unset) x (4 tile types + no context)
+        assert len(reference.combat_action_matrix) == 4 * 4 * 5
+
+
+def test_class_and_race_filtering(app):
+    with app.app_context():
+        codes = {a.code for a in CombatService().get_available_actions(_player("witch", "Elf"), "monster")}
+        assert {"fireball", "elven_grace", "attack_light", "flee"} <= codes
+        assert "power_strike" not in codes
+        assert "pandarian_calm" not in codes
+
+        basic = {a.code for a in CombatService().get_available_actions(_player())}
+        assert basic == {"attack_light", "attack_heavy", "defend", "heal", "flee"}
+
+
+def test_api_payload_matches_schema_output(app):
+    with app.app_context():
+        for action_set in get_reference_data().combat_action_matrix.values():
+            assert list(action_set.api_payload) == combat_actions_schema.dump(action_set.actions)
+
+
+def test_unknown_key_falls_back_to_filtering(app):
+    with app.app_context():
+        action_set = get_reference_data().combat_actions_for(None, None, "volcano")
+        assert [a.code for a in action_set.actions] == [
+            a.code for a in get_reference_data().combat_actions_for(None, None).actions
+        ]
+
+
+def test_matrix_rebuilt_when_combat_actions_change(app):
+    with app.app_context():
+        fighter = _player("fighter")
+        assert "whirlwind" not in {a.code for a in CombatService().get_available_actions(fighter)}
+
+        db.session.add(CombatAction(name="Whirlwind", code="whirlwind", requires_class=fighter.playerclass))
+        db.session.commit()
+
+        assert "whirlwind" in {a.code for a in CombatService().get_available_actions(fighter)}
@@ -0,0 +1,115 @@
+"""
+Tests for batched multi-action combat submissions.
+"""
+import pytest
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+
+from pq_app import create_app
+from pq_app.model import db, User, Tile, Playthrough, TileTypeOption, Encounter, init_defaults
+from pq_app.services.stats_service import StatsService
+
+
+@pytest.fixture
+def app():
+    app = create_app("testing")
+    with app.app_context():
+        db.create_all()
+        init_defaults()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def _player_with_tile(monster_hp=60, username="batch_player"):
+    player = User(username=username)
+    player.set_password("pw")
+    player.points = 100
+    db.session.add(player)
+    db.session.flush()
+    playthrough = Playthrough(user_id=player.id)
+    db.session.add(playthrough)
+    db.session.flush()
+    tile = Tile(
+        user_id=player.id,
+        type=TileTypeOption.query.filter_by(name="monster").first().id,
+        playthrough_id=playthrough.id,
+        monster_max_hp=monster_hp,
+        monster_current_hp=monster_hp,
+    )
+    db.session.add(tile)
+    db.session.commit()
+    return player, tile
+
+
+def _batch(app, player, **body):
+    headers = {"Authorization": f"Bearer {create_access_token(identity=str(player.id))}"}
+    return app.test_client().post(f"/api/v1/player/{player.id}/combat/batch", json=body, headers=headers)
+
+
+def test_batch_runs_in_order_with_one_encounter_insert(app):
+    app.config.update(COUNTER_ATTACK_CHANCE=0)
+    player, tile = _player_with_tile(monster_hp=10000)
+    player_id, tile_id = player.id, tile.id
+    codes = ["defend", "attack_heavy", "attack_light"]
+
+    inserts = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("INSERT INTO ENCOUNTER"):
+            inserts.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", _record)
+    try:
+        response = _batch(app, player, tile_id=tile_id, combat_action_codes=codes)
+    finally:
+        event.remove(db.engine, "before_cursor_execute", _record)
+
+    assert response.status_code == 200
+    data = response.get_json()
+    assert (data["outcome"], data["turns"], data["requested"]) == ("in_progress", 3, 3)
+    assert [entry["action"] for entry in data["log"]] == codes
+    assert data["points_balance"] == 97
+    assert len(inserts) == 1
+
+    db.session.expire_all()
+    assert db.session.get(Tile, tile_id).monster_current_hp == data["monster_hp"]
+    assert Encounter.query.filter_by(tile_id=tile_id).count() == 3
+    assert StatsService().get_player_stats(player_id).total_encounters == 3
+
+
+def test_batch_stops_early_when_the_monster_dies(app):
+    app.config.update(COUNTER_ATTACK_CHANCE=0)
+    player, tile = _player_with_tile(monster_hp=1)
+    tile_id = tile.id
+
+    data = _batch(app, player, tile_id=tile_id, combat_action_codes=["attack_heavy"] * 5).get_json()
+    hits = next(i for i, entry in enumerate(data["log"]) if entry["success"]) + 1
+    assert (data["outcome"], data["turns"], data["requested"]) == ("won", hits, 5)
+    assert data["tile_completed"] and data["points_balance"] == 100 - hits
+
+    db.session.remove()
+    assert Encounter.query.filter_by(tile_id=tile_id).count() == hits
+    # The tile is done, so a further batch is refused
+    player = db.session.get(User, player.id)
+    assert _batch(app, player, tile_id=tile_id, combat_action_codes=["attack_light"]).status_code == 400
+
+
+def test_invalid_batches(app):
+    player, tile = _player_with_tile()
+    assert _batch(app, player, tile_id=tile.id).status_code == 400
+    assert _batch(app, player, tile_id=tile.id, combat_action_codes=[]).status_code == 400
+    assert _batch(app, player, tile_id=tile.id, combat_action_codes=[{"code": "heal"}]).status_code == 400
+    unavailable = ["attack_light", "dragon_breath"]
+    assert _batch(app, player, tile_id=tile.id, combat_action_codes=unavailable).status_code == 400
+
+    app.config.update(COMBAT_BATCH_MAX_ACTIONS=2)
+    assert _batch(app, player, tile_id=tile.id, combat_action_codes=["heal"] * 3).status_code == 400
+
+    other, other_tile = _player_with_tile(username="other_batch_player")
+    assert _batch(app, player, tile_id=other_tile.id, combat_action_codes=["heal"]).status_code == 404
+
+    tile.action_taken = True
+    db.session.commit()
+    assert _batch(app, player, tile_id=tile.id, combat_action_codes=["attack_light"]).status_code == 400
+    assert Encounter.query.count() == 0
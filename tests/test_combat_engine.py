@@ -0,0 +1,108 @@
+"""
+Tests for the pure combat engine (no app, request or database needed).
+"""
+import random
+
+from pq_app.services import combat_engine
+from pq_app.services.combat_engine import (
+    CombatConfig,
+    DefenseChanged,
+    MonsterDamaged,
+    PlayerDamaged,
+    PlayerState,
+    TileState,
+)
+from pq_app.services.reference_data import CombatActionRef
+
+CONFIG = CombatConfig(counter_attack_chance=100, counter_damage_min=6, counter_damage_max=6, healing_nerf_percent=50)
+
+
+def _action(code, damage=(0, 0), heal=0, defense=0, success_rate=100):
+    return CombatActionRef(
+        id=1,
+        name=code.title(),
+        code=code,
+        description=None,
+        damage_min=damage[0],
+        damage_max=damage[1],
+        heal_amount=heal,
+        defense_boost=defense,
+        success_rate=success_rate,
+        requires_class=None,
+        requires_race=None,
+    )
+
+
+def test_resolution_does_not_touch_inputs():
+    player = PlayerState(hitpoints=50, max_hp=100)
+    tile = TileState(monster_current_hp=40, monster_max_hp=40, player_defense_pending=4)
+
+    resolution = combat_engine.resolve_combat_action(player, tile, _action("hit", (10, 10)), CONFIG, random.Random(1))
+
+    assert player == PlayerState(hitpoints=50, max_hp=100)
+    assert tile == TileState(monster_current_hp=40, monster_max_hp=40, player_defense_pending=4)
+    assert resolution.effects == [MonsterDamaged(10, 30), DefenseChanged(None), PlayerDamaged(2)]
+    assert resolution.message == "Hit: dealt 10 damage, Monster HP: 30/40, blocked 4 with defense, received 2 damage!"
+    assert (resolution.player_hp_after, resolution.monster_hp_after, resolution.hp_change) == (48, 30, -2)
+
+    # Replaying the effects onto copies reproduces the resolved states
+    player_copy, tile_copy = PlayerState.of(player), TileState.of(tile)
+    for effect in resolution.effects:
+        effect.apply(player_copy, tile_copy)
+    assert (player_copy, tile_copy) == (resolution.player, resolution.tile)
+
+
+def test_same_rng_seed_gives_same_fight():
+    def fight(seed):
+        rng = random.Random(seed)
+        player = PlayerState(hitpoints=100, max_hp=100)
+        tile = TileState(monster_current_hp=80, monster_max_hp=80)
+        action = _action("hit", (5, 12), success_rate=80)
+        log = []
+        while player.hitpoints > 0 and tile.monster_current_hp > 0:
+            resolution = combat_engine.resolve_combat_action(player, tile, action, CONFIG, rng)
+            player, tile = resolution.player, resolution.tile
+            log.append(resolution.message)
+        return log, player
+
+    assert fight(7) == fight(7)
+
+
+def test_kill_awards_xp_with_level_up():
+    config = CombatConfig(xp_base=50, hp_per_level=10, xp_per_monster_hp=1.0)
+    player = PlayerState(hitpoints=40, max_hp=100, level=1, exp_points=20)
+    tile = TileState(monster_current_hp=5, monster_max_hp=60)
+
+    resolution = combat_engine.resolve_combat_action(player, tile, _action("hit", (9, 9)), config, random.Random(0))
+
+    assert resolution.monster_defeated and resolution.tile_completed
+    assert resolution.xp["xp_awarded"] == 60 and resolution.xp["levels_gained"] == 1
+    assert resolution.player == PlayerState(hitpoints=50, max_hp=110, level=2, exp_points=30)
+    assert resolution.message.endswith("+60 XP, Leveled up to 2 (+10 max HP)!")
+
+
+def test_heal_is_nerfed_and_draws_no_counter_attack():
+    player = PlayerState(hitpoints=70, max_hp=100)
+    resolution = combat_engine.resolve_combat_action(
+        player, TileState(50, 50), _action("heal", heal=40), CONFIG, random.Random(0)
+    )
+    # min(40, 30 missing) = 30, halved by the nerf
+    assert resolution.player.hitpoints == 85
+    assert resolution.damage_received == 0
+
+
+def test_failed_flee_is_countered_through_defense():
+    class Rolls:
+        values = [100, 6]
+
+        def randint(self, a, b):
+            return self.values.pop(0)
+
+    tile = TileState(50, 50, player_defense_pending=5)
+    resolution = combat_engine.resolve_combat_action(
+        PlayerState(30, 100), tile, _action("flee", success_rate=60), CONFIG, Rolls()
+    )
+    assert not resolution.fled and not resolution.tile_completed
+    assert resolution.player.hitpoints == 29
+    assert resolution.tile.player_defense_pending is None
+    assert resolution.message == "You failed to flee! The monster hits you for 1 damage."
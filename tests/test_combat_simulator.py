@@ -0,0 +1,143 @@
+"""
+Tests for the vectorized combat simulator, including lane-by-lane parity with CombatService.
+"""
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from pq_app import create_app  # noqa: E402
+from pq_app.model import db, User, Tile, TileTypeOption, PlayerClass, PlayerRace, init_defaults  # noqa: E402
+from pq_app.services import combat_service  # noqa: E402
+from pq_app.services.combat_engine import CombatConfig  # noqa: E402
+from pq_app.services.combat_service import CombatService  # noqa: E402
+from pq_app.services.combat_simulator import (  # noqa: E402
+    DIED,
+    FLED,
+    NOT_FOUGHT,
+    POLICIES,
+    WON,
+    simulate,
+    simulate_matrix,
+)
+from pq_app.services.reference_data import get_reference_data  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    app = create_app("testing")
+    # Tougher monsters so fights run long enough to heal, defend, flee and die
+    app.config.update(
+        MONSTER_HP_MIN=80, MONSTER_HP_MAX=160, COUNTER_ATTACK_CHANCE=80, HEALING_NERF_PERCENT=25, XP_BASE=60
+    )
+    with app.app_context():
+        db.create_all()
+        init_defaults()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+class ScriptedRandom:
+    """Stands in for the random module, returning the simulator's draws in call order"""
+
+    def __init__(self):
+        self.values = []
+
+    def randint(self, a, b):
+        value = self.values.pop(0)
+        assert a <= value <= b
+        return value
+
+
+def _every_action():
+    """A policy that rotates each lane through every action, so all of them get replayed"""
+    turn = iter(range(10**9))
+
+    def policy(table, state, params):
+        return (np.arange(state.hp.size) + next(turn)) % len(table.actions)
+
+    return policy
+
+
+def _actions_for(class_name, race_name):
+    player_class = PlayerClass.query.filter_by(name=class_name).first()
+    player_race = PlayerRace.query.filter_by(name=race_name).first()
+    actions = get_reference_data().combat_actions_for(player_class.id, player_race.id, "monster").actions
+    return player_class, player_race, actions
+
+
+@pytest.mark.parametrize("class_name,race_name", [("fighter", "Elf"), ("healer", "Pandarian")])
+def test_simulation_matches_combat_service(app, monkeypatch, class_name, race_name):
+    scripted = ScriptedRandom()
+    monkeypatch.setattr(combat_service, "random", scripted)
+    player_class, player_race, actions = _actions_for(class_name, race_name)
+    monster_type = TileTypeOption.query.filter_by(name="monster").first()
+    config = CombatConfig.from_config(app.config)
+    lanes = 8
+
+    for name, policy in [(name, name) for name in sorted(POLICIES)] + [("every_action", _every_action())]:
+        result = simulate(
+            actions, policy, lanes=lanes, fights=3, config=config, seed=11, record=True,
+            policy_params={"threshold": 50},
+        )
+        for lane in range(lanes):
+            player = User(
+                username=f"sim_{name}_{lane}",
+                password_hash="x",
+                playerclass=player_class.id,
+                playerrace=player_race.id,
+            )
+            db.session.add(player)
+            db.session.flush()
+
+            for fight, (monster_hp, draws) in enumerate(result.trace):
+                if result.outcomes[fight, lane] == NOT_FOUGHT:
+                    assert player.hitpoints == 0
+                    break
+                hp = int(monster_hp[lane])
+                tile = Tile(user_id=player.id, type=monster_type.id, monster_max_hp=hp, monster_current_hp=hp)
+                db.session.add(tile)
+                db.session.flush()
+
+                with app.test_request_context():
+                    for turn in draws[: result.turns[fight, lane]]:
+                        action = result.table.actions[turn.action[turn.position(lane)]]
+                        scripted.values = turn.script(lane, result.table)
+                        outcome = CombatService().execute_combat_action(player, tile, action)
+
+                expected = result.outcomes[fight, lane]
+                assert (tile.monster_current_hp == 0) == (expected == WON)
+                assert (player.hitpoints == 0) == (expected == DIED)
+                assert (outcome.success and action.code == "flee") == (expected == FLED)
+                assert player.level == result.level[fight, lane]
+
+            state = result.state
+            assert (player.hitpoints, player.max_hp, player.level, player.exp_points) == (
+                state.hp[lane],
+                state.max_hp[lane],
+                state.level[lane],
+                state.exp[lane],
+            )
+        db.session.rollback()
+
+
+def test_summary_is_reproducible_and_complete(app):
+    _, _, actions = _actions_for("witch", "Human")
+    config = CombatConfig.from_config(app.config)
+
+    first = simulate(actions, "heal_below", lanes=2000, fights=4, config=config, seed=3).summary()
+    again = simulate(actions, "heal_below", lanes=2000, fights=4, config=config, seed=3).summary()
+    assert first == again
+
+    rates = first["won_rate"] + first["died_rate"] + first["fled_rate"] + first["timed_out_rate"]
+    assert rates == pytest.approx(1.0)
+    assert [point["fight"] for point in first["xp_curve"]] == [1, 2, 3, 4]
+    levels = [point["mean_level"] for point in first["xp_curve"]]
+    assert levels == sorted(levels)
+    assert first["turns_to_kill"]["mean"] > 0
+
+
+def test_matrix_covers_every_class_race_and_policy(app):
+    summaries = simulate_matrix(get_reference_data(), policies=["light", "flee_below"], lanes=50, seed=1)
+    combos = {(s["class"], s["race"], s["policy"]) for s in summaries}
+    assert len(combos) == len(summaries) == 3 * 3 * 2
@@ -0,0 +1,193 @@
+"""
+Tests for optimistic concurrency on tiles and players: many threads acting on one tile or player.
+"""
+import threading
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from flask_jwt_extended import create_access_token
+from sqlalchemy import func, select
+from werkzeug.security import generate_password_hash
+
+import config
+from pq_app import create_app
+from pq_app.model import db, User, Tile, Playthrough, TileTypeOption, Encounter, init_defaults
+from pq_app.services.concurrency import ConcurrentUpdateError, run_with_retry
+from pq_app.services.stats_service import StatsService
+
+THREADS = 8
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    # Threads need a database they can all connect to, so use a file instead of :memory:
+    monkeypatch.setattr(config.TestingConfig, "SQLALCHEMY_DATABASE_URI", f"sqlite:///{tmp_path / 'race.db'}")
+    monkeypatch.setattr(config.TestingConfig, "RATELIMIT_ENABLED", False, raising=False)
+    app = create_app("testing")
+    app.config.update(OPTIMISTIC_RETRY_ATTEMPTS=100)
+    with app.app_context():
+        db.create_all()
+        init_defaults()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def _player_with_tile(monster_hp):
+    player = User(username="racer")
+    player.set_password("pw")
+    player.points = 1000
+    db.session.add(player)
+    db.session.flush()
+    playthrough = Playthrough(user_id=player.id)
+    db.session.add(playthrough)
+    db.session.flush()
+    tile = Tile(
+        user_id=player.id,
+        type=TileTypeOption.query.filter_by(name="monster").first().id,
+        playthrough_id=playthrough.id,
+        monster_max_hp=monster_hp,
+        monster_current_hp=monster_hp,
+    )
+    db.session.add(tile)
+    db.session.commit()
+    return player.id, tile.id
+
+
+def _hammer(app, player_id, path, body, requests_per_thread=1):
+    """POST ``body`` to ``path`` from THREADS threads at once; returns every response"""
+    with app.test_request_context():
+        headers = {"Authorization": f"Bearer {create_access_token(identity=str(player_id))}"}
+    start = threading.Barrier(THREADS)
+    responses = []
+
+    def worker():
+        client = app.test_client()
+        start.wait()
+        for _ in range(requests_per_thread):
+            response = client.post(f"/api/v1/player/{player_id}{path}", json=body, headers=headers)
+            responses.append((response.status_code, response.get_json()))
+
+    threads = [threading.Thread(target=worker) for _ in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return responses
+
+
+def test_concurrent_actions_lose_no_hp_updates(app):
+    app.config.update(COUNTER_ATTACK_CHANCE=100, COUNTER_DAMAGE_MIN=1, COUNTER_DAMAGE_MAX=1)
+    player_id, tile_id = _player_with_tile(monster_hp=100000)
+
+    responses = _hammer(
+        app, player_id, "/combat/execute", {"tile_id": tile_id, "combat_action_code": "attack_light"}, 5
+    )
+
+    assert [status for status, _ in responses] == [200] * THREADS * 5
+    db.session.expire_all()
+    encounters = Encounter.query.filter_by(tile_id=tile_id).all()
+    player, tile = db.session.get(User, player_id), db.session.get(Tile, tile_id)
+    assert len(encounters) == THREADS * 5
+    assert tile.monster_current_hp == 100000 - sum(e.damage_dealt for e in encounters)
+    assert player.hitpoints == 100 - sum(e.damage_received for e in encounters)
+    assert player.points == 1000 - THREADS * 5
+    assert StatsService().get_player_stats(player_id).total_encounters == THREADS * 5
+
+
+def test_a_monster_is_defeated_only_once(app):
+    app.config.update(COUNTER_ATTACK_CHANCE=0)
+    player_id, tile_id = _player_with_tile(monster_hp=1)
+
+    responses = _hammer(app, player_id, "/combat/auto", {"tile_id": tile_id, "policy": "heavy"})
+
+    won = [data for status, data in responses if status == 200]
+    assert len(won) == 1 and won[0]["outcome"] == "won"
+    assert sorted(status for status, _ in responses) == [200] + [400] * (THREADS - 1)
+    db.session.expire_all()
+    player = db.session.get(User, player_id)
+    assert player.exp_points == won[0]["xp_gained"]
+    assert StatsService().get_player_stats(player_id).monsters_killed == 1
+
+
+def test_retries_are_bounded(app):
+    player_id, _ = _player_with_tile(monster_hp=50)
+    attempts = []
+
+    def conflicting_work():
+        attempts.append(1)
+        player = db.session.get(User, player_id)
+        points = player.points
+        # Another writer commits between our read and our write
+        with db.engine.begin() as connection:
+            connection.execute(
+                User.__table__.update().where(User.id == player_id).values(version_id=User.version_id + 1)
+            )
+        player.points = points + 1
+
+    with pytest.raises(ConcurrentUpdateError):
+        run_with_retry(conflicting_work, attempts=3)
+    assert len(attempts) == 3
+    db.session.expire_all()
+    assert db.session.get(User, player_id).points == 1000
+
+
+def test_web_tile_action_is_committed(app):
+    player_id, tile_id = _player_with_tile(monster_hp=50)
+    client = app.test_client()
+    client.post("/login", data={"username": "racer", "password": "pw"})
+
+    response = client.post(f"/player/{player_id}/game/tile/{tile_id}/action", data={"action": "inspect"})
+
+    assert response.status_code == 200
+    # Read through another connection: only committed rows are visible there
+    with db.engine.connect() as connection:
+        encounters = connection.execute(select(func.count()).where(Encounter.tile_id == tile_id)).scalar()
+        points = connection.execute(select(User.points).where(User.id == player_id)).scalar()
+    assert (encounters, points) == (1, 999)
+
+
+def test_concurrent_next_tile_requests_all_succeed(app):
+    player_id, tile_id = _player_with_tile(monster_hp=50)
+    playthrough_id = db.session.get(Tile, tile_id).playthrough_id
+    # Every request accrues points, so every request writes the versioned player row
+    db.session.get(User, player_id).last_points_accrual_at = datetime.now(timezone.utc) - timedelta(hours=2)
+    db.session.commit()
+
+    responses = _hammer(app, player_id, "/tiles/next", {})
+
+    assert [status for status, _ in responses] == [200] * THREADS
+    db.session.expire_all()
+    # Each request revealed its own position of the sequence, and none of them stored it
+    assert {data["tile_index"] for _, data in responses} == set(range(THREADS))
+    assert {data["id"] for _, data in responses} == {None}
+    assert Tile.query.filter_by(playthrough_id=playthrough_id).count() == 1
+    assert db.session.get(Playthrough, playthrough_id).tiles_revealed == THREADS
+    # Accrued once, not once per racing request
+    assert db.session.get(User, player_id).points == 1010
+
+
+def test_rehash_on_login_is_retried_after_a_concurrent_update(app, monkeypatch):
+    player_id, _ = _player_with_tile(monster_hp=50)
+    db.session.get(User, player_id).password_hash = generate_password_hash("pw", "pbkdf2:sha256:500")
+    db.session.commit()
+    rehash = User.rehash_password_if_needed
+    attempts = []
+
+    def conflicting_rehash(user, password):
+        attempts.append(1)
+        if len(attempts) == 1:
+            # Another request commits to the player between our read and our write
+            with db.engine.begin() as connection:
+                connection.execute(
+                    User.__table__.update().where(User.id == player_id).values(version_id=User.version_id + 1)
+                )
+        return rehash(user, password)
+
+    monkeypatch.setattr(User, "rehash_password_if_needed", conflicting_rehash)
+    response = app.test_client().post("/api/v1/auth/login", json={"username": "racer", "password": "pw"})
+
+    assert response.status_code == 200
+    assert len(attempts) == 2
+    db.session.expire_all()
+    assert db.session.get(User, player_id).password_hash.startswith("pbkdf2:sha256:1000$")
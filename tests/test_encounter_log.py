@@ -0,0 +1,137 @@
+"""
+Tests for the buffered encounter log writer.
+"""
+import pytest
+from sqlalchemy import event
+
+from pq_app import create_app
+from pq_app.model import db, User, Tile, Playthrough, TileTypeOption, Encounter, init_defaults
+from pq_app.services.combat_service import CombatService
+from pq_app.services.concurrency import run_with_retry
+from pq_app.services.encounter_log import EncounterRecord, get_encounter_log
+from pq_app.services.stats_service import StatsService
+
+
+@pytest.fixture
+def app():
+    app = create_app("testing")
+    with app.app_context():
+        db.create_all()
+        init_defaults()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def encounter_inserts(app):
+    inserts = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("INSERT INTO ENCOUNTER"):
+            inserts.append(len(parameters) if executemany else 1)
+
+    event.listen(db.engine, "before_cursor_execute", _record)
+    yield inserts
+    event.remove(db.engine, "before_cursor_execute", _record)
+
+
+def _player_with_tile():
+    player = User(username="log_player")
+    player.set_password("pw")
+    db.session.add(player)
+    db.session.flush()
+    playthrough = Playthrough(user_id=player.id)
+    db.session.add(playthrough)
+    db.session.flush()
+    tile = Tile(
+        user_id=player.id,
+        type=TileTypeOption.query.filter_by(name="monster").first().id,
+        playthrough_id=playthrough.id,
+        monster_max_hp=50,
+        monster_current_hp=50,
+    )
+    db.session.add(tile)
+    db.session.commit()
+    return player, tile
+
+
+def test_actions_are_written_in_one_insert_at_commit(app, encounter_inserts):
+    player, tile = _player_with_tile()
+    with app.test_request_context():
+        service = CombatService()
+        for _ in range(3):
+            service.execute_action(player, tile, "inspect", "monster")
+
+        assert encounter_inserts == []
+        assert len(get_encounter_log()) == 3
+        assert all(isinstance(record, EncounterRecord) for record in get_encounter_log().pending)
+        assert not any(isinstance(obj, Encounter) for obj in db.session.new)
+        db.session.commit()
+
+    assert encounter_inserts == [3]
+    assert Encounter.query.filter_by(tile_id=tile.id).count() == 3
+
+
+def test_buffered_encounters_are_visible_to_queries(app, encounter_inserts):
+    player, tile = _player_with_tile()
+    with app.test_request_context():
+        CombatService().execute_action(player, tile, "rest", "monster")
+        assert Encounter.query.filter_by(tile_id=tile.id).count() == 1
+        db.session.commit()
+    assert encounter_inserts == [1]
+
+
+def test_rollback_discards_buffered_encounters(app, encounter_inserts):
+    player, tile = _player_with_tile()
+    tile_id = tile.id
+    with app.test_request_context():
+        CombatService().execute_action(player, tile, "inspect", "monster")
+        db.session.rollback()
+        assert len(get_encounter_log()) == 0
+        db.session.commit()
+
+    assert encounter_inserts == []
+    assert Encounter.query.filter_by(tile_id=tile_id).count() == 0
+
+
+def test_append_only_mode_writes_outside_the_session(app, encounter_inserts):
+    player, tile = _player_with_tile()
+    tile_id = tile.id
+    app.config.update(ENCOUNTER_LOG_APPEND_ONLY=True)
+
+    # A fresh application context, as for a real request: the log is written when it ends
+    with app.app_context(), app.test_request_context():
+        CombatService().execute_action(db.session.get(User, player.id), db.session.get(Tile, tile_id), "inspect")
+        assert db.session.info.get("encounter_log") is None
+        db.session.rollback()
+        assert encounter_inserts == []
+
+    assert encounter_inserts == [1]
+    assert Encounter.query.filter_by(tile_id=tile_id).count() == 1
+
+
+def test_append_only_mode_drops_the_encounters_of_a_retried_attempt(app, encounter_inserts):
+    player, tile = _player_with_tile()
+    player_id, tile_id = player.id, tile.id
+    app.config.update(ENCOUNTER_LOG_APPEND_ONLY=True)
+    attempts = []
+
+    def rest():
+        attempts.append(1)
+        player = db.session.get(User, player_id)
+        if len(attempts) == 1:
+            # Another request commits to the player between our read and our write
+            with db.engine.begin() as connection:
+                connection.execute(
+                    User.__table__.update().where(User.id == player_id).values(version_id=User.version_id + 1)
+                )
+        CombatService().execute_action(player, db.session.get(Tile, tile_id), "rest", "monster")
+
+    with app.app_context(), app.test_request_context():
+        run_with_retry(rest)
+
+    assert len(attempts) == 2
+    assert encounter_inserts == [1]
+    assert Encounter.query.filter_by(tile_id=tile_id).count() == 1
+    assert StatsService().get_player_stats(player_id).total_encounters == 1
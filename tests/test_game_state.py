@@ -0,0 +1,132 @@
+"""
+Tests for the single-roundtrip game state endpoint.
+"""
+import json
+
+import pytest
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+
+from pq_app import create_app
+from pq_app.model import db, User, Tile, Playthrough, TileMedia, TileTypeOption, PlayerClass, init_defaults
+from pq_app.services.game_state_service import GameStateService
+from pq_app.services.reference_data import get_reference_data
+from pq_app.services.tile_service import TileService
+
+
+@pytest.fixture
+def app():
+    app = create_app("testing")
+    with app.app_context():
+        db.create_all()
+        init_defaults()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def _player(with_tile=True):
+    player = User(username="state_player")
+    player.set_password("pw")
+    player.playerclass = PlayerClass.query.filter_by(name="witch").first().id
+    db.session.add(player)
+    db.session.flush()
+    if with_tile:
+        playthrough = Playthrough(user_id=player.id)
+        db.session.add(playthrough)
+        db.session.flush()
+        monster = TileTypeOption.query.filter_by(name="monster").first()
+        db.session.add(Tile(user_id=player.id, type=monster.id, playthrough_id=playthrough.id, content="old"))
+        db.session.add(
+            Tile(
+                user_id=player.id,
+                type=monster.id,
+                playthrough_id=playthrough.id,
+                content="Goblin (40 HP)",
+                monster_max_hp=40,
+                monster_current_hp=30,
+            )
+        )
+    db.session.commit()
+    return player
+
+
+def _headers(player):
+    return {"Authorization": f"Bearer {create_access_token(identity=str(player.id))}"}
+
+
+def test_state_endpoint_returns_full_screen(app):
+    with app.app_context():
+        player = _player()
+        response = app.test_client().get(f"/api/v1/player/{player.id}/state", headers=_headers(player))
+        assert response.status_code == 200
+        data = json.loads(response.data)
+
+        assert data["player"]["char_class"] == "witch"
+        assert data["playthrough"]["id"]
+        tile = data["tile"]
+        assert tile["content"] == "Goblin (40 HP)"
+        assert tile["tile_type_obj"]["name"] == "monster"
+        assert tile["monster_status"] == {"current_hp": 30, "max_hp": 40, "hp_percent": 75.0, "is_alive": True}
+        assert [a["code"] for a in tile["available_actions"]] == [
+            a.code for a in TileService().get_allowed_actions("monster")
+        ]
+        assert "fireball" in {a["code"] for a in tile["combat_actions"]}
+        assert "points_balance" in data
+
+
+def test_state_is_a_single_query(app):
+    with app.app_context():
+        player = _player()
+        url, headers = f"/api/v1/player/{player.id}/state", _headers(player)
+        get_reference_data()  # warm
+        db.session.expire_all()
+        statements = []
+
+        def _before_execute(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith("SELECT"):
+                statements.append(statement)
+
+        event.listen(db.engine, "before_cursor_execute", _before_execute)
+        try:
+            response = app.test_client().get(url, headers=headers)
+        finally:
+            event.remove(db.engine, "before_cursor_execute", _before_execute)
+
+        assert response.status_code == 200
+        assert len(statements) == 1
+
+
+def test_tile_media_overrides_type_art(app):
+    with app.app_context():
+        player = _player()
+        tile = Tile.query.filter_by(user_id=player.id).order_by(Tile.id.desc()).first()
+        db.session.add(TileMedia(tile_type_id=tile.type, media_type="ascii_art", content="<default>", is_default=True))
+        db.session.commit()
+        assert GameStateService().load(player.id).ascii_art == "<default>"
+
+        db.session.add(TileMedia(tile_id=tile.id, media_type="ascii_art", content="<this tile>"))
+        db.session.commit()
+        assert GameStateService().load(player.id).ascii_art == "<this tile>"
+
+
+def test_state_without_playthrough(app):
+    with app.app_context():
+        player = _player(with_tile=False)
+        data = json.loads(
+            app.test_client().get(f"/api/v1/player/{player.id}/state", headers=_headers(player)).data
+        )
+        assert data["playthrough"] is None
+        assert data["tile"] is None
+
+
+def test_state_access_checks(app):
+    with app.app_context():
+        player = _player()
+        other = User(username="other")
+        other.set_password("pw")
+        db.session.add(other)
+        db.session.commit()
+        client = app.test_client()
+        assert client.get(f"/api/v1/player/{other.id}/state", headers=_headers(player)).status_code == 403
+        assert client.get(f"/api/v1/player/{other.id + 100}/state", headers=_headers(player)).status_code == 404
@@ -0,0 +1,179 @@
+"""
+Tests for Idempotency-Key replay on action endpoints.
+"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+from pq_app import create_app
+from pq_app.model import db, User, Tile, Playthrough, TileTypeOption, Encounter, IdempotencyKey, init_defaults
+from pq_app.services.idempotency import IdempotencyService, request_fingerprint
+
+
+@pytest.fixture
+def app():
+    app = create_app("testing")
+    app.config.update(RATELIMIT_ENABLED=False, COUNTER_ATTACK_CHANCE=0)
+    with app.app_context():
+        db.create_all()
+        init_defaults()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def _player_with_tile(tile_type="monster", username="idem_player"):
+    player = User(username=username)
+    player.set_password("pw")
+    player.points = 100
+    db.session.add(player)
+    db.session.flush()
+    playthrough = Playthrough(user_id=player.id)
+    db.session.add(playthrough)
+    db.session.flush()
+    tile = Tile(
+        user_id=player.id,
+        type=TileTypeOption.query.filter_by(name=tile_type).first().id,
+        playthrough_id=playthrough.id,
+        monster_max_hp=10000 if tile_type == "monster" else None,
+        monster_current_hp=10000 if tile_type == "monster" else None,
+    )
+    db.session.add(tile)
+    db.session.commit()
+    return player.id, tile.id
+
+
+def _post(app, player_id, path, body, key=None):
+    headers = {"Authorization": f"Bearer {create_access_token(identity=str(player_id))}"}
+    if key is not None:
+        headers["Idempotency-Key"] = key
+    return app.test_client().post(f"/api/v1/player/{player_id}{path}", json=body, headers=headers)
+
+
+def _points(player_id):
+    db.session.expire_all()
+    return db.session.get(User, player_id).points
+
+
+def test_repeated_key_replays_the_first_response(app):
+    player_id, tile_id = _player_with_tile()
+    body = {"tile_id": tile_id, "combat_action_code": "attack_light"}
+
+    first = _post(app, player_id, "/combat/execute", body, key="retry-1")
+    second = _post(app, player_id, "/combat/execute", body, key="retry-1")
+
+    assert first.status_code == second.status_code == 200
+    assert second.get_json() == first.get_json()
+    assert "Idempotent-Replayed" not in first.headers
+    assert second.headers["Idempotent-Replayed"] == "true"
+    assert _points(player_id) == 99
+    assert Encounter.query.filter_by(tile_id=tile_id).count() == 1
+
+    # A different key (or none) acts again
+    assert _post(app, player_id, "/combat/execute", body, key="retry-2").status_code == 200
+    assert _post(app, player_id, "/combat/execute", body).status_code == 200
+    assert _points(player_id) == 97
+
+
+def test_tile_action_is_idempotent(app):
+    player_id, tile_id = _player_with_tile(tile_type="scene")
+
+    first = _post(app, player_id, f"/tiles/{tile_id}/action", {"action_code": "rest"}, key="rest-1")
+    assert first.status_code == 200, first.get_json()
+    assert first.get_json()["tile_completed"] is True
+
+    # The tile is done, but the retry still gets the original success instead of a 400
+    second = _post(app, player_id, f"/tiles/{tile_id}/action", {"action_code": "rest"}, key="rest-1")
+    assert second.status_code == 200
+    assert second.get_json() == first.get_json()
+    assert _points(player_id) == 99
+    assert _post(app, player_id, f"/tiles/{tile_id}/action", {"action_code": "rest"}).status_code == 400
+
+
+def test_key_reused_for_a_different_request(app):
+    player_id, tile_id = _player_with_tile()
+    _post(app, player_id, "/combat/execute", {"tile_id": tile_id, "combat_action_code": "attack_light"}, key="k")
+
+    response = _post(app, player_id, "/combat/execute", {"tile_id": tile_id, "combat_action_code": "heal"}, key="k")
+    assert response.status_code == 422
+    assert _points(player_id) == 99
+
+
+def test_in_flight_key_conflicts(app):
+    player_id, tile_id = _player_with_tile()
+    body = {"tile_id": tile_id, "combat_action_code": "attack_light"}
+    fingerprint = request_fingerprint("POST", f"/api/v1/player/{player_id}/combat/execute", _json_bytes(app, body))
+    outcome, _ = IdempotencyService().claim(player_id, "in-flight", fingerprint)
+    db.session.commit()
+    assert outcome == "claimed"
+
+    assert _post(app, player_id, "/combat/execute", body, key="in-flight").status_code == 409
+    assert _points(player_id) == 100
+
+
+def test_abandoned_claim_is_taken_over_after_its_lease(app):
+    player_id, tile_id = _player_with_tile()
+    body = {"tile_id": tile_id, "combat_action_code": "attack_light"}
+    fingerprint = request_fingerprint("POST", f"/api/v1/player/{player_id}/combat/execute", _json_bytes(app, body))
+    # A worker claimed the key, then died before the action committed
+    IdempotencyService().claim(player_id, "abandoned", fingerprint, now=datetime.now(timezone.utc) - timedelta(minutes=5))
+    db.session.commit()
+
+    first = _post(app, player_id, "/combat/execute", body, key="abandoned")
+    assert first.status_code == 200
+    assert _points(player_id) == 99
+    second = _post(app, player_id, "/combat/execute", body, key="abandoned")
+    assert second.headers["Idempotent-Replayed"] == "true"
+    assert _points(player_id) == 99
+
+
+def test_request_that_lost_its_lease_cannot_store_a_response(app):
+    player_id, _ = _player_with_tile()
+    service = IdempotencyService(lease=timedelta(seconds=60))
+    slow = datetime.now(timezone.utc) - timedelta(minutes=5)
+    assert service.claim(player_id, "slow", "hash", now=slow)[0] == "claimed"
+    assert service.claim(player_id, "slow", "hash")[0] == "claimed"
+    db.session.commit()
+
+    assert service.complete(player_id, "slow", slow, 200, "{}") is False
+    service.release(player_id, "slow", slow)
+    db.session.commit()
+    assert db.session.get(IdempotencyKey, (player_id, "slow")).status_code is None
+
+
+def test_action_and_response_commit_together(app, monkeypatch):
+    player_id, tile_id = _player_with_tile()
+    body = {"tile_id": tile_id, "combat_action_code": "attack_light"}
+
+    def crash(*args, **kwargs):
+        raise RuntimeError("worker died before storing the response")
+
+    monkeypatch.setattr(IdempotencyService, "complete", crash)
+    assert _post(app, player_id, "/combat/execute", body, key="atomic").status_code == 500
+
+    # Neither the action nor a half-finished claim survived
+    assert _points(player_id) == 100
+    assert Encounter.query.filter_by(tile_id=tile_id).count() == 0
+    assert db.session.get(IdempotencyKey, (player_id, "atomic")) is None
+
+
+def test_expired_and_invalid_keys(app):
+    player_id, tile_id = _player_with_tile()
+    body = {"tile_id": tile_id, "combat_action_code": "attack_light"}
+    assert _post(app, player_id, "/combat/execute", body, key="old").status_code == 200
+
+    db.session.get(IdempotencyKey, (player_id, "old")).created_at = datetime.now(timezone.utc) - timedelta(days=2)
+    db.session.commit()
+    response = _post(app, player_id, "/combat/execute", body, key="old")
+    assert response.status_code == 200
+    assert "Idempotent-Replayed" not in response.headers
+    assert _points(player_id) == 98
+
+    assert _post(app, player_id, "/combat/execute", body, key="").status_code == 400
+    assert _post(app, player_id, "/combat/execute", body, key="x" * 256).status_code == 400
+    assert _points(player_id) == 98
+
+
+def _json_bytes(app, body):
+    return app.json.dumps(body).encode("utf-8")
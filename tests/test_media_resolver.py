@@ -0,0 +1,110 @@
+"""
+Tests for tile display-media resolution with the cached per-type fallback chain.
+"""
+import pytest
+from sqlalchemy import event
+
+from pq_app import create_app
+from pq_app.model import db, User, Tile, TileTypeOption, init_defaults
+from pq_app.services.media_service import MediaService
+from pq_app.services.reference_data import get_reference_data
+
+
+@pytest.fixture
+def app():
+    app = create_app("testing")
+    with app.app_context():
+        db.create_all()
+        init_defaults()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def tiles(app):
+    player = User(username="media_player")
+    player.set_password("pw")
+    db.session.add(player)
+    db.session.flush()
+    monster = TileTypeOption.query.filter_by(name="monster").first()
+    scene = TileTypeOption.query.filter_by(name="scene").first()
+    monster.ascii_art = "<legacy monster>"
+    scene.ascii_art = "<legacy scene>"
+    rows = [Tile(user_id=player.id, type=t.id) for t in (monster, monster, scene, scene)]
+    db.session.add_all(rows)
+    db.session.commit()
+    return rows
+
+
+class _SelectCounter:
+    def __init__(self):
+        self.count = 0
+
+    def _count(self, conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            self.count += 1
+
+    def __enter__(self):
+        event.listen(db.engine, "before_cursor_execute", self._count)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(db.engine, "before_cursor_execute", self._count)
+
+
+def test_fallback_chain_priority(app, tiles):
+    service = MediaService()
+    monster_tile, other_monster, scene_tile, _ = tiles
+    assert service.get_tile_display_media(monster_tile.id) == "<legacy monster>"
+
+    service.create_media_record(tile_type_id=monster_tile.type, content="<default monster>", is_default=True)
+    assert service.get_tile_display_media(monster_tile.id) == "<default monster>"
+
+    service.create_media_record(tile_id=monster_tile.id, content="<this tile>")
+    assert service.get_tile_display_media(monster_tile.id) == "<this tile>"
+    assert service.get_tile_display_media(other_monster.id, other_monster.type) == "<default monster>"
+    assert service.get_tile_display_media(scene_tile.id, scene_tile.type) == "<legacy scene>"
+    assert service.get_tile_display_media(99999) is None
+
+
+def test_single_query_per_tile_and_per_batch(app, tiles):
+    service = MediaService()
+    get_reference_data()  # warm
+    ids = [(t.id, t.type) for t in tiles]
+
+    with _SelectCounter() as counter:
+        service.get_tile_display_media(*ids[0])
+    assert counter.count == 1
+
+    with _SelectCounter() as counter:
+        service.get_tile_display_media(ids[0][0])
+    assert counter.count == 1
+
+    with _SelectCounter() as counter:
+        resolved = service.resolve_display_media(ids)
+    assert counter.count == 1
+    assert resolved == {
+        ids[0][0]: "<legacy monster>",
+        ids[1][0]: "<legacy monster>",
+        ids[2][0]: "<legacy scene>",
+        ids[3][0]: "<legacy scene>",
+    }
+
+
+def test_media_writes_invalidate_type_chain(app, tiles):
+    service = MediaService()
+    tile = tiles[0]
+    first = service.create_media_record(tile_type_id=tile.type, content="<first>", is_default=True)
+    second = service.create_media_record(tile_type_id=tile.type, content="<second>", is_default=False)
+    assert service.get_tile_display_media(tile.id, tile.type) == "<first>"
+
+    assert service.set_default_media(second.id)
+    assert service.get_tile_display_media(tile.id, tile.type) == "<second>"
+
+    assert service.delete_media(second.id)
+    assert service.delete_media(first.id)
+    assert service.get_tile_display_media(tile.id, tile.type) == "<legacy monster>"
+
+    assert service.update_tile_type_ascii(tile.type, "<updated legacy>")
+    assert service.get_tile_display_media(tile.id, tile.type) == "<updated legacy>"
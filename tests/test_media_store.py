@@ -0,0 +1,144 @@
+"""
+Tests for the content-addressed media store and hash references in API tile payloads.
+"""
+import json
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+from pq_app import create_app
+from pq_app.model import db, User, Tile, Playthrough, TileMedia, TileTypeOption, MediaBlob, init_defaults
+from pq_app.services.media_store import hash_content
+
+ART = " /\\_/\\\n( o.o )\n > ^ <\n"
+
+
+@pytest.fixture
+def app():
+    app = create_app("testing")
+    with app.app_context():
+        db.create_all()
+        init_defaults()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def _player_on_monster_tile():
+    monster = TileTypeOption.query.filter_by(name="monster").first()
+    monster.ascii_art = ART
+    player = User(username="media_store_player")
+    player.set_password("pw")
+    db.session.add(player)
+    db.session.flush()
+    playthrough = Playthrough(user_id=player.id)
+    db.session.add(playthrough)
+    db.session.flush()
+    db.session.add(Tile(user_id=player.id, type=monster.id, playthrough_id=playthrough.id, content="Goblin"))
+    db.session.commit()
+    return player
+
+
+def _headers(player):
+    return {"Authorization": f"Bearer {create_access_token(identity=str(player.id))}"}
+
+
+def test_identical_art_is_stored_once(app):
+    with app.app_context():
+        monster = TileTypeOption.query.filter_by(name="monster").first()
+        monster.ascii_art = ART
+        db.session.add(TileMedia(tile_type_id=monster.id, media_type="ascii_art", content=ART, is_default=True))
+        db.session.add(TileMedia(tile_type_id=monster.id, media_type="ascii_art", content=ART))
+        db.session.commit()
+
+        digest = hash_content(ART)
+        assert MediaBlob.query.count() == 1
+        assert db.session.get(MediaBlob, digest).content == ART
+        assert monster.ascii_art_hash == digest
+        assert {m.content_hash for m in TileMedia.query.all()} == {digest}
+
+        monster.ascii_art = "<changed>"
+        db.session.commit()
+        assert monster.ascii_art_hash == hash_content("<changed>")
+        # Blobs are immutable: the old art stays addressable
+        assert MediaBlob.query.count() == 2
+
+        monster.ascii_art = None
+        db.session.commit()
+        assert monster.ascii_art_hash is None
+
+
+def test_art_text_is_read_from_the_blob(app):
+    with app.app_context():
+        monster = TileTypeOption.query.filter_by(name="monster").first()
+        monster.ascii_art = ART
+        db.session.add(TileMedia(tile_type_id=monster.id, media_type="ascii_art", content=ART, is_default=True))
+        db.session.commit()
+        monster_id = monster.id
+        db.session.expunge_all()
+
+        # Only the hash is stored on the referencing rows
+        assert "ascii_art" not in TileTypeOption.__table__.c
+        assert "content" not in TileMedia.__table__.c
+        assert TileTypeOption.query.filter_by(name="monster").first().ascii_art == ART
+        assert TileMedia.query.filter_by(tile_type_id=monster_id).first().content == ART
+
+
+def test_media_endpoint_is_immutable_and_conditional(app):
+    with app.app_context():
+        _player_on_monster_tile()
+        client = app.test_client()
+        digest = hash_content(ART)
+
+        response = client.get(f"/api/v1/media/{digest}")
+        assert response.status_code == 200
+        assert response.get_data(as_text=True) == ART
+        assert response.mimetype == "text/plain"
+        assert response.cache_control.public
+        assert response.cache_control.max_age == 31536000
+        assert "immutable" in response.headers["Cache-Control"]
+        assert response.get_etag()[0] == digest
+
+        cached = client.get(f"/api/v1/media/{digest}", headers={"If-None-Match": f'"{digest}"'})
+        assert cached.status_code == 304
+        assert cached.get_data() == b""
+
+        assert client.get(f"/api/v1/media/{'0' * 64}").status_code == 404
+        assert client.get("/api/v1/media/not-a-hash").status_code == 404
+
+
+def test_tile_payload_references_art_by_hash(app):
+    with app.app_context():
+        player = _player_on_monster_tile()
+        client = app.test_client()
+        digest = hash_content(ART)
+
+        data = json.loads(client.get(f"/api/v1/player/{player.id}/tiles/current", headers=_headers(player)).data)
+        assert data["ascii_art"] is None
+        assert data["ascii_art_hash"] == digest
+        monster_id = TileTypeOption.query.filter_by(name="monster").first().id
+        assert data["tile_type_obj"] == {"id": monster_id, "name": "monster", "ascii_art_hash": digest}
+        assert client.get(data["ascii_art_url"]).get_data(as_text=True) == ART
+
+        url = f"/api/v1/player/{player.id}/tiles/current?inline_media=1"
+        inline = json.loads(client.get(url, headers=_headers(player)).data)
+        assert inline["ascii_art"] == ART
+        assert inline["tile_type_obj"]["ascii_art"] == ART
+
+        state = json.loads(client.get(f"/api/v1/player/{player.id}/state", headers=_headers(player)).data)
+        assert state["tile"]["ascii_art_hash"] == digest
+        assert state["tile"]["ascii_art"] is None
+
+
+def test_tile_override_hash_wins(app):
+    with app.app_context():
+        player = _player_on_monster_tile()
+        tile = Tile.query.filter_by(user_id=player.id).first()
+        db.session.add(TileMedia(tile_id=tile.id, media_type="ascii_art", content="<this goblin>"))
+        db.session.commit()
+
+        data = json.loads(
+            app.test_client().get(f"/api/v1/player/{player.id}/tiles/{tile.id}", headers=_headers(player)).data
+        )
+        assert data["ascii_art_hash"] == hash_content("<this goblin>")
+        assert data["tile_type_obj"]["ascii_art_hash"] == hash_content(ART)
@@ -0,0 +1,152 @@
+"""
+Tests for the Prometheus metrics endpoint and the counters behind it.
+"""
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+from prometheus_client import REGISTRY, multiprocess
+from sqlalchemy import create_engine
+
+from pq_app import create_app
+from pq_app.model import db, MediaBlob, Playthrough, User, TileTypeOption, init_defaults
+from pq_app.services import metrics
+from pq_app.services.combat_service import CombatService
+from pq_app.services.media_store import hash_content
+from pq_app.services.player_service import PlayerService
+from pq_app.services.pool_metrics import InstrumentedQueuePool
+from pq_app.services.tile_service import TileService
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+@pytest.fixture
+def app():
+    app = create_app("testing")
+    app.config.update(COUNTER_ATTACK_CHANCE=0)
+    with app.app_context():
+        db.create_all()
+        init_defaults()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def _value(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def _player_on_monster_tile():
+    player = User(username="metrics_player", email="metrics@example.com")
+    player.set_password("pw")
+    player.points = 10
+    db.session.add(player)
+    db.session.flush()
+    playthrough = Playthrough(user_id=player.id)
+    db.session.add(playthrough)
+    db.session.flush()
+    monster = TileTypeOption.query.filter_by(name="monster").one()
+    tile = TileService().create_tile(player.id, playthrough.id, monster.id)
+    tile.monster_current_hp = tile.monster_max_hp = 1
+    db.session.add(tile)
+    db.session.commit()
+    return player, tile
+
+
+def test_metrics_endpoint_reports_requests(app):
+    client = app.test_client()
+    labels = dict(blueprint="api_v1", endpoint="api_v1.get_pool_status", method="GET", status="200")
+    before = _value("pq_http_request_duration_seconds_count", **labels)
+    client.get("/api/v1/health/pool")
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    assert "pq_http_request_duration_seconds_bucket" in response.get_data(as_text=True)
+    assert _value("pq_http_request_duration_seconds_count", **labels) == before + 1
+
+
+def test_gameplay_counters_count_committed_actions(app):
+    tiles = _value("pq_tiles_generated_total", type="monster")
+    kills, deaths = _value("pq_monster_kills_total"), _value("pq_player_deaths_total")
+    spent = _value("pq_points_spent_total")
+    player, tile = _player_on_monster_tile()
+    assert _value("pq_tiles_generated_total", type="monster") == tiles + 1
+
+    service = CombatService()
+    with app.test_request_context():
+        result = service.auto_battle(player, tile, policy="strongest")
+        PlayerService().spend_point(player, 3)
+        # Nothing is counted before the commit
+        assert _value("pq_monster_kills_total") == kills
+        db.session.commit()
+    assert result.outcome == "won"
+    assert _value("pq_monster_kills_total") == kills + 1
+    assert _value("pq_points_spent_total") == spent + 3
+    code = result.turns[-1].action.code
+    assert _value("pq_combat_actions_total", code=code, result="success") >= 1
+
+    # A death in a transaction that rolls back is not counted
+    for commit in (False, True):
+        player.hitpoints = 1
+        with app.test_request_context():
+            service.execute_action(player, tile, "rest", "monster")
+            if commit:
+                db.session.commit()
+            else:
+                db.session.rollback()
+        assert _value("pq_player_deaths_total") == deaths + commit
+
+
+def test_cache_lookups(app):
+    digest = hash_content("art")
+    db.session.add(MediaBlob(sha256=digest, content="art"))
+    db.session.commit()
+    hits = _value("pq_cache_lookups_total", cache="media", result="hit")
+    misses = _value("pq_cache_lookups_total", cache="media", result="miss")
+    client = app.test_client()
+    client.get(f"/api/v1/media/{digest}")
+    client.get(f"/api/v1/media/{digest}", headers={"If-None-Match": f'"{digest}"'})
+    assert _value("pq_cache_lookups_total", cache="media", result="hit") == hits + 1
+    assert _value("pq_cache_lookups_total", cache="media", result="miss") == misses + 1
+
+    reference_hits = _value("pq_cache_lookups_total", cache="reference_data", result="hit")
+    TileService().get_tile_types()
+    assert _value("pq_cache_lookups_total", cache="reference_data", result="hit") == reference_hits + 1
+
+
+def test_pool_gauges(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=InstrumentedQueuePool, pool_size=2)
+    waits = _value("pq_db_pool_checkout_wait_seconds_count")
+    with engine.connect(), engine.connect():
+        assert _value("pq_db_pool_checked_out") == 2
+        assert _value("pq_db_pool_size") == 2
+    assert _value("pq_db_pool_checked_out") == 0
+    assert _value("pq_db_pool_checkout_wait_seconds_count") == waits + 2
+    engine.dispose()
+
+
+def test_multiprocess_values_are_aggregated(tmp_path, monkeypatch):
+    # Two "workers" write to the shared directory; a scrape from any process adds them up
+    worker = (
+        "import os; from pq_app.services import metrics; "
+        "metrics.MONSTER_KILLS.inc(3); metrics.POOL_CHECKED_OUT.set(2); print(os.getpid())"
+    )
+    env = {"PROMETHEUS_MULTIPROC_DIR": str(tmp_path), "PYTHONPATH": str(ROOT)}
+    pids = [
+        int(subprocess.run([sys.executable, "-c", worker], env=env, check=True, capture_output=True).stdout)
+        for _ in range(2)
+    ]
+
+    monkeypatch.setenv("PROMETHEUS_MULTIPROC_DIR", str(tmp_path))
+    registry = metrics.registry()
+    assert registry is not REGISTRY
+    assert registry.get_sample_value("pq_monster_kills_total") == 6
+    assert registry.get_sample_value("pq_db_pool_checked_out") == 4
+
+    # gunicorn.conf.py marks exited workers dead: their gauges go, their counts stay
+    multiprocess.mark_process_dead(pids[0], str(tmp_path))
+    registry = metrics.registry()
+    assert registry.get_sample_value("pq_monster_kills_total") == 6
+    assert registry.get_sample_value("pq_db_pool_checked_out") == 2
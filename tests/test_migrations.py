@@ -0,0 +1,165 @@
+"""
+Upgrade a SQLite database that holds gameplay data through the alembic migrations.
+
+Alembic runs in a subprocess: env.py registers a process-wide ``connect`` listener
+that turns SQLite foreign keys on, which must not leak into the other tests.
+"""
+import os
+import sqlite3
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Schema created by db.create_all() at revision 0009 (before this series of migrations)
+SCHEMA_0009 = """
+CREATE TABLE actionoption (
+    id INTEGER NOT NULL, name VARCHAR, code VARCHAR,
+    PRIMARY KEY (id), UNIQUE (code)
+);
+CREATE TABLE tiletypeoption (
+    id INTEGER NOT NULL, name VARCHAR, ascii_art TEXT,
+    PRIMARY KEY (id)
+);
+CREATE TABLE playerclass (id INTEGER NOT NULL, name VARCHAR, PRIMARY KEY (id));
+CREATE TABLE playerrace (id INTEGER NOT NULL, name VARCHAR, PRIMARY KEY (id));
+CREATE TABLE user (
+    id INTEGER NOT NULL, username VARCHAR(150) NOT NULL, password_hash VARCHAR(150) NOT NULL,
+    email VARCHAR, hitpoints INTEGER, max_hp INTEGER, strength INTEGER, intelligence INTEGER,
+    stealth INTEGER, exp_points INTEGER, level INTEGER, playerclass INTEGER, playerrace INTEGER,
+    points INTEGER, last_points_accrual_at DATETIME, created_at DATETIME,
+    PRIMARY KEY (id), UNIQUE (username),
+    FOREIGN KEY(playerclass) REFERENCES playerclass (id),
+    FOREIGN KEY(playerrace) REFERENCES playerrace (id)
+);
+CREATE TABLE action (
+    id INTEGER NOT NULL, name VARCHAR, tile INTEGER, actionverb INTEGER,
+    PRIMARY KEY (id),
+    FOREIGN KEY(tile) REFERENCES tile (id) ON DELETE CASCADE,
+    FOREIGN KEY(actionverb) REFERENCES actionoption (id)
+);
+CREATE TABLE combataction (
+    id INTEGER NOT NULL, name VARCHAR(100) NOT NULL, code VARCHAR(50) NOT NULL, description TEXT,
+    damage_min INTEGER, damage_max INTEGER, heal_amount INTEGER, defense_boost INTEGER,
+    requires_class INTEGER, requires_race INTEGER, success_rate INTEGER, created_at DATETIME,
+    PRIMARY KEY (id), UNIQUE (code),
+    FOREIGN KEY(requires_class) REFERENCES playerclass (id),
+    FOREIGN KEY(requires_race) REFERENCES playerrace (id)
+);
+CREATE TABLE playthrough (
+    id INTEGER NOT NULL, user_id INTEGER NOT NULL, started_at DATETIME, ended_at DATETIME,
+    PRIMARY KEY (id), FOREIGN KEY(user_id) REFERENCES user (id)
+);
+CREATE TABLE tile (
+    id INTEGER NOT NULL, action_taken BOOLEAN, type INTEGER NOT NULL, action INTEGER, user_id INTEGER,
+    playthrough_id INTEGER, content VARCHAR, created_at DATETIME, monster_max_hp INTEGER,
+    monster_current_hp INTEGER, player_defense_pending INTEGER,
+    PRIMARY KEY (id),
+    FOREIGN KEY(type) REFERENCES tiletypeoption (id),
+    FOREIGN KEY(action) REFERENCES action (id),
+    FOREIGN KEY(user_id) REFERENCES user (id),
+    FOREIGN KEY(playthrough_id) REFERENCES playthrough (id)
+);
+CREATE TABLE encounter (
+    id INTEGER NOT NULL, tile_id INTEGER NOT NULL, user_id INTEGER NOT NULL, combat_action_id INTEGER,
+    player_hp_before INTEGER NOT NULL, player_hp_after INTEGER NOT NULL, monster_hp_before INTEGER,
+    monster_hp_after INTEGER, damage_dealt INTEGER, damage_received INTEGER, was_successful BOOLEAN,
+    result_message TEXT, created_at DATETIME,
+    PRIMARY KEY (id),
+    FOREIGN KEY(tile_id) REFERENCES tile (id) ON DELETE CASCADE,
+    FOREIGN KEY(user_id) REFERENCES user (id),
+    FOREIGN KEY(combat_action_id) REFERENCES combataction (id)
+);
+CREATE TABLE tilemedia (
+    id INTEGER NOT NULL, tile_type_id INTEGER, tile_id INTEGER, media_type VARCHAR(50) NOT NULL,
+    content TEXT, url VARCHAR(500), is_default BOOLEAN, display_order INTEGER, created_at DATETIME,
+    PRIMARY KEY (id),
+    FOREIGN KEY(tile_type_id) REFERENCES tiletypeoption (id),
+    FOREIGN KEY(tile_id) REFERENCES tile (id) ON DELETE CASCADE
+);
+"""
+
+SEED_0009 = """
+INSERT INTO actionoption (id, name, code) VALUES (1, 'rest', 'rest'), (2, 'fight', 'fight');
+INSERT INTO tiletypeoption (id, name, ascii_art) VALUES (1, 'scene', NULL), (2, 'monster', '<o_o>');
+INSERT INTO playerclass (id, name) VALUES (1, 'fighter');
+INSERT INTO playerrace (id, name) VALUES (1, 'Human');
+INSERT INTO combataction (id, name, code, damage_min, damage_max, success_rate)
+    VALUES (1, 'Light Attack', 'attack_light', 3, 8, 95);
+INSERT INTO user (id, username, password_hash, hitpoints, max_hp, exp_points, level, playerclass, playerrace, points)
+    VALUES (1, 'veteran', 'x', 20, 25, 40, 2, 1, 1, 3);
+INSERT INTO playthrough (id, user_id) VALUES (1, 1);
+INSERT INTO tile (id, action_taken, type, user_id, playthrough_id, monster_max_hp, monster_current_hp)
+    VALUES (1, 1, 2, 1, 1, 10, 0), (2, 0, 2, 1, 1, 12, 12), (3, 0, 1, 1, 1, NULL, NULL);
+INSERT INTO action (id, name, tile, actionverb) VALUES (1, 'fight', 1, 2);
+UPDATE tile SET action = 1 WHERE id = 1;
+INSERT INTO encounter (id, tile_id, user_id, combat_action_id, player_hp_before, player_hp_after,
+                       monster_hp_before, monster_hp_after, damage_dealt, damage_received, was_successful)
+    VALUES (1, 1, 1, 1, 25, 22, 10, 4, 6, 3, 1), (2, 1, 1, 1, 22, 20, 4, 0, 4, 2, 1);
+INSERT INTO tilemedia (id, tile_type_id, tile_id, media_type, content, is_default)
+    VALUES (1, 2, NULL, 'ascii_art', '<O_O>', 1), (2, NULL, 3, 'ascii_art', '~~~', 0);
+"""
+
+
+def _alembic(db_path, *args):
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{db_path}")
+    return subprocess.run(
+        [sys.executable, "-m", "alembic", "-c", str(ROOT / "alembic.ini"), *args],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+
+
+@pytest.fixture
+def db_0009(tmp_path):
+    path = tmp_path / "pyquest.db"
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA_0009 + SEED_0009)
+    conn.close()
+    result = _alembic(path, "stamp", "0009_add_player_defense_pending")
+    assert result.returncode == 0, result.stderr
+    return path
+
+
+@pytest.mark.parametrize("interrupted", [False, True], ids=["fresh", "after-failed-run"])
+def test_upgrade_to_head_keeps_tiles_and_encounters(db_0009, interrupted):
+    if interrupted:
+        # An earlier 0013 run that died mid-recreate left batch mode's temporary table behind
+        conn = sqlite3.connect(db_0009)
+        conn.execute("CREATE TABLE _alembic_tmp_tilemedia (id INTEGER NOT NULL, PRIMARY KEY (id))")
+        conn.commit()
+        conn.close()
+
+    result = _alembic(db_0009, "upgrade", "head")
+    assert result.returncode == 0, result.stderr
+
+    conn = sqlite3.connect(db_0009)
+    try:
+        heads = _alembic(db_0009, "heads").stdout.split()[0]
+        assert conn.execute("SELECT version_num FROM alembic_version").fetchall() == [(heads,)]
+        assert conn.execute("SELECT count(*) FROM tile").fetchone() == (3,)
+        assert conn.execute("SELECT count(*) FROM encounter").fetchone() == (2,)
+        assert conn.execute("PRAGMA foreign_key_check").fetchall() == []
+        assert conn.execute("SELECT name FROM sqlite_master WHERE name LIKE '_alembic_tmp_%'").fetchall() == []
+        # Seeded positions (0014)
+        assert "tile_index" in {row[1] for row in conn.execute("PRAGMA table_info(tile)")}
+
+        # The recreated tables kept their rows; their art now lives only in the blob store (0019)
+        art = conn.execute(
+            "SELECT mediablob.content FROM tiletypeoption JOIN mediablob ON sha256 = ascii_art_hash WHERE id = 2"
+        ).fetchone()
+        assert art == ("<o_o>",)
+        assert "ascii_art" not in {row[1] for row in conn.execute("PRAGMA table_info(tiletypeoption)")}
+        assert "content" not in {row[1] for row in conn.execute("PRAGMA table_info(tilemedia)")}
+        assert conn.execute("SELECT count(*) FROM tilemedia WHERE content_hash IS NOT NULL").fetchone() == (2,)
+        assert conn.execute("SELECT count(*) FROM mediablob").fetchone() == (3,)
+
+        stats = conn.execute("SELECT total_encounters, total_damage_dealt FROM playerstats WHERE user_id = 1")
+        assert stats.fetchone() == (2, 10)
+    finally:
+        conn.close()
@@ -0,0 +1,163 @@
+"""
+Tests for keyset (cursor) pagination of encounter and tile history.
+"""
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+
+from pq_app import create_app
+from pq_app.model import db, User, Tile, Playthrough, Encounter, init_defaults
+from pq_app.services.pagination import InvalidCursor, decode_cursor, encode_cursor
+from pq_app.services.stats_service import StatsService
+from pq_app.services.tile_service import TileService
+
+
+@pytest.fixture
+def app():
+    app = create_app("testing")
+    with app.app_context():
+        db.create_all()
+        init_defaults()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def _player_with_history(tiles=3, encounters_per_tile=4):
+    """Create tiles and encounters; encounters share timestamps in pairs to exercise the id tie-break"""
+    player = User(username="pager")
+    player.set_password("pw")
+    db.session.add(player)
+    db.session.flush()
+    playthrough = Playthrough(user_id=player.id)
+    db.session.add(playthrough)
+    db.session.flush()
+
+    base = datetime(2026, 1, 1, 12, 0, 0)
+    n = 0
+    for t in range(tiles):
+        tile = Tile(user_id=player.id, type=1, playthrough_id=playthrough.id, content=f"tile {t}")
+        tile.created_at = base + timedelta(minutes=t)
+        db.session.add(tile)
+        db.session.flush()
+        for _ in range(encounters_per_tile):
+            encounter = Encounter(tile_id=tile.id, user_id=player.id, player_hp_before=100, player_hp_after=100)
+            encounter.created_at = base + timedelta(seconds=n // 2)
+            db.session.add(encounter)
+            n += 1
+    StatsService().rebuild_player_stats(player.id)
+    db.session.commit()
+    return player
+
+
+def test_cursor_round_trip():
+    created = datetime(2026, 1, 2, 3, 4, 5, 678)
+    assert decode_cursor(encode_cursor(created, 42)) == (created, 42)
+    with pytest.raises(InvalidCursor):
+        decode_cursor("not-a-cursor")
+
+
+def test_encounter_pages_cover_history_once(app):
+    with app.app_context():
+        player = _player_with_history(tiles=3, encounters_per_tile=5)
+        service = StatsService()
+        seen, cursor = [], None
+        while True:
+            page = service.get_encounter_history(player.id, cursor=cursor, limit=4)
+            seen.extend(e.id for e in page.items)
+            if not page.has_more:
+                assert page.next_cursor is None
+                break
+            cursor = page.next_cursor
+
+        expected = [
+            e.id
+            for e in Encounter.query.filter_by(user_id=player.id)
+            .order_by(Encounter.created_at.desc(), Encounter.id.desc())
+            .all()
+        ]
+        assert seen == expected
+
+
+def test_encounters_endpoint_uses_cursor(app):
+    with app.app_context():
+        player = _player_with_history(tiles=2, encounters_per_tile=3)
+        headers = {"Authorization": f"Bearer {create_access_token(identity=str(player.id))}"}
+        client = app.test_client()
+
+        first = json.loads(client.get(f"/api/v1/player/{player.id}/encounters?limit=4", headers=headers).data)
+        assert len(first["encounters"]) == 4
+        assert first["has_more"] is True
+        assert first["total"] == 6
+
+        url = f"/api/v1/player/{player.id}/encounters?limit=4&cursor={first['next_cursor']}"
+        second = json.loads(client.get(url, headers=headers).data)
+        assert len(second["encounters"]) == 2
+        assert second["has_more"] is False
+        assert second["next_cursor"] is None
+        assert not {e["id"] for e in first["encounters"]} & {e["id"] for e in second["encounters"]}
+
+        bad = client.get(f"/api/v1/player/{player.id}/encounters?cursor=%%%", headers=headers)
+        assert bad.status_code == 400
+
+
+def test_encounters_endpoint_does_not_count(app):
+    with app.app_context():
+        player = _player_with_history(tiles=1, encounters_per_tile=3)
+        headers = {"Authorization": f"Bearer {create_access_token(identity=str(player.id))}"}
+        statements = []
+
+        def _before_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement.lower())
+
+        event.listen(db.engine, "before_cursor_execute", _before_execute)
+        try:
+            app.test_client().get(f"/api/v1/player/{player.id}/encounters", headers=headers)
+        finally:
+            event.remove(db.engine, "before_cursor_execute", _before_execute)
+
+        assert not [s for s in statements if "count(" in s]
+
+
+def test_tile_history_eager_loads_encounters(app):
+    with app.app_context():
+        player = _player_with_history(tiles=6, encounters_per_tile=2)
+        db.session.expire_all()
+        statements = []
+
+        def _before_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, "before_cursor_execute", _before_execute)
+        try:
+            page = TileService().get_tile_history(player.id, limit=4)
+            encounter_counts = [len(t.encounters) for t in page.items]
+        finally:
+            event.remove(db.engine, "before_cursor_execute", _before_execute)
+
+        assert [t.content for t in page.items] == ["tile 5", "tile 4", "tile 3", "tile 2"]
+        assert encounter_counts == [2, 2, 2, 2]
+        assert page.has_more
+        # playthroughs, tiles, then one selectin query each for encounters and action records
+        assert len(statements) == 4
+
+        rest = TileService().get_tile_history(player.id, cursor=page.next_cursor, limit=4)
+        assert [t.content for t in rest.items] == ["tile 1", "tile 0"]
+        assert not rest.has_more
+
+
+def test_history_page_links_to_older_tiles(app):
+    with app.app_context():
+        player = _player_with_history(tiles=30, encounters_per_tile=0)
+        client = app.test_client()
+        client.post("/login", data={"username": "pager", "password": "pw"})
+
+        response = client.get(f"/player/{player.id}/game/history")
+        assert response.status_code == 200
+        assert b"tile 29" in response.data
+        assert b"Older tiles" in response.data
+
+        assert client.get(f"/player/{player.id}/game/history?cursor=bogus").status_code == 400
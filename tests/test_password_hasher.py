@@ -0,0 +1,99 @@
+"""
+Tests for bounded password hashing, 429 backpressure and rehash-on-login.
+"""
+import pytest
+from werkzeug.security import generate_password_hash
+
+from pq_app import create_app
+from pq_app.model import db, User
+from pq_app.services import password_hasher
+from pq_app.services.password_hasher import HashingBusyError, PasswordHasher, get_password_hasher
+
+
+@pytest.fixture
+def app():
+    app = create_app("testing")
+    app.config.update(RATELIMIT_ENABLED=False)
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def _user(username="hash_user", password_hash=None):
+    user = User(username=username, email=f"{username}@example.com")
+    if password_hash:
+        user.password_hash = password_hash
+    else:
+        user.set_password("secret")
+    db.session.add(user)
+    db.session.commit()
+    return user
+
+
+def _login(app, username="hash_user", password="secret"):
+    return app.test_client().post("/api/v1/auth/login", json={"username": username, "password": password})
+
+
+def test_hashes_use_the_configured_method(app):
+    user = _user()
+    assert user.password_hash.startswith("pbkdf2:sha256:1000$")
+    assert user.check_password("secret")
+    assert not user.check_password("wrong")
+    assert not User(username="nohash").check_password("secret")
+
+
+def test_login_rehashes_outdated_hashes(app):
+    user = _user(password_hash=generate_password_hash("secret", "pbkdf2:sha256:500"))
+    user_id = user.id
+
+    assert _login(app).status_code == 200
+    db.session.expire_all()
+    assert db.session.get(User, user_id).password_hash.startswith("pbkdf2:sha256:1000$")
+    assert get_password_hasher().snapshot()["rehashes"] == 1
+
+    # Already current: no further rehash, and a wrong password never rehashes
+    assert _login(app).status_code == 200
+    assert _login(app, password="wrong").status_code == 401
+    assert get_password_hasher().snapshot()["rehashes"] == 1
+
+
+def test_saturated_hashing_returns_429(app):
+    _user()
+    hasher = PasswordHasher(method="pbkdf2:sha256:1000", workers=1, queue_size=0)
+    app.extensions["password_hasher"] = hasher
+    # Occupy the only slot, as a hash in flight would
+    hasher._slots.acquire()
+    try:
+        response = _login(app)
+        assert response.status_code == 429
+        assert response.headers["Retry-After"] == "1"
+        register = app.test_client().post(
+            "/api/v1/auth/register", json={"username": "new", "email": "new@example.com", "password": "pw"}
+        )
+        assert register.status_code == 429
+        assert app.test_client().post("/login", data={"username": "hash_user", "password": "secret"}).status_code == 429
+        with pytest.raises(HashingBusyError):
+            hasher.hash("pw")
+    finally:
+        hasher._slots.release()
+
+    assert _login(app).status_code == 200
+    status = app.test_client().get("/api/v1/health/password-hashing").get_json()
+    assert (status["rejected"], status["verifications"], status["in_flight"]) == (4, 1, 0)
+
+
+def test_needs_rehash_does_not_hash(monkeypatch):
+    hasher = PasswordHasher()
+    assert hasher.method == "pbkdf2:sha256:600000"
+    current = generate_password_hash("secret", hasher.method)
+    # The default method's hashes fit the user.password_hash column
+    assert len(current) <= User.__table__.c.password_hash.type.length
+
+    def no_hashing(*args):
+        raise AssertionError("needs_rehash hashed a password")
+
+    monkeypatch.setattr(password_hasher, "generate_password_hash", no_hashing)
+    assert not hasher.needs_rehash(current)
+    assert hasher.needs_rehash(generate_password_hash("secret", "pbkdf2:sha256:1000"))
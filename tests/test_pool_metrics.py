@@ -0,0 +1,64 @@
+"""
+Tests for engine pool options and connection pool instrumentation.
+"""
+import pytest
+from sqlalchemy import exc
+
+import config
+from pq_app import create_app
+from pq_app.model import db
+from pq_app.services import pool_metrics
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    uri = f"sqlite:///{tmp_path / 'pool.db'}"
+    monkeypatch.setattr(config.TestingConfig, "SQLALCHEMY_DATABASE_URI", uri)
+    monkeypatch.setattr(
+        config.TestingConfig,
+        "SQLALCHEMY_ENGINE_OPTIONS",
+        config.engine_options(uri, pool_size=1, max_overflow=0, pool_timeout=1),
+        raising=False,
+    )
+    app = create_app("testing")
+    with app.app_context():
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def test_engine_options_from_env(monkeypatch):
+    assert config.engine_options("sqlite:///:memory:") == {}
+    assert config.engine_options("sqlite://") == {}
+
+    monkeypatch.setenv("DB_POOL_SIZE", "20")
+    monkeypatch.setenv("DB_POOL_PRE_PING", "0")
+    options = config.engine_options("postgresql://pq@db/pq", max_overflow=3)
+    assert options["pool_size"] == 20
+    assert options["max_overflow"] == 3
+    assert options["pool_pre_ping"] is False
+    assert options["pool_recycle"] == 1800
+
+
+def test_pool_status_endpoint(app):
+    assert isinstance(db.engine.pool, pool_metrics.InstrumentedQueuePool)
+    # The shared config class options are not modified
+    assert "poolclass" not in config.TestingConfig.SQLALCHEMY_ENGINE_OPTIONS
+
+    db.session.remove()
+    data = app.test_client().get("/api/v1/health/pool").get_json()
+    assert data["pool"] == "InstrumentedQueuePool"
+    assert (data["size"], data["max_overflow"], data["timeout"]) == (1, 0, 1)
+    assert data["checkouts"] >= 1 and data["timeouts"] == 0
+    assert data["wait_seconds_max"] >= 0
+
+
+def test_checkout_timeouts_are_counted(app):
+    db.session.remove()
+    with db.engine.connect():
+        with pytest.raises(exc.TimeoutError):
+            db.engine.connect()
+        data = pool_metrics.snapshot()
+        assert data["checked_out"] == 1
+        assert data["timeouts"] == 1
+        assert data["wait_seconds_max"] >= 1
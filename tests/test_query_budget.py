@@ -0,0 +1,134 @@
+"""
+SQL statement budgets for hot endpoints, and the per-request query counter behind them.
+"""
+import logging
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+from pq_app import create_app
+from pq_app.model import db, Action, Encounter, Playthrough, Tile, TileTypeOption, User, init_defaults
+from pq_app.services.query_counter import count_queries
+
+
+@pytest.fixture
+def app():
+    app = create_app("testing")
+    app.config.update(RATELIMIT_ENABLED=False, COUNTER_ATTACK_CHANCE=0)
+    with app.app_context():
+        db.create_all()
+        init_defaults()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def game(app):
+    """A player with a page worth of tiles of every type, each with an action and encounters"""
+    player = User(username="budget_player", email="budget@example.com")
+    player.set_password("pw")
+    player.points = 100
+    player.playerclass, player.playerrace = 1, 1
+    db.session.add(player)
+    db.session.flush()
+    playthrough = Playthrough(user_id=player.id)
+    db.session.add(playthrough)
+    db.session.flush()
+    tile_types = TileTypeOption.query.all()
+    tiles = []
+    for i in range(12):
+        tile = Tile(
+            user_id=player.id,
+            type=tile_types[i % len(tile_types)].id,
+            playthrough_id=playthrough.id,
+            tile_index=i,
+            monster_max_hp=10**6,
+            monster_current_hp=10**6,
+        )
+        db.session.add(tile)
+        db.session.flush()
+        action = Action(name="rest", tile=tile.id)
+        db.session.add(action)
+        db.session.flush()
+        tile.action = action.id
+        for _ in range(2):
+            db.session.add(Encounter(tile_id=tile.id, user_id=player.id, player_hp_before=100, player_hp_after=90))
+        tiles.append(tile)
+    db.session.commit()
+    monster = next(t for t in tiles if t.type == TileTypeOption.query.filter_by(name="monster").one().id)
+    headers = {"Authorization": f"Bearer {create_access_token(identity=str(player.id))}"}
+    db.session.expire_all()
+    return {"player_id": player.id, "monster_id": monster.id, "headers": headers}
+
+
+def test_web_history_page(app, game, query_budget):
+    client = app.test_client()
+    assert client.post("/login", data={"username": "budget_player", "password": "pw"}).status_code == 302
+    db.session.expire_all()
+    with query_budget(6):
+        response = client.get(f"/player/{game['player_id']}/game/history")
+    assert response.status_code == 200
+
+
+@pytest.mark.parametrize(
+    "path, budget",
+    [
+        ("/state", 2),
+        ("/tiles/current", 5),
+        # Includes the one-off rebuild of the missing stats rollup row
+        ("/encounters", 5),
+        ("/tiles/{monster_id}/combat-actions", 3),
+    ],
+)
+def test_api_reads(app, game, query_budget, path, budget):
+    url = f"/api/v1/player/{game['player_id']}" + path.format(**game)
+    with query_budget(budget):
+        response = app.test_client().get(url, headers=game["headers"])
+    assert response.status_code == 200
+
+
+def test_combat_execute(app, game, query_budget):
+    body = {"tile_id": game["monster_id"], "combat_action_code": "attack_light"}
+    with query_budget(8):
+        response = app.test_client().post(
+            f"/api/v1/player/{game['player_id']}/combat/execute", json=body, headers=game["headers"]
+        )
+    assert response.status_code == 200
+
+
+def test_server_timing_header(app, game):
+    response = app.test_client().get(f"/api/v1/player/{game['player_id']}/state", headers=game["headers"])
+    timing = response.headers["Server-Timing"]
+    assert timing.startswith("db;dur=") and timing.endswith('desc="1 queries"')
+
+    app.config["SERVER_TIMING_ENABLED"] = False
+    response = app.test_client().get(f"/api/v1/player/{game['player_id']}/state", headers=game["headers"])
+    assert "Server-Timing" not in response.headers
+
+
+def test_n_plus_one_is_flagged(app, game, query_budget, caplog):
+    @app.route("/_lazy_encounters/<int:player_id>")
+    def lazy_encounters(player_id):
+        tiles = Tile.query.filter_by(user_id=player_id).all()
+        return {"encounters": sum(len(tile.encounters) for tile in tiles)}
+
+    with caplog.at_level(logging.WARNING, logger="pq_app.queries"):
+        response = app.test_client().get(f"/_lazy_encounters/{game['player_id']}")
+    assert response.get_json() == {"encounters": 24}
+    warning = next(record for record in caplog.records if record.levelno == logging.WARNING)
+    assert warning.db_statement_count == 12 and "FROM encounter" in warning.db_statement
+
+    db.session.expire_all()
+    with pytest.raises(pytest.fail.Exception, match="N\\+1: ran 12 times"):
+        with query_budget(100):
+            for tile in Tile.query.filter_by(user_id=game["player_id"]).all():
+                tile.encounters
+
+
+def test_counters_nest(app, game):
+    with count_queries() as outer:
+        with count_queries() as inner:
+            db.session.get(User, game["player_id"])
+        Tile.query.count()
+    assert (outer.count, inner.count) == (2, 1)
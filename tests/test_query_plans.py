@@ -0,0 +1,162 @@
+"""
+Index audit: every hot service query must be answered from an index.
+
+Statements issued by the services (and the encounter/stats API endpoints) are captured
+and run through EXPLAIN QUERY PLAN (SQLite) or EXPLAIN (Postgres). The test fails if any
+of them falls back to a full table scan.
+"""
+import re
+
+import pytest
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+
+from pq_app import create_app
+from pq_app.model import db, User, Tile, Playthrough, Encounter, TileTypeOption, init_defaults
+from pq_app.services.combat_service import CombatService
+from pq_app.services.game_state_service import GameStateService
+from pq_app.services.media_service import MediaService
+from pq_app.services.reference_data import get_reference_data
+from pq_app.services.tile_service import TileService
+
+SQLITE_FULL_SCAN = re.compile(r"^SCAN (TABLE )?(?P<table>\w+)$")
+POSTGRES_FULL_SCAN = re.compile(r"Seq Scan on (?P<table>\w+)")
+
+
+@pytest.fixture
+def app():
+    app = create_app("testing")
+    with app.app_context():
+        db.create_all()
+        init_defaults()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def game(app):
+    """A player with a playthrough, a monster tile and a few encounters"""
+    player = User(username="plan_player")
+    player.set_password("pw")
+    db.session.add(player)
+    db.session.flush()
+    playthrough = Playthrough(user_id=player.id)
+    db.session.add(playthrough)
+    db.session.flush()
+    monster = TileTypeOption.query.filter_by(name="monster").first()
+    tile = Tile(user_id=player.id, type=monster.id, playthrough_id=playthrough.id, content="m")
+    db.session.add(tile)
+    db.session.flush()
+    for _ in range(3):
+        db.session.add(Encounter(tile_id=tile.id, user_id=player.id, player_hp_before=100, player_hp_after=90))
+    MediaService().load_ascii_from_files()
+    db.session.commit()
+    get_reference_data()  # warm the registry so reference-table loads are not captured
+    return {"player": player, "playthrough": playthrough, "tile": tile}
+
+
+class _StatementRecorder:
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            self.statements.append((statement, parameters))
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._record)
+
+
+def _full_scans(statement, parameters):
+    """Return the tables a statement would scan in full"""
+    conn = db.session.connection()
+    dialect = conn.dialect.name
+    if dialect == "sqlite":
+        plan = [row[-1] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)]
+        pattern = SQLITE_FULL_SCAN
+    elif dialect == "postgresql":
+        plan = [row[0] for row in conn.exec_driver_sql("EXPLAIN " + statement, parameters)]
+        pattern = POSTGRES_FULL_SCAN
+    else:  # pragma: no cover - other dialects are not supported by the audit
+        pytest.skip(f"no plan audit for {dialect}")
+    return [m.group("table") for line in plan for m in [pattern.search(line.strip())] if m]
+
+
+def _assert_indexed(recorder):
+    assert recorder.statements, "no statements captured"
+    offenders = []
+    for statement, parameters in recorder.statements:
+        tables = _full_scans(statement, parameters)
+        if tables:
+            offenders.append(f"{tables}: {statement}")
+    assert not offenders, "full table scans:\n" + "\n".join(offenders)
+
+
+def test_tile_service_queries_use_indexes(app, game):
+    player, playthrough, tile = game["player"], game["playthrough"], game["tile"]
+    service = TileService()
+    with _StatementRecorder(db.engine) as recorder:
+        service.get_latest_tile(player.id, playthrough.id)
+        service.get_latest_tile(player.id)
+        service.get_active_playthrough(player.id)
+        service.needs_new_tile(player.id, playthrough.id)
+        db.session.expire_all()
+        service.get_tile_data(tile.id)
+        service.get_tile_history(player.id)
+        service.next_tile(player.id, playthrough.id)
+    _assert_indexed(recorder)
+
+
+def test_combat_service_queries_use_indexes(app, game):
+    tile = game["tile"]
+    service = CombatService()
+    rest = get_reference_data().action_options_by_code["rest"]
+    with _StatementRecorder(db.engine) as recorder:
+        service.get_tile_for_action(tile.id)
+        service.get_or_create_action_record(tile.id, "rest", rest)
+        service.get_or_create_action_record(tile.id, "rest", rest)
+    _assert_indexed(recorder)
+
+
+def test_media_service_queries_use_indexes(app, game):
+    tile = game["tile"]
+    service = MediaService()
+    with _StatementRecorder(db.engine) as recorder:
+        service.get_default_media(tile.type)
+        service.get_media_for_tile(tile.id)
+        service.get_media_for_tile_type(tile.type)
+        service.get_tile_display_media(tile.id)
+        service.resolve_display_media([tile])
+    _assert_indexed(recorder)
+
+
+def test_game_state_query_uses_indexes(app, game):
+    with _StatementRecorder(db.engine) as recorder:
+        GameStateService().load(game["player"].id)
+    _assert_indexed(recorder)
+
+
+def test_encounter_and_stats_endpoints_use_indexes(app, game):
+    player = game["player"]
+    headers = {"Authorization": f"Bearer {create_access_token(identity=str(player.id))}"}
+    client = app.test_client()
+    with _StatementRecorder(db.engine) as recorder:
+        first = client.get(f"/api/v1/player/{player.id}/encounters?limit=2", headers=headers)
+        assert first.status_code == 200
+        cursor = first.get_json()["next_cursor"]
+        assert client.get(f"/api/v1/player/{player.id}/encounters?cursor={cursor}", headers=headers).status_code == 200
+        assert client.get(f"/api/v1/player/characters/{player.id}/stats", headers=headers).status_code == 200
+    _assert_indexed(recorder)
+
+
+def test_audit_detects_full_scans(app, game):
+    """Sanity check: an unindexed predicate is reported"""
+    with _StatementRecorder(db.engine) as recorder:
+        Encounter.query.filter_by(damage_dealt=5).all()
+    assert _full_scans(*recorder.statements[0]) == ["encounter"]
@@ -0,0 +1,62 @@
+"""
+Tests for the shared SQLite rate-limit storage.
+"""
+import time
+
+import pytest
+from limits.storage import storage_from_string
+
+import benchmark_rate_limit
+import config
+from pq_app import create_app
+from pq_app.model import db
+from pq_app.services.rate_limit_storage import SQLiteStorage
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setattr(config.TestingConfig, "RATELIMIT_STORAGE_URI", f"sqlite:///{tmp_path / 'limits.db'}")
+    app = create_app("testing")
+    with app.app_context():
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def test_counters_expire_and_clear(tmp_path):
+    storage = storage_from_string(f"sqlite:///{tmp_path / 'limits.db'}")
+    assert isinstance(storage, SQLiteStorage)
+
+    assert storage.incr("a", 60) == 1
+    assert storage.incr("a", 60, amount=2) == 3
+    assert storage.get("a") == 3
+    assert storage.get_expiry("a") > time.time() + 50
+    assert storage.decr("a") == 2
+
+    assert storage.incr("short", 0.05) == 1
+    time.sleep(0.1)
+    assert storage.get("short") == 0
+    # An expired counter restarts from the increment
+    assert storage.incr("short", 60) == 1
+
+    storage.clear("a")
+    assert storage.get("a") == 0
+    assert storage.reset() == 1
+    assert storage.check()
+
+
+@pytest.mark.parametrize("strategy", sorted(benchmark_rate_limit.STRATEGIES))
+def test_limit_holds_across_processes(tmp_path, strategy):
+    uri = f"sqlite:///{tmp_path / 'limits.db'}"
+    assert benchmark_rate_limit.count_admitted(uri, strategy, workers=3, limit=20) == 20
+
+
+def test_login_limit_is_shared_and_persisted(app):
+    client = app.test_client()
+    statuses = [client.post("/api/v1/auth/login", json={}).status_code for _ in range(11)]
+    assert statuses == [400] * 10 + [429]
+
+    # A fresh storage on the same file (another worker, or after a restart) sees the hits
+    storage = storage_from_string(app.config["RATELIMIT_STORAGE_URI"])
+    assert storage.reset() > 0
+    assert client.post("/api/v1/auth/login", json={}).status_code == 400
@@ -0,0 +1,157 @@
+"""
+Tests for the process-local reference-data registry.
+"""
+import pytest
+from sqlalchemy import event
+
+from pq_app import create_app
+from pq_app.model import db, User, Tile, TileTypeOption, CombatAction, ReferenceDataVersion, init_defaults
+from pq_app.services.combat_service import CombatService
+from pq_app.services.media_service import MediaService
+from pq_app.services.reference_data import ReferenceData, get_reference_data
+from pq_app.services.tile_service import TileService
+
+
+@pytest.fixture
+def app():
+    app = create_app("testing")
+    with app.app_context():
+        db.create_all()
+        init_defaults()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def _count_queries():
+    statements = []
+
+    def _before_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", _before_execute)
+    return statements, lambda: event.remove(db.engine, "before_cursor_execute", _before_execute)
+
+
+def test_lookups_are_served_without_queries(app):
+    with app.app_context():
+        get_reference_data()  # warm
+        player = User(username="ref_player")
+        statements, stop = _count_queries()
+        try:
+            tile_service = TileService()
+            combat_service = CombatService()
+            assert {t["name"] for t in tile_service.get_tile_types()} == {"scene", "monster", "sign", "treasure"}
+            assert [a.name for a in tile_service.get_allowed_actions("sign")] == ["inspect", "quit", "rest"]
+            assert combat_service.get_action_by_value("fight").code == "fight"
+            assert combat_service.get_action_by_value("rest").name == "rest"
+            assert len(combat_service.get_available_actions(player)) == 5
+        finally:
+            stop()
+        assert statements == []
+
+
+def test_action_lookup_by_id_and_name(app):
+    with app.app_context():
+        reference = get_reference_data()
+        rest = reference.action_options_by_code["rest"]
+        service = CombatService()
+        assert service.get_action_by_value(str(rest.id)) == rest
+        assert service.get_action_by_value("nonexistent") is None
+
+
+def test_commit_to_reference_table_invalidates(app):
+    with app.app_context():
+        before = get_reference_data()
+        db.session.add(TileTypeOption(name="shrine"))
+        db.session.commit()
+
+        after = get_reference_data()
+        assert after.version > before.version
+        assert "shrine" in after.tile_types_by_name
+        assert "shrine" not in before.tile_types_by_name
+
+
+def test_rolled_back_write_does_not_leave_stale_data(app):
+    with app.app_context():
+        db.session.add(TileTypeOption(name="ghost"))
+        db.session.flush()
+        db.session.rollback()
+        assert "ghost" not in get_reference_data().tile_types_by_name
+
+
+def test_combat_action_edit_is_visible_after_commit(app):
+    with app.app_context():
+        assert get_reference_data().combat_actions_by_code["flee"].success_rate == 60
+        CombatAction.query.filter_by(code="flee").first().success_rate = 100
+        db.session.commit()
+        assert get_reference_data().combat_actions_by_code["flee"].success_rate == 100
+
+
+def test_admin_media_write_invalidates(app):
+    with app.app_context():
+        monster = get_reference_data().tile_types_by_name["monster"]
+        assert MediaService().update_tile_type_ascii(monster.id, "<o_o>")
+        assert get_reference_data().tile_types_by_id[monster.id].ascii_art == "<o_o>"
+
+
+def test_write_from_another_process_is_seen_after_check_interval(app):
+    with app.app_context():
+        # A second registry stands in for another gunicorn worker: the local
+        # after_commit invalidation never reaches it, only reference_data_version does
+        other_worker = ReferenceData(check_seconds=60)
+        monster = other_worker.load().tile_types_by_name["monster"]
+        MediaService().update_tile_type_ascii(monster.id, "<o_o>")
+
+        assert other_worker.snapshot().tile_type_display_art[monster.id].content != "<o_o>"
+        other_worker.check_seconds = 0
+        assert other_worker.snapshot().tile_type_display_art[monster.id].content == "<o_o>"
+
+
+def test_version_check_is_one_query_when_nothing_changed(app):
+    with app.app_context():
+        registry = ReferenceData(check_seconds=0)
+        before = registry.load()
+        statements, stop = _count_queries()
+        try:
+            assert registry.snapshot() is before
+        finally:
+            stop()
+        assert len(statements) == 1
+
+
+def test_reference_write_upserts_the_version_row(app):
+    with app.app_context():
+        # init_defaults seeds the row; without it the first write creates it
+        assert db.session.get(ReferenceDataVersion, 1) is not None
+        ReferenceDataVersion.query.delete()
+        db.session.commit()
+
+        monster = get_reference_data().tile_types_by_name["monster"]
+        MediaService().update_tile_type_ascii(monster.id, "<o_o>")
+        MediaService().update_tile_type_ascii(monster.id, "<O_O>")
+        db.session.expire_all()
+        assert db.session.get(ReferenceDataVersion, 1).version == 2
+
+
+def test_only_type_level_media_writes_bump_the_version(app):
+    with app.app_context():
+        player = User(username="override_player")
+        player.set_password("pw")
+        db.session.add(player)
+        db.session.commit()
+        monster = get_reference_data().tile_types_by_name["monster"]
+        tile = Tile(user_id=player.id, type=monster.id, content="A goblin")
+        db.session.add(tile)
+        db.session.commit()
+        before = db.session.get(ReferenceDataVersion, 1).version
+
+        override = MediaService().create_media_record(tile_id=tile.id, content="~~~")
+        override.content = "~o~"
+        db.session.commit()
+        db.session.expire_all()
+        assert db.session.get(ReferenceDataVersion, 1).version == before
+
+        MediaService().create_media_record(tile_type_id=monster.id, content="<o_o>", is_default=True)
+        db.session.expire_all()
+        assert db.session.get(ReferenceDataVersion, 1).version == before + 1
@@ -249,6 +249,8 @@ def user_with_character(client, authenticated_user, setup_game_data):
 
         tile_id = tile.id
 
+    # Requests share the outer app context's session: drop its now-stale (versioned) copies
+    db.session.expire_all()
     return {"user_id": authenticated_user, "tile_id": tile_id}
 
 
@@ -13,6 +13,7 @@ from pq_app.model import (
     TileTypeOption,
     ActionOption,
 )
+from pq_app.services.tile_service import TileService
 
 
 @pytest.fixture
@@ -524,12 +525,13 @@ def test_start_journey(client, authenticated_user, setup_game_data):
     assert response.status_code == 302
     assert f"/player/{user_id}/play" in response.location
 
-    # Verify playthrough and tile created
+    # Verify playthrough created and its first tile revealed (stored on the first action)
     with client.application.app_context():
         play = Playthrough.query.filter_by(user_id=user_id, ended_at=None).first()
         assert play is not None
-        tile = Tile.query.filter_by(user_id=user_id, playthrough_id=play.id).first()
-        assert tile is not None
+        assert play.tiles_revealed == 1
+        assert Tile.query.filter_by(user_id=user_id, playthrough_id=play.id).first() is None
+        tile = TileService().get_current_tile(user_id, play)
         assert tile.content is not None  # Content should be generated
 
 
@@ -538,6 +540,9 @@ def test_generate_tile_no_actioned_tile(client, user_with_character):
     """Test generate_tile redirects if previous tile not actioned."""
     user_id = user_with_character["user_id"]
 
+    # Requests share the outer app context's session: drop its stale (versioned) copies
+    db.session.expire_all()
+
     response = client.get(f"/player/{user_id}/game/tile/next", follow_redirects=False)
 
     assert response.status_code == 302
@@ -549,6 +554,9 @@ def test_generate_tile_requires_active_playthrough(client, user_with_character):
     """Test generate_tile redirects when no active playthrough exists."""
     user_id = user_with_character["user_id"]
 
+    # Requests share the outer app context's session: drop its stale (versioned) copies
+    db.session.expire_all()
+
     # Try to generate a tile without starting a journey
     response = client.get(f"/player/{user_id}/game/tile/next", follow_redirects=False)
 
@@ -568,14 +576,18 @@ def test_generate_tile_action_filtering(client, user_with_character):
         tile.action_taken = True
         db.session.commit()
 
+    # Requests share the outer app context's session: drop its stale (versioned) copies
+    db.session.expire_all()
+
     response = client.get(f"/player/{user_id}/game/tile/next", follow_redirects=True)
     assert response.status_code == 200
 
-    # Verify new tile was created with content
+    # Verify new tile was revealed with content (it is not stored until actioned)
     with client.application.app_context():
-        tiles = Tile.query.filter_by(user_id=user_id).all()
-        assert len(tiles) == 2
-        new_tile = tiles[-1]
+        assert Tile.query.filter_by(user_id=user_id).count() == 1
+        play = Playthrough.query.filter_by(user_id=user_id).one()
+        new_tile = TileService().get_current_tile(user_id, play)
+        assert new_tile.id is None
         assert new_tile.content is not None
 
 
@@ -752,6 +764,9 @@ def test_setup_char_post_with_existing_tile(client, user_with_character):
         existing_tiles = Tile.query.filter_by(user_id=user_id).count()
         assert existing_tiles > 0
 
+    # Requests share the outer app context's session: drop its stale (versioned) copies
+    db.session.expire_all()
+
     response = client.post(
         f"/player/{user_id}/setup",
         data={"charclass": class_id, "charrace": race_id},
@@ -0,0 +1,53 @@
+"""
+Tests for the SQLite tuning profile applied to new connections.
+"""
+import sqlite3
+
+import pytest
+
+import benchmark_sqlite
+import config
+from pq_app import create_app
+from pq_app.model import db, apply_sqlite_pragmas
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setattr(config.TestingConfig, "SQLALCHEMY_DATABASE_URI", f"sqlite:///{tmp_path / 'tuned.db'}")
+    app = create_app("testing")
+    with app.app_context():
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def _pragma(name):
+    return db.session.connection().exec_driver_sql(f"PRAGMA {name}").scalar()
+
+
+def test_connections_get_the_tuning_profile(app):
+    assert _pragma("journal_mode") == "wal"
+    assert _pragma("busy_timeout") == 5000
+    assert _pragma("synchronous") == 1  # NORMAL
+    assert _pragma("cache_size") == -32000
+    assert _pragma("temp_store") == 2  # MEMORY
+    assert _pragma("foreign_keys") == 1
+
+
+def test_blank_values_are_skipped_and_bad_values_rejected():
+    connection = sqlite3.connect(":memory:")
+    apply_sqlite_pragmas(connection, {"cache_size": "", "temp_store": None, "busy_timeout": 1234})
+    assert connection.execute("PRAGMA busy_timeout").fetchone()[0] == 1234
+
+    with pytest.raises(ValueError):
+        apply_sqlite_pragmas(connection, {"cache_size": "1; DROP TABLE player"})
+    connection.close()
+
+
+def test_benchmark_profiles_commit_every_transaction(tmp_path):
+    path = str(tmp_path / "bench.db")
+    tuned = dict(config.Config.SQLITE_PRAGMAS, foreign_keys="ON")
+    for name, pragmas in (("baseline", benchmark_sqlite.BASELINE), ("tuned", tuned)):
+        summary = benchmark_sqlite.run_profile(name, pragmas, path, workers=2, transactions=20)
+        assert summary["committed"] == 40
+    assert summary["locked_errors"] == 0
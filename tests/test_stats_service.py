@@ -0,0 +1,229 @@
+"""
+Tests for character statistics and the PlayerStats rollup.
+"""
+import json
+
+import pytest
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+
+from pq_app import create_app
+from pq_app.model import db, User, Tile, Playthrough, Encounter, PlayerStats, TileTypeOption, init_defaults
+from pq_app.services.combat_service import CombatService
+from pq_app.services.reference_data import get_reference_data
+from pq_app.services.stats_service import StatsService
+from pq_app.services.tile_service import TileService
+
+
+@pytest.fixture
+def app():
+    app = create_app("testing")
+    with app.app_context():
+        db.create_all()
+        init_defaults()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+def _player_with_encounters(outcomes):
+    """outcomes: list of (was_successful, damage_dealt, damage_received)"""
+    player = User(username="stats_player")
+    player.set_password("pw")
+    db.session.add(player)
+    db.session.flush()
+    playthrough = Playthrough(user_id=player.id)
+    db.session.add(playthrough)
+    db.session.flush()
+    tile = Tile(user_id=player.id, type=1, playthrough_id=playthrough.id)
+    db.session.add(tile)
+    db.session.flush()
+    for success, dealt, received in outcomes:
+        db.session.add(
+            Encounter(
+                tile_id=tile.id,
+                user_id=player.id,
+                player_hp_before=100,
+                player_hp_after=100 - received,
+                damage_dealt=dealt,
+                damage_received=received,
+                was_successful=success,
+            )
+        )
+    StatsService().rebuild_player_stats(player.id)
+    db.session.commit()
+    return player
+
+
+def test_character_stats_aggregates(app):
+    with app.app_context():
+        player = _player_with_encounters([(True, 10, 0), (False, 0, 5), (True, 7, 3)])
+        stats = StatsService().get_character_stats(player.id)
+        assert stats == {
+            "total_encounters": 3,
+            "successful_encounters": 2,
+            "success_rate": 66.67,
+            "total_damage_dealt": 17,
+            "total_damage_received": 8,
+            "average_damage_dealt": 5.67,
+            "monsters_killed": 0,
+            "tiles_explored": 1,
+            "flee_attempts": 0,
+            "flee_successes": 0,
+        }
+
+
+def test_character_stats_without_history(app):
+    with app.app_context():
+        player = _player_with_encounters([])
+        stats = StatsService().get_character_stats(player.id)
+        assert stats["total_encounters"] == 0
+        assert stats["success_rate"] == 0
+        assert stats["average_damage_dealt"] == 0
+
+
+def test_recent_encounters_are_bounded(app):
+    with app.app_context():
+        player = _player_with_encounters([(True, i, 0) for i in range(15)])
+        recent = StatsService().get_recent_encounters(player.id, limit=10)
+        assert len(recent) == 10
+        assert recent[0].id > recent[-1].id
+
+
+def test_stats_endpoint_does_not_load_history(app):
+    with app.app_context():
+        player = _player_with_encounters([(True, 1, 1)] * 25)
+        headers = {"Authorization": f"Bearer {create_access_token(identity=str(player.id))}"}
+
+        rows_fetched = []
+
+        def _after_execute(conn, clauseelement, multiparams, params, execution_options, result):
+            if "from encounter" in str(clauseelement).lower():
+                rows_fetched.append(str(clauseelement))
+
+        event.listen(db.engine, "after_execute", _after_execute)
+        try:
+            response = app.test_client().get(f"/api/v1/player/characters/{player.id}/stats", headers=headers)
+        finally:
+            event.remove(db.engine, "after_execute", _after_execute)
+
+        assert response.status_code == 200
+        data = json.loads(response.data)
+        assert data["statistics"]["total_encounters"] == 25
+        assert len(data["recent_encounters"]) == 10
+        # totals come from the rollup row; only the bounded recent-encounters query reads history
+        assert len(rows_fetched) == 1
+
+
+def _monster_tile(player):
+    playthrough = Playthrough(user_id=player.id)
+    db.session.add(playthrough)
+    db.session.flush()
+    monster = TileTypeOption.query.filter_by(name="monster").first()
+    tile = TileService().create_tile(player.id, playthrough.id, monster.id)
+    db.session.add(tile)
+    db.session.commit()
+    return tile
+
+
+def test_combat_updates_rollup_in_same_transaction(app):
+    with app.test_request_context():
+        player = _player_with_encounters([])
+        tile = _monster_tile(player)
+        tile.monster_current_hp = 1
+        reference = get_reference_data()
+        service = CombatService()
+
+        service.execute_combat_action(player, tile, reference.combat_actions_by_code["flee"])
+        heavy = reference.combat_actions_by_code["attack_heavy"]
+        while tile.monster_current_hp > 0:
+            service.execute_combat_action(player, tile, heavy)
+        db.session.commit()
+
+        stats = db.session.get(PlayerStats, player.id)
+        assert stats.monsters_killed == 1
+        assert stats.flee_attempts == 1
+        assert stats.tiles_explored == 2
+        # the incremental rollup agrees with a rebuild from history
+        rebuilt = StatsService().compute_player_stats([player.id])[player.id]
+        assert {name: getattr(stats, name) for name in PlayerStats.COUNTERS} == rebuilt
+
+
+def test_rolled_back_encounter_does_not_count(app):
+    with app.test_request_context():
+        player = _player_with_encounters([(True, 1, 0)])
+        tile = _monster_tile(player)
+        CombatService().execute_action(player, tile, "inspect", "monster")
+        db.session.rollback()
+        assert StatsService().get_player_stats(player.id).total_encounters == 1
+
+
+def test_stats_without_rollup_row_are_computed(app):
+    with app.app_context():
+        player = _player_with_encounters([(True, 4, 0), (False, 0, 2)])
+        db.session.execute(db.delete(PlayerStats))
+        db.session.commit()
+
+        stats = StatsService().get_player_stats(player.id)
+        assert stats.total_encounters == 2
+        assert stats.total_damage_dealt == 4
+        assert stats not in db.session
+
+        assert StatsService().rebuild_player_stats() == 1
+        db.session.commit()
+        assert db.session.get(PlayerStats, player.id).tiles_explored == 1
+
+
+def test_new_players_start_with_an_empty_row(app):
+    with app.app_context():
+        player = User(username="fresh_player")
+        player.set_password("pw")
+        db.session.add(player)
+        db.session.commit()
+
+        stats = db.session.get(PlayerStats, player.id)
+        assert stats is not None
+        assert {name: getattr(stats, name) for name in PlayerStats.COUNTERS} == dict.fromkeys(PlayerStats.COUNTERS, 0)
+
+
+def test_increments_skip_players_not_yet_backfilled(app):
+    with app.test_request_context():
+        player = _player_with_encounters([(True, 4, 0), (False, 0, 2)])
+        db.session.execute(db.delete(PlayerStats))
+        db.session.commit()
+
+        # A row holding only this tile would hide the two earlier encounters
+        TileService().next_tile(player.id, _monster_tile(player).playthrough_id)
+        db.session.commit()
+        assert db.session.get(PlayerStats, player.id) is None
+        stats = StatsService().get_player_stats(player.id)
+        assert (stats.total_encounters, stats.tiles_explored) == (2, 3)
+
+
+def test_rebuild_overwrites_rows_in_place(app):
+    with app.app_context():
+        player = _player_with_encounters([(True, 4, 0)])
+        idle = User(username="idle_player")
+        idle.set_password("pw")
+        db.session.add(idle)
+        db.session.flush()
+        db.session.execute(db.update(PlayerStats).values(total_encounters=99, tiles_explored=99))
+        db.session.commit()
+
+        statements = []
+
+        def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement.lstrip().split()[0].upper())
+
+        event.listen(db.engine, "before_cursor_execute", _before_cursor_execute)
+        try:
+            assert StatsService().rebuild_player_stats() == 2
+        finally:
+            event.remove(db.engine, "before_cursor_execute", _before_cursor_execute)
+        db.session.commit()
+        # upserted in place: a concurrent increment never finds the row missing
+        assert "DELETE" not in statements
+        db.session.expire_all()
+        assert db.session.get(PlayerStats, player.id).total_encounters == 1
+        assert db.session.get(PlayerStats, player.id).tiles_explored == 1
+        assert db.session.get(PlayerStats, idle.id).total_encounters == 0
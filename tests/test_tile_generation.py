@@ -0,0 +1,211 @@
+"""
+Tests for deterministic, seeded tile generation.
+"""
+import pytest
+from flask_jwt_extended import create_access_token
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.attributes import set_committed_value
+
+from pq_app import create_app
+from pq_app.model import db, User, Tile, Playthrough, init_defaults
+from pq_app.services.tile_service import GeneratedTile, TileService
+
+
+@pytest.fixture
+def app():
+    app = create_app("testing")
+    with app.app_context():
+        db.create_all()
+        init_defaults()
+        yield app
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture
+def player(app):
+    player = User(username="seeded_player")
+    player.set_password("pw")
+    db.session.add(player)
+    db.session.commit()
+    return player
+
+
+class _StatementCounter:
+    def __init__(self):
+        self.statements = []
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement.lstrip().split()[0].upper())
+
+    def __enter__(self):
+        event.listen(db.engine, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(db.engine, "before_cursor_execute", self._record)
+
+
+def test_same_seed_and_index_give_same_tile(app):
+    first = [TileService().generate_tile(1234, i) for i in range(20)]
+    again = [TileService().generate_tile(1234, i) for i in range(20)]
+    other = [TileService().generate_tile(4321, i) for i in range(20)]
+
+    assert first == again
+    assert first != other
+    assert {t.tile_index for t in first} == set(range(20))
+    for tile in first:
+        if tile.monster_max_hp is not None:
+            assert tile.content.endswith(f"({tile.monster_max_hp} HP)")
+
+
+def test_reveals_follow_the_seeded_sequence(app, player):
+    service = TileService()
+    playthrough, first = service.start_new_playthrough(player.id)
+    db.session.commit()
+    assert first.tile_index == 0
+    assert playthrough.seed is not None
+
+    # Upcoming positions are a pure function of the seed: no look-ahead is stored
+    with _StatementCounter() as counter:
+        upcoming = [service.generate_tile(playthrough.seed, index) for index in (1, 2, 3)]
+    assert counter.statements == []
+
+    for expected in upcoming:
+        tile = service.next_tile(player.id, playthrough.id)
+        db.session.commit()
+        assert (tile.tile_index, tile.type, tile.content, tile.monster_max_hp) == (
+            expected.tile_index,
+            expected.type,
+            expected.content,
+            expected.monster_max_hp,
+        )
+    assert playthrough.tiles_revealed == 4
+
+
+def test_reveal_without_action_inserts_no_tile(app, player):
+    service = TileService()
+    playthrough, _ = service.start_new_playthrough(player.id)
+    db.session.commit()
+
+    with _StatementCounter() as counter:
+        service.next_tile(player.id, playthrough.id)
+        db.session.commit()
+    # the playthrough position and the stats rollup; the tile is stored on its first action
+    assert [s for s in counter.statements if s in ("INSERT", "UPDATE")] == ["UPDATE", "UPDATE"]
+    assert Tile.query.filter_by(playthrough_id=playthrough.id).count() == 0
+
+
+def test_first_action_stores_the_tile_once(app, player):
+    service = TileService()
+    playthrough, first = service.start_new_playthrough(player.id)
+    db.session.commit()
+    assert first.id is None
+
+    stored = service.store_tile(service.get_current_tile(player.id, playthrough))
+    again = service.store_tile(service.generate_tile(playthrough.seed, 0).to_tile(player.id, playthrough.id))
+    db.session.commit()
+    assert stored.id is not None and again.id == stored.id
+    assert (stored.tile_index, stored.content) == (0, first.content)
+    assert service.get_current_tile(player.id, playthrough).id == stored.id
+    assert Tile.query.filter_by(playthrough_id=playthrough.id).count() == 1
+
+
+def test_history_rebuilds_unactioned_positions(app, player):
+    service = TileService()
+    playthrough, first = service.start_new_playthrough(player.id)
+    service.store_tile(first)
+    db.session.commit()
+    for _ in range(2):
+        service.next_tile(player.id, playthrough.id)
+        db.session.commit()
+
+    page = service.get_tile_history(player.id, limit=2)
+    assert [(t.tile_index, t.id) for t in page.items] == [(2, None), (1, None)]
+    assert page.items[0].content == service.generate_tile(playthrough.seed, 2).content
+    rest = service.get_tile_history(player.id, cursor=page.next_cursor, limit=2)
+    assert [t.tile_index for t in rest.items] == [0]
+    assert rest.items[0].id is not None
+    assert not rest.has_more
+
+
+def test_stale_position_does_not_reveal_twice(app, player):
+    service = TileService()
+    playthrough, first = service.start_new_playthrough(player.id)
+    db.session.commit()
+
+    # A concurrent request read the position before this one advanced it
+    set_committed_value(playthrough, "tiles_revealed", 0)
+    tile = service.next_tile(player.id, playthrough.id)
+    db.session.commit()
+    assert tile.tile_index == 1
+    assert playthrough.tiles_revealed == 2
+
+
+def test_unseeded_playthrough_gets_a_seed(app, player):
+    playthrough = Playthrough(user_id=player.id)
+    db.session.add(playthrough)
+    db.session.commit()
+    playthrough.seed = None
+    db.session.commit()
+
+    tile = TileService().next_tile(player.id, playthrough.id)
+    db.session.commit()
+    assert playthrough.seed is not None
+    assert tile.tile_index == 0
+    assert isinstance(TileService().generate_tile(playthrough.seed, 1), GeneratedTile)
+
+
+def test_legacy_playthrough_starts_its_sequence(app, player):
+    playthrough = Playthrough(user_id=player.id)
+    db.session.add(playthrough)
+    db.session.flush()
+    db.session.add(Tile(user_id=player.id, type=1, playthrough_id=playthrough.id, content="legacy"))
+    db.session.commit()
+
+    tile = TileService().next_tile(player.id, playthrough.id)
+    db.session.commit()
+    assert tile.content != "legacy"
+    assert tile.tile_index == 0
+
+
+def test_position_is_revealed_once(app, player):
+    service = TileService()
+    playthrough, first = service.start_new_playthrough(player.id)
+    service.store_tile(first)
+    db.session.commit()
+
+    duplicate = service.generate_tile(playthrough.seed, 0).to_tile(player.id, playthrough.id)
+    db.session.add(duplicate)
+    with pytest.raises(IntegrityError):
+        db.session.commit()
+    db.session.rollback()
+
+
+def test_api_next_tile_follows_the_sequence(app, player):
+    service = TileService()
+    playthrough, first = service.start_new_playthrough(player.id)
+    service.store_tile(first).action_taken = True
+    db.session.commit()
+    expected = service.generate_tile(playthrough.seed, 1)
+
+    headers = {"Authorization": f"Bearer {create_access_token(identity=str(player.id))}"}
+    response = app.test_client().post(f"/api/v1/player/{player.id}/tiles/next", headers=headers)
+    assert response.status_code == 200
+    assert response.get_json()["content"] == expected.content
+
+
+def test_api_action_on_current_tile_stores_it(app, player):
+    service = TileService()
+    playthrough, first = service.start_new_playthrough(player.id)
+    db.session.commit()
+
+    headers = {"Authorization": f"Bearer {create_access_token(identity=str(player.id))}"}
+    response = app.test_client().post(
+        f"/api/v1/player/{player.id}/tiles/current/action", headers=headers, json={"action_code": "rest"}
+    )
+    assert response.status_code == 200, response.get_json()
+    stored = Tile.query.filter_by(playthrough_id=playthrough.id).one()
+    assert (stored.tile_index, stored.content) == (0, first.content)
+    assert response.get_json()["tile_id"] == stored.id